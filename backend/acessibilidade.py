@@ -0,0 +1,403 @@
+"""
+Acessibilidade espacial a fontes de alimentos in natura (feiras e hortas).
+
+Pré-calcula, por bairro (a partir do centróide do polígono):
+
+- `dist_in_natura_km`: distância até a fonte in natura mais próxima;
+- `fontes_in_natura_500m` / `_1km` / `_2km`: fontes dentro de cada raio;
+- `acessibilidade_in_natura`: índice 2SFCA com decaimento gaussiano (fontes
+  por 10 mil habitantes, ponderado pela população que disputa cada fonte).
+
+O cálculo usa índices em grade (fontes e centróides) e é mantido de forma
+incremental: adicionar ou remover fontes só recalcula os bairros dentro do raio
+de captação (e, na remoção, o vizinho mais próximo de quem perdeu a fonte). A
+soma do 2SFCA e a distância à mais próxima ficam sem arredondamento no motor e
+só são arredondadas no resultado, então adicionar e depois remover as mesmas
+fontes volta ao cálculo completo.
+
+Ponto de referência de cada bairro, nesta ordem:
+
+1. `poligono`: centróide de área do polígono (`geometria.py`);
+2. `referencia`: ponto fixo do CSV `RAJAI_BAIRROS_REFERENCIA`
+   (`bairro,lat,lon`; ex.: os centróides exportados de outro SIG);
+3. `pontos_nao_fonte`: média dos pontos das camadas que não são fontes in
+   natura (cozinhas). As fontes ficam de fora para a referência não ser puxada
+   para perto delas, o que encurtaria as distâncias medidas.
+
+Bairros sem nenhuma das três ficam sem métricas. A origem de cada bairro sai em
+`/acessibilidade` (`origem_centroide`) e o resumo, com aviso, no `meta`.
+
+Com dados compartilhados, o cálculo roda só no carregador e os workers recebem o
+motor pronto; a atualização incremental (`/acessibilidade/recarregar`) fica
+desativada, porque só mudaria o worker que recebeu o pedido — para recarregar
+as camadas, publique uma nova geração com `carregador.py`.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+
+from bootstrap import montar_bootstrap
+from endpoint import GEO_CATALOG, GEO_METRICS, GEO_SUMMARY, GEO_SUMMARY_CIDADE, GEO_SUMMARY_RA, normalize_bairro
+from geometria import BAIRROS_CENTROIDES
+from indice_espacial import GradeEspacial, haversine_km
+from memoria_compartilhada import ATIVO as DADOS_COMPARTILHADOS, Construtor, PlanoCompartilhado
+from metricas import medir_fase
+from piramide_pontos import montar_piramide
+from pontos import CAMADAS, PONTOS, carregar_pontos, pontos_in_natura
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+acessibilidade_router = APIRouter(prefix="/api/v1/geo/bairros", tags=["geo"])
+
+BASE_DIR = Path(__file__).parent
+REFERENCIA_FILE = Path(os.getenv("RAJAI_BAIRROS_REFERENCIA", BASE_DIR / "dados" / "bairros_referencia.csv"))
+
+RAIO_CAPTACAO_KM = 2.0
+RAIOS_CONTAGEM = (("fontes_in_natura_500m", 0.5), ("fontes_in_natura_1km", 1.0), ("fontes_in_natura_2km", 2.0))
+
+METRICAS_ACESSIBILIDADE = [
+    "dist_in_natura_km",
+    "fontes_in_natura_500m",
+    "fontes_in_natura_1km",
+    "fontes_in_natura_2km",
+    "acessibilidade_in_natura",
+]
+
+ACESSIBILIDADE_META: Dict[str, Any] = {}
+# bairro -> origem do ponto de referência ("poligono", "referencia" ou "pontos_nao_fonte")
+ORIGEM_CENTROIDE: Dict[str, str] = {}
+
+
+def peso_gaussiano(d_km: float, d0_km: float) -> float:
+    """Decaimento gaussiano do 2SFCA: 1 na origem, 0 a partir do raio de captação."""
+    if d_km > d0_km:
+        return 0.0
+    limite = math.exp(-0.5)
+    return (math.exp(-0.5 * (d_km / d0_km) ** 2) - limite) / (1 - limite)
+
+
+class MotorAcessibilidade:
+    def __init__(self, raio_captacao_km: float = RAIO_CAPTACAO_KM):
+        self.d0 = raio_captacao_km
+        self.raio_max = max(raio_captacao_km, max(r for _, r in RAIOS_CONTAGEM))
+        self.fontes = GradeEspacial(celula_km=1.0)
+        self.bairros = GradeEspacial(celula_km=1.0)
+        self.populacao: Dict[str, float] = {}
+        self.oferta: Dict[str, float] = {}  # R_j (oferta por habitante ponderado) de cada fonte
+        self.resultado: Dict[str, Dict[str, Any]] = {}
+        self._mais_proxima: Dict[str, Optional[str]] = {}
+        # sem arredondar: soma de R_j * peso (2SFCA) e distância à mais próxima de cada bairro
+        self._acessibilidade: Dict[str, float] = {}
+        self._dist_proxima: Dict[str, Optional[float]] = {}
+
+    # --- cálculo completo ---
+    def calcular(
+        self,
+        centroides: Dict[str, Tuple[float, float]],
+        populacao: Dict[str, float],
+        fontes: Iterable[Dict[str, Any]],
+    ) -> Dict[str, Dict[str, Any]]:
+        self.fontes = GradeEspacial(celula_km=1.0)
+        self.bairros = GradeEspacial(celula_km=1.0)
+        self.populacao = dict(populacao)
+        self.oferta = {}
+        self.resultado = {}
+        self._mais_proxima = {}
+        self._acessibilidade = {}
+        self._dist_proxima = {}
+
+        for bairro, (lat, lon) in centroides.items():
+            self.bairros.inserir(bairro, lat, lon)
+            self.resultado[bairro] = self._vazio()
+        for f in fontes:
+            self.fontes.inserir(f["id"], f["lat"], f["lon"])
+
+        for fid in self.fontes.ids():
+            self.oferta[fid] = self._oferta_da_fonte(fid)
+
+        for bairro in self.resultado:
+            self._recalcular_bairro(bairro)
+        return self.resultado
+
+    def _vazio(self) -> Dict[str, Any]:
+        res: Dict[str, Any] = {"dist_in_natura_km": None, "acessibilidade_in_natura": 0.0}
+        for nome, _ in RAIOS_CONTAGEM:
+            res[nome] = 0
+        return res
+
+    def _oferta_da_fonte(self, fid: str) -> float:
+        lat, lon = self.fontes.coordenadas(fid)
+        demanda = sum(
+            self.populacao.get(b, 0) * peso_gaussiano(d, self.d0) for b, d in self.bairros.no_raio(lat, lon, self.d0)
+        )
+        return (1.0 / demanda) if demanda > 0 else 0.0
+
+    def _definir_mais_proxima(self, bairro: str, fid: Optional[str], d: Optional[float]) -> None:
+        self._mais_proxima[bairro] = fid
+        self._dist_proxima[bairro] = d
+        self.resultado[bairro]["dist_in_natura_km"] = None if d is None else round(d, 3)
+
+    def _somar_acessibilidade(self, bairro: str, valor: float) -> None:
+        acc = self._acessibilidade[bairro] = self._acessibilidade.get(bairro, 0.0) + valor
+        # resíduo de ponto flutuante ao remover todas as fontes não vira -0.0
+        self.resultado[bairro]["acessibilidade_in_natura"] = round(max(acc, 0.0) * 10000, 4)
+
+    def _recalcular_bairro(self, bairro: str) -> None:
+        lat, lon = self.bairros.coordenadas(bairro)
+        res = self.resultado[bairro] = self._vazio()
+        mais_proxima = self.fontes.mais_proximo(lat, lon)
+        self._definir_mais_proxima(bairro, *(mais_proxima or (None, None)))
+
+        acc = 0.0
+        for fid, d in self.fontes.no_raio(lat, lon, self.raio_max):
+            for nome, raio in RAIOS_CONTAGEM:
+                if d <= raio:
+                    res[nome] += 1
+            acc += self.oferta.get(fid, 0.0) * peso_gaussiano(d, self.d0)
+        self._acessibilidade[bairro] = 0.0
+        self._somar_acessibilidade(bairro, acc)
+
+    # --- atualização incremental ---
+    def adicionar_fontes(self, fontes: Iterable[Dict[str, Any]]) -> List[str]:
+        """Insere fontes e atualiza só os bairros afetados. Retorna os bairros alterados."""
+        afetados = set()
+        for f in fontes:
+            fid, lat, lon = f["id"], f["lat"], f["lon"]
+            if fid in self.fontes:
+                afetados.update(self.remover_fontes([fid]))
+            self.fontes.inserir(fid, lat, lon)
+            self.oferta[fid] = self._oferta_da_fonte(fid)
+            r = self.oferta[fid]
+
+            for bairro, d in self.bairros.no_raio(lat, lon, self.raio_max):
+                res = self.resultado[bairro]
+                for nome, raio in RAIOS_CONTAGEM:
+                    if d <= raio:
+                        res[nome] += 1
+                self._somar_acessibilidade(bairro, r * peso_gaussiano(d, self.d0))
+                afetados.add(bairro)
+
+            # a nova fonte pode virar a mais próxima de qualquer bairro
+            for bairro in self.resultado:
+                blat, blon = self.bairros.coordenadas(bairro)
+                d = haversine_km(blat, blon, lat, lon)
+                atual = self._dist_proxima.get(bairro)
+                if atual is None or d < atual:
+                    self._definir_mais_proxima(bairro, fid, d)
+                    afetados.add(bairro)
+        return sorted(afetados)
+
+    def remover_fontes(self, ids: Iterable[str]) -> List[str]:
+        afetados = set()
+        for fid in ids:
+            coords = self.fontes.coordenadas(fid)
+            if coords is None:
+                continue
+            lat, lon = coords
+            r = self.oferta.pop(fid, 0.0)
+            self.fontes.remover(fid)
+
+            for bairro, d in self.bairros.no_raio(lat, lon, self.raio_max):
+                res = self.resultado[bairro]
+                for nome, raio in RAIOS_CONTAGEM:
+                    if d <= raio:
+                        res[nome] -= 1
+                self._somar_acessibilidade(bairro, -r * peso_gaussiano(d, self.d0))
+                afetados.add(bairro)
+
+            for bairro, prox in list(self._mais_proxima.items()):
+                if prox != fid:
+                    continue
+                blat, blon = self.bairros.coordenadas(bairro)
+                self._definir_mais_proxima(bairro, *(self.fontes.mais_proximo(blat, blon) or (None, None)))
+                afetados.add(bairro)
+        return sorted(afetados)
+
+
+MOTOR = MotorAcessibilidade()
+
+
+def _referencias_fixas(path: Path = REFERENCIA_FILE) -> Dict[str, Tuple[float, float]]:
+    """CSV `bairro,lat,lon` com um ponto fixo por bairro (opcional)."""
+    if not path.exists():
+        return {}
+    refs = {}
+    with path.open(encoding="utf-8-sig", newline="") as fp:
+        for row in csv.DictReader(fp):
+            try:
+                refs[normalize_bairro(row["bairro"])] = (float(row["lat"]), float(row["lon"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return refs
+
+
+def _centroides_fallback() -> Dict[str, Tuple[float, float]]:
+    """Média das coordenadas dos pontos de cada bairro nas camadas que não são fontes in natura."""
+    soma: Dict[str, List[float]] = {}
+    for camada, pontos in PONTOS.items():
+        if CAMADAS.get(camada, {}).get("in_natura", True):
+            continue
+        for p in pontos:
+            if not p["bairro"]:
+                continue
+            acc = soma.setdefault(p["bairro"], [0.0, 0.0, 0])
+            acc[0] += p["lat"]
+            acc[1] += p["lon"]
+            acc[2] += 1
+    return {b: (a[0] / a[2], a[1] / a[2]) for b, a in soma.items()}
+
+
+def _aplicar_nos_sumarios(bairros: Optional[Iterable[str]] = None) -> None:
+    """Copia o resultado do motor para GEO_SUMMARY (e refaz os rollups de RA e cidade)."""
+    alvo = GEO_SUMMARY.keys() if bairros is None else [b for b in bairros if b in GEO_SUMMARY]
+    for bairro in alvo:
+        res = MOTOR.resultado.get(bairro)
+        totais = GEO_SUMMARY[bairro]["totais"]
+        for m in METRICAS_ACESSIBILIDADE:
+            totais[m] = res.get(m) if res else None
+
+    def rollup(membros: List[str], destino: Dict[str, Any]) -> None:
+        pares = [(GEO_SUMMARY[b]["populacao_2022"] or 0, MOTOR.resultado[b]) for b in membros if b in MOTOR.resultado]
+        totais = destino["totais"]
+        for nome, _ in RAIOS_CONTAGEM:
+            totais[nome] = sum(r[nome] for _, r in pares)
+        for m in ("dist_in_natura_km", "acessibilidade_in_natura"):
+            validos = [(p, r[m]) for p, r in pares if r[m] is not None]
+            peso = sum(p for p, _ in validos)
+            totais[m] = round(sum(p * v for p, v in validos) / peso, 4) if peso else None
+
+    for summary in GEO_SUMMARY_RA.values():
+        rollup(summary.get("bairros", []), summary)
+    for summary in GEO_SUMMARY_CIDADE.values():
+        rollup(list(GEO_SUMMARY.keys()), summary)
+
+
+def _registrar_metricas() -> None:
+    for m in METRICAS_ACESSIBILIDADE:
+        if m not in GEO_METRICS:
+            GEO_METRICS.append(m)
+    if GEO_CATALOG:
+        GEO_CATALOG["metrics"] = GEO_METRICS
+
+
+def calcular_acessibilidade() -> Dict[str, Any]:
+    """Cálculo completo (na carga). Requer GEO_SUMMARY e PONTOS já carregados."""
+    with medir_fase("acessibilidade"):
+        centroides: Dict[str, Tuple[float, float]] = {}
+        ORIGEM_CENTROIDE.clear()
+        for origem, fonte in (
+            ("poligono", BAIRROS_CENTROIDES),
+            ("referencia", _referencias_fixas()),
+            ("pontos_nao_fonte", _centroides_fallback()),
+        ):
+            for b, c in fonte.items():
+                if b in GEO_SUMMARY and b not in centroides:
+                    centroides[b] = c
+                    ORIGEM_CENTROIDE[b] = origem
+        por_origem: Dict[str, int] = {}
+        for origem in ORIGEM_CENTROIDE.values():
+            por_origem[origem] = por_origem.get(origem, 0) + 1
+        sem_centroide = sorted(b for b in GEO_SUMMARY if b not in centroides)
+        populacao = {b: float(GEO_SUMMARY[b].get("populacao_2022") or 0) for b in centroides}
+        fontes = pontos_in_natura()
+        MOTOR.calcular(centroides, populacao, fontes)
+        _registrar_metricas()
+        _aplicar_nos_sumarios()
+
+    ACESSIBILIDADE_META.clear()
+    ACESSIBILIDADE_META.update(
+        {
+            "origem_centroides": por_origem,
+            "bairros_com_centroide": len(centroides),
+            "bairros_sem_centroide": sem_centroide,
+            "fontes_in_natura": len(fontes),
+            "raio_captacao_km": MOTOR.d0,
+            "metricas": METRICAS_ACESSIBILIDADE,
+        }
+    )
+    if set(por_origem) - {"poligono"} or sem_centroide:
+        ACESSIBILIDADE_META["aviso"] = (
+            "Sem polígono para todos os bairros: parte das distâncias parte de um ponto fixo ou da média das "
+            "cozinhas do bairro (ver origem_centroide), e bairros sem referência ficam sem métricas."
+        )
+    logger.info(
+        "Acessibilidade calculada: %d bairros, %d fontes (centróides: %s)", len(centroides), len(fontes), por_origem
+    )
+    return ACESSIBILIDADE_META
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    construtor.objeto(
+        "acessibilidade", {"motor": vars(MOTOR), "meta": ACESSIBILIDADE_META, "origem": ORIGEM_CENTROIDE}
+    )
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    """Motor e resultado já calculados pelo carregador (as métricas já estão nos sumários)."""
+    dados = plano.objeto("acessibilidade")
+    ACESSIBILIDADE_META.clear()
+    ORIGEM_CENTROIDE.clear()
+    # no lugar: localizacao.py importa MOTOR
+    vars(MOTOR).update(vars(MotorAcessibilidade()) if dados is None else dados["motor"])
+    if dados is None:
+        return
+    ACESSIBILIDADE_META.update(dados["meta"])
+    ORIGEM_CENTROIDE.update(dados["origem"])
+
+
+def atualizar_fontes(adicionadas: Iterable[Dict[str, Any]] = (), removidas: Iterable[str] = ()) -> List[str]:
+    """Atualização incremental das fontes in natura; devolve os bairros recalculados."""
+    afetados = set(MOTOR.remover_fontes(removidas))
+    afetados.update(MOTOR.adicionar_fontes(adicionadas))
+    _aplicar_nos_sumarios(afetados)
+    ACESSIBILIDADE_META["fontes_in_natura"] = len(MOTOR.fontes)
+    return sorted(afetados)
+
+
+def recarregar_camadas() -> Dict[str, Any]:
+    """Relê as camadas de pontos do disco e aplica só a diferença no motor."""
+    antes = {p["id"]: p for p in pontos_in_natura()}
+    carregar_pontos()
+    depois = {p["id"]: p for p in pontos_in_natura()}
+
+    removidas = [fid for fid in antes if fid not in depois]
+    adicionadas = [
+        p for fid, p in depois.items() if fid not in antes or (antes[fid]["lat"], antes[fid]["lon"]) != (p["lat"], p["lon"])
+    ]
+    afetados = atualizar_fontes(adicionadas, removidas)
+    return {"adicionadas": len(adicionadas), "removidas": len(removidas), "bairros_recalculados": afetados}
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@acessibilidade_router.get("/acessibilidade")
+async def geo_acessibilidade():
+    """Métricas de acessibilidade pré-calculadas por bairro (também disponíveis no choropleth)."""
+    if not ACESSIBILIDADE_META:
+        raise HTTPException(status_code=404, detail="Acessibilidade não calculada")
+    data = {b: {**res, "origem_centroide": ORIGEM_CENTROIDE.get(b)} for b, res in MOTOR.resultado.items()}
+    return resposta_json({"meta": ACESSIBILIDADE_META, "data": data})
+
+
+@acessibilidade_router.post("/acessibilidade/recarregar")
+async def geo_acessibilidade_recarregar():
+    if not ACESSIBILIDADE_META:
+        raise HTTPException(status_code=404, detail="Acessibilidade não calculada")
+    if DADOS_COMPARTILHADOS:
+        raise HTTPException(
+            status_code=409,
+            detail="Com dados compartilhados, recarregue as camadas publicando uma nova geração (carregador.py)",
+        )
+    resultado = recarregar_camadas()
+    montar_piramide()
+    resultado["bootstrap_versao"] = montar_bootstrap()
+    return resultado
@@ -0,0 +1,371 @@
+"""
+Autocorrelação espacial das métricas de bairro (hotspots de desertos/pântanos alimentares).
+
+- Adjacência: contiguidade "queen" derivada uma vez da topologia
+  (`topologia.py`): como os arcos são cortados nas junções, dois bairros que
+  compartilham algum ponto de ponta de arco se tocam (divisa ou só um vértice).
+  Fica em CSR (`indptr`/`indices`, NumPy).
+- Estatísticas, por métrica de `GEO_METRICS`:
+  - I de Moran global (W padronizada por linha), com p por permutação;
+  - LISA (Moran local) com p por permutação condicional e quadrante
+    (AA, BB, AB, BA);
+  - Getis-Ord Gi* (pesos binários incluindo o próprio bairro), z analítico e p
+    por permutação condicional.
+  As permutações são sorteadas em lote (uma matriz de sorteios para todos os
+  bairros, como no "crand" do PySAL) e as defasagens saem de somas acumuladas
+  sobre o CSR, sem laço por bairro.
+- As permutações rodam no pool de processos (`execucao.py`), em lotes de
+  métricas; o resultado fica em cache por métrica, chaveado pelos valores, e
+  é servido como camada de choropleth em `/hotspots`.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+
+from endpoint import GEO_METRICS, GEO_SUMMARY, _validate_metric
+from execucao import MAX_WORKERS, POOL
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from metricas import registrar_acesso_cache, registrar_tamanho_cache
+from serializacao import resposta_json
+from topologia import TOPOLOGIA
+
+logger = logging.getLogger("rajai")
+
+autocorrelacao_router = APIRouter(prefix="/api/v1/geo/bairros", tags=["geo"])
+
+PERMUTACOES = int(os.getenv("RAJAI_AUTOCORRELACAO_PERMUTACOES", "999"))
+SEMENTE = int(os.getenv("RAJAI_AUTOCORRELACAO_SEMENTE", "12345"))
+ALFA_PADRAO = 0.05
+BLOCO_BAIRROS = 64  # bairros por bloco na permutação condicional (limita a memória)
+CAMADAS = ("lisa", "gi")
+
+# {"bairros": [...], "indptr": array, "indices": array}
+ADJACENCIA: Dict[str, Any] = {}
+# (métrica, assinatura dos valores) -> resultado de calcular_estatisticas
+_CACHE: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_EM_ANDAMENTO: Dict[Tuple[str, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+# -----------------------------
+# Adjacência
+# -----------------------------
+def contiguidade_queen(topologia: Dict[str, Any]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Bairros (ordenados) e CSR da vizinhança queen a partir dos arcos da topologia."""
+    arcos = topologia.get("arcs") or []
+    bairros: List[str] = []
+    pontos_por_bairro: List[set] = []
+    for geom in topologia.get("geometries", []):
+        poligonos = geom["arcs"] if geom["type"] == "MultiPolygon" else [geom["arcs"]]
+        pontos = set()
+        for pol in poligonos:
+            for anel in pol:
+                for a in anel:
+                    arco = arcos[a if a >= 0 else ~a]
+                    pontos.add(tuple(arco[0]))
+                    pontos.add(tuple(arco[-1]))
+        bairros.append(geom["id"])
+        pontos_por_bairro.append(pontos)
+
+    ordem = sorted(range(len(bairros)), key=lambda i: bairros[i])
+    bairros = [bairros[i] for i in ordem]
+    pontos_por_bairro = [pontos_por_bairro[i] for i in ordem]
+
+    donos: Dict[Tuple[int, int], List[int]] = {}
+    for i, pontos in enumerate(pontos_por_bairro):
+        for p in pontos:
+            donos.setdefault(p, []).append(i)
+    vizinhos: List[set] = [set() for _ in bairros]
+    for lista in donos.values():
+        for i in lista:
+            vizinhos[i].update(j for j in lista if j != i)
+
+    indptr = np.zeros(len(bairros) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(v) for v in vizinhos])
+    indices = np.asarray([j for v in vizinhos for j in sorted(v)], dtype=np.int64)
+    return bairros, indptr, indices
+
+
+def montar_adjacencia() -> int:
+    """Deriva a adjacência da topologia carregada. Retorna o número de bairros."""
+    ADJACENCIA.clear()
+    _CACHE.clear()
+    if not TOPOLOGIA:
+        return 0
+    bairros, indptr, indices = contiguidade_queen(TOPOLOGIA)
+    ADJACENCIA.update({"bairros": bairros, "indptr": indptr, "indices": indices})
+    ilhas = int((np.diff(indptr) == 0).sum())
+    logger.info(
+        "Adjacência queen: %d bairros, %d pares de vizinhos, %d sem vizinhos", len(bairros), len(indices) // 2, ilhas
+    )
+    return len(bairros)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if ADJACENCIA:
+        construtor.objeto("adjacencia.bairros", ADJACENCIA["bairros"])
+        construtor.array("adjacencia.indptr", ADJACENCIA["indptr"])
+        construtor.array("adjacencia.indices", ADJACENCIA["indices"])
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    ADJACENCIA.clear()
+    _CACHE.clear()
+    if plano.tem_array("adjacencia.indptr"):
+        ADJACENCIA.update(
+            {
+                "bairros": plano.objeto("adjacencia.bairros"),
+                "indptr": plano.array("adjacencia.indptr"),
+                "indices": plano.array("adjacencia.indices"),
+            }
+        )
+
+
+def _subgrafo(indptr: np.ndarray, indices: np.ndarray, manter: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR restrito aos bairros de `manter` (máscara), com índices renumerados."""
+    novo = np.full(manter.size, -1, dtype=np.int64)
+    novo[manter] = np.arange(int(manter.sum()))
+    linhas = np.repeat(np.arange(manter.size), np.diff(indptr))
+    ok = manter[linhas] & manter[indices]
+    contagem = np.bincount(novo[linhas[ok]], minlength=int(manter.sum()))
+    sub_indptr = np.zeros(contagem.size + 1, dtype=np.int64)
+    sub_indptr[1:] = np.cumsum(contagem)
+    return sub_indptr, novo[indices[ok]]
+
+
+# -----------------------------
+# Estatísticas (rodam nos processos do pool)
+# -----------------------------
+def _somas_csr(valores: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Soma dos vizinhos de cada bairro; `valores` pode ser (n,) ou (P, n)."""
+    acumulado = np.cumsum(valores[..., indices], axis=-1)
+    acumulado = np.concatenate([np.zeros(acumulado.shape[:-1] + (1,)), acumulado], axis=-1)
+    return acumulado[..., indptr[1:]] - acumulado[..., indptr[:-1]]
+
+
+def _p_dobrado(simulados: np.ndarray, observado: np.ndarray) -> np.ndarray:
+    """p por permutação (bicaudal dobrado, como no PySAL): (min(maiores, P - maiores) + 1) / (P + 1)."""
+    p = simulados.shape[-1]
+    maiores = (simulados >= observado[..., None]).sum(axis=-1)
+    return (np.minimum(maiores, p - maiores) + 1) / (p + 1)
+
+
+def calcular_estatisticas(
+    x: np.ndarray, indptr: np.ndarray, indices: np.ndarray, permutacoes: int = PERMUTACOES, semente: int = SEMENTE
+) -> Dict[str, Any]:
+    """Moran global, LISA e Gi* para os valores `x` (um por bairro, na ordem do CSR)."""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.size
+    k = np.diff(indptr)
+    ilhas = k == 0
+    vazio = {
+        "moran": None,
+        "lisa": np.full(n, np.nan), "lisa_p": np.full(n, np.nan), "quadrante": np.zeros(n, dtype=np.int8),
+        "gi_z": np.full(n, np.nan), "gi_p": np.full(n, np.nan),
+    }
+    z = x - x.mean()
+    zz = float(z @ z)
+    if n < 3 or zz == 0 or ilhas.all():
+        return vazio
+    rng = np.random.default_rng(semente)
+    k_div = np.maximum(k, 1)
+
+    # Moran global (W padronizada por linha; ilhas ficam fora de S0)
+    lag = _somas_csr(z, indptr, indices) / k_div
+    s0 = float((~ilhas).sum())
+    i_global = n / s0 * float(z @ lag) / zz
+    zp = rng.permuted(np.tile(z, (permutacoes, 1)), axis=1)
+    i_sim = n / s0 * (zp * (_somas_csr(zp, indptr, indices) / k_div)).sum(axis=1) / zz
+    moran = {
+        "I": i_global,
+        "esperado": -1.0 / (n - 1),
+        "p_sim": float(_p_dobrado(i_sim[None, :], np.asarray([i_global]))[0]),
+        "z_sim": float((i_global - i_sim.mean()) / i_sim.std()) if i_sim.std() > 0 else None,
+        "n": n,
+        "permutacoes": permutacoes,
+    }
+
+    # Permutação condicional: para cada sorteio, os primeiros k_i de uma permutação
+    # dos outros n-1 bairros (índices >= i pulam o próprio i)
+    m2 = zz / n
+    lisa = z / m2 * lag
+    soma_x = _somas_csr(x, indptr, indices) + x  # Gi*: vizinhos + o próprio bairro
+    wi = (k + 1).astype(np.float64)
+    media, desvio = x.mean(), x.std()
+    gi_den = desvio * np.sqrt((n * wi - wi**2) / (n - 1))
+    gi_z = (soma_x - media * wi) / gi_den
+
+    kmax = int(k.max())
+    sorteios = rng.random((permutacoes, n - 1)).argsort(axis=1)[:, :kmax]
+    lisa_p = np.empty(n)
+    gi_p = np.empty(n)
+    for ini in range(0, n, BLOCO_BAIRROS):
+        fim = min(n, ini + BLOCO_BAIRROS)
+        alvo = np.arange(ini, fim)
+        idx = sorteios[None, :, :] + (sorteios[None, :, :] >= alvo[:, None, None])
+        mascara = np.arange(kmax)[None, None, :] < k[alvo, None, None]
+        soma_z = (z[idx] * mascara).sum(axis=-1)  # (bloco, P)
+        lisa_sim = (z[alvo] / m2)[:, None] * soma_z / k_div[alvo, None]
+        lisa_p[ini:fim] = _p_dobrado(lisa_sim, lisa[alvo])
+        soma_x_sim = x[alvo, None] + soma_z + media * k[alvo, None]
+        gi_sim = (soma_x_sim - media * wi[alvo, None]) / gi_den[alvo, None]
+        gi_p[ini:fim] = _p_dobrado(gi_sim, gi_z[alvo])
+
+    # quadrante: 1 AA (alto-alto), 2 BA (baixo-alto), 3 BB, 4 AB
+    quadrante = np.where(z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3)).astype(np.int8)
+    for arr in (lisa, lisa_p, gi_z, gi_p):
+        arr[ilhas] = np.nan
+    quadrante[ilhas] = 0
+    return {"moran": moran, "lisa": lisa, "lisa_p": lisa_p, "quadrante": quadrante, "gi_z": gi_z, "gi_p": gi_p}
+
+
+def calcular_lote(
+    lote: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]], permutacoes: int = PERMUTACOES, semente: int = SEMENTE
+) -> List[Dict[str, Any]]:
+    """Várias métricas numa tarefa só do pool: [(métrica, x, indptr, indices), ...]."""
+    return [calcular_estatisticas(x, indptr, indices, permutacoes, semente) for _, x, indptr, indices in lote]
+
+
+# -----------------------------
+# Cache e cálculo sob demanda
+# -----------------------------
+registrar_tamanho_cache("autocorrelacao", lambda: len(_CACHE))
+
+
+def _entrada(metric: str) -> Optional[Tuple[Tuple[str, str], List[str], np.ndarray, np.ndarray, np.ndarray]]:
+    """Chave de cache, bairros, valores e CSR (só bairros com valor) para a métrica."""
+    if not ADJACENCIA or not GEO_SUMMARY:
+        return None
+    bairros_todos = ADJACENCIA["bairros"]
+    brutos = [(GEO_SUMMARY.get(b) or {}).get("totais", {}).get(metric) for b in bairros_todos]
+    manter = np.asarray([v is not None for v in brutos])
+    bairros = [b for b, ok in zip(bairros_todos, manter) if ok]
+    x = np.asarray([v for v in brutos if v is not None], dtype=np.float64)
+    indptr, indices = _subgrafo(ADJACENCIA["indptr"], ADJACENCIA["indices"], manter)
+    assinatura = hashlib.sha1(x.tobytes() + "|".join(bairros).encode("utf-8")).hexdigest()[:16]
+    return (metric, f"{assinatura}:{PERMUTACOES}:{SEMENTE}"), bairros, x, indptr, indices
+
+
+async def estatisticas(metric: str) -> Tuple[List[str], np.ndarray, Dict[str, Any]]:
+    entrada = _entrada(metric)
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Adjacência dos bairros não disponível (sem geometria)")
+    chave, bairros, x, indptr, indices = entrada
+    pronto = _CACHE.get(chave)
+    registrar_acesso_cache("autocorrelacao", pronto is not None)
+    if pronto is None:
+        futuro = _EM_ANDAMENTO.get(chave)
+        if futuro is None:
+            futuro = asyncio.ensure_future(
+                POOL.executar("autocorrelacao", calcular_estatisticas, x, indptr, indices, PERMUTACOES, SEMENTE)
+            )
+            _EM_ANDAMENTO[chave] = futuro
+            try:
+                _CACHE[chave] = await asyncio.shield(futuro)
+            finally:
+                _EM_ANDAMENTO.pop(chave, None)
+            pronto = _CACHE[chave]
+        else:
+            pronto = await asyncio.shield(futuro)
+    return bairros, x, pronto
+
+
+async def pre_calcular() -> int:
+    """Calcula todas as métricas em lotes paralelos (um por processo do pool). Retorna quantas calculou."""
+    pendentes = []
+    for metric in list(GEO_METRICS):
+        entrada = _entrada(metric)
+        if entrada is not None and entrada[0] not in _CACHE:
+            chave, _, x, indptr, indices = entrada
+            pendentes.append((chave, (metric, x, indptr, indices)))
+    if not pendentes:
+        return 0
+    lotes = [pendentes[i :: MAX_WORKERS] for i in range(min(MAX_WORKERS, len(pendentes)))]
+    resultados = await asyncio.gather(
+        *[POOL.executar("autocorrelacao", calcular_lote, [item for _, item in lote], PERMUTACOES, SEMENTE) for lote in lotes],
+        return_exceptions=True,
+    )
+    feitos = 0
+    for lote, res in zip(lotes, resultados):
+        if isinstance(res, BaseException):
+            logger.warning("Falha ao pré-calcular autocorrelação: %s", res)
+            continue
+        for (chave, _), r in zip(lote, res):
+            _CACHE[chave] = r
+            feitos += 1
+    logger.info("Autocorrelação espacial pré-calculada para %d métricas", feitos)
+    return feitos
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+QUADRANTES = {0: None, 1: "alto-alto", 2: "baixo-alto", 3: "baixo-baixo", 4: "alto-baixo"}
+
+
+def _num(v: float) -> Optional[float]:
+    return None if np.isnan(v) else round(float(v), 6)
+
+
+@autocorrelacao_router.get("/hotspots")
+async def geo_hotspots(
+    metric: str = Query(default="densidade_ultraprocessado_10k", description="Métrica analisada"),
+    camada: str = Query(default="lisa", description="lisa (Moran local) ou gi (Getis-Ord Gi*)"),
+    alpha: float = Query(default=ALFA_PADRAO, gt=0, lt=1, description="Nível de significância"),
+):
+    """
+    Camada de choropleth com clusters estatisticamente significativos.
+    `value` é o I local (lisa) ou o z de Gi* (gi); `cluster` é o quadrante LISA
+    (alto-alto, baixo-baixo, alto-baixo, baixo-alto) ou quente/frio, e "ns" quando p >= alpha.
+    """
+    metric = _validate_metric(metric)
+    if camada not in CAMADAS:
+        raise HTTPException(status_code=400, detail=f"Camada inválida: {camada} (use lisa ou gi)")
+    bairros, x, est = await estatisticas(metric)
+
+    data = []
+    for i, b in enumerate(bairros):
+        if camada == "lisa":
+            valor, p = est["lisa"][i], est["lisa_p"][i]
+            cluster = QUADRANTES[int(est["quadrante"][i])]
+        else:
+            valor, p = est["gi_z"][i], est["gi_p"][i]
+            cluster = None if np.isnan(valor) else ("quente" if valor > 0 else "frio")
+        if cluster is not None and p >= alpha:
+            cluster = "ns"
+        data.append({"bairro": b, "value": _num(valor), "p": _num(p), "cluster": cluster, "metric_value": float(x[i])})
+    return resposta_json(
+        {
+            "meta": {
+                "geo_level": "bairro",
+                "geo_join_key": "bairro",
+                "metric": metric,
+                "camada": camada,
+                "alpha": alpha,
+                "pesos": "queen, padronizada por linha" if camada == "lisa" else "queen binária + o próprio bairro",
+                "moran": est["moran"],
+            },
+            "data": data,
+        }
+    )
+
+
+@autocorrelacao_router.get("/autocorrelacao")
+async def geo_autocorrelacao(
+    metric: Optional[str] = Query(default=None, description="Métrica (padrão: todas as de GEO_METRICS)"),
+):
+    """I de Moran global (com p por permutação) de uma ou de todas as métricas."""
+    metricas = [_validate_metric(metric)] if metric else list(GEO_METRICS)
+    if not metric:
+        await pre_calcular()
+    data = {}
+    for m in metricas:
+        _, _, est = await estatisticas(m)
+        data[m] = est["moran"]
+    return resposta_json({"meta": {"pesos": "queen, padronizada por linha", "permutacoes": PERMUTACOES}, "data": data})
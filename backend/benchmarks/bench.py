@@ -0,0 +1,312 @@
+"""
+Suíte de benchmarks dos caminhos quentes da API e dos pipelines de dados.
+
+Para cada escala (1x, 10x, 100x o tamanho atual) gera entradas sintéticas com
+`gerar_dados.py` e, num processo isolado (para o pico de RSS ser da escala),
+mede:
+
+- funções de carga/agregação: `load_and_distribute_data`, `set_geo_cache`,
+  `processar_densidade_em_memoria`;
+- helpers de consulta: `_filter_geo_rows` e `_greedy_routes`;
+- endpoints GEO via cliente ASGI em processo (httpx), com percentis de
+  latência sequencial e vazão sob concorrência.
+
+O resultado é gravado em JSON. Com `--baseline` os números são comparados a uma
+execução anterior e regressões acima da tolerância são listadas (exit code 1).
+
+Uso:
+    cd backend
+    python benchmarks/bench.py --escalas 1 10 100
+    python benchmarks/bench.py --escalas 1 10 --baseline benchmarks/resultados/anterior.json
+
+Requer `httpx` (apenas para os benchmarks de endpoints).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import multiprocessing as mp
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+RESULTADOS_DIR = BENCH_DIR / "resultados"
+
+for p in (str(BACKEND_DIR), str(BENCH_DIR)):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import gerar_dados  # noqa: E402
+
+
+# -----------------------------
+# Estatística das amostras
+# -----------------------------
+def _percentil(ordenadas: List[float], p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    k = max(0, min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1)))))
+    return ordenadas[k]
+
+
+def resumir_amostras(amostras_s: List[float]) -> Dict[str, float]:
+    """Converte tempos (segundos) em estatísticas em milissegundos."""
+    ms = sorted(a * 1000 for a in amostras_s)
+    n = len(ms)
+    return {
+        "n": n,
+        "min_ms": round(ms[0], 4) if n else 0.0,
+        "p50_ms": round(_percentil(ms, 50), 4),
+        "p90_ms": round(_percentil(ms, 90), 4),
+        "p99_ms": round(_percentil(ms, 99), 4),
+        "max_ms": round(ms[-1], 4) if n else 0.0,
+        "media_ms": round(sum(ms) / n, 4) if n else 0.0,
+    }
+
+
+def medir(fn: Callable[[], Any], repeticoes: int, aquecimento: int = 1) -> Dict[str, float]:
+    for _ in range(aquecimento):
+        fn()
+    amostras = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        amostras.append(time.perf_counter() - t0)
+    return resumir_amostras(amostras)
+
+
+def _pico_rss_mb() -> float:
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KiB, macOS em bytes
+    if platform.system() == "Darwin":
+        return round(pico / (1024 * 1024), 2)
+    return round(pico / 1024, 2)
+
+
+# -----------------------------
+# Casos de benchmark
+# -----------------------------
+def casos_funcoes(main_mod: Any, endpoint_mod: Any, escala: int) -> Dict[str, Callable[[], Any]]:
+    """Funções medidas isoladamente. A carga (`load_and_distribute_data`) já deve ter rodado."""
+    rows = main_mod.read_csv_to_dicts(main_mod.DATA_FILE)
+    # mesmas entradas de `carregar_tabelas`: sem o Censo, RA, população e área ficam vazias
+    censo_rows = main_mod.read_csv_to_dicts(main_mod.CENSO_FILE)
+    bairros = sorted(endpoint_mod.GEO_SUMMARY.keys()) or [""]
+    rng = random.Random(7)
+
+    producers = [
+        {"id": f"prod-{i}", "lat": -22.9 + rng.uniform(-0.15, 0.15), "lon": -43.4 + rng.uniform(-0.25, 0.25)}
+        for i in range(20 * escala)
+    ]
+    destinos = [
+        {
+            "id": f"dest-{i}",
+            "lat": -22.9 + rng.uniform(-0.15, 0.15),
+            "lon": -43.4 + rng.uniform(-0.25, 0.25),
+            "demand": rng.randint(1, 10),
+        }
+        for i in range(50 * escala)
+    ]
+
+    return {
+        "read_csv_to_dicts": lambda: main_mod.read_csv_to_dicts(main_mod.DATA_FILE),
+        "set_geo_cache": lambda: endpoint_mod.set_geo_cache(rows, censo_rows),
+        "processar_densidade_em_memoria": main_mod.processar_densidade_em_memoria,
+        "_filter_geo_rows[bairro]": lambda: endpoint_mod._filter_geo_rows(bairro=rng.choice(bairros)),
+        "_filter_geo_rows[grupo]": lambda: endpoint_mod._filter_geo_rows(grupo="Ultraprocessado"),
+        "_filter_geo_rows[q]": lambda: endpoint_mod._filter_geo_rows(q="padaria"),
+        "_greedy_routes": lambda: endpoint_mod._greedy_routes(producers, destinos),
+    }
+
+
+def caminhos_endpoints(endpoint_mod: Any) -> Dict[str, Callable[[random.Random], str]]:
+    bairros = sorted(endpoint_mod.GEO_SUMMARY.keys()) or ["CENTRO"]
+    return {
+        "GET /geo/bairros/catalogo": lambda _: "/api/v1/geo/bairros/catalogo",
+        "GET /geo/bairros/resumo": lambda _: "/api/v1/geo/bairros/resumo",
+        "GET /geo/bairros/choropleth": lambda r: (
+            "/api/v1/geo/bairros/choropleth?metric=" + r.choice(endpoint_mod.GEO_METRICS)
+        ),
+        "GET /geo/bairros/{bairro}/tooltip": lambda r: f"/api/v1/geo/bairros/{r.choice(bairros)}/tooltip",
+        "GET /geo/bairros/linhas": lambda _: "/api/v1/geo/bairros/linhas",
+        "GET /geo/bairros/linhas?grupo&limit": lambda _: "/api/v1/geo/bairros/linhas?grupo=In%20natura&limit=100",
+        "GET /geo/densidade": lambda _: "/api/v1/geo/densidade",
+    }
+
+
+async def _medir_endpoints(app: Any, endpoint_mod: Any, repeticoes: int, concorrencia: int) -> Dict[str, Any]:
+    import httpx
+
+    resultados: Dict[str, Any] = {}
+    rng = random.Random(11)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for nome, gerar_url in caminhos_endpoints(endpoint_mod).items():
+            # aquecimento
+            resp = await client.get(gerar_url(rng))
+            tamanho = len(resp.content)
+
+            amostras = []
+            for _ in range(repeticoes):
+                url = gerar_url(rng)
+                t0 = time.perf_counter()
+                resp = await client.get(url)
+                amostras.append(time.perf_counter() - t0)
+                if resp.status_code >= 500:
+                    raise RuntimeError(f"{nome}: HTTP {resp.status_code}")
+
+            total = repeticoes * concorrencia
+            fila = asyncio.Semaphore(concorrencia)
+
+            async def _uma() -> None:
+                async with fila:
+                    await client.get(gerar_url(rng))
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(_uma() for _ in range(total)))
+            duracao = time.perf_counter() - t0
+
+            resultados[nome] = {
+                **resumir_amostras(amostras),
+                "status": resp.status_code,
+                "bytes_resposta": tamanho,
+                "vazao_rps": round(total / duracao, 2) if duracao else 0.0,
+                "concorrencia": concorrencia,
+            }
+    return resultados
+
+
+def executar_escala(escala: int, repeticoes: int, concorrencia: int, workdir: str) -> Dict[str, Any]:
+    """Roda todos os casos para uma escala. Executado em processo próprio."""
+    dados_path, censo_path = gerar_dados.gerar(escala, Path(workdir) / f"x{escala}")
+
+    import endpoint as endpoint_mod
+    import main as main_mod
+
+    main_mod.DATA_FILE = dados_path
+    main_mod.CENSO_FILE = censo_path
+    logging.getLogger("rajai").setLevel(logging.WARNING)
+
+    silencio = io.StringIO()
+    with contextlib.redirect_stdout(silencio), contextlib.redirect_stderr(silencio):
+        carga = medir(main_mod.load_and_distribute_data, repeticoes=max(1, repeticoes // 10), aquecimento=0)
+        funcoes = {nome: medir(fn, repeticoes) for nome, fn in casos_funcoes(main_mod, endpoint_mod, escala).items()}
+        funcoes = {"load_and_distribute_data": carga, **funcoes}
+        main_mod.load_and_distribute_data()
+        endpoints = asyncio.run(_medir_endpoints(main_mod.app, endpoint_mod, repeticoes, concorrencia))
+
+    return {
+        "escala": escala,
+        "linhas_dados": len(endpoint_mod.GEO_ROWS),
+        "bairros": len(endpoint_mod.GEO_SUMMARY),
+        "funcoes": funcoes,
+        "endpoints": endpoints,
+        "pico_rss_mb": _pico_rss_mb(),
+    }
+
+
+# -----------------------------
+# Comparação entre execuções
+# -----------------------------
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float, chave: str = "p50_ms") -> List[Dict[str, Any]]:
+    """Lista casos cujo `chave` piorou mais que `tolerancia` (fração) em relação ao baseline."""
+    regressoes: List[Dict[str, Any]] = []
+    base_por_escala = {str(e["escala"]): e for e in baseline.get("escalas", [])}
+
+    for esc in atual.get("escalas", []):
+        base = base_por_escala.get(str(esc["escala"]))
+        if not base:
+            continue
+        for grupo in ("funcoes", "endpoints"):
+            for nome, stats in esc.get(grupo, {}).items():
+                ref = base.get(grupo, {}).get(nome)
+                if not ref or not ref.get(chave):
+                    continue
+                razao = stats[chave] / ref[chave]
+                if razao > 1 + tolerancia:
+                    regressoes.append(
+                        {
+                            "escala": esc["escala"],
+                            "caso": f"{grupo}.{nome}",
+                            "baseline": ref[chave],
+                            "atual": stats[chave],
+                            "razao": round(razao, 3),
+                        }
+                    )
+        rss_base = base.get("pico_rss_mb")
+        if rss_base and esc.get("pico_rss_mb", 0) / rss_base > 1 + tolerancia:
+            regressoes.append(
+                {
+                    "escala": esc["escala"],
+                    "caso": "pico_rss_mb",
+                    "baseline": rss_base,
+                    "atual": esc["pico_rss_mb"],
+                    "razao": round(esc["pico_rss_mb"] / rss_base, 3),
+                }
+            )
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100])
+    ap.add_argument("--repeticoes", type=int, default=30)
+    ap.add_argument("--concorrencia", type=int, default=8)
+    ap.add_argument("--saida", default=None, help="Arquivo JSON de saída (padrão: benchmarks/resultados/<timestamp>.json)")
+    ap.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparação")
+    ap.add_argument("--tolerancia", type=float, default=0.2, help="Piora relativa aceita antes de sinalizar regressão")
+    args = ap.parse_args(argv)
+
+    ctx = mp.get_context("spawn")
+    escalas = []
+    with tempfile.TemporaryDirectory(prefix="rajai-bench-") as workdir:
+        for escala in args.escalas:
+            print(f"==> escala {escala}x")
+            with ctx.Pool(1) as pool:
+                res = pool.apply(executar_escala, (escala, args.repeticoes, args.concorrencia, workdir))
+            escalas.append(res)
+            print(f"    linhas={res['linhas_dados']} bairros={res['bairros']} pico_rss={res['pico_rss_mb']} MB")
+            for grupo in ("funcoes", "endpoints"):
+                for nome, stats in res[grupo].items():
+                    print(f"    {nome:<45} p50={stats['p50_ms']:>10.3f} ms  p99={stats['p99_ms']:>10.3f} ms")
+
+    resultado = {
+        "gerado_em": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "concorrencia": args.concorrencia,
+        "escalas": escalas,
+    }
+
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"OK: {saida}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressoes = comparar(resultado, baseline, args.tolerancia)
+        if regressoes:
+            print(f"Regressões acima de {args.tolerancia:.0%}:")
+            for r in regressoes:
+                print(f"  [{r['escala']}x] {r['caso']}: {r['baseline']} -> {r['atual']} ({r['razao']}x)")
+            return 1
+        print("Sem regressões em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+"""
+Benchmark de serialização JSON: caminho antigo x caminho novo, em payloads reais.
+
+Carrega os dados reais (`dados/dados.csv` + Censo) e, para cada payload,
+mede o tempo de gerar os bytes da resposta em três caminhos:
+
+- `jsonable_encoder+stdlib`: o caminho antigo do FastAPI (`jsonable_encoder`
+  seguido de `JSONResponse`, com `json.dumps` da stdlib);
+- `jsonable_encoder+rapida`: rotas que ainda devolvem dict, com a nova
+  `RespostaJSONRapida` como classe padrão;
+- `resposta_json`: estruturas pré-calculadas servidas direto (sem encoder).
+
+Também confere que os três caminhos produzem o mesmo JSON.
+
+Uso:
+    cd backend
+    python benchmarks/bench_serializacao.py --repeticoes 50
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+RESULTADOS_DIR = BENCH_DIR / "resultados"
+
+for p in (str(BACKEND_DIR), str(BENCH_DIR)):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+from bench import medir  # noqa: E402
+
+
+def payloads(main_mod: Any, endpoint_mod: Any) -> Dict[str, Any]:
+    """Os mesmos objetos que as rotas devolvem."""
+    bairro = next(iter(endpoint_mod.GEO_SUMMARY))
+    summary = endpoint_mod.GEO_SUMMARY[bairro]
+    slug, ds = next(iter(endpoint_mod.DATASETS.items()))
+    return {
+        "/geo/densidade": main_mod.DENSITY_CACHE,
+        "/geo/bairros/linhas (sem limite)": {"meta": {"total_rows": len(endpoint_mod.GEO_ROWS)}, "data": endpoint_mod.GEO_ROWS},
+        "/geo/bairros/choropleth": {
+            "meta": {"geo_level": "bairro", "metric": "total"},
+            "data": [{"bairro": k, "value": s["totais"].get("total", 0)} for k, s in endpoint_mod.GEO_SUMMARY.items()],
+        },
+        "/geo/bairros/resumo?geo_level=bairro": {
+            "itens": {k: endpoint_mod._totais_e_percentuais(s["totais"]) for k, s in endpoint_mod.GEO_SUMMARY.items()}
+        },
+        "/geo/bairros/{bairro}/tooltip": {"totais": summary["totais"], "breakdown": summary["breakdown"]},
+        f"/dados/{slug}": {"meta": {"slug": slug}, "data": endpoint_mod.DATA_CACHE.get(ds["cache_key"], [])},
+    }
+
+
+def caminhos() -> Dict[str, Callable[[Any], bytes]]:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from serializacao import RespostaJSONRapida, resposta_json
+
+    return {
+        "jsonable_encoder+stdlib": lambda obj: JSONResponse(jsonable_encoder(obj)).body,
+        "jsonable_encoder+rapida": lambda obj: RespostaJSONRapida(jsonable_encoder(obj)).body,
+        "resposta_json": lambda obj: resposta_json(obj).body,
+    }
+
+
+def executar(repeticoes: int) -> Dict[str, Any]:
+    import endpoint as endpoint_mod
+    import main as main_mod
+    import serializacao
+
+    logging.getLogger("rajai").setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()):
+        main_mod.load_and_distribute_data()
+
+    resultado: Dict[str, Any] = {}
+    for nome, obj in payloads(main_mod, endpoint_mod).items():
+        saidas = {c: fn(obj) for c, fn in caminhos().items()}
+        referencia = json.loads(saidas["jsonable_encoder+stdlib"])
+        for c, corpo in saidas.items():
+            if json.loads(corpo) != referencia:
+                raise AssertionError(f"{nome}: saída de '{c}' difere do caminho antigo")
+        resultado[nome] = {
+            "bytes": len(saidas["resposta_json"]),
+            "caminhos": {c: medir(lambda fn=fn: fn(obj), repeticoes) for c, fn in caminhos().items()},
+        }
+    resultado_meta = {"orjson": serializacao.orjson is not None}
+    return {"meta": resultado_meta, "payloads": resultado}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeticoes", type=int, default=50)
+    ap.add_argument("--saida", default=None, help="Arquivo JSON de saída (padrão: benchmarks/resultados/serializacao-<timestamp>.json)")
+    args = ap.parse_args(argv)
+
+    res = executar(args.repeticoes)
+    print(f"orjson disponível: {res['meta']['orjson']}")
+    for nome, info in res["payloads"].items():
+        antigo = info["caminhos"]["jsonable_encoder+stdlib"]["p50_ms"]
+        print(f"{nome} ({info['bytes']} bytes)")
+        for c, stats in info["caminhos"].items():
+            ganho = antigo / stats["p50_ms"] if stats["p50_ms"] else 0.0
+            print(f"    {c:<26} p50={stats['p50_ms']:>9.3f} ms  p99={stats['p99_ms']:>9.3f} ms  ({ganho:.1f}x)")
+
+    resultado = {
+        "gerado_em": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        **res,
+    }
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"serializacao-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"OK: {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
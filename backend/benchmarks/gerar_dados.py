@@ -0,0 +1,89 @@
+"""
+Gera entradas sintéticas (dados.csv + Censo_2022.csv) em múltiplos do tamanho atual.
+
+A escala 1 é uma cópia dos arquivos reais. Na escala N, cada bairro do Censo é
+replicado N-1 vezes com sufixo numérico (ex.: "Tijuca 3") e as linhas de
+dados.csv são replicadas para os bairros clonados com quantidades perturbadas,
+preservando a distribuição de grupos/CNAEs e o cruzamento bairro x Censo.
+
+Uso:
+    python benchmarks/gerar_dados.py --escala 10 --saida /tmp/rajai-bench/x10
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DADOS_DIR = BACKEND_DIR / "dados"
+DATA_FILE = DADOS_DIR / "dados.csv"
+CENSO_FILE = DADOS_DIR / "Censo_2022.csv"
+
+
+def _ler_csv(path: Path) -> Tuple[List[str], List[Dict[str, str]]]:
+    with path.open(newline="", encoding="utf-8-sig") as fp:
+        reader = csv.DictReader(fp)
+        return list(reader.fieldnames or []), list(reader)
+
+
+def _escrever_csv(path: Path, campos: List[str], linhas: List[Dict[str, str]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as fp:
+        writer = csv.DictWriter(fp, fieldnames=campos)
+        writer.writeheader()
+        writer.writerows(linhas)
+
+
+def gerar(escala: int, destino: Path, seed: int = 42) -> Tuple[Path, Path]:
+    """Escreve dados.csv e Censo_2022.csv sintéticos em `destino` e retorna os caminhos."""
+    if escala < 1:
+        raise ValueError("escala deve ser >= 1")
+
+    rng = random.Random(seed)
+    campos_dados, dados = _ler_csv(DATA_FILE)
+    campos_censo, censo = _ler_csv(CENSO_FILE)
+
+    dados_out: List[Dict[str, str]] = list(dados)
+    censo_out: List[Dict[str, str]] = list(censo)
+
+    for i in range(1, escala):
+        sufixo = f" {i}"
+        for row in censo:
+            clone = dict(row)
+            clone["nome"] = f"{row['nome']}{sufixo}"
+            clone["codbairro"] = f"{row.get('codbairro', '')}-{i}"
+            pop = int(float(row.get("Total_de_pessoas_2022") or 0))
+            clone["Total_de_pessoas_2022"] = str(max(1, int(pop * rng.uniform(0.7, 1.3))))
+            censo_out.append(clone)
+        for row in dados:
+            clone = dict(row)
+            clone["bairro"] = f"{row['bairro'].strip()}{sufixo}"
+            qtd = int(float(row.get("quantidade") or 0))
+            clone["quantidade"] = str(max(0, qtd + rng.randint(-1, 2)))
+            dados_out.append(clone)
+
+    destino.mkdir(parents=True, exist_ok=True)
+    dados_path = destino / "dados.csv"
+    censo_path = destino / "Censo_2022.csv"
+    _escrever_csv(dados_path, campos_dados, dados_out)
+    _escrever_csv(censo_path, campos_censo, censo_out)
+    return dados_path, censo_path
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--escala", type=int, default=1)
+    ap.add_argument("--saida", required=True, help="Diretório onde os CSVs serão gravados")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    dados_path, censo_path = gerar(args.escala, Path(args.saida), seed=args.seed)
+    print(f"OK: {dados_path} | {censo_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
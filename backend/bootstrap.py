@@ -0,0 +1,149 @@
+"""
+Payload único de inicialização do mapa de bairros.
+
+Numa só resposta (comprimida e cacheável) o frontend recebe:
+
+- `geometria`: TopoJSON quantizado e simplificado dos bairros (ver `topologia.py`),
+  com `id` = bairro normalizado, ou `null` sem o GeoJSON de bairros no backend
+  (`geometria.py`); nesse caso o frontend (`mapa.tsx`) carrega o GeoJSON por
+  conta própria e usa o resto do payload normalmente;
+- `catalogo`: o mesmo de `/api/v1/geo/bairros/catalogo`;
+- `bairros`: índice estável (posição -> bairro normalizado);
+- `metricas`: cada métrica como um array alinhado ao índice;
+- `tooltips`: resumo de tooltip de cada bairro, também alinhado ao índice.
+
+O payload é montado uma vez na carga, serializado, pré-comprimido (gzip/brotli) e
+versionado pelo hash do conteúdo. A URL versionada (`?v=<versao>`) é imutável.
+Com dados compartilhados, quem monta é o carregador; os workers servem as
+variantes direto do segmento.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse
+
+from compressao import payload_estatico, resposta_estatica
+from serializacao import dumps
+from endpoint import GEO_CATALOG, GEO_METRICS, GEO_SUMMARY
+from geometria import BAIRROS_GEOMETRIA
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from topologia import topojson_padrao
+
+logger = logging.getLogger("rajai")
+
+bootstrap_router = APIRouter(prefix="/api/v1/geo/bairros", tags=["geo"])
+
+CASAS_METRICAS = 4
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "public, max-age=0, must-revalidate"
+
+# {"versao": str, "payload": payload_estatico(...), "n_bairros": int}
+BOOTSTRAP: Dict[str, Any] = {}
+
+
+def _arredondar(valor: Any) -> Any:
+    if isinstance(valor, float):
+        return round(valor, CASAS_METRICAS)
+    return valor
+
+
+def montar_payload() -> Dict[str, Any]:
+    ordem: List[str] = sorted(set(GEO_SUMMARY) | set(BAIRROS_GEOMETRIA))
+    sumarios = [GEO_SUMMARY.get(b) for b in ordem]
+    metricas = {
+        m: [_arredondar(s["totais"].get(m)) if s else None for s in sumarios]
+        for m in GEO_METRICS
+    }
+    tooltips = [
+        {
+            "populacao_2022": s.get("populacao_2022", 0),
+            "area_km2": _arredondar(s.get("area_km2")),
+            "regiao_adm": s.get("regiao_adm"),
+            "breakdown": s["breakdown"],
+        }
+        if s
+        else None
+        for s in sumarios
+    ]
+    return {
+        "catalogo": GEO_CATALOG,
+        "bairros": ordem,
+        "metricas": metricas,
+        "tooltips": tooltips,
+        "geometria": topojson_padrao(),
+    }
+
+
+def montar_bootstrap() -> Optional[str]:
+    """(Re)monta o payload comprimido. Retorna a versão (hash do conteúdo)."""
+    BOOTSTRAP.clear()
+    if not GEO_SUMMARY:
+        return None
+    payload = montar_payload()
+    if payload["geometria"] is None:
+        logger.warning("Bootstrap do mapa sem geometria: GeoJSON de bairros não carregado")
+    corpo = dumps(payload)
+    versao = hashlib.sha256(corpo).hexdigest()[:16]
+    corpo = b'{"versao":"' + versao.encode() + b'",' + corpo[1:]
+    BOOTSTRAP.update(
+        {
+            "versao": versao,
+            "payload": payload_estatico(corpo, etag=f'"{versao}"'),
+            "n_bairros": len(payload["bairros"]),
+        }
+    )
+    logger.info(
+        "Bootstrap do mapa montado: versão %s, %d bairros, %d bytes (%d gzip)",
+        versao,
+        len(payload["bairros"]),
+        len(corpo),
+        len(BOOTSTRAP["payload"]["variantes"]["gzip"]),
+    )
+    return versao
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if BOOTSTRAP:
+        construtor.objeto("bootstrap", {"versao": BOOTSTRAP["versao"], "n_bairros": BOOTSTRAP["n_bairros"]})
+        construtor.payload("bootstrap", BOOTSTRAP["payload"])
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    BOOTSTRAP.clear()
+    info = plano.objeto("bootstrap")
+    if info is not None:
+        BOOTSTRAP.update({**info, "payload": plano.payload("bootstrap")})
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@bootstrap_router.get("/bootstrap/versao")
+async def geo_bootstrap_versao():
+    if not BOOTSTRAP:
+        raise HTTPException(status_code=404, detail="Bootstrap do mapa não carregado")
+    versao = BOOTSTRAP["versao"]
+    return {"versao": versao, "url": f"{bootstrap_router.prefix}/bootstrap?v={versao}"}
+
+
+@bootstrap_router.get("/bootstrap")
+async def geo_bootstrap(
+    request: Request,
+    v: Optional[str] = Query(default=None, description="Versão do payload (torna a resposta imutável)"),
+):
+    if not BOOTSTRAP:
+        raise HTTPException(status_code=404, detail="Bootstrap do mapa não carregado")
+    versao = BOOTSTRAP["versao"]
+    if v is not None and v != versao:
+        return RedirectResponse(f"{bootstrap_router.prefix}/bootstrap?v={versao}", status_code=307)
+
+    return resposta_estatica(
+        request,
+        BOOTSTRAP["payload"],
+        cache_control=CACHE_IMUTAVEL if v else CACHE_REVALIDAR,
+    )
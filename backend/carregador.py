@@ -0,0 +1,41 @@
+"""
+Carregador dos dados compartilhados entre workers.
+
+Lê os CSVs, monta os caches tabulares e tudo o que deriva deles (geometria,
+camadas de pontos, acessibilidade, bootstrap, cubo, versões, cenários, rede
+viária) e publica uma nova geração do segmento em memória compartilhada
+(`memoria_compartilhada.py`). Os workers da API (com
+`RAJAI_DADOS_COMPARTILHADOS=1`) percebem o novo contador de geração e
+re-anexam sozinhos, sem reiniciar e sem recalcular nada.
+
+Uso:
+    python carregador.py            # publica (ou republica) os dados
+    python carregador.py --limpar   # remove os segmentos publicados
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List, Optional
+
+from main import carregar_e_publicar, logger
+from memoria_compartilhada import DIRETORIO, PREFIXO, limpar, trava
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Publica os dados da API em memória compartilhada")
+    parser.add_argument("--limpar", action="store_true", help="remove os segmentos publicados e sai")
+    args = parser.parse_args(argv)
+
+    with trava():
+        if args.limpar:
+            limpar()
+            logger.info("Segmentos %s/%s.* removidos", DIRETORIO, PREFIXO)
+            return 0
+        geracao = carregar_e_publicar()
+    print(f"geração {geracao} publicada em {DIRETORIO}/{PREFIXO}.g{geracao}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
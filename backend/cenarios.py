@@ -0,0 +1,580 @@
+"""
+Cenários "e se": variações sobre os dados carregados, sem editar CSVs.
+
+Um cenário é uma lista de deltas aplicados em ordem:
+
+- `{"op": "adicionar", "bairro": "SANTA CRUZ", "grupo": "In natura", "cnae": "Feira livre", "quantidade": 3}`
+- `{"op": "remover", "bairro": ..., "grupo": ..., "cnae": (opcional), "quantidade": n}`
+- `{"op": "reclassificar", "cnae": "Restaurante|Lanchonete", "para": "Misto", "de": (opcional),
+  "bairro": (opcional), "quantidade": (opcional)}` — `cnae` são termos separados por `|`,
+  procurados como texto literal (sem distinção de maiúsculas) dentro do CNAE, como nos
+  padrões de `corrigir_classificacao.py`. Não é expressão regular: o endpoint é público
+  e um padrão com backtracking catastrófico travaria o worker;
+- `{"op": "populacao", "bairro": ..., "valor": n}` (ou `"variacao": ±n`).
+
+O cálculo é incremental: a base guarda, por bairro, as quantidades por
+(grupo, CNAE) e as somas por grupo de cada bairro/RA/cidade. Um cenário vira um
+dicionário de deltas por (bairro, grupo, CNAE) e de população; só os bairros
+tocados, as RAs deles e a cidade têm os totais recalculados (com o mesmo
+`_calcular_totais` da carga). Os percentis são refeitos sobre o vetor de
+densidades do nível (base + itens alterados), com a mesma ordenação encadeada
+de `_aplicar_percentis`, então bairros não tocados também aparecem quando o
+percentil deles muda.
+
+Cenários são identificados pelo hash dos deltas normalizados. As definições
+ficam em disco (`dados/cenarios`, uma por arquivo), então um cenário criado num
+worker do uvicorn pode ser lido em qualquer outro; o resultado calculado fica
+num LRU por processo (recalculável a partir da definição).
+`/cenarios/comparar` coloca vários lado a lado.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+
+from endpoint import (
+    CIDADE,
+    GEO_CATALOG,
+    GEO_JOIN_KEYS,
+    GEO_LEVELS,
+    METRICS_TO_RANK,
+    _aplicar_percentis,
+    _calcular_totais,
+    _filter_geo_rows,
+    _validate_geo_level,
+    normalize_bairro,
+)
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from metricas import registrar_acesso_cache, registrar_tamanho_cache
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+cenarios_router = APIRouter(prefix="/api/v1/geo/cenarios", tags=["geo"])
+
+BASE_DIR = Path(__file__).parent
+DEFINICOES_DIR = Path(os.getenv("RAJAI_CENARIOS_DIR", BASE_DIR / "dados" / "cenarios"))
+CAPACIDADE_CACHE = int(os.getenv("RAJAI_CENARIOS_CACHE", "64"))
+MAX_DELTAS = 200
+MAX_PADRAO_CNAE = 200  # caracteres de `cnae` em reclassificar
+MAX_TERMOS_CNAE = 20
+MAX_DEFINICOES = 1000  # definições guardadas em disco (as usadas há mais tempo saem primeiro)
+
+OPERACOES = ("adicionar", "remover", "reclassificar", "populacao")
+METRICAS_CENARIO = list(_calcular_totais({}, None, None)) + [alvo for _, alvo in METRICS_TO_RANK]
+Chave = Tuple[str, str, str]  # (bairro, grupo, cnae)
+
+
+class BaseCenarios:
+    """Agregados da base (dados atuais) no formato que o cálculo incremental precisa."""
+
+    def __init__(self, rows: List[Dict[str, Any]], niveis: Dict[str, Dict[str, Dict[str, Any]]]):
+        self.quantidades: Dict[str, Dict[Tuple[str, str], int]] = {}
+        for r in rows:
+            por_chave = self.quantidades.setdefault(r["bairro"], {})
+            chave = (r["classificacao_grupo"] or "Sem grupo", r["classificacao_cnae"])
+            por_chave[chave] = por_chave.get(chave, 0) + r["quantidade"]
+
+        self.ra_de = {b: s.get("regiao_adm") or "" for b, s in niveis["bairro"].items()}
+        self.itens: Dict[str, List[str]] = {nivel: list(s) for nivel, s in niveis.items()}
+        self.posicao = {nivel: {k: i for i, k in enumerate(ks)} for nivel, ks in self.itens.items()}
+        self.sumarios = {nivel: {k: dict(s) for k, s in sumarios.items()} for nivel, sumarios in niveis.items()}
+        self.totais = {nivel: {k: dict(s["totais"]) for k, s in sumarios.items()} for nivel, sumarios in niveis.items()}
+
+        # somas por grupo em cada nível, como em montar_geo (RAs só com bairros que têm RA)
+        self.grupos: Dict[str, Dict[str, Dict[str, int]]] = {nivel: {} for nivel in GEO_LEVELS}
+        for b, por_chave in self.quantidades.items():
+            alvos = [("bairro", b), ("cidade", CIDADE)]
+            if self.ra_de.get(b):
+                alvos.append(("ra", self.ra_de[b]))
+            for (g, _), q in por_chave.items():
+                for nivel, item in alvos:
+                    grupos = self.grupos[nivel].setdefault(item, {})
+                    grupos[g] = grupos.get(g, 0) + q
+
+        self.grupos_validos = {g.lower(): g for g in GEO_CATALOG.get("groups", [])}
+        self.token = hashlib.sha256(
+            json.dumps([self.itens["bairro"], self.totais["cidade"]], sort_keys=True, default=str).encode()
+        ).hexdigest()[:12]
+
+    def quantidade(self, chave: Chave, delta: Dict[Chave, int]) -> int:
+        b, g, c = chave
+        return self.quantidades.get(b, {}).get((g, c), 0) + delta.get(chave, 0)
+
+    def chaves_do_bairro(self, bairro: str, delta: Dict[Chave, int]) -> List[Chave]:
+        chaves = {(bairro, g, c) for g, c in self.quantidades.get(bairro, {})}
+        chaves.update(k for k in delta if k[0] == bairro)
+        return sorted(chaves)
+
+
+BASE: Optional[BaseCenarios] = None
+_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_DEFINICOES: Dict[str, Tuple[int, Dict[str, Any]]] = {}  # id -> (mtime do arquivo, definição) lidas do disco
+_LOCK = threading.Lock()
+registrar_tamanho_cache("cenarios", lambda: len(_CACHE))
+
+
+def montar_base_cenarios() -> int:
+    """Monta a base a partir das linhas e sumários carregados. Retorna o número de bairros."""
+    global BASE
+    BASE = BaseCenarios(_filter_geo_rows(), GEO_LEVELS)
+    with _LOCK:
+        _CACHE.clear()
+    logger.info("Base de cenários: %d bairros (base %s)", len(BASE.itens["bairro"]), BASE.token)
+    return len(BASE.itens["bairro"])
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if BASE is not None:
+        construtor.objeto("cenarios.base", BASE)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    """A base vem pronta do carregador (os agregados são por bairro x grupo x CNAE, não por linha)."""
+    global BASE
+    BASE = plano.objeto("cenarios.base")
+    with _LOCK:
+        _CACHE.clear()
+
+
+# -----------------------------
+# Deltas
+# -----------------------------
+def _bairro(base: BaseCenarios, valor: Any, i: int) -> str:
+    b = normalize_bairro(str(valor or ""))
+    if b not in base.posicao["bairro"]:
+        raise HTTPException(status_code=400, detail=f"Delta {i}: bairro desconhecido: {valor}")
+    return b
+
+
+def _grupo(base: BaseCenarios, valor: Any, i: int, campo: str = "grupo") -> str:
+    g = base.grupos_validos.get(str(valor or "").strip().lower())
+    if g is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Delta {i}: {campo} inválido: {valor} (use {', '.join(base.grupos_validos.values())})",
+        )
+    return g
+
+
+def _inteiro(valor: Any, i: int, campo: str, minimo: Optional[int] = 1) -> int:
+    try:
+        n = int(valor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Delta {i}: {campo} deve ser inteiro")
+    if minimo is not None and n < minimo:
+        raise HTTPException(status_code=400, detail=f"Delta {i}: {campo} deve ser >= {minimo}")
+    return n
+
+
+def termos_cnae(padrao: str) -> List[str]:
+    """`"Restaurante|Lanchonete"` -> `["restaurante", "lanchonete"]` (texto literal, sem regex)."""
+    return [t for t in (p.strip().casefold() for p in padrao.split("|")) if t]
+
+
+def cnae_casa(cnae: str, termos: List[str]) -> bool:
+    cnae = cnae.casefold()
+    return any(t in cnae for t in termos)
+
+
+def normalizar_deltas(base: BaseCenarios, deltas: Any) -> List[Dict[str, Any]]:
+    """Valida e normaliza (nomes canônicos, campos em ordem fixa), para o hash não depender da grafia."""
+    if not isinstance(deltas, list) or not deltas:
+        raise HTTPException(status_code=400, detail="Informe 'deltas': uma lista não vazia")
+    if len(deltas) > MAX_DELTAS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_DELTAS} deltas por cenário")
+    saida = []
+    for i, d in enumerate(deltas):
+        if not isinstance(d, dict):
+            raise HTTPException(status_code=400, detail=f"Delta {i}: deve ser um objeto")
+        op = str(d.get("op") or "").strip().lower()
+        if op == "adicionar":
+            saida.append(
+                {
+                    "op": op,
+                    "bairro": _bairro(base, d.get("bairro"), i),
+                    "grupo": _grupo(base, d.get("grupo"), i),
+                    "cnae": str(d.get("cnae") or "").strip(),
+                    "quantidade": _inteiro(d.get("quantidade", 1), i, "quantidade"),
+                }
+            )
+        elif op == "remover":
+            saida.append(
+                {
+                    "op": op,
+                    "bairro": _bairro(base, d.get("bairro"), i),
+                    "grupo": _grupo(base, d.get("grupo"), i),
+                    "cnae": str(d["cnae"]).strip() if d.get("cnae") is not None else None,
+                    "quantidade": _inteiro(d.get("quantidade", 1), i, "quantidade"),
+                }
+            )
+        elif op == "reclassificar":
+            padrao = str(d.get("cnae") or "").strip()
+            if not termos_cnae(padrao):
+                raise HTTPException(
+                    status_code=400, detail=f"Delta {i}: reclassificar exige 'cnae' (termos separados por '|')"
+                )
+            if len(padrao) > MAX_PADRAO_CNAE or len(termos_cnae(padrao)) > MAX_TERMOS_CNAE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Delta {i}: cnae aceita até {MAX_PADRAO_CNAE} caracteres e {MAX_TERMOS_CNAE} termos",
+                )
+            saida.append(
+                {
+                    "op": op,
+                    "cnae": padrao,
+                    "para": _grupo(base, d.get("para"), i, "para"),
+                    "de": _grupo(base, d.get("de"), i, "de") if d.get("de") else None,
+                    "bairro": _bairro(base, d.get("bairro"), i) if d.get("bairro") else None,
+                    "quantidade": _inteiro(d["quantidade"], i, "quantidade") if d.get("quantidade") is not None else None,
+                }
+            )
+        elif op == "populacao":
+            if (d.get("valor") is None) == (d.get("variacao") is None):
+                raise HTTPException(status_code=400, detail=f"Delta {i}: populacao exige 'valor' ou 'variacao'")
+            saida.append(
+                {
+                    "op": op,
+                    "bairro": _bairro(base, d.get("bairro"), i),
+                    "valor": _inteiro(d["valor"], i, "valor", 0) if d.get("valor") is not None else None,
+                    "variacao": _inteiro(d["variacao"], i, "variacao", None) if d.get("variacao") is not None else None,
+                }
+            )
+        else:
+            raise HTTPException(status_code=400, detail=f"Delta {i}: op inválida: {op or None} (use {', '.join(OPERACOES)})")
+    return saida
+
+
+def id_cenario(deltas: List[Dict[str, Any]]) -> str:
+    texto = json.dumps(deltas, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def aplicar_deltas(
+    base: BaseCenarios, deltas: List[Dict[str, Any]]
+) -> Tuple[Dict[Chave, int], Dict[str, int], List[str]]:
+    """Deltas normalizados -> (variação por (bairro, grupo, CNAE), população nova por bairro, avisos)."""
+    qtd: Dict[Chave, int] = {}
+    pop: Dict[str, int] = {}
+    avisos: List[str] = []
+
+    def mover(chave: Chave, n: int) -> None:
+        qtd[chave] = qtd.get(chave, 0) + n
+
+    for i, d in enumerate(deltas):
+        op = d["op"]
+        if op == "adicionar":
+            mover((d["bairro"], d["grupo"], d["cnae"]), d["quantidade"])
+        elif op == "remover":
+            chaves = [
+                k
+                for k in base.chaves_do_bairro(d["bairro"], qtd)
+                if k[1] == d["grupo"] and (d["cnae"] is None or k[2].lower() == d["cnae"].lower())
+            ]
+            # maiores primeiro (ordem determinística para remoções sem CNAE)
+            chaves.sort(key=lambda k: (-base.quantidade(k, qtd), k))
+            falta = d["quantidade"]
+            for k in chaves:
+                n = min(falta, base.quantidade(k, qtd))
+                mover(k, -n)
+                falta -= n
+                if not falta:
+                    break
+            if falta:
+                avisos.append(f"Delta {i}: só havia {d['quantidade'] - falta} para remover")
+        elif op == "reclassificar":
+            termos = termos_cnae(d["cnae"])
+            casa: Dict[str, bool] = {}  # CNAE -> casa com o padrão (os mesmos CNAEs se repetem nos bairros)
+            bairros = [d["bairro"]] if d["bairro"] else base.itens["bairro"]
+            limite = d["quantidade"]
+            movidos = 0
+            for b in bairros:
+                restante = None if limite is None else limite - movidos
+                for k in base.chaves_do_bairro(b, qtd):
+                    if restante is not None and restante <= 0:
+                        break
+                    _, g, c = k
+                    if c not in casa:
+                        casa[c] = cnae_casa(c, termos)
+                    if g == d["para"] or (d["de"] and g != d["de"]) or not casa[c]:
+                        continue
+                    n = base.quantidade(k, qtd)
+                    if restante is not None:
+                        n = min(n, restante)
+                        restante -= n
+                    if n:
+                        mover(k, -n)
+                        mover((b, d["para"], c), n)
+                        movidos += n
+            if not movidos:
+                avisos.append(f"Delta {i}: nenhum estabelecimento com CNAE /{d['cnae']}/ para reclassificar")
+            elif limite is not None and movidos < limite:
+                avisos.append(f"Delta {i}: só {movidos} de {limite} reclassificados")
+        elif op == "populacao":
+            atual = pop.get(d["bairro"], base.sumarios["bairro"][d["bairro"]].get("populacao_2022") or 0)
+            novo = d["valor"] if d["valor"] is not None else atual + d["variacao"]
+            if novo < 0:
+                avisos.append(f"Delta {i}: população negativa ajustada para 0")
+            pop[d["bairro"]] = max(0, novo)
+    return {k: v for k, v in qtd.items() if v}, pop, avisos
+
+
+# -----------------------------
+# Cálculo
+# -----------------------------
+def _item(base: BaseCenarios, nivel: str, chave: str, totais: Dict[str, Any], direto: bool) -> Dict[str, Any]:
+    antes = base.totais[nivel][chave]
+    return {
+        GEO_JOIN_KEYS[nivel]: chave,
+        "direto": direto,
+        "antes": {m: antes.get(m) for m in METRICAS_CENARIO},
+        "depois": {m: totais.get(m) for m in METRICAS_CENARIO},
+        "delta": {m: round((totais.get(m) or 0) - (antes.get(m) or 0), 4) for m in METRICAS_CENARIO},
+    }
+
+
+def calcular_cenario(base: BaseCenarios, deltas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    qtd, pop, avisos = aplicar_deltas(base, deltas)
+
+    # variação por grupo e de população em cada item tocado, nos três níveis
+    var_grupos: Dict[str, Dict[str, Dict[str, int]]] = {nivel: {} for nivel in GEO_LEVELS}
+    var_pop: Dict[str, Dict[str, int]] = {nivel: {} for nivel in GEO_LEVELS}
+
+    def alvos(b: str) -> List[Tuple[str, str]]:
+        ra = base.ra_de.get(b)
+        return [("bairro", b), ("cidade", CIDADE)] + ([("ra", ra)] if ra else [])
+
+    for (b, g, _), n in qtd.items():
+        for nivel, item in alvos(b):
+            grupos = var_grupos[nivel].setdefault(item, {})
+            grupos[g] = grupos.get(g, 0) + n
+    for b, novo in pop.items():
+        for nivel, item in alvos(b):
+            # RA/cidade sem o bairro (ex.: cidade sem RA) ainda contam a população
+            if item in base.totais[nivel]:
+                var = novo - (base.sumarios["bairro"][b].get("populacao_2022") or 0)
+                var_pop[nivel][item] = var_pop[nivel].get(item, 0) + var
+
+    niveis: Dict[str, List[Dict[str, Any]]] = {}
+    for nivel in GEO_LEVELS:
+        tocados = sorted((set(var_grupos[nivel]) | set(var_pop[nivel])) & set(base.totais[nivel]))
+        novos: Dict[str, Dict[str, Any]] = {}
+        for item in tocados:
+            sumario = base.sumarios[nivel][item]
+            grupos = dict(base.grupos[nivel].get(item, {}))
+            for g, n in var_grupos[nivel].get(item, {}).items():
+                grupos[g] = grupos.get(g, 0) + n
+            populacao = (sumario.get("populacao_2022") or 0) + var_pop[nivel].get(item, 0)
+            novos[item] = _calcular_totais(
+                {g: n for g, n in grupos.items() if n}, populacao or None, sumario.get("area_km2")
+            )
+
+        # percentis: ranking do nível (na ordem da base) com as densidades dos itens tocados trocadas
+        indiretos = []
+        if tocados:
+            ranking = [
+                {
+                    "item": item,
+                    "totais": {o: (novos.get(item) or base.totais[nivel][item]).get(o, 0) for o, _ in METRICS_TO_RANK},
+                }
+                for item in base.itens[nivel]
+            ]
+            _aplicar_percentis(ranking)
+            for r in ranking:
+                item, antes = r["item"], base.totais[nivel][r["item"]]
+                if item in novos:
+                    novos[item].update(r["totais"])
+                elif any(r["totais"][alvo] != antes.get(alvo) for _, alvo in METRICS_TO_RANK):
+                    indiretos.append(_item(base, nivel, item, {**antes, **r["totais"]}, False))
+        lista = [_item(base, nivel, item, novos[item], True) for item in tocados] + indiretos
+        niveis[nivel] = lista
+
+    return {
+        "deltas": deltas,
+        "avisos": avisos,
+        "meta": {
+            "base": base.token,
+            "chaves_alteradas": len(qtd),
+            "bairros_afetados": sum(1 for i in niveis["bairro"] if i["direto"]),
+            "bairros_com_percentil_alterado": sum(1 for i in niveis["bairro"] if not i["direto"]),
+            "tempo_ms": round((time.perf_counter() - t0) * 1000, 3),
+        },
+        "niveis": niveis,
+    }
+
+
+# -----------------------------
+# Definições (compartilhadas entre workers)
+# -----------------------------
+def _arquivo_definicao(cenario_id: str) -> Optional[Path]:
+    if not re.fullmatch(r"[0-9a-f]{16}", cenario_id):
+        return None
+    return DEFINICOES_DIR / f"{cenario_id}.json"
+
+
+def salvar_definicao(cenario_id: str, definicao: Dict[str, Any]) -> None:
+    """Grava (ou só marca como usada) a definição e poda as mais antigas."""
+    DEFINICOES_DIR.mkdir(parents=True, exist_ok=True)
+    path = DEFINICOES_DIR / f"{cenario_id}.json"
+    tmp = path.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("w", encoding="utf-8") as fp:
+        json.dump(definicao, fp, ensure_ascii=False)
+    os.replace(tmp, path)
+    arquivos = sorted(DEFINICOES_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime_ns)
+    for antigo in arquivos[: max(0, len(arquivos) - MAX_DEFINICOES)]:
+        antigo.unlink(missing_ok=True)
+
+
+def ler_definicao(cenario_id: str) -> Optional[Dict[str, Any]]:
+    path = _arquivo_definicao(cenario_id)
+    try:
+        mtime = path.stat().st_mtime_ns if path is not None else None
+    except FileNotFoundError:
+        mtime = None
+    if mtime is None:
+        return None
+    with _LOCK:
+        lida = _DEFINICOES.get(cenario_id)
+    if lida is not None and lida[0] == mtime:
+        return lida[1]
+    try:
+        with path.open("r", encoding="utf-8") as fp:
+            definicao = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return None
+    with _LOCK:
+        _DEFINICOES[cenario_id] = (mtime, definicao)
+    return definicao
+
+
+def listar_definicoes() -> List[Tuple[str, Dict[str, Any]]]:
+    """Definições em disco, as usadas mais recentemente primeiro."""
+    if not DEFINICOES_DIR.is_dir():
+        return []
+    arquivos = sorted(DEFINICOES_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    saida = [(p.stem, ler_definicao(p.stem)) for p in arquivos]
+    with _LOCK:
+        for cid in set(_DEFINICOES) - {cid for cid, _ in saida}:
+            _DEFINICOES.pop(cid, None)
+    return [(cid, d) for cid, d in saida if d is not None]
+
+
+def _base() -> BaseCenarios:
+    if BASE is None:
+        raise HTTPException(status_code=404, detail="Base de cenários não carregada")
+    return BASE
+
+
+def obter_cenario(cenario_id: str, definicao: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Resultado do cenário (LRU por id; recalcula se saiu do cache ou se a base mudou)."""
+    base = _base()
+    with _LOCK:
+        pronto = _CACHE.get(cenario_id)
+        if pronto is not None and pronto["meta"]["base"] == base.token:
+            _CACHE.move_to_end(cenario_id)
+        else:
+            pronto = None
+    registrar_acesso_cache("cenarios", pronto is not None)
+    if pronto is not None:
+        return pronto
+    definicao = definicao or ler_definicao(cenario_id)
+    if definicao is None:
+        raise HTTPException(status_code=404, detail=f"Cenário não encontrado: {cenario_id}")
+
+    pronto = {"id": cenario_id, "nome": definicao.get("nome"), **calcular_cenario(base, definicao["deltas"])}
+    with _LOCK:
+        _CACHE[cenario_id] = pronto
+        while len(_CACHE) > CAPACIDADE_CACHE:
+            _CACHE.popitem(last=False)
+    return pronto
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@cenarios_router.post("")
+async def criar_cenario(payload: Dict[str, Any]):
+    """
+    Calcula um cenário (`{"nome": ..., "deltas": [...]}`) contra os dados atuais.
+    Devolve, por nível, os itens alterados com as métricas antes/depois; itens
+    com `direto: false` só tiveram o percentil deslocado.
+    """
+    base = _base()
+    deltas = normalizar_deltas(base, payload.get("deltas"))
+    cenario_id = id_cenario(deltas)
+    definicao = {"nome": payload.get("nome"), "deltas": deltas}
+    salvar_definicao(cenario_id, definicao)
+    return resposta_json(obter_cenario(cenario_id, definicao))
+
+
+@cenarios_router.get("")
+async def listar_cenarios():
+    return {
+        "items": [
+            {"id": cid, "nome": d.get("nome"), "deltas": len(d["deltas"]), "em_cache": cid in _CACHE}
+            for cid, d in listar_definicoes()
+        ]
+    }
+
+
+@cenarios_router.get("/comparar")
+async def comparar_cenarios(
+    ids: str = Query(..., description="Ids de cenários separados por vírgula"),
+    geo_level: str = Query(default="bairro", description="Nível geográfico: bairro, ra ou cidade"),
+    metric: Optional[str] = Query(default=None, description="Métricas separadas por vírgula (padrão: todas)"),
+):
+    """Itens alterados em algum dos cenários, com o valor da base e o de cada cenário lado a lado."""
+    level = _validate_geo_level(geo_level)
+    lista = [i.strip() for i in ids.split(",") if i.strip()]
+    if not lista:
+        raise HTTPException(status_code=400, detail="Informe ao menos um id de cenário")
+    metricas = [m.strip() for m in metric.split(",") if m.strip()] if metric else METRICAS_CENARIO
+    invalidas = [m for m in metricas if m not in METRICAS_CENARIO]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Métrica inválida: {', '.join(invalidas)}")
+
+    base = _base()
+    resultados = {cid: obter_cenario(cid) for cid in lista}
+    por_cenario = {
+        cid: {i[GEO_JOIN_KEYS[level]]: i["depois"] for i in r["niveis"][level]} for cid, r in resultados.items()
+    }
+    chaves = sorted(set().union(*por_cenario.values()), key=base.posicao[level].get)
+    data = []
+    for chave in chaves:
+        antes = base.totais[level][chave]
+        data.append(
+            {
+                GEO_JOIN_KEYS[level]: chave,
+                "base": {m: antes.get(m) for m in metricas},
+                "cenarios": {
+                    cid: {m: por_cenario[cid].get(chave, antes).get(m) for m in metricas} for cid in lista
+                },
+            }
+        )
+    return resposta_json(
+        {
+            "meta": {
+                "geo_level": level,
+                "cenarios": [{"id": cid, "nome": r.get("nome"), "avisos": r["avisos"]} for cid, r in resultados.items()],
+                "metricas": metricas,
+                "itens": len(data),
+            },
+            "data": data,
+        }
+    )
+
+
+@cenarios_router.get("/{cenario_id}")
+async def geo_cenario(cenario_id: str):
+    return resposta_json(obter_cenario(cenario_id))
@@ -0,0 +1,316 @@
+"""
+Exportação colunar (Arrow IPC / Parquet) dos endpoints de dados.
+
+Quem consome `/api/v1/geo/densidade`, `/api/v1/dados/{slug}` ou
+`/api/v1/geo/bairros/linhas` para carregar direto no pandas pode pedir
+`format=arrow` (stream IPC: `pa.ipc.open_stream(corpo).read_pandas()`) ou
+`format=parquet` (`pd.read_parquet`), sem JSON dos dois lados.
+
+- Tipos: cada coluna ganha um tipo (int64, float64, bool ou string) inferido da
+  fonte inteira, uma vez por carga, em vez das strings do `csv.DictReader`
+  ("3" vira 3). A página/filtro usa o esquema da fonte, então o tipo de uma
+  coluna não depende do recorte pedido. O esquema de cada fonte registrada é
+  listado em `/api/v1/dados/catalogo` (funciona sem pyarrow).
+- Strings saem dicionarizadas (`dictionary<int32, string>`): bairro, grupo e
+  CNAE se repetem muito.
+- Com dados compartilhados (`memoria_compartilhada.py`), a tabela é montada das
+  colunas do segmento: colunas int64/float64 viram arrays Arrow sem cópia sobre
+  o mmap e as de texto saem dos códigos (só os valores distintos são decodificados).
+- A resposta é um stream: um lote de `LOTE_LINHAS` linhas (record batch ou row
+  group) por vez, sem montar o arquivo inteiro em memória. A tabela é montada
+  no gerador (threadpool), não no event loop; a da fonte inteira, sem filtro,
+  fica memorizada até a próxima carga.
+
+pyarrow é opcional: sem ele, `format=arrow|parquet` responde 501.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from memoria_compartilhada import TabelaCompartilhada
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - optional
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+LOTE_LINHAS = int(os.getenv("RAJAI_EXPORT_LOTE", "65536"))
+COMPRESSAO_PARQUET = os.getenv("RAJAI_EXPORT_PARQUET_COMPRESSAO", "zstd")
+
+FORMATOS = ("json", "arrow", "parquet")
+TIPOS_MIDIA = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSOES = {"arrow": "arrows", "parquet": "parquet"}
+
+FORMATO_QUERY = Query(
+    default="json", alias="format", description="json (padrão), arrow (stream IPC) ou parquet"
+)
+
+_INT_RE = re.compile(r"^-?(?:0|[1-9]\d*)$")  # zeros à esquerda ("01") continuam texto
+_FLOAT_RE = re.compile(r"^-?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?$")
+
+Esquema = Dict[str, str]  # coluna -> int64 | float64 | bool | string
+
+# fonte -> função que devolve as linhas atuais (lista de dicts ou TabelaCompartilhada)
+_FONTES: Dict[str, Callable[[], Any]] = {}
+# fonte -> (objeto das linhas, esquema / tabela); invalidados quando o objeto muda (nova carga)
+_ESQUEMAS: Dict[str, Tuple[Any, Esquema]] = {}
+_TABELAS: Dict[str, Tuple[Any, "pa.Table"]] = {}
+_lock = threading.Lock()
+
+
+def formatos_disponiveis() -> List[str]:
+    return list(FORMATOS) if pa is not None else ["json"]
+
+
+def validar_formato(formato: Optional[str]) -> str:
+    f = (formato or "json").strip().lower()
+    if f not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {formato} (use {', '.join(FORMATOS)})")
+    if f != "json" and pa is None:
+        raise HTTPException(status_code=501, detail="Exportação colunar indisponível: instale pyarrow")
+    return f
+
+
+def registrar_fonte(nome: str, fn: Callable[[], Any]) -> None:
+    """Registra uma fonte de linhas para o catálogo de esquemas."""
+    _FONTES[nome] = fn
+
+
+# -----------------------------
+# Inferência de tipos
+# -----------------------------
+def _tipo_valor(v: Any) -> Optional[str]:
+    if v is None or v == "":
+        return None
+    if isinstance(v, (bool, np.bool_)):
+        return "bool"
+    if isinstance(v, (int, np.integer)):
+        return "int64"
+    if isinstance(v, (float, np.floating)):
+        return "float64"
+    if isinstance(v, str):
+        if _INT_RE.match(v):
+            return "int64"
+        if _FLOAT_RE.match(v):
+            return "float64"
+    return "string"
+
+
+def classificar(valores: Iterable[Any]) -> str:
+    """Tipo mais estreito que acomoda todos os valores não vazios (int + float = float64)."""
+    tipo: Optional[str] = None
+    for v in valores:
+        t = _tipo_valor(v)
+        if t is None or t == tipo:
+            continue
+        if tipo is None:
+            tipo = t
+        elif {tipo, t} == {"int64", "float64"}:
+            tipo = "float64"
+        else:
+            return "string"
+    return tipo or "string"
+
+
+def _colunas(linhas: Sequence[Dict[str, Any]]) -> List[str]:
+    colunas: Dict[str, None] = {}
+    for linha in linhas:
+        for k in linha:
+            if k is not None:
+                colunas.setdefault(k, None)
+    return list(colunas)
+
+
+def inferir_esquema(linhas: Any) -> Esquema:
+    if isinstance(linhas, TabelaCompartilhada):
+        esquema = {}
+        for col in linhas.colunas:
+            valores = linhas.coluna(col)
+            if valores.dtype in (np.int64, np.float64):
+                esquema[col] = valores.dtype.name
+            else:
+                distintos = np.unique(valores[valores >= 0]).tolist()
+                esquema[col] = classificar(linhas.texto(c) for c in distintos)
+        return esquema
+    return {col: classificar(linha.get(col) for linha in linhas) for col in _colunas(linhas)}
+
+
+def esquema_da_fonte(nome: str, linhas: Any) -> Esquema:
+    """Esquema das linhas completas de uma fonte (memorizado enquanto o objeto não muda)."""
+    with _lock:
+        pronto = _ESQUEMAS.get(nome)
+        if pronto is not None and pronto[0] is linhas:
+            return pronto[1]
+    esquema = inferir_esquema(linhas)
+    with _lock:
+        _ESQUEMAS[nome] = (linhas, esquema)
+    return esquema
+
+
+def esquemas() -> Dict[str, List[Dict[str, str]]]:
+    """{fonte: [{"nome", "tipo"}]} das fontes registradas que têm linhas carregadas."""
+    saida = {}
+    for nome, fn in _FONTES.items():
+        linhas = fn()
+        if linhas is None or not len(linhas):
+            continue
+        saida[nome] = [{"nome": c, "tipo": t} for c, t in esquema_da_fonte(nome, linhas).items()]
+    return saida
+
+
+# -----------------------------
+# Montagem da tabela Arrow
+# -----------------------------
+def _converter(valores: Iterable[Any], tipo: str) -> List[Any]:
+    if tipo == "string":
+        return [None if v is None else str(v) for v in valores]
+    conv: Callable[[Any], Any] = {"int64": int, "float64": float, "bool": bool}[tipo]
+    saida = []
+    for v in valores:
+        if v is None or v == "":
+            saida.append(None)
+            continue
+        try:
+            saida.append(conv(v))
+        except (TypeError, ValueError):
+            saida.append(None)
+    return saida
+
+
+def _array(valores: List[Any], tipo: str) -> "pa.Array":
+    if tipo == "string":
+        return pa.array(valores, type=pa.string()).dictionary_encode()
+    return pa.array(valores, type={"int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_()}[tipo])
+
+
+def _coluna_compartilhada(tabela: TabelaCompartilhada, col: str, tipo: str) -> "pa.Array":
+    valores = tabela.coluna(col)
+    ausente = tabela.ausente(col)
+    if valores.dtype == np.int64:
+        # sem máscara, pa.array reaproveita o buffer do segmento (sem cópia)
+        return pa.array(valores, mask=ausente) if ausente is not None and ausente.any() else pa.array(valores)
+    if valores.dtype == np.float64:
+        nulos = np.isnan(valores) if ausente is None else np.isnan(valores) | ausente
+        return pa.array(valores, mask=nulos) if nulos.any() else pa.array(valores)
+    nulos = valores < 0
+    if ausente is not None:
+        nulos = nulos | ausente
+    distintos = np.unique(valores[~nulos])
+    indices = np.searchsorted(distintos, np.where(nulos, distintos[0] if distintos.size else 0, valores))
+    indices = pa.array(indices.astype(np.int32), mask=nulos if nulos.any() else None)
+    dicionario = _array(_converter((tabela.texto(int(c)) for c in distintos), tipo), tipo)
+    if tipo == "string":
+        # dictionary_encode em valores já distintos mantém a ordem: só troca o dicionário
+        return pa.DictionaryArray.from_arrays(indices, dicionario.dictionary)
+    return dicionario.take(indices)
+
+
+def tabela_arrow(linhas: Any, esquema: Optional[Esquema] = None) -> "pa.Table":
+    """Linhas (lista de dicts ou TabelaCompartilhada) -> pa.Table com o esquema dado (ou inferido)."""
+    if esquema is None:
+        esquema = inferir_esquema(linhas)
+    if isinstance(linhas, TabelaCompartilhada):
+        arrays = {col: _coluna_compartilhada(linhas, col, tipo) for col, tipo in esquema.items()}
+    else:
+        arrays = {col: _array(_converter([l.get(col) for l in linhas], tipo), tipo) for col, tipo in esquema.items()}
+    return pa.table(arrays)
+
+
+# -----------------------------
+# Resposta em stream
+# -----------------------------
+class _Coletor:
+    """Destino de escrita do pyarrow que devolve os bytes acumulados a cada lote."""
+
+    def __init__(self) -> None:
+        self._partes: List[bytes] = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados: Any) -> int:
+        b = bytes(dados)
+        self._partes.append(b)
+        self._posicao += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def esvaziar(self) -> bytes:
+        saida = b"".join(self._partes)
+        self._partes.clear()
+        return saida
+
+
+def _tabela_memorizada(chave: Optional[str], linhas: Any, esquema: Optional[Esquema]) -> "pa.Table":
+    if chave is None:
+        return tabela_arrow(linhas, esquema)
+    with _lock:
+        pronta = _TABELAS.get(chave)
+        if pronta is not None and pronta[0] is linhas:
+            return pronta[1]
+    tabela = tabela_arrow(linhas, esquema)
+    with _lock:
+        _TABELAS[chave] = (linhas, tabela)
+    return tabela
+
+
+def _lotes(
+    linhas: Any, esquema: Optional[Esquema], formato: str, lote: int, chave: Optional[str]
+) -> Iterator[bytes]:
+    tabela = _tabela_memorizada(chave, linhas, esquema)
+    coletor = _Coletor()
+    destino = pa.PythonFile(coletor, mode="w")
+    if formato == "arrow":
+        with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+            for batch in tabela.to_batches(max_chunksize=lote):
+                escritor.write_batch(batch)
+                yield coletor.esvaziar()
+    else:
+        with pq.ParquetWriter(destino, tabela.schema, compression=COMPRESSAO_PARQUET) as escritor:
+            for inicio in range(0, tabela.num_rows, lote):
+                escritor.write_table(tabela.slice(inicio, lote), row_group_size=lote)
+                yield coletor.esvaziar()
+    resto = coletor.esvaziar()
+    if resto:
+        yield resto
+
+
+def resposta_colunar(
+    linhas: Any,
+    formato: str,
+    nome: str,
+    esquema: Optional[Esquema] = None,
+    chave: Optional[str] = None,
+    lote: int = LOTE_LINHAS,
+) -> StreamingResponse:
+    """
+    Resposta `format=arrow|parquet` das linhas, gerada em lotes. `chave` memoriza a
+    tabela Arrow enquanto `linhas` for o mesmo objeto (use só para a fonte inteira).
+    """
+    return StreamingResponse(
+        _lotes(linhas, esquema, formato, max(1, lote), chave),
+        media_type=TIPOS_MIDIA[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{nome}.{EXTENSOES[formato]}"',
+            "X-Total-Rows": str(len(linhas)),
+        },
+    )
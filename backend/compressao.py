@@ -0,0 +1,206 @@
+"""
+Compressão de respostas HTTP (gzip e, se instalado, brotli).
+
+Dois caminhos:
+
+- payloads estáticos (cache em memória: densidade, bootstrap, geometria,
+  GeoJSON das camadas) são comprimidos uma vez, no nível máximo, e guardados
+  junto dos bytes originais; `resposta_estatica` só escolhe a variante;
+- respostas dinâmicas (`/linhas`, `/dados/{slug}`, ...) passam pelo
+  `CompressaoMiddleware`, que comprime na hora, com nível rápido, quando o
+  corpo passa de `LIMIAR_BYTES`.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+from serializacao import dumps
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional
+    brotli = None  # type: ignore
+
+LIMIAR_BYTES = int(os.getenv("RAJAI_COMPRESSAO_MIN_BYTES", "1024"))
+NIVEL_GZIP_DINAMICO = 4
+QUALIDADE_BROTLI_DINAMICO = 4
+
+TIPOS_COMPRIMIVEIS = (
+    "application/json",
+    "application/geo+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/vnd.apache.arrow.stream",
+    "text/",
+    "image/svg+xml",
+)
+
+
+def codificacoes_suportadas() -> List[str]:
+    """Em ordem de preferência."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negociar(accept_encoding: str) -> Optional[str]:
+    """Escolhe a melhor codificação suportada para o `Accept-Encoding` (respeita q=)."""
+    pesos: Dict[str, float] = {}
+    for parte in (accept_encoding or "").lower().split(","):
+        nome, _, params = parte.strip().partition(";")
+        if not nome:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        pesos[nome.strip()] = q
+    melhor, melhor_q = None, 0.0
+    for cod in codificacoes_suportadas():
+        q = pesos.get(cod, pesos.get("*", 0.0))
+        if q > melhor_q:
+            melhor, melhor_q = cod, q
+    return melhor
+
+
+# -----------------------------
+# Payloads estáticos (pré-comprimidos)
+# -----------------------------
+def payload_estatico(corpo: bytes, etag: Optional[str] = None) -> Dict[str, Any]:
+    """Bytes originais + variantes comprimidas no nível máximo + ETag."""
+    variantes = {"identity": corpo, "gzip": gzip.compress(corpo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes["br"] = brotli.compress(corpo, quality=11)
+    return {
+        "variantes": variantes,
+        "etag": etag or '"' + hashlib.sha256(corpo).hexdigest()[:16] + '"',
+    }
+
+
+def serializar_estatico(obj: Any, etag: Optional[str] = None) -> Dict[str, Any]:
+    return payload_estatico(dumps(obj), etag)
+
+
+def resposta_estatica(
+    request: Request,
+    payload: Dict[str, Any],
+    media_type: str = "application/json",
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Serve a variante pré-comprimida aceita pelo cliente (ou 304 se o ETag bater)."""
+    cabecalhos = {"ETag": payload["etag"], "Vary": "Accept-Encoding", **(headers or {})}
+    if cache_control:
+        cabecalhos["Cache-Control"] = cache_control
+    if payload["etag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=cabecalhos)
+    variantes = payload["variantes"]
+    cod = negociar(request.headers.get("accept-encoding", ""))
+    if cod in variantes:
+        cabecalhos["Content-Encoding"] = cod
+        return Response(content=variantes[cod], media_type=media_type, headers=cabecalhos)
+    return Response(content=variantes["identity"], media_type=media_type, headers=cabecalhos)
+
+
+# -----------------------------
+# Compressão na hora (respostas dinâmicas)
+# -----------------------------
+class _Compressor:
+    def __init__(self, codificacao: str):
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._c = brotli.Compressor(quality=QUALIDADE_BROTLI_DINAMICO)
+        else:
+            self._c = zlib.compressobj(NIVEL_GZIP_DINAMICO, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        if self.codificacao == "br":
+            return self._c.process(dados)
+        return self._c.compress(dados)
+
+    def finalizar(self) -> bytes:
+        if self.codificacao == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+
+def _comprimivel(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    tipo = headers.get("content-type", "")
+    if tipo.startswith("text/event-stream"):
+        return False
+    return tipo.startswith(TIPOS_COMPRIMIVEIS)
+
+
+class CompressaoMiddleware:
+    """
+    Comprime respostas dinâmicas acima de `LIMIAR_BYTES` com gzip/brotli em nível
+    rápido. Respostas que já trazem `Content-Encoding` (payloads pré-comprimidos)
+    passam direto. Respostas em streaming são comprimidas pedaço a pedaço.
+    """
+
+    def __init__(self, app: Any, limiar_bytes: int = LIMIAR_BYTES):
+        self.app = app
+        self.limiar_bytes = limiar_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cabecalhos_req = dict(scope.get("headers") or [])
+        codificacao = negociar(cabecalhos_req.get(b"accept-encoding", b"").decode("latin-1"))
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        estado: Dict[str, Any] = {"inicio": None, "compressor": None, "direto": False}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            tipo = message["type"]
+            if tipo == "http.response.start":
+                estado["inicio"] = message
+                return
+            if tipo != "http.response.body" or estado["direto"]:
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais = message.get("more_body", False)
+
+            if estado["compressor"] is None:
+                inicio = estado["inicio"]
+                headers = MutableHeaders(raw=inicio["headers"])
+                pequeno = not mais and len(corpo) < self.limiar_bytes
+                if pequeno or inicio["status"] in (204, 304) or not _comprimivel(headers):
+                    estado["direto"] = True
+                    await send(inicio)
+                    await send(message)
+                    return
+                estado["compressor"] = _Compressor(codificacao)
+                headers["Content-Encoding"] = codificacao
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not mais:
+                    saida = estado["compressor"].comprimir(corpo) + estado["compressor"].finalizar()
+                    headers["Content-Length"] = str(len(saida))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": saida})
+                    return
+                await send(inicio)
+
+            saida = estado["compressor"].comprimir(corpo)
+            if not mais:
+                saida += estado["compressor"].finalizar()
+            await send({"type": "http.response.body", "body": saida, "more_body": mais})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,331 @@
+"""
+Cubo OLAP pré-calculado: região administrativa x bairro x grupo x CNAE.
+
+Na carga, as linhas de dados.csv viram um array denso `quantidade[bairro,
+grupo, cnae]` e, a partir dele, os 12 cuboides (cada subconjunto de grupo/CNAE
+com o eixo geográfico no bairro, na RA ou somado). Cada bairro tem uma só RA,
+então RA x bairro não é um eixo denso: o cuboide da RA é o roll-up do bairro e,
+com as duas dimensões na consulta, a RA sai do bairro (os pares observados).
+Uma consulta usa o cuboide das dimensões pedidas (linhas + colunas + filtros):
+filtra por índice, soma as dimensões só de filtro e transpõe — sem varrer
+linhas. Drill-down e roll-up são só trocar as dimensões (ex.: `rows=ra` ->
+`rows=ra,bairro`).
+
+Medidas por célula: `quantidade`, `populacao` (soma dos bairros da célula; não
+depende de grupo/CNAE) e `densidade_10k` (quantidade por 10 mil habitantes).
+A população é a dos bairros que aparecem em dados.csv, para o roll-up somar.
+
+Com dados compartilhados, o cubo é montado uma vez no carregador e os cuboides
+vão para o segmento; os workers consultam os arrays mapeados.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+
+from endpoint import GEO_SUMMARY, _filter_geo_rows, normalize_bairro
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from metricas import registrar_tamanho_cache
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+cubo_router = APIRouter(prefix="/api/v1/geo", tags=["geo"])
+
+DIMENSOES = ("regiao_adm", "bairro", "classificacao_grupo", "classificacao_cnae")
+DIMENSOES_GEO = ("regiao_adm", "bairro")
+APELIDOS = {"ra": "regiao_adm", "grupo": "classificacao_grupo", "cnae": "classificacao_cnae"}
+MEDIDAS = ("quantidade", "populacao", "densidade_10k")
+
+
+def _dimensao(nome: str) -> str:
+    d = nome.strip().lower()
+    d = APELIDOS.get(d, d)
+    if d not in DIMENSOES:
+        raise HTTPException(
+            status_code=400, detail=f"Dimensão desconhecida: {nome} (use {', '.join(DIMENSOES)} ou ra/grupo/cnae)"
+        )
+    return d
+
+
+def _ordenar(dims: Sequence[str]) -> Tuple[str, ...]:
+    return tuple(d for d in DIMENSOES if d in dims)
+
+
+class Cubo:
+    def __init__(self, rows: Sequence[Dict[str, Any]], ra_de: Dict[str, str], populacao: Dict[str, int]):
+        bairros = sorted({r["bairro"] for r in rows} | set(ra_de))
+        valores = {
+            "regiao_adm": sorted({ra_de.get(b) or "" for b in bairros}),
+            "bairro": bairros,
+            "classificacao_grupo": sorted({r["classificacao_grupo"] for r in rows}),
+            "classificacao_cnae": sorted({r["classificacao_cnae"] for r in rows}),
+        }
+        self.membros: Dict[str, List[str]] = valores
+        self.indice: Dict[str, Dict[str, int]] = {d: {v: i for i, v in enumerate(vs)} for d, vs in valores.items()}
+        # cada bairro tem uma só RA: o eixo geográfico é o bairro e a RA sai dele
+        self.ra_do_bairro = np.asarray(
+            [self.indice["regiao_adm"][ra_de.get(b) or ""] for b in bairros], dtype=np.int64
+        )
+
+        base = np.zeros(tuple(len(valores[d]) for d in DIMENSOES[1:]), dtype=np.int64)
+        if rows:
+            ib = np.asarray([self.indice["bairro"][r["bairro"]] for r in rows])
+            ig = np.asarray([self.indice["classificacao_grupo"][r["classificacao_grupo"]] for r in rows])
+            ic = np.asarray([self.indice["classificacao_cnae"][r["classificacao_cnae"]] for r in rows])
+            np.add.at(base, (ib, ig, ic), np.asarray([r["quantidade"] for r in rows], dtype=np.int64))
+        pop = np.asarray([populacao.get(b) or 0 for b in bairros], dtype=np.int64)
+
+        # cuboide de cada subconjunto de dimensões com no máximo um nível geográfico
+        # (nenhum, RA ou bairro); eixos na ordem de DIMENSOES
+        outras = DIMENSOES[2:]
+        self.cuboides: Dict[FrozenSet[str], np.ndarray] = {}
+        for k in range(len(outras) + 1):
+            for dims in itertools.combinations(outras, k):
+                por_bairro = base.sum(axis=tuple(1 + i for i, d in enumerate(outras) if d not in dims))
+                self.cuboides[frozenset(("bairro",) + dims)] = por_bairro
+                self.cuboides[frozenset(("regiao_adm",) + dims)] = self._por_ra(por_bairro)
+                self.cuboides[frozenset(dims)] = por_bairro.sum(axis=0)
+        self.populacao: Dict[FrozenSet[str], np.ndarray] = {
+            frozenset(("bairro",)): pop,
+            frozenset(("regiao_adm",)): self._por_ra(pop),
+            frozenset(): pop.sum(axis=0),
+        }
+
+    def _por_ra(self, por_bairro: np.ndarray) -> np.ndarray:
+        """Roll-up do eixo 0 (bairro) para RA."""
+        soma = np.zeros((len(self.membros["regiao_adm"]),) + por_bairro.shape[1:], dtype=por_bairro.dtype)
+        np.add.at(soma, self.ra_do_bairro, por_bairro)
+        return soma
+
+    def conteudo_compartilhado(self, construtor: Construtor) -> None:
+        construtor.objeto("cubo.membros", self.membros)
+        construtor.array("cubo.ra_do_bairro", self.ra_do_bairro)
+        for dims, arr in self.cuboides.items():
+            construtor.array("cubo.q." + ",".join(_ordenar(dims)), arr)
+        for dims, arr in self.populacao.items():
+            construtor.array("cubo.p." + ",".join(_ordenar(dims)), arr)
+
+    @classmethod
+    def de_plano(cls, plano: PlanoCompartilhado) -> Optional["Cubo"]:
+        membros = plano.objeto("cubo.membros")
+        if membros is None:
+            return None
+        cubo = cls.__new__(cls)
+        cubo.membros = membros
+        cubo.indice = {d: {v: i for i, v in enumerate(vs)} for d, vs in membros.items()}
+        cubo.ra_do_bairro = plano.array("cubo.ra_do_bairro")
+        cubo.cuboides, cubo.populacao = {}, {}
+        for nome in plano.nomes_arrays():
+            if nome.startswith(("cubo.q.", "cubo.p.")):
+                alvo = cubo.cuboides if nome.startswith("cubo.q.") else cubo.populacao
+                alvo[frozenset(d for d in nome[7:].split(",") if d)] = plano.array(nome)
+        return cubo
+
+    @property
+    def celulas(self) -> int:
+        return int(sum(a.size for a in self.cuboides.values()))
+
+    def _indices_filtro(self, dim: str, valores: Sequence[str]) -> List[int]:
+        if dim in DIMENSOES_GEO:
+            chaves = [normalize_bairro(v) for v in valores]
+            mapa = self.indice[dim]
+        else:
+            chaves = [v.strip().lower() for v in valores]
+            mapa = {m.lower(): i for m, i in self.indice[dim].items()}
+        faltando = [v for v, k in zip(valores, chaves) if k not in mapa]
+        if faltando:
+            raise HTTPException(status_code=400, detail=f"Valor desconhecido para {dim}: {', '.join(faltando)}")
+        return sorted({mapa[k] for k in chaves})
+
+    def _fatiar(
+        self, arr: np.ndarray, dims: Tuple[str, ...], eixos: Sequence[str], filtros: Dict[str, List[int]]
+    ) -> np.ndarray:
+        """Aplica os filtros, soma as dimensões só de filtro e transpõe para a ordem de `eixos`."""
+        for d, idx in filtros.items():
+            if d in dims:
+                arr = np.take(arr, idx, axis=dims.index(d))
+        restantes = list(dims)
+        for d in list(dims):
+            if d not in eixos:
+                arr = arr.sum(axis=restantes.index(d))
+                restantes.remove(d)
+        presentes = [d for d in eixos if d in restantes]
+        return np.transpose(arr, [restantes.index(d) for d in presentes])
+
+    def _resolver(
+        self, cuboides: Dict[FrozenSet[str], np.ndarray], dims: Tuple[str, ...], eixos: Sequence[str],
+        filtros: Dict[str, List[int]], selecao: Dict[str, List[int]],
+    ) -> np.ndarray:
+        """Consulta o cuboide de `dims` e devolve o array nos `eixos` pedidos.
+
+        Com RA e bairro na mesma consulta o cuboide é o do bairro; a RA sai dele por
+        roll-up (RA sem bairro nos eixos) ou pelo par (RA, bairro) quando os dois
+        estão em lados diferentes da tabela.
+        """
+        por_bairro = "regiao_adm" in eixos and "bairro" in dims
+        internos = list(dict.fromkeys("bairro" if d == "regiao_adm" and por_bairro else d for d in eixos))
+        arr = self._fatiar(cuboides[frozenset(dims)], dims, internos, filtros)
+        if not por_bairro:
+            return arr
+        eixo = internos.index("bairro")
+        # pertence[r, b] = 1 se o b-ésimo bairro selecionado é da r-ésima RA selecionada
+        ras = self.ra_do_bairro[selecao["bairro"]]
+        pertence = (np.asarray(selecao["regiao_adm"])[:, None] == ras[None, :]).astype(arr.dtype)
+        if "bairro" in eixos:
+            forma = [1] * arr.ndim
+            forma[eixo:eixo + 1] = pertence.shape
+            arr = np.expand_dims(arr, eixo) * pertence.reshape(forma)
+            atuais = internos[:eixo] + ["regiao_adm", "bairro"] + internos[eixo + 1:]
+        else:
+            arr = np.moveaxis(np.tensordot(pertence, arr, axes=([1], [eixo])), 0, eixo)
+            atuais = [("regiao_adm" if d == "bairro" else d) for d in internos]
+        return np.transpose(arr, [atuais.index(d) for d in eixos])
+
+    def consultar(self, linhas: List[str], colunas: List[str], filtros: Dict[str, List[str]]) -> Dict[str, Any]:
+        eixos = linhas + colunas
+        if len(set(eixos)) != len(eixos):
+            raise HTTPException(status_code=400, detail="Dimensão repetida entre rows e cols")
+        idx_filtros = {d: self._indices_filtro(d, v) for d, v in filtros.items()}
+
+        geo = (set(eixos) | set(idx_filtros)) & set(DIMENSOES_GEO)
+        selecao = {d: idx_filtros.get(d, list(range(len(self.membros[d])))) for d in DIMENSOES}
+        filtros_int = {d: i for d, i in idx_filtros.items() if d not in DIMENSOES_GEO}
+        if "bairro" in geo:
+            ras = set(selecao["regiao_adm"])
+            selecao["bairro"] = [b for b in selecao["bairro"] if self.ra_do_bairro[b] in ras]
+            filtros_int["bairro"] = selecao["bairro"]
+        elif "regiao_adm" in idx_filtros:
+            filtros_int["regiao_adm"] = selecao["regiao_adm"]
+
+        # RA e bairro do mesmo lado formam um eixo só: o bairro, rotulado com a sua RA
+        def unidades(lado: List[str]) -> List[str]:
+            if "regiao_adm" in lado and "bairro" in lado:
+                return [d for d in lado if d != "regiao_adm"]
+            return list(lado)
+
+        u_linhas, u_colunas = unidades(linhas), unidades(colunas)
+        u_eixos = u_linhas + u_colunas
+        dims_geo = ("bairro",) if "bairro" in geo else tuple(geo)
+        dims = _ordenar(set(dims_geo) | (set(eixos) | set(idx_filtros)) - set(DIMENSOES_GEO))
+        qtd = self._resolver(self.cuboides, dims, u_eixos, filtros_int, selecao)
+
+        filtros_geo = {d: i for d, i in filtros_int.items() if d in DIMENSOES_GEO}
+        u_geo = [d for d in u_eixos if d in DIMENSOES_GEO]
+        pop = self._resolver(self.populacao, dims_geo, u_geo, filtros_geo, selecao)
+        # população não varia com grupo/CNAE: repete ao longo desses eixos
+        pop = pop.reshape([len(selecao[d]) if d in DIMENSOES_GEO else 1 for d in u_eixos])
+        pop = np.broadcast_to(pop, qtd.shape)
+
+        n_linhas = int(np.prod([len(selecao[d]) for d in u_linhas]))
+        n_colunas = int(np.prod([len(selecao[d]) for d in u_colunas]))
+        qtd = qtd.reshape(n_linhas, n_colunas)
+        pop = pop.reshape(n_linhas, n_colunas)
+
+        def indices(lado: List[str], u_lado: List[str]) -> List[Tuple[int, ...]]:
+            """Índices dos membros de cada linha (ou coluna), na ordem das dimensões do lado."""
+            saida = []
+            for combinacao in itertools.product(*[selecao[d] for d in u_lado]):
+                idx = dict(zip(u_lado, combinacao))
+                if "regiao_adm" in lado and "regiao_adm" not in idx:
+                    idx["regiao_adm"] = int(self.ra_do_bairro[idx["bairro"]])
+                saida.append(tuple(idx[d] for d in lado))
+            return saida
+
+        idx_linhas = indices(linhas, u_linhas)
+        idx_colunas = indices(colunas, u_colunas)
+        # combinações vazias (ex.: bairro fora da RA da linha) saem do resultado; o resto
+        # sai na ordem das dimensões pedidas (RA e depois bairro em `rows=ra,bairro`)
+        cheias_l = (qtd.sum(axis=1) > 0) | (pop.max(axis=1, initial=0) > 0) if linhas else np.ones(n_linhas, bool)
+        cheias_c = (qtd.sum(axis=0) > 0) | (pop.max(axis=0, initial=0) > 0) if colunas else np.ones(n_colunas, bool)
+        manter_l = np.asarray(sorted(np.flatnonzero(cheias_l), key=idx_linhas.__getitem__), dtype=np.int64)
+        manter_c = np.asarray(sorted(np.flatnonzero(cheias_c), key=idx_colunas.__getitem__), dtype=np.int64)
+        qtd = qtd[np.ix_(manter_l, manter_c)]
+        pop = pop[np.ix_(manter_l, manter_c)]
+
+        dens = np.round(qtd / np.maximum(pop, 1) * 10000, 2).astype(object)
+        dens[pop <= 0] = None
+
+        def rotulo(lado: List[str], idx: Tuple[int, ...]) -> List[Optional[str]]:
+            return [self.membros[d][i] or None for d, i in zip(lado, idx)]
+
+        return {
+            "meta": {
+                "rows": linhas,
+                "cols": colunas,
+                "filters": filtros,
+                "medidas": list(MEDIDAS),
+                "cuboide": list(dims),
+            },
+            "linhas": [rotulo(linhas, idx_linhas[i]) for i in manter_l],
+            "colunas": [rotulo(colunas, idx_colunas[j]) for j in manter_c],
+            "valores": {
+                "quantidade": qtd.tolist(),
+                "populacao": pop.tolist(),
+                "densidade_10k": dens.tolist(),
+            },
+            "totais": {
+                "linhas": qtd.sum(axis=1).tolist(),
+                "colunas": qtd.sum(axis=0).tolist(),
+                "geral": int(qtd.sum()),
+            },
+        }
+
+
+CUBO: Optional[Cubo] = None
+registrar_tamanho_cache("cubo", lambda: CUBO.celulas if CUBO is not None else 0)
+
+
+def montar_cubo() -> int:
+    """Monta o cubo a partir das linhas e sumários já carregados. Retorna o número de células."""
+    global CUBO
+    rows = _filter_geo_rows()
+    ra_de = {b: s.get("regiao_adm") or "" for b, s in GEO_SUMMARY.items()}
+    populacao = {b: int(s.get("populacao_2022") or 0) for b, s in GEO_SUMMARY.items()}
+    CUBO = Cubo(rows, ra_de, populacao)
+    logger.info("Cubo OLAP: %d linhas, %d células em %d cuboides", len(rows), CUBO.celulas, len(CUBO.cuboides))
+    return CUBO.celulas
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if CUBO is not None:
+        CUBO.conteudo_compartilhado(construtor)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    global CUBO
+    CUBO = Cubo.de_plano(plano)
+
+
+def _lista_dimensoes(texto: Optional[str]) -> List[str]:
+    return [_dimensao(d) for d in (texto or "").split(",") if d.strip()]
+
+
+def _parse_filtros(texto: Optional[str]) -> Dict[str, List[str]]:
+    """`ra:CENTRO|TIJUCA;grupo:Ultraprocessado` -> {"regiao_adm": [...], "classificacao_grupo": [...]}"""
+    filtros: Dict[str, List[str]] = {}
+    for parte in (texto or "").split(";"):
+        if not parte.strip():
+            continue
+        dim, sep, valores = parte.partition(":")
+        lista = [v.strip() for v in valores.split("|") if v.strip()]
+        if not sep or not lista:
+            raise HTTPException(status_code=400, detail=f"Filtro inválido: {parte} (use dim:valor1|valor2)")
+        filtros.setdefault(_dimensao(dim), []).extend(lista)
+    return filtros
+
+
+@cubo_router.get("/cubo")
+async def geo_cubo(
+    rows: Optional[str] = Query(default=None, description="Dimensões nas linhas, separadas por vírgula"),
+    cols: Optional[str] = Query(default=None, description="Dimensões nas colunas, separadas por vírgula"),
+    filters: Optional[str] = Query(default=None, description="Filtros: dim:valor1|valor2;dim2:valor"),
+):
+    """Tabela cruzada de quantidade, população e densidade por 10 mil habitantes."""
+    if CUBO is None:
+        raise HTTPException(status_code=404, detail="Cubo não carregado")
+    return resposta_json(CUBO.consultar(_lista_dimensoes(rows), _lista_dimensoes(cols), _parse_filtros(filters)))
@@ -0,0 +1,284 @@
+"""
+Resolução de entidades: o mesmo estabelecimento vindo de fontes diferentes.
+
+A mesma feira pode aparecer em `csv_informais.csv` (só bairro + tipo) e em
+`feiras_rio.csv` (endereço, dia e coordenadas); somar as duas fontes conta a
+feira duas vezes. `IndiceEntidades` agrupa os registros em estabelecimentos
+canônicos, guardando de que fontes/ids cada um veio:
+
+- blocagem por (bairro normalizado, CNAE): um registro só é comparado com os do
+  mesmo bloco, então o custo cresce com o tamanho dos blocos, não com o
+  quadrado do total;
+- similaridade de nome/endereço por Jaccard de trigramas dos tokens
+  normalizados (sem acento, sem "RUA"/"AV."/"DE"...), que não depende da ordem
+  ("LIVRAMENTO DO, RUA" = "Rua do Livramento") e tolera erros de digitação;
+  endereços com números diferentes não casam, e com nome dos dois lados nome e
+  endereço pesam igual;
+- coordenadas, quando as duas estão geocodificadas no nível de rua ou melhor:
+  perto (`RAIO_M`) reforça o casamento, longe (`DISTANCIA_VETO_M`) o impede.
+  Geocodificações só no nível do bairro caem todas no mesmo ponto e não contam;
+- registros sem atributos (só bairro + CNAE, como os informais) ocupam uma
+  entidade do bloco que ainda não tenha registro daquela fonte; se não houver,
+  viram uma entidade nova.
+
+Casamentos com mais de uma entidade as fundem (union-find), e o índice é
+incremental: `adicionar` casa um registro novo contra o que já existe.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import math
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from endpoint import normalize_bairro
+
+logger = logging.getLogger("rajai")
+
+HACKA_DIR = Path(__file__).parent / "joao" / "hacka"
+LIMIAR = float(os.getenv("RAJAI_DEDUP_LIMIAR", "0.75"))
+RAIO_M = float(os.getenv("RAJAI_DEDUP_RAIO_M", "150"))
+DISTANCIA_VETO_M = float(os.getenv("RAJAI_DEDUP_VETO_M", "1000"))
+BONUS_PROXIMIDADE = 0.2
+PRECISOES_CONFIAVEIS = {"exact", "street"}
+
+# fonte -> (CSV geocodificado, CNAE e grupo dos registros, coluna que diferencia sessões no mesmo lugar)
+FONTES_CAMADAS: Dict[str, Tuple[Path, str, str, str]] = {
+    "feiras": (HACKA_DIR / "feiras_rio_geocoded_fixed.csv", "Feira", "In natura", "dia"),
+    "hortas": (HACKA_DIR / "hortas_cariocas_geocoded.csv", "Horta", "In natura", ""),
+    "cozinhas": (HACKA_DIR / "cozinhas_comunitarias_rio_geocoded.csv", "Cozinha", "Misto", ""),
+}
+
+_NAO_ALFANUM_RE = re.compile(r"[^A-Z0-9]+")
+_IRRELEVANTES = frozenset(
+    "R RUA AV AVENIDA ESTR ESTRADA EST PCA PRACA TV TRAVESSA AL ALAMEDA LGO LARGO ROD RODOVIA "
+    "DE DA DO DAS DOS E S N SN NO RIO JANEIRO RJ".split()
+)
+
+
+def normalizar(texto: Any) -> str:
+    if not isinstance(texto, str):
+        return ""
+    nfkd = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return _NAO_ALFANUM_RE.sub(" ", sem_acento.upper()).strip()
+
+
+def trigramas(texto: str) -> FrozenSet[str]:
+    """Trigramas de cada token relevante (com bordas), em um único conjunto."""
+    grams = set()
+    for token in normalizar(texto).split():
+        if token in _IRRELEVANTES:
+            continue
+        t = f" {token} "
+        grams.update(t[i : i + 3] for i in range(len(t) - 2))
+    return frozenset(grams)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def distancia_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(h))
+
+
+def _float(valor: Any) -> Optional[float]:
+    try:
+        f = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+
+def registro(
+    fonte: str,
+    id: Any,
+    bairro: Any,
+    cnae: Any,
+    grupo: Any = "",
+    nome: Any = "",
+    endereco: Any = "",
+    lat: Any = None,
+    lon: Any = None,
+    precisao: Any = "",
+    discriminante: Any = "",
+) -> Dict[str, Any]:
+    """Registro de uma fonte com os campos pré-processados para blocagem e comparação."""
+    lat_f, lon_f = _float(lat), _float(lon)
+    preciso = lat_f is not None and lon_f is not None and str(precisao or "") in PRECISOES_CONFIAVEIS
+    bairro = bairro if isinstance(bairro, str) else ""
+    return {
+        "fonte": fonte,
+        "id": str(id),
+        "bairro": bairro,
+        "classificacao_grupo": grupo if isinstance(grupo, str) else "",
+        "classificacao_cnae": cnae if isinstance(cnae, str) else "",
+        "nome": nome if isinstance(nome, str) else "",
+        "endereco": endereco if isinstance(endereco, str) else "",
+        "lat": lat_f,
+        "lon": lon_f,
+        "_bloco": (normalize_bairro(bairro), normalizar(cnae)),
+        "_nome": trigramas(nome),
+        "_endereco": trigramas(endereco),
+        "_numeros": frozenset(t for t in normalizar(endereco).split() if t.isdigit()),
+        "_coords": (lat_f, lon_f) if preciso else None,
+        "_discriminante": normalizar(discriminante),
+    }
+
+
+def _sem_atributos(r: Dict[str, Any]) -> bool:
+    return not (r["_nome"] or r["_endereco"] or r["_coords"])
+
+
+def similaridade(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """0..1; 0 também quando algo impede o casamento (sessões distintas, coordenadas distantes)."""
+    if a["_discriminante"] and b["_discriminante"] and a["_discriminante"] != b["_discriminante"]:
+        return 0.0
+    # mesma rua com números diferentes é outro endereço
+    mesmo_numero = not (a["_numeros"] and b["_numeros"]) or bool(a["_numeros"] & b["_numeros"])
+    sim_endereco = jaccard(a["_endereco"], b["_endereco"]) if mesmo_numero else 0.0
+    if a["_nome"] and b["_nome"]:
+        # com nome dos dois lados, o endereço sozinho não basta (duas hortas na mesma rua)
+        sim_nome = jaccard(a["_nome"], b["_nome"])
+        score = (sim_nome + sim_endereco) / 2 if a["_endereco"] and b["_endereco"] else sim_nome
+    else:
+        score = sim_endereco
+    if a["_coords"] and b["_coords"]:
+        d = distancia_m(*a["_coords"], *b["_coords"])
+        if d > DISTANCIA_VETO_M:
+            return 0.0
+        if d <= RAIO_M:
+            score = min(1.0, score + BONUS_PROXIMIDADE)
+    return score
+
+
+class IndiceEntidades:
+    def __init__(self, limiar: float = LIMIAR):
+        self.limiar = limiar
+        self.registros: List[Dict[str, Any]] = []
+        self._pai: List[int] = []  # union-find de entidades (uma por registro ao entrar)
+        self._blocos: Dict[Tuple[str, str], List[int]] = {}
+        self.comparacoes = 0
+
+    def _raiz(self, i: int) -> int:
+        while self._pai[i] != i:
+            self._pai[i] = self._pai[self._pai[i]]
+            i = self._pai[i]
+        return i
+
+    def _unir(self, a: int, b: int) -> int:
+        ra, rb = self._raiz(a), self._raiz(b)
+        if ra != rb:
+            ra, rb = min(ra, rb), max(ra, rb)  # a entidade mais antiga dá o id
+            self._pai[rb] = ra
+        return ra
+
+    def adicionar(self, reg: Dict[str, Any]) -> int:
+        """Casa o registro (de `registro()`) com as entidades do bloco. Retorna o id da entidade."""
+        i = len(self.registros)
+        self.registros.append(reg)
+        self._pai.append(i)
+        bloco = self._blocos.setdefault(reg["_bloco"], [])
+        membros: Dict[int, List[int]] = {}
+        for j in bloco:
+            membros.setdefault(self._raiz(j), []).append(j)
+        bloco.append(i)
+
+        if _sem_atributos(reg):
+            alvos = [e for e, js in membros.items() if all(self.registros[j]["fonte"] != reg["fonte"] for j in js)]
+            return self._unir(min(alvos), i) if alvos else i
+
+        casadas = []
+        for e, js in membros.items():
+            self.comparacoes += len(js)
+            if max(similaridade(reg, self.registros[j]) for j in js) >= self.limiar:
+                casadas.append(e)
+        if not casadas:
+            # entidade só de registros sem atributos de outra fonte: este registro a descreve
+            casadas = [
+                min(
+                    (e for e, js in membros.items()
+                     if all(_sem_atributos(self.registros[j]) and self.registros[j]["fonte"] != reg["fonte"] for j in js)),
+                    default=i,
+                )
+            ]
+        raiz = i
+        for e in casadas:
+            raiz = self._unir(e, raiz)
+        return raiz
+
+    def adicionar_varios(self, registros: Iterable[Dict[str, Any]]) -> List[int]:
+        return [self.adicionar(r) for r in registros]
+
+    def entidades(self) -> List[Dict[str, Any]]:
+        """Estabelecimentos canônicos, com os atributos do registro mais completo e a proveniência."""
+        grupos: Dict[int, List[int]] = {}
+        for i in range(len(self.registros)):
+            grupos.setdefault(self._raiz(i), []).append(i)
+        saida = []
+        for e, idxs in sorted(grupos.items()):
+            regs = [self.registros[i] for i in idxs]
+            melhor = max(regs, key=lambda r: (r["_coords"] is not None, bool(r["nome"]), bool(r["endereco"]), r["lat"] is not None))
+            saida.append({
+                "entidade": e,
+                "bairro": melhor["bairro"],
+                "classificacao_grupo": next((r["classificacao_grupo"] for r in regs if r["classificacao_grupo"]), ""),
+                "classificacao_cnae": melhor["classificacao_cnae"],
+                "nome": melhor["nome"],
+                "endereco": melhor["endereco"],
+                "lat": melhor["lat"],
+                "lon": melhor["lon"],
+                "n_registros": len(regs),
+                "fontes": "|".join(f"{r['fonte']}:{r['id']}" for r in regs),
+            })
+        return saida
+
+    def resumo(self) -> Dict[str, int]:
+        n = len(self.registros)
+        return {
+            "registros": n,
+            "entidades": len({self._raiz(i) for i in range(n)}),
+            "blocos": len(self._blocos),
+            "comparacoes": self.comparacoes,
+            "pares_sem_blocagem": n * (n - 1) // 2,
+        }
+
+
+def registros_camadas(fontes: Optional[Dict[str, Tuple[Path, str, str, str]]] = None) -> List[Dict[str, Any]]:
+    """Registros dos CSVs geocodificados de `joao/hacka` (feiras, hortas, cozinhas) que existirem."""
+    saida = []
+    for fonte, (path, cnae, grupo, discriminante) in (fontes or FONTES_CAMADAS).items():
+        if not path.exists():
+            continue
+        with path.open(encoding="utf-8", newline="") as fp:
+            for n, row in enumerate(csv.DictReader(fp)):
+                saida.append(registro(
+                    fonte, row.get("id") or n, row.get("bairro"), cnae, grupo,
+                    nome=row.get("nome"), endereco=row.get("endereco"),
+                    lat=row.get("lat"), lon=row.get("lon"), precisao=row.get("geocode_precision"),
+                    discriminante=row.get(discriminante) if discriminante else "",
+                ))
+    return saida
+
+
+def registros_tabela(fonte: str, linhas: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Registros de uma lista de linhas com bairro/classificacao_grupo/classificacao_cnae (ex.: informais)."""
+    return [
+        registro(
+            fonte, n, r.get("bairro"), r.get("classificacao_cnae"), r.get("classificacao_grupo"),
+            nome=r.get("nome"), endereco=r.get("endereco"), lat=r.get("lat"), lon=r.get("lon"),
+            precisao=r.get("geocode_precision"),
+        )
+        for n, r in enumerate(linhas)
+    ]
@@ -0,0 +1,184 @@
+"""
+Serviço de matriz de distâncias (haversine, km).
+
+- `CacheDistancias`: LRU limitado de distâncias por par de coordenadas
+  arredondadas (`CASAS_CHAVE` casas decimais, ~1 m), mais um LRU pequeno de
+  matrizes inteiras. Pedidos repetidos de `/rotas-candidatas` saem direto da
+  matriz guardada; quase repetidos (outro conjunto dos mesmos pontos) montam a
+  matriz dos pares guardados, e só os pares que faltam são calculados, de uma
+  vez, vetorizados com NumPy.
+- `MATRIZ_BAIRROS`: matriz densa centróide x centróide de todos os bairros,
+  montada na carga a partir dos polígonos (com dados compartilhados, uma vez
+  no carregador; os workers leem a matriz direto do segmento).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from indice_espacial import RAIO_TERRA_KM
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from metricas import registrar_acessos_cache, registrar_tamanho_cache
+
+logger = logging.getLogger("rajai")
+
+CASAS_CHAVE = int(os.getenv("RAJAI_DISTANCIAS_CASAS", "5"))
+CAPACIDADE_PADRAO = int(os.getenv("RAJAI_DISTANCIAS_CAPACIDADE", "200000"))
+CAPACIDADE_MATRIZES = 256
+MAX_ELEMENTOS_MATRIZ = 250_000  # matrizes maiores não entram no LRU de matrizes
+
+Coordenada = Tuple[float, float]  # (lat, lon)
+
+
+def haversine_vetorizado(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Haversine elemento a elemento (com broadcasting), em km."""
+    p1 = np.radians(lat1)
+    p2 = np.radians(lat2)
+    dlat = p2 - p1
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _arredondar(c: Coordenada) -> Coordenada:
+    return (round(c[0], CASAS_CHAVE), round(c[1], CASAS_CHAVE))
+
+
+def _chave(ka: Coordenada, kb: Coordenada) -> Tuple[Coordenada, Coordenada]:
+    return (ka, kb) if ka <= kb else (kb, ka)  # distância é simétrica
+
+
+class CacheDistancias:
+    """LRU de distâncias por par de coordenadas arredondadas, com limite de entradas."""
+
+    def __init__(self, capacidade: int = CAPACIDADE_PADRAO, capacidade_matrizes: int = CAPACIDADE_MATRIZES):
+        self.capacidade = capacidade
+        self.capacidade_matrizes = capacidade_matrizes
+        self._dados: "OrderedDict[Tuple[Coordenada, Coordenada], float]" = OrderedDict()
+        self._matrizes: "OrderedDict[Tuple[Tuple[Coordenada, ...], Tuple[Coordenada, ...]], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._matrizes.clear()
+
+    def matriz(self, origens: Sequence[Coordenada], destinos: Sequence[Coordenada]) -> np.ndarray:
+        """Matriz len(origens) x len(destinos) de distâncias em km (não alterar o array devolvido)."""
+        ko = tuple(_arredondar(o) for o in origens)
+        kd = tuple(_arredondar(d) for d in destinos)
+        chave_matriz = (ko, kd)
+        with self._lock:
+            pronta = self._matrizes.get(chave_matriz)
+            if pronta is not None:
+                self._matrizes.move_to_end(chave_matriz)
+        if pronta is not None:
+            registrar_acessos_cache("distancias", pronta.size, 0)
+            return pronta
+
+        out = np.empty((len(origens), len(destinos)), dtype=float)
+        faltando: Dict[Tuple[Coordenada, Coordenada], List[Tuple[int, int]]] = {}
+        pares: List[Tuple[Coordenada, Coordenada]] = []
+        with self._lock:
+            for i, o in enumerate(origens):
+                for j, d in enumerate(destinos):
+                    k = _chave(ko[i], kd[j])
+                    valor = self._dados.get(k)
+                    if valor is not None:
+                        self._dados.move_to_end(k)
+                        out[i, j] = valor
+                        continue
+                    if k not in faltando:
+                        faltando[k] = []
+                        pares.append((o, d))
+                    faltando[k].append((i, j))
+        hits = out.size - sum(len(v) for v in faltando.values())
+        registrar_acessos_cache("distancias", hits, out.size - hits)
+        if not faltando:
+            self._guardar_matriz(chave_matriz, out)
+            return out
+
+        arr = np.asarray([(o[0], o[1], d[0], d[1]) for o, d in pares], dtype=float)
+        calculadas = haversine_vetorizado(arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3])
+        with self._lock:
+            for (k, posicoes), valor in zip(faltando.items(), calculadas.tolist()):
+                for i, j in posicoes:
+                    out[i, j] = valor
+                self._dados[k] = valor
+                self._dados.move_to_end(k)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+        self._guardar_matriz(chave_matriz, out)
+        return out
+
+    def _guardar_matriz(self, chave: Tuple[Tuple[Coordenada, ...], Tuple[Coordenada, ...]], matriz: np.ndarray) -> None:
+        if matriz.size > MAX_ELEMENTOS_MATRIZ:
+            return
+        matriz.setflags(write=False)
+        with self._lock:
+            self._matrizes[chave] = matriz
+            while len(self._matrizes) > self.capacidade_matrizes:
+                self._matrizes.popitem(last=False)
+
+
+CACHE = CacheDistancias()
+registrar_tamanho_cache("distancias", lambda: len(CACHE))
+
+
+def matriz_distancias(origens: Iterable[Coordenada], destinos: Iterable[Coordenada]) -> np.ndarray:
+    return CACHE.matriz(list(origens), list(destinos))
+
+
+# -----------------------------
+# Matriz densa entre centróides de bairros
+# -----------------------------
+BAIRROS_INDICE: Dict[str, int] = {}
+MATRIZ_BAIRROS: Optional[np.ndarray] = None
+
+
+def montar_matriz_bairros(centroides: Dict[str, Coordenada]) -> int:
+    """Monta a matriz n x n (float32) entre os centróides. Retorna n."""
+    global MATRIZ_BAIRROS
+    BAIRROS_INDICE.clear()
+    if not centroides:
+        MATRIZ_BAIRROS = None
+        return 0
+    nomes = sorted(centroides)
+    BAIRROS_INDICE.update({b: i for i, b in enumerate(nomes)})
+    lat = np.asarray([centroides[b][0] for b in nomes], dtype=float)
+    lon = np.asarray([centroides[b][1] for b in nomes], dtype=float)
+    MATRIZ_BAIRROS = haversine_vetorizado(lat[:, None], lon[:, None], lat[None, :], lon[None, :]).astype(np.float32)
+    logger.info("Matriz de distâncias entre bairros: %d x %d", len(nomes), len(nomes))
+    return len(nomes)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if MATRIZ_BAIRROS is not None:
+        construtor.objeto("distancias.bairros", list(BAIRROS_INDICE))
+        construtor.array("distancias.matriz", MATRIZ_BAIRROS)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    global MATRIZ_BAIRROS
+    BAIRROS_INDICE.clear()
+    MATRIZ_BAIRROS = None
+    if plano.tem_array("distancias.matriz"):
+        BAIRROS_INDICE.update({b: i for i, b in enumerate(plano.objeto("distancias.bairros"))})
+        MATRIZ_BAIRROS = plano.array("distancias.matriz")
+
+
+def distancias_entre_bairros(bairros: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """Submatriz para os bairros pedidos (normalizados) que têm centróide."""
+    if MATRIZ_BAIRROS is None:
+        return [], np.empty((0, 0), dtype=np.float32)
+    presentes = [b for b in bairros if b in BAIRROS_INDICE]
+    idx = [BAIRROS_INDICE[b] for b in presentes]
+    return presentes, MATRIZ_BAIRROS[np.ix_(idx, idx)]
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
-import math
 import os
 import re
 import unicodedata
 from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from colunar import (
+    FORMATO_QUERY,
+    esquema_da_fonte,
+    esquemas,
+    formatos_disponiveis,
+    registrar_fonte,
+    resposta_colunar,
+    validar_formato,
+)
+from distancias import distancias_entre_bairros
+from execucao import POOL
+from memoria_compartilhada import Construtor, PlanoCompartilhado, TabelaCompartilhada
+from rede_viaria import matriz_viagem, rede_carregada
+from roteirizacao import roteirizar
+from serializacao import resposta_json
 
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -23,7 +39,25 @@ DATA_CACHE: Dict[str, List[Dict[str, Any]]] = {}
 GEO_ROWS: List[Dict[str, Any]] = []
 GEO_INDEX: Dict[str, List[Dict[str, Any]]] = {}
 GEO_SUMMARY: Dict[str, Dict[str, Any]] = {}
+GEO_SUMMARY_RA: Dict[str, Dict[str, Any]] = {}
+GEO_SUMMARY_CIDADE: Dict[str, Dict[str, Any]] = {}
 GEO_CATALOG: Dict[str, List[str]] = {}
+# Com dados compartilhados (memoria_compartilhada.py), as linhas ficam no segmento
+# mapeado e GEO_ROWS/GEO_INDEX ficam vazios
+GEO_TABELA: Optional[TabelaCompartilhada] = None
+registrar_fonte("linhas", lambda: GEO_TABELA if GEO_TABELA is not None else GEO_ROWS)
+
+# Acima disso (produtores x destinos) o cálculo de rotas vai para o pool de processos
+PARES_INLINE_MAX = int(os.getenv("RAJAI_ROTAS_PARES_INLINE", "200"))  # só sem rede viária
+
+# Níveis geográficos da agregação hierárquica (bairro -> região administrativa -> cidade)
+CIDADE = "RIO DE JANEIRO"
+GEO_LEVELS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "bairro": GEO_SUMMARY,
+    "ra": GEO_SUMMARY_RA,
+    "cidade": GEO_SUMMARY_CIDADE,
+}
+GEO_JOIN_KEYS = {"bairro": "bairro", "ra": "regiao_adm", "cidade": "cidade"}
 
 # Métricas suportadas no mapa
 GEO_METRICS = [
@@ -36,6 +70,10 @@ GEO_METRICS = [
     "densidade_in_natura_10k",
     "densidade_misto_10k",
     "densidade_ultraprocessado_10k",
+    "densidade_total_km2",
+    "densidade_in_natura_km2",
+    "densidade_misto_km2",
+    "densidade_ultraprocessado_km2",
     "percentil_densidade_total",
     "percentil_densidade_in_natura",
     "percentil_densidade_misto",
@@ -68,36 +106,188 @@ def set_data_cache(cache: Dict[str, List[Dict[str, Any]]]) -> None:
     DATA_CACHE.update(cache)
 
 
-def set_geo_cache(rows: List[Dict[str, Any]]) -> None:
+def total_linhas_geo() -> int:
+    return len(GEO_TABELA) if GEO_TABELA is not None else len(GEO_ROWS)
+
+
+# -----------------------------
+# Dados compartilhados entre workers
+# -----------------------------
+def conteudo_compartilhado(construtor: Construtor, rows: List[Dict[str, Any]]) -> None:
     """
-    Recebe linhas de dados.csv (bairro, classificacao_grupo, classificacao_cnae, quantidade).
-    Cria cache, índice por bairro normalizado e sumários para choropleth/tooltip.
+    Adiciona ao segmento o que set_geo_cache/set_data_cache montaram: as linhas
+    limpas (tabela "geo"), as linhas brutas (tabela "dados") com os subconjuntos
+    do DATA_CACHE como índices, e os sumários (pequenos, um por bairro/RA), já
+    com as métricas que a carga acrescenta (intervalos, acessibilidade).
     """
+    construtor.tabela("geo", GEO_ROWS, inteiras=("quantidade",))
+    construtor.tabela("dados", rows)
+    posicao = {id(r): i for i, r in enumerate(rows)}
+    for cache_key, subset in DATA_CACHE.items():
+        construtor.subconjunto(cache_key, "dados", [posicao[id(r)] for r in subset])
+    construtor.objeto(
+        "geo.sumarios",
+        {
+            "bairro": GEO_SUMMARY,
+            "ra": GEO_SUMMARY_RA,
+            "cidade": GEO_SUMMARY_CIDADE,
+            "catalogo": GEO_CATALOG,
+            "metricas": GEO_METRICS,
+        },
+    )
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    """Troca os caches pelas visões do segmento (atualizando os dicts no lugar, que outros módulos importam)."""
+    global GEO_TABELA
+    sumarios = plano.objeto("geo.sumarios")
     GEO_ROWS.clear()
     GEO_INDEX.clear()
-    GEO_SUMMARY.clear()
+    GEO_TABELA = plano.tabela("geo")
+    for nivel, alvo in GEO_LEVELS.items():
+        alvo.clear()
+        alvo.update(sumarios[nivel])
+    GEO_METRICS[:] = sumarios["metricas"]
+    GEO_CATALOG.clear()
+    GEO_CATALOG.update(sumarios["catalogo"])
+    GEO_CATALOG["metrics"] = GEO_METRICS  # mesma lista que acessibilidade.py estende
+    DATA_CACHE.clear()
+    DATA_CACHE.update({nome: plano.subconjunto(nome) for nome in plano.subconjuntos()})
+
+
+def _float_ou_none(value: Any) -> Optional[float]:
+    """Conversão direta (ponto decimal), para colunas numéricas do Censo como Shape_Area."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _calcular_totais(group_totals: Dict[str, int], pop_total: Optional[float], area_km2: Optional[float]) -> Dict[str, Any]:
+    """Totais, razão e densidades (por 10k habitantes e por km²) a partir das somas por grupo."""
+    total = sum(group_totals.values())
+    total_in_natura = group_totals.get("In natura", 0)
+    total_misto = group_totals.get("Misto", 0)
+    total_ultra = group_totals.get("Ultraprocessado", 0)
+    ratio_ultra = (total_ultra / total) if total else 0
+
+    def por_10k(x: int) -> float:
+        return (x * 10000 / pop_total) if pop_total else 0
+
+    def por_km2(x: int) -> float:
+        return (x / area_km2) if area_km2 else 0
+
+    return {
+        "total": total,
+        "total_in_natura": total_in_natura,
+        "total_misto": total_misto,
+        "total_ultraprocessado": total_ultra,
+        "ratio_ultra_sobre_total": ratio_ultra,
+        "densidade_total_10k": por_10k(total),
+        "densidade_in_natura_10k": por_10k(total_in_natura),
+        "densidade_misto_10k": por_10k(total_misto),
+        "densidade_ultraprocessado_10k": por_10k(total_ultra),
+        "densidade_total_km2": por_km2(total),
+        "densidade_in_natura_km2": por_km2(total_in_natura),
+        "densidade_misto_km2": por_km2(total_misto),
+        "densidade_ultraprocessado_km2": por_km2(total_ultra),
+    }
+
+
+METRICS_TO_RANK = [
+    ("densidade_total_10k", "percentil_densidade_total"),
+    ("densidade_in_natura_10k", "percentil_densidade_in_natura"),
+    ("densidade_misto_10k", "percentil_densidade_misto"),
+    ("densidade_ultraprocessado_10k", "percentil_densidade_ultraprocessado"),
+]
+
+
+def _aplicar_percentis(summaries: List[Dict[str, Any]]) -> None:
+    """Ranking relativo (0-100) de cada densidade dentro do mesmo nível geográfico."""
+    total_itens = len(summaries)
+    if not total_itens:
+        return
+    ordenados = list(summaries)
+    for metric_source, metric_target in METRICS_TO_RANK:
+        # Ordena por densidade
+        ordenados.sort(key=lambda x: x["totais"].get(metric_source, 0))
+        # Aplica o rank
+        for i, item in enumerate(ordenados):
+            percentil = ((i + 1) / total_itens) * 100
+            item["totais"][metric_target] = round(percentil, 2)
+
+
+def set_geo_cache(rows: List[Dict[str, Any]], censo_rows: Optional[List[Dict[str, Any]]] = None) -> None:
+    """
+    Recebe linhas de dados.csv (bairro, classificacao_grupo, classificacao_cnae, quantidade)
+    e, opcionalmente, as linhas do Censo_2022.csv (nome, regiao_adm, codra, Shape_Area, população).
+    Cria cache, índice por bairro normalizado e sumários para choropleth/tooltip nos três
+    níveis geográficos (bairro -> região administrativa -> cidade), numa única passada.
+    """
+    global GEO_TABELA
+    geo = montar_geo(rows, censo_rows)
+    GEO_TABELA = None
+    GEO_ROWS[:] = geo["rows"]
+    GEO_INDEX.clear()
+    GEO_INDEX.update(geo["index"])
+    for nivel, alvo in GEO_LEVELS.items():
+        alvo.clear()
+        alvo.update(geo[nivel])
+    GEO_CATALOG.clear()
+    GEO_CATALOG.update(geo["catalogo"])
+
+
+def limpar_linha_geo(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha de dados.csv -> linha limpa (bairro normalizado, quantidade inteira)."""
+    bairro_raw = str(row.get("bairro", "")).strip()
+    q = _try_parse_number(row.get("quantidade"))
+    return {
+        "bairro_raw": bairro_raw,
+        "bairro": normalize_bairro(bairro_raw),
+        "classificacao_grupo": str(row.get("classificacao_grupo", "")).strip(),
+        "classificacao_cnae": str(row.get("classificacao_cnae", "")).strip(),
+        "quantidade": int(q) if q is not None else 0,
+    }
+
+
+def montar_geo(rows: List[Dict[str, Any]], censo_rows: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Monta, sem tocar nos caches globais, as linhas limpas, o índice por bairro, os
+    sumários dos três níveis ("bairro", "ra", "cidade") e o catálogo.
+    Também usado para versões anteriores dos dados (`versoes.py`).
+    """
+    geo_rows: List[Dict[str, Any]] = []
+    geo_index: Dict[str, List[Dict[str, Any]]] = {}
+    summary: Dict[str, Dict[str, Any]] = {}
+    summary_ra: Dict[str, Dict[str, Any]] = {}
+    summary_cidade: Dict[str, Dict[str, Any]] = {}
 
     groups_set = set()
     cnaes_set = set()
     pop_map: Dict[str, int] = {}
 
-    for row in rows:
-        bairro_raw = str(row.get("bairro", "")).strip()
-        bairro_norm = normalize_bairro(bairro_raw)
-        grupo = str(row.get("classificacao_grupo", "")).strip()
-        cnae = str(row.get("classificacao_cnae", "")).strip()
-        q = _try_parse_number(row.get("quantidade"))
-        quantidade = int(q) if q is not None else 0
-
-        cleaned = {
-            "bairro_raw": bairro_raw,
-            "bairro": bairro_norm,
-            "classificacao_grupo": grupo,
-            "classificacao_cnae": cnae,
-            "quantidade": quantidade,
+    # Censo: bairro -> população, área e região administrativa
+    censo_map: Dict[str, Dict[str, Any]] = {}
+    for c in censo_rows or []:
+        nome = str(c.get("nome", "")).strip()
+        if not nome:
+            continue
+        shape_area = _float_ou_none(c.get("Shape_Area"))
+        censo_map[normalize_bairro(nome)] = {
+            "nome": nome,
+            "populacao": int(_float_ou_none(c.get("Total_de_pessoas_2022")) or 0),
+            "area_km2": (shape_area / 1_000_000) if shape_area else None,
+            "regiao_adm": normalize_bairro(str(c.get("regiao_adm", ""))),
+            "codra": str(c.get("codra", "")).strip(),
         }
-        GEO_ROWS.append(cleaned)
-        GEO_INDEX.setdefault(bairro_norm, []).append(cleaned)
+
+    for row in rows:
+        cleaned = limpar_linha_geo(row)
+        bairro_norm = cleaned["bairro"]
+        grupo = cleaned["classificacao_grupo"]
+        cnae = cleaned["classificacao_cnae"]
+        geo_rows.append(cleaned)
+        geo_index.setdefault(bairro_norm, []).append(cleaned)
 
         # populações são redundantes no CSV; guarda a primeira encontrada
         pop_val = _try_parse_number(row.get("Total_de_pessoas_2022"))
@@ -109,10 +299,19 @@ def set_geo_cache(rows: List[Dict[str, Any]]) -> None:
         if cnae:
             cnaes_set.add(cnae)
 
+    # Acumuladores dos níveis superiores (preenchidos na mesma passada dos bairros)
+    ra_groups: Dict[str, Dict[str, int]] = {}
+    ra_breakdown: Dict[str, Dict[Tuple[str, str], int]] = {}
+    ra_bairros: Dict[str, List[str]] = {}
+    cidade_groups: Dict[str, int] = {}
+    cidade_breakdown: Dict[Tuple[str, str], int] = {}
+
     # Monta sumários por bairro
-    for bairro, items in GEO_INDEX.items():
+    for bairro, items in geo_index.items():
         group_totals: Dict[str, int] = {}
         breakdown: Dict[str, List[Dict[str, Any]]] = {}
+        censo = censo_map.get(bairro, {})
+        ra = censo.get("regiao_adm") or ""
 
         for item in items:
             g = item["classificacao_grupo"] or "Sem grupo"
@@ -121,62 +320,91 @@ def set_geo_cache(rows: List[Dict[str, Any]]) -> None:
             breakdown.setdefault(g, []).append(
                 {"classificacao_cnae": item["classificacao_cnae"], "quantidade": qty}
             )
-
-        total = sum(group_totals.values())
-        total_in_natura = group_totals.get("In natura", 0)
-        total_misto = group_totals.get("Misto", 0)
-        total_ultra = group_totals.get("Ultraprocessado", 0)
-        ratio_ultra = (total_ultra / total) if total else 0
-        pop_total = pop_map.get(bairro)
-        dens_total = (total * 10000 / pop_total) if pop_total else 0
-        dens_in_natura = (total_in_natura * 10000 / pop_total) if pop_total else 0
-        dens_misto = (total_misto * 10000 / pop_total) if pop_total else 0
-        dens_ultra = (total_ultra * 10000 / pop_total) if pop_total else 0
-
-        GEO_SUMMARY[bairro] = {
+            chave = (g, item["classificacao_cnae"])
+            cidade_breakdown[chave] = cidade_breakdown.get(chave, 0) + qty
+            if ra:
+                ra_b = ra_breakdown.setdefault(ra, {})
+                ra_b[chave] = ra_b.get(chave, 0) + qty
+
+        for g, qty in group_totals.items():
+            cidade_groups[g] = cidade_groups.get(g, 0) + qty
+            if ra:
+                ra_g = ra_groups.setdefault(ra, {})
+                ra_g[g] = ra_g.get(g, 0) + qty
+        if ra:
+            ra_bairros.setdefault(ra, []).append(bairro)
+
+        pop_total = pop_map.get(bairro) or censo.get("populacao")
+        summary[bairro] = {
             "bairro": bairro,
+            "regiao_adm": ra or None,
             "populacao_2022": pop_total or 0,
-            "totais": {
-                "total": total,
-                "total_in_natura": total_in_natura,
-                "total_misto": total_misto,
-                "total_ultraprocessado": total_ultra,
-                "ratio_ultra_sobre_total": ratio_ultra,
-                "densidade_total_10k": dens_total,
-                "densidade_in_natura_10k": dens_in_natura,
-                "densidade_misto_10k": dens_misto,
-                "densidade_ultraprocessado_10k": dens_ultra,
-            },
+            "area_km2": censo.get("area_km2"),
+            "totais": _calcular_totais(group_totals, pop_total, censo.get("area_km2")),
             "breakdown": breakdown,
         }
-        metrics_to_rank = [
-        ("densidade_total_10k", "percentil_densidade_total"),
-        ("densidade_in_natura_10k", "percentil_densidade_in_natura"),
-        ("densidade_misto_10k", "percentil_densidade_misto"),
-        ("densidade_ultraprocessado_10k", "percentil_densidade_ultraprocessado"),
-    ]
 
-    all_bairros = list(GEO_SUMMARY.values())
-    total_bairros = len(all_bairros)
-
-    if total_bairros > 0:
-        for metric_source, metric_target in metrics_to_rank:
-            # Ordena por densidade
-            all_bairros.sort(key=lambda x: x["totais"].get(metric_source, 0))
-            # Aplica o rank
-            for i, item in enumerate(all_bairros):
-                percentil = ((i + 1) / total_bairros) * 100
-                item["totais"][metric_target] = round(percentil, 2)
-                
-    GEO_CATALOG.clear()
-    GEO_CATALOG.update(
-        {
-            "groups": sorted(groups_set),
-            "cnaes": sorted(cnaes_set),
-            "metrics": GEO_METRICS,
-            "bairros": sorted(GEO_SUMMARY.keys()),
+    _aplicar_percentis(list(summary.values()))
+
+    # Regiões administrativas: população e área vêm de todos os bairros do Censo da RA
+    ra_pop: Dict[str, int] = {}
+    ra_area: Dict[str, float] = {}
+    ra_cod: Dict[str, str] = {}
+    for info in censo_map.values():
+        ra = info["regiao_adm"]
+        if not ra:
+            continue
+        ra_pop[ra] = ra_pop.get(ra, 0) + info["populacao"]
+        ra_area[ra] = ra_area.get(ra, 0.0) + (info["area_km2"] or 0.0)
+        ra_cod.setdefault(ra, info["codra"])
+
+    for ra in sorted(set(ra_pop) | set(ra_groups)):
+        summary_ra[ra] = {
+            "regiao_adm": ra,
+            "codra": ra_cod.get(ra),
+            "bairros": sorted(ra_bairros.get(ra, [])),
+            "populacao_2022": ra_pop.get(ra, 0),
+            "area_km2": ra_area.get(ra),
+            "totais": _calcular_totais(ra_groups.get(ra, {}), ra_pop.get(ra), ra_area.get(ra)),
+            "breakdown": _breakdown_de(ra_breakdown.get(ra, {})),
         }
-    )
+    _aplicar_percentis(list(summary_ra.values()))
+
+    pop_cidade = sum(ra_pop.values()) or sum(pop_map.values())
+    area_cidade = sum(ra_area.values()) or None
+    summary_cidade[CIDADE] = {
+        "cidade": CIDADE,
+        "regioes_adm": sorted(summary_ra.keys()),
+        "populacao_2022": pop_cidade,
+        "area_km2": area_cidade,
+        "totais": _calcular_totais(cidade_groups, pop_cidade, area_cidade),
+        "breakdown": _breakdown_de(cidade_breakdown),
+    }
+    _aplicar_percentis(list(summary_cidade.values()))
+
+    catalogo = {
+        "groups": sorted(groups_set),
+        "cnaes": sorted(cnaes_set),
+        "metrics": GEO_METRICS,
+        "geo_levels": list(GEO_LEVELS.keys()),
+        "bairros": sorted(summary.keys()),
+        "regioes_adm": sorted(summary_ra.keys()),
+    }
+    return {
+        "rows": geo_rows,
+        "index": geo_index,
+        "bairro": summary,
+        "ra": summary_ra,
+        "cidade": summary_cidade,
+        "catalogo": catalogo,
+    }
+
+
+def _breakdown_de(acumulado: Dict[Tuple[str, str], int]) -> Dict[str, List[Dict[str, Any]]]:
+    breakdown: Dict[str, List[Dict[str, Any]]] = {}
+    for (g, cnae), qty in sorted(acumulado.items()):
+        breakdown.setdefault(g, []).append({"classificacao_cnae": cnae, "quantidade": qty})
+    return breakdown
 
 
 # -----------------------------
@@ -239,6 +467,13 @@ def _get_dataset(slug: str) -> Dict[str, str]:
     return ds
 
 
+def _esquema_dataset(cache_key: str) -> List[Dict[str, str]]:
+    rows = DATA_CACHE.get(cache_key)
+    if rows is None or not len(rows):
+        return []
+    return [{"nome": c, "tipo": t} for c, t in esquema_da_fonte(cache_key, rows).items()]
+
+
 # -----------------------------
 # Helpers: filtro/search/paginação
 # -----------------------------
@@ -310,6 +545,8 @@ def _apply_filters(
     if limit:
         rows = rows[:limit]
 
+    if not isinstance(rows, list):  # TabelaCompartilhada sem filtro/paginação
+        rows = list(rows)
     return rows, total
 
 
@@ -337,22 +574,61 @@ def _validate_metric(metric: str) -> str:
     return metric
 
 
+def _validate_geo_level(geo_level: str) -> str:
+    level = (geo_level or "").strip().lower()
+    if level not in GEO_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Nível geográfico inválido: {geo_level}")
+    return level
+
+
+def _totais_e_percentuais(totais: Dict[str, Any]) -> Dict[str, Any]:
+    total = int(totais.get("total", 0) or 0)
+    total_in_natura = int(totais.get("total_in_natura", 0) or 0)
+    total_misto = int(totais.get("total_misto", 0) or 0)
+    total_ultra = int(totais.get("total_ultraprocessado", 0) or 0)
+
+    def pct(x: int, denom: int) -> float:
+        return (x / denom * 100) if denom else 0.0
+
+    return {
+        "totais": {
+            "total": total,
+            "total_in_natura": total_in_natura,
+            "total_misto": total_misto,
+            "total_ultraprocessado": total_ultra,
+        },
+        "percentuais": {
+            "in_natura": pct(total_in_natura, total),
+            "misto": pct(total_misto, total),
+            "ultraprocessado": pct(total_ultra, total),
+        },
+    }
+
+
 def _filter_geo_rows(
-    bairro: Optional[str] = None, grupo: Optional[str] = None, cnae: Optional[str] = None, q: Optional[str] = None
+    bairro: Optional[str] = None,
+    grupo: Optional[str] = None,
+    cnae: Optional[str] = None,
+    q: Optional[str] = None,
+    rows: Optional[List[Dict[str, Any]]] = None,
 ) -> List[Dict[str, Any]]:
-    results = GEO_ROWS
+    """Filtra `rows` (padrão: as linhas carregadas, em lista ou no segmento compartilhado)."""
+    if rows is None and GEO_TABELA is not None:
+        results = _filtrar_tabela_geo(GEO_TABELA, bairro, grupo, cnae)
+    else:
+        results = GEO_ROWS if rows is None else rows
 
-    if bairro:
-        bairro_norm = normalize_bairro(bairro)
-        results = [r for r in results if r["bairro"] == bairro_norm]
+        if bairro:
+            bairro_norm = normalize_bairro(bairro)
+            results = [r for r in results if r["bairro"] == bairro_norm]
 
-    if grupo:
-        g_low = grupo.lower().strip()
-        results = [r for r in results if r["classificacao_grupo"].lower() == g_low]
+        if grupo:
+            g_low = grupo.lower().strip()
+            results = [r for r in results if r["classificacao_grupo"].lower() == g_low]
 
-    if cnae:
-        c_low = cnae.lower().strip()
-        results = [r for r in results if r["classificacao_cnae"].lower() == c_low]
+        if cnae:
+            c_low = cnae.lower().strip()
+            results = [r for r in results if r["classificacao_cnae"].lower() == c_low]
 
     if q:
         results = [r for r in results if _row_matches_search(r, q)]
@@ -360,65 +636,75 @@ def _filter_geo_rows(
     return results
 
 
+def _filtrar_tabela_geo(
+    tabela: TabelaCompartilhada, bairro: Optional[str], grupo: Optional[str], cnae: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Mesmos filtros de _filter_geo_rows, avaliados uma vez por valor distinto; só as linhas aceitas são montadas."""
+    mascara = None
+    filtros = []
+    if bairro:
+        bairro_norm = normalize_bairro(bairro)
+        filtros.append(("bairro", lambda v: v == bairro_norm))
+    if grupo:
+        g_low = grupo.lower().strip()
+        filtros.append(("classificacao_grupo", lambda v: v.lower() == g_low))
+    if cnae:
+        c_low = cnae.lower().strip()
+        filtros.append(("classificacao_cnae", lambda v: v.lower() == c_low))
+    for coluna, predicado in filtros:
+        m = tabela.mascara(coluna, predicado)
+        mascara = m if mascara is None else mascara & m
+    return tabela.linhas(mascara)
+
+
 # -----------------------------
 # Helpers LOGÍSTICA
 # -----------------------------
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
-    p1 = math.radians(lat1)
-    p2 = math.radians(lat2)
-    dlat = p2 - p1
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return r * c
-
-
 def _greedy_routes(
     producers: List[Dict[str, Any]], destinos: List[Dict[str, Any]]
 ) -> Dict[str, Any]:
     """
-    Heurística simples: para cada destino, escolhe o produtor mais próximo (menor distância).
+    Heurística simples: para cada destino, escolhe o produtor mais próximo.
+    Com a rede viária compilada (`rede_viaria.py`), "mais próximo" é o menor tempo
+    de viagem pelas vias; sem ela, a menor distância haversine (matriz com cache).
     """
     routes = []
     total_distance = 0.0
+    total_duration = 0.0
     total_cost = 0.0
-
-    for destino in destinos:
-        if not producers:
-            continue
-        lat_d = float(destino.get("lat", 0))
-        lon_d = float(destino.get("lon", 0))
-        demand = float(destino.get("demand", 0))
-
-        best = None
-        best_dist = None
-        for prod in producers:
-            lat_p = float(prod.get("lat", 0))
-            lon_p = float(prod.get("lon", 0))
-            dist = _haversine_km(lat_p, lon_p, lat_d, lon_d)
-            if best_dist is None or dist < best_dist:
-                best_dist = dist
-                best = prod
-
-        if best is None or best_dist is None:
-            continue
-
-        cost = best_dist * demand
-        total_distance += best_dist
-        total_cost += cost
-        routes.append(
-            {
-                "produtor": best,
-                "destino": destino,
-                "distance_km": round(best_dist, 3),
-                "custo_estimado": round(cost, 3),
-            }
-        )
+    metodo = "haversine"
+
+    if producers and destinos:
+        coords_p = [(float(p.get("lat", 0)), float(p.get("lon", 0))) for p in producers]
+        coords_d = [(float(d.get("lat", 0)), float(d.get("lon", 0))) for d in destinos]
+        km, minutos, metodo = matriz_viagem(coords_d, coords_p)
+        criterio = km if metodo == "haversine" else minutos
+        melhores = criterio.argmin(axis=1)  # primeiro mínimo, como na busca linear
+
+        for j, destino in enumerate(destinos):
+            best = producers[int(melhores[j])]
+            best_dist = float(km[j, melhores[j]])
+            best_min = float(minutos[j, melhores[j]])
+            demand = float(destino.get("demand", 0))
+
+            cost = best_dist * demand
+            total_distance += best_dist
+            total_duration += best_min
+            total_cost += cost
+            routes.append(
+                {
+                    "produtor": best,
+                    "destino": destino,
+                    "distance_km": round(best_dist, 3),
+                    "duration_min": round(best_min, 1),
+                    "custo_estimado": round(cost, 3),
+                }
+            )
 
     return {
-        "meta": {"algorithm": "greedy_nearest"},
+        "meta": {"algorithm": "greedy_nearest", "distancia": metodo},
         "total_distance_km": round(total_distance, 3),
+        "total_duration_min": round(total_duration, 1),
         "total_custo_estimado": round(total_cost, 3),
         "routes": routes,
     }
@@ -450,67 +736,88 @@ def _maybe_ai_summary(routes_payload: Dict[str, Any]) -> Optional[str]:
 # -----------------------------
 # Endpoints GEO (choropleth + tooltip + linhas)
 # -----------------------------
+VERSION_QUERY = Query(default=None, description="Versão dos dados (ver /versoes); padrão: a atual")
+
+
+def _geo_versao(version: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Linhas e sumários de uma versão anterior dos dados, ou None para a atual."""
+    if not version:
+        return None
+    from versoes import geo_da_versao  # import tardio: versoes.py importa este módulo
+
+    return geo_da_versao(version)
+
+
 @geo_router.get("/catalogo")
-async def geo_catalogo():
+async def geo_catalogo(version: Optional[str] = VERSION_QUERY):
+    geo = _geo_versao(version)
+    if geo is not None:
+        return resposta_json(geo["catalogo"])
     if not GEO_CATALOG:
         raise HTTPException(status_code=404, detail="Catálogo de bairros não carregado")
-    return GEO_CATALOG
+    return resposta_json(GEO_CATALOG)
 
 
 @geo_router.get("/resumo")
-async def geo_resumo_geral():
+async def geo_resumo_geral(
+    geo_level: Optional[str] = Query(
+        default=None, description="Inclui os resumos por item do nível: bairro, ra ou cidade"
+    ),
+    version: Optional[str] = VERSION_QUERY,
+):
     """Resumo agregado de todos os bairros.
 
     Útil para cards/indicadores no frontend (ex.: percentuais por grupo).
+    Com `geo_level`, inclui também o resumo de cada bairro/RA já pré-agregado.
     """
-    if not GEO_SUMMARY:
+    niveis = _geo_versao(version) or GEO_LEVELS
+    cidade = niveis["cidade"].get(CIDADE)
+    if not niveis["bairro"] or not cidade:
         raise HTTPException(status_code=404, detail="Resumo de bairros não carregado")
 
-    total = 0
-    total_in_natura = 0
-    total_misto = 0
-    total_ultra = 0
-
-    # soma os totais já computados por bairro
-    for summary in GEO_SUMMARY.values():
-        t = summary.get("totais", {})
-        total += int(t.get("total", 0) or 0)
-        total_in_natura += int(t.get("total_in_natura", 0) or 0)
-        total_misto += int(t.get("total_misto", 0) or 0)
-        total_ultra += int(t.get("total_ultraprocessado", 0) or 0)
-
-    def pct(x: int, denom: int) -> float:
-        return (x / denom * 100) if denom else 0.0
-
-    return {
-        "meta": {"geo_level": "bairro"},
-        "totais": {
-            "total": total,
-            "total_in_natura": total_in_natura,
-            "total_misto": total_misto,
-            "total_ultraprocessado": total_ultra,
-        },
-        "percentuais": {
-            "in_natura": pct(total_in_natura, total),
-            "misto": pct(total_misto, total),
-            "ultraprocessado": pct(total_ultra, total),
-        },
+    resposta: Dict[str, Any] = {
+        "meta": {"geo_level": "bairro", "version": version},
+        **_totais_e_percentuais(cidade["totais"]),
     }
+    if geo_level:
+        level = _validate_geo_level(geo_level)
+        resposta["meta"]["geo_level"] = level
+        resposta["itens"] = {
+            key: {
+                "populacao_2022": summary.get("populacao_2022", 0),
+                "area_km2": summary.get("area_km2"),
+                **_totais_e_percentuais(summary["totais"]),
+            }
+            for key, summary in niveis[level].items()
+        }
+    return resposta_json(resposta)
 
 
 @geo_router.get("/choropleth")
 async def geo_choropleth(
     metric: str = Query(default="total_ultraprocessado", description="Métrica para pintar o mapa"),
+    geo_level: str = Query(default="bairro", description="Nível geográfico: bairro, ra ou cidade"),
+    version: Optional[str] = VERSION_QUERY,
+    with_ci: bool = Query(default=False, description="Inclui intervalo de confiança (bootstrap) e estabilidade do percentil"),
 ):
     metric = _validate_metric(metric)
+    level = _validate_geo_level(geo_level)
+    join_key = GEO_JOIN_KEYS[level]
+    niveis = _geo_versao(version) or GEO_LEVELS
     data = [
         {
-            "bairro": summary["bairro"],
+            join_key: key,
             "value": summary["totais"].get(metric, 0),
         }
-        for summary in GEO_SUMMARY.values()
+        for key, summary in niveis[level].items()
     ]
-    return {"meta": {"geo_level": "bairro", "geo_join_key": "bairro", "metric": metric}, "data": data}
+    if with_ci:
+        for item, summary in zip(data, niveis[level].values()):
+            item["ci"] = summary.get("intervalos", {}).get(metric)
+            if metric.startswith("percentil_"):
+                item["estabilidade"] = summary.get("estabilidade", {}).get(metric)
+    meta = {"geo_level": level, "geo_join_key": join_key, "metric": metric, "version": version}
+    return resposta_json({"meta": meta, "data": data})
 
 
 @geo_router.get("/linhas")
@@ -521,36 +828,69 @@ async def geo_linhas(
     q: Optional[str] = Query(default=None, description="Busca textual"),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=0, ge=0, description="0 = sem limite"),
+    version: Optional[str] = VERSION_QUERY,
+    formato: str = FORMATO_QUERY,
 ):
-    rows = _filter_geo_rows(bairro=bairro, grupo=grupo, cnae=cnae, q=q)
+    formato = validar_formato(formato)
+    geo = _geo_versao(version)
+    if formato != "json":
+        # esquema (e, sem filtros, a própria tabela) da fonte inteira: colunas do segmento ou linhas carregadas
+        fonte = geo["rows"] if geo else (GEO_TABELA if GEO_TABELA is not None else GEO_ROWS)
+        chave = f"linhas@{version}" if version else "linhas"
+        esquema = esquema_da_fonte(chave, fonte)
+        if not any((bairro, grupo, cnae, q, offset, limit)):
+            return resposta_colunar(fonte, formato, "linhas", esquema, chave=chave)
+    rows = _filter_geo_rows(bairro=bairro, grupo=grupo, cnae=cnae, q=q, rows=geo["rows"] if geo else None)
     total = len(rows)
     if offset:
         rows = rows[offset:]
     if limit:
         rows = rows[:limit]
-    return {
+    if formato != "json":
+        return resposta_colunar(rows, formato, "linhas", esquema)
+    return resposta_json({
         "meta": {
             "total_rows": total,
             "returned_rows": len(rows),
             "offset": offset,
             "limit": limit,
             "filters": {"bairro": bairro, "grupo": grupo, "cnae": cnae, "q": q},
+            "version": version,
         },
         "data": rows,
-    }
+    })
 
 
 @geo_router.get("/{bairro}/tooltip")
-async def geo_tooltip(bairro: str):
+async def geo_tooltip(
+    bairro: str,
+    geo_level: str = Query(default="bairro", description="Nível geográfico do nome informado: bairro, ra ou cidade"),
+    version: Optional[str] = VERSION_QUERY,
+):
+    level = _validate_geo_level(geo_level)
     key = normalize_bairro(bairro)
-    summary = GEO_SUMMARY.get(key)
+    summary = (_geo_versao(version) or GEO_LEVELS)[level].get(key)
     if not summary:
         raise HTTPException(status_code=404, detail="Bairro não encontrado")
-    return {
-        "meta": {"bairro": key, "populacao_2022": summary.get("populacao_2022", 0)},
+    meta: Dict[str, Any] = {
+        "geo_level": level,
+        "version": version,
+        "bairro": key,
+        "populacao_2022": summary.get("populacao_2022", 0),
+        "area_km2": summary.get("area_km2"),
+    }
+    if level == "bairro":
+        meta["regiao_adm"] = summary.get("regiao_adm")
+    elif level == "ra":
+        meta["regiao_adm"] = key
+        meta["bairros"] = summary.get("bairros", [])
+    return resposta_json({
+        "meta": meta,
         "totais": summary["totais"],
+        "intervalos": summary.get("intervalos"),
+        "estabilidade": summary.get("estabilidade"),
         "breakdown": summary["breakdown"],
-    }
+    })
 
 
 # -----------------------------
@@ -574,28 +914,61 @@ async def logistica_demo():
 
 
 @logistica_router.post("/rotas-candidatas")
-async def logistica_rotas(payload: Dict[str, Any]):
+async def logistica_rotas(payload: Dict[str, Any], request: Request):
+    """
+    Padrão: um trecho produtor -> destino por destino (produtor mais próximo).
+    `modo: "vrp"`: rotas com várias paradas por veículo, com capacidade e janelas
+    de horário (ver `roteirizacao.py`).
+
+    Com a rede viária (buscas na hierarquia) ou acima de `PARES_INLINE_MAX` pares,
+    o pedido roda no pool de processos (`execucao.py`): o event loop continua livre
+    para o tráfego do mapa; fila cheia devolve 429. Inline só a haversine pequena.
+    """
     producers = payload.get("producers") or []
     destinos = payload.get("destinos") or []
     if not isinstance(producers, list) or not isinstance(destinos, list):
         raise HTTPException(status_code=400, detail="producers e destinos devem ser listas")
 
-    result = _greedy_routes(producers, destinos)
-    ai_resumo = _maybe_ai_summary(result)
+    if str(payload.get("modo") or "").lower() == "vrp":
+        result = await roteirizar(payload, request)
+    elif rede_carregada() or len(producers) * len(destinos) > PARES_INLINE_MAX:
+        result = await POOL.executar("rotas", _greedy_routes, producers, destinos, request=request)
+    else:
+        result = _greedy_routes(producers, destinos)
+    ai_resumo = await run_in_threadpool(_maybe_ai_summary, result)
     if ai_resumo:
         result["ai_resumo"] = ai_resumo
     return result
 
 
+@logistica_router.get("/distancias/bairros")
+async def logistica_distancias_bairros(
+    bairros: str = Query(..., description="Bairros separados por vírgula"),
+):
+    """Submatriz (km) da matriz pré-calculada entre centróides de bairros."""
+    pedidos = [normalize_bairro(b) for b in bairros.split(",") if b.strip()]
+    presentes, matriz = distancias_entre_bairros(pedidos)
+    if not presentes:
+        raise HTTPException(status_code=404, detail="Nenhum bairro com centróide encontrado")
+    return resposta_json(
+        {
+            "bairros": presentes,
+            "nao_encontrados": [b for b in pedidos if b not in presentes],
+            "distancias_km": [[round(float(v), 3) for v in linha] for linha in matriz],
+        }
+    )
+
+
 # -----------------------------
 # Endpoints novos (semânticos)
 # -----------------------------
 @data_router.get("/catalogo")
 async def get_catalogo():
     """
-    Lista os datasets disponíveis de forma entendível (slug + CNAE + label + perfil).
+    Lista os datasets disponíveis de forma entendível (slug + CNAE + label + perfil),
+    com o esquema tipado usado em `format=arrow|parquet`.
     """
-    return {
+    return resposta_json({
         "items": [
             {
                 "slug": slug,
@@ -603,10 +976,17 @@ async def get_catalogo():
                 "label": ds["label"],
                 "perfil_alimentar": ds["perfil_alimentar"],
                 "endpoint": f"/api/v1/dados/{slug}",
+                "schema": _esquema_dataset(ds["cache_key"]),
             }
             for slug, ds in DATASETS.items()
-        ]
-    }
+        ],
+        "exportacao": {
+            "formatos": formatos_disponiveis(),
+            "parametro": "format",
+            "strings": "dictionary<int32, string>",
+            "esquemas": esquemas(),
+        },
+    })
 
 
 @data_router.get("/{slug}")
@@ -615,17 +995,26 @@ async def get_dataset_data(
     q: Optional[str] = Query(default=None, description="Busca textual em qualquer coluna"),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=0, ge=0, description="0 = sem limite"),
+    formato: str = FORMATO_QUERY,
 ):
     """
     Retorna os dados do CSV associado ao 'slug', com paginação e busca.
     """
+    formato = validar_formato(formato)
     ds = _get_dataset(slug)
     raw = _get_table_by_cache_key(ds["cache_key"])
 
+    if formato != "json":
+        esquema = esquema_da_fonte(ds["cache_key"], raw)
+        if not (q or offset or limit):
+            return resposta_colunar(raw, formato, slug, esquema, chave=ds["cache_key"])
+        page, _ = _apply_filters(raw, q=q, offset=offset, limit=limit)
+        return resposta_colunar(page, formato, slug, esquema)
+
     # aplica filtros
     page, total = _apply_filters(raw, q=q, offset=offset, limit=limit)
 
-    return {
+    return resposta_json({
         "meta": {
             "slug": slug,
             "cnae": ds["cnae"],
@@ -637,7 +1026,7 @@ async def get_dataset_data(
             "limit": limit,
         },
         "data": page,
-    }
+    })
 
 
 @data_router.get("/{slug}/resumo")
@@ -649,7 +1038,7 @@ async def get_dataset_summary(slug: str):
     raw = _get_table_by_cache_key(ds["cache_key"])
     resumo = _summarize_numeric(raw)
 
-    return {
+    return resposta_json({
         "meta": {
             "slug": slug,
             "cnae": ds["cnae"],
@@ -657,7 +1046,7 @@ async def get_dataset_summary(slug: str):
             "perfil_alimentar": ds["perfil_alimentar"],
         },
         "sum": resumo,
-    }
+    })
 
 
 # -----------------------------
@@ -665,29 +1054,29 @@ async def get_dataset_summary(slug: str):
 # -----------------------------
 @data_router.get("/tabela_1")
 async def get_tabela_1():
-    return _get_table_by_cache_key("tabela_1")
+    return resposta_json(list(_get_table_by_cache_key("tabela_1")))
 
 
 @data_router.get("/tabela_2")
 async def get_tabela_2():
-    return _get_table_by_cache_key("tabela_2")
+    return resposta_json(list(_get_table_by_cache_key("tabela_2")))
 
 
 @data_router.get("/tabela_3")
 async def get_tabela_3():
-    return _get_table_by_cache_key("tabela_3")
+    return resposta_json(list(_get_table_by_cache_key("tabela_3")))
 
 
 @data_router.get("/tabela_4")
 async def get_tabela_4():
-    return _get_table_by_cache_key("tabela_4")
+    return resposta_json(list(_get_table_by_cache_key("tabela_4")))
 
 
 @data_router.get("/tabela_5")
 async def get_tabela_5():
-    return _get_table_by_cache_key("tabela_5")
+    return resposta_json(list(_get_table_by_cache_key("tabela_5")))
 
 
 @data_router.get("/tabela_6")
 async def get_tabela_6():
-    return _get_table_by_cache_key("tabela_6")
+    return resposta_json(list(_get_table_by_cache_key("tabela_6")))
@@ -0,0 +1,337 @@
+"""
+Execução de tarefas pesadas (CPU) fora do event loop, num pool limitado de processos.
+
+`POOL.executar(tarefa, fn, *args, timeout_s=..., request=...)`:
+
+- `fn` roda num dos `MAX_WORKERS` processos do pool (precisa ser uma função de
+  módulo, serializável por pickle, assim como os argumentos e o resultado);
+- no máximo `MAX_WORKERS + FILA_MAXIMA` tarefas ficam em execução ou na fila;
+  acima disso a resposta é 429 com `Retry-After` (o pedido nem entra);
+- o prazo (`timeout_s`) conta a espera na fila e a execução; estourado, o
+  processo é encerrado, substituído, e a resposta é 504;
+- se o cliente desconectar (ou a requisição for cancelada), a tarefa sai da
+  fila ou tem o processo encerrado;
+- espera na fila, tempo de execução e desfecho de cada tarefa vão para
+  `/metrics`;
+- `fn` pode chamar `informar_progresso(dados)` durante a execução: cada aviso
+  chega à API pelo mesmo pipe e é repassado ao callback `progresso` (fora do
+  pool, a chamada não faz nada).
+
+Os processos são próprios (não `ProcessPoolExecutor`) justamente para poder
+encerrar uma tarefa em andamento. A espera pelo resultado roda numa thread
+dedicada por tarefa, então o event loop só acorda para checar desconexão.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from metricas import observar_execucao, registrar_estado_pool
+
+logger = logging.getLogger("rajai")
+
+MAX_WORKERS = int(os.getenv("RAJAI_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+FILA_MAXIMA = int(os.getenv("RAJAI_POOL_FILA", "8"))
+TIMEOUT_PADRAO_S = float(os.getenv("RAJAI_POOL_TIMEOUT_S", "30"))
+# "spawn" evita herdar locks de threads da API; "fork" sobe mais rápido
+METODO_INICIO = os.getenv("RAJAI_POOL_INICIO", "spawn")
+INTERVALO_S = 0.1  # checagem de prazo/cancelamento/desconexão
+RETRY_AFTER_S = 5
+
+
+# pipe do processo atual com a API (só definido dentro dos processos do pool)
+_CONEXAO: Any = None
+
+
+def informar_progresso(dados: Any) -> None:
+    """Envia um aviso de progresso da tarefa em execução (serializável por pickle)."""
+    if _CONEXAO is not None:
+        _CONEXAO.send(("progresso", dados))
+
+
+class TarefaCancelada(Exception):
+    pass
+
+
+class TempoEsgotado(Exception):
+    pass
+
+
+def _laco_worker(conn: Any) -> None:
+    """Loop do processo: recebe (fn, args, kwargs), devolve ("ok", valor) ou ("erro", exceção)."""
+    global _CONEXAO
+    _CONEXAO = conn
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        fn, args, kwargs = msg
+        try:
+            resposta = ("ok", fn(*args, **kwargs))
+        except Exception as exc:
+            resposta = ("erro", exc)
+        try:
+            conn.send(resposta)
+        except Exception as exc:  # resultado/exceção não serializável
+            conn.send(("erro", RuntimeError(f"{type(exc).__name__}: {exc}")))
+
+
+def _descartar_resultado(fut: "asyncio.Future[Any]") -> None:
+    if not fut.cancelled():
+        fut.exception()
+
+
+class _Worker:
+    def __init__(self, ctx: Any):
+        self.conn, filho = ctx.Pipe()
+        self.processo = ctx.Process(target=_laco_worker, args=(filho,), name="rajai-pool", daemon=True)
+        self.processo.start()
+        filho.close()
+
+    def encerrar(self, forcar: bool = False) -> None:
+        try:
+            if forcar:
+                self.processo.terminate()
+            else:
+                self.conn.send(None)
+            self.processo.join(timeout=2)
+            if self.processo.is_alive():
+                self.processo.kill()
+        except Exception:
+            pass
+        finally:
+            self.conn.close()
+
+
+class PoolProcessos:
+    def __init__(self, workers: int = MAX_WORKERS, fila_maxima: int = FILA_MAXIMA, metodo_inicio: str = METODO_INICIO):
+        self.workers = max(1, workers)
+        self.fila_maxima = max(0, fila_maxima)
+        self._ctx = multiprocessing.get_context(metodo_inicio)
+        self._lock = threading.Lock()
+        self._livres: "queue.Queue[_Worker]" = queue.Queue()
+        self._todos: Dict[int, _Worker] = {}
+        self._criados = 0
+        self._reservas = 0  # em execução + na fila
+        self._executando = 0
+        self._threads: Optional[ThreadPoolExecutor] = None
+
+    # --- estado ---
+    @property
+    def executando(self) -> int:
+        return self._executando
+
+    @property
+    def na_fila(self) -> int:
+        return self._reservas - self._executando
+
+    def estado(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "processos": self._criados,
+            "executando": self._executando,
+            "fila": self.na_fila,
+            "fila_maxima": self.fila_maxima,
+        }
+
+    # --- reservas (backpressure) ---
+    def _reservar(self) -> bool:
+        with self._lock:
+            if self._reservas >= self.workers + self.fila_maxima:
+                return False
+            self._reservas += 1
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(
+                    max_workers=self.workers + self.fila_maxima, thread_name_prefix="rajai-pool"
+                )
+            return True
+
+    def _liberar(self) -> None:
+        with self._lock:
+            self._reservas -= 1
+
+    # --- processos ---
+    def _criar(self) -> _Worker:
+        w = _Worker(self._ctx)
+        with self._lock:
+            self._todos[id(w)] = w
+        return w
+
+    def _descartar(self, w: _Worker) -> None:
+        with self._lock:
+            self._todos.pop(id(w), None)
+            self._criados -= 1
+        w.encerrar(forcar=True)
+
+    def _obter_worker(self, prazo: float, cancelar: threading.Event) -> _Worker:
+        with self._lock:
+            criar = self._livres.empty() and self._criados < self.workers
+            if criar:
+                self._criados += 1
+        if criar:
+            try:
+                return self._criar()
+            except Exception:
+                with self._lock:
+                    self._criados -= 1
+                raise
+        while True:
+            try:
+                return self._livres.get(timeout=INTERVALO_S)
+            except queue.Empty:
+                if cancelar.is_set():
+                    raise TarefaCancelada()
+                if time.monotonic() > prazo:
+                    raise TempoEsgotado()
+
+    def aquecer(self) -> None:
+        """Sobe os processos antes do primeiro pedido (em segundo plano)."""
+
+        def subir() -> None:
+            while True:
+                with self._lock:
+                    if self._criados >= self.workers:
+                        return
+                    self._criados += 1
+                try:
+                    self._livres.put(self._criar())
+                except Exception:
+                    with self._lock:
+                        self._criados -= 1
+                    logger.exception("Falha ao iniciar processo do pool")
+                    return
+
+        threading.Thread(target=subir, name="rajai-pool-aquecer", daemon=True).start()
+
+    def _rodar(
+        self,
+        fn: Callable[..., Any],
+        args: tuple,
+        kwargs: dict,
+        prazo: float,
+        cancelar: threading.Event,
+        tempos: Dict[str, float],
+        progresso: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """Bloqueante (thread dedicada): espera um processo livre, envia a tarefa e aguarda."""
+        t0 = time.monotonic()
+        w = self._obter_worker(prazo, cancelar)
+        tempos["espera_s"] = time.monotonic() - t0
+        if cancelar.is_set() or time.monotonic() > prazo:
+            self._livres.put(w)
+            raise TarefaCancelada() if cancelar.is_set() else TempoEsgotado()
+
+        with self._lock:
+            self._executando += 1
+        t1 = time.monotonic()
+        try:
+            try:
+                w.conn.send((fn, args, kwargs))
+                while True:
+                    while not w.conn.poll(INTERVALO_S):
+                        if cancelar.is_set():
+                            self._descartar(w)
+                            raise TarefaCancelada()
+                        if time.monotonic() > prazo:
+                            self._descartar(w)
+                            raise TempoEsgotado()
+                        if not w.processo.is_alive():
+                            break
+                    status, valor = w.conn.recv()
+                    if status != "progresso":
+                        break
+                    if progresso is not None:
+                        progresso(valor)
+            except (EOFError, OSError, BrokenPipeError):
+                self._descartar(w)
+                raise RuntimeError("Processo do pool terminou inesperadamente")
+            self._livres.put(w)
+        finally:
+            tempos["execucao_s"] = time.monotonic() - t1
+            with self._lock:
+                self._executando -= 1
+        if status == "erro":
+            raise valor
+        return valor
+
+    async def executar(
+        self,
+        tarefa: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout_s: Optional[float] = None,
+        request: Optional[Request] = None,
+        progresso: Optional[Callable[[Any], None]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not self._reservar():
+            observar_execucao(tarefa, "rejeitada", 0.0, 0.0)
+            raise HTTPException(
+                status_code=429,
+                detail="Fila de processamento cheia; tente novamente em instantes",
+                headers={"Retry-After": str(RETRY_AFTER_S)},
+            )
+        cancelar = threading.Event()
+        tempos: Dict[str, float] = {}
+        prazo = time.monotonic() + (timeout_s or TIMEOUT_PADRAO_S)
+        status = "ok"
+        fut: Optional[asyncio.Future] = None
+        try:
+            fut = asyncio.get_running_loop().run_in_executor(
+                self._threads, self._rodar, fn, args, kwargs, prazo, cancelar, tempos, progresso
+            )
+            while True:
+                feito, _ = await asyncio.wait({fut}, timeout=INTERVALO_S)
+                if feito:
+                    return fut.result()
+                if request is not None and await request.is_disconnected():
+                    cancelar.set()
+                    raise TarefaCancelada()
+        except TarefaCancelada:
+            status = "cancelada"
+            raise HTTPException(status_code=499, detail="Requisição cancelada pelo cliente")
+        except TempoEsgotado:
+            status = "timeout"
+            raise HTTPException(status_code=504, detail="Tempo esgotado no processamento")
+        except asyncio.CancelledError:
+            cancelar.set()
+            status = "cancelada"
+            raise
+        except Exception:
+            status = "erro"
+            raise
+        finally:
+            if fut is not None and not fut.done():
+                # a thread ainda encerra o processo; o desfecho dela não interessa mais
+                fut.add_done_callback(_descartar_resultado)
+            self._liberar()
+            observar_execucao(tarefa, status, tempos.get("espera_s", 0.0), tempos.get("execucao_s", 0.0))
+
+    def encerrar(self) -> None:
+        with self._lock:
+            todos = list(self._todos.values())
+            self._todos.clear()
+            self._criados = 0
+        for w in todos:
+            w.encerrar()
+        while not self._livres.empty():
+            self._livres.get_nowait()
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+
+
+POOL = PoolProcessos()
+registrar_estado_pool(POOL.estado)
@@ -0,0 +1,689 @@
+"""
+Jobs de geocodificação em lote dentro da API.
+
+Substitui a execução manual de `joao/hacka/scripts/geocode_feiras.py`: o CSV é
+enviado em `POST /api/v1/geo/geocode/jobs`, processado por um pool de workers
+com limite de taxa compartilhado e cache de consultas, e o progresso/resultados
+parciais ficam disponíveis por `GET`. O cache da API fica em
+`dados/geocode_cache.json` (fora do git) e nasce como cópia do
+`joao/hacka/geocode_cache.json` versionado dos scripts, que não é alterado.
+
+O estado de cada job é salvo em disco. No desligamento da API os jobs em
+execução param após a linha atual com status `interrompido` (diferente de
+`cancelado`, que é pedido pelo usuário) e são retomados, com os da fila, na
+próxima inicialização.
+
+Com vários workers do uvicorn (ver `memoria_compartilhada.py`), o disco é a
+fonte da verdade: qualquer worker lê o status de qualquer job em `JOBS_DIR`, o
+cancelamento de um job de outro worker é pedido por um arquivo-marca, cada job
+pendente é assumido por um único processo (sob trava de arquivo) e o intervalo
+mínimo entre chamadas ao provedor vale para todos os processos juntos (último
+horário num arquivo travado com `flock`).
+
+O provedor é plugável (`RAJAI_GEOCODER`): `nominatim` (geopy) ou `fixture`,
+que responde a partir de um JSON local e serve para testes.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from metricas import registrar_acesso_cache, registrar_tamanho_cache
+
+try:
+    from geopy.exc import GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+    from geopy.geocoders import Nominatim
+except Exception:  # pragma: no cover - optional
+    Nominatim = None  # type: ignore
+    GeocoderServiceError = GeocoderTimedOut = GeocoderUnavailable = Exception  # type: ignore
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover - optional (Windows)
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger("rajai")
+
+geocode_router = APIRouter(prefix="/api/v1/geo/geocode", tags=["geocode"])
+
+BASE_DIR = Path(__file__).parent
+CACHE_SCRIPTS_FILE = BASE_DIR / "joao" / "hacka" / "geocode_cache.json"
+CACHE_FILE = Path(os.getenv("RAJAI_GEOCODE_CACHE", BASE_DIR / "dados" / "geocode_cache.json"))
+JOBS_DIR = Path(os.getenv("RAJAI_GEOCODE_JOBS_DIR", BASE_DIR / "dados" / "geocode_jobs"))
+FIXTURE_FILE = Path(os.getenv("RAJAI_GEOCODER_FIXTURE", CACHE_SCRIPTS_FILE))
+
+DEFAULT_SUFFIX = "Rio de Janeiro, RJ, Brasil"
+MAX_WORKERS = int(os.getenv("RAJAI_GEOCODE_WORKERS", "2"))
+SALVAR_A_CADA = 10
+
+STATUS_FINAIS = {"concluido", "erro", "cancelado"}  # "interrompido" (desligamento) é retomado
+
+
+class ErroTemporario(Exception):
+    """Falha recuperável do provedor (timeout/indisponível): tenta de novo com backoff."""
+
+
+class _Encerrando(Exception):
+    """A API está desligando: o job para sem registrar a linha atual."""
+
+
+# -----------------------------
+# Provedores
+# -----------------------------
+class ProvedorGeocodificacao:
+    nome = "base"
+    min_intervalo_s = 0.0
+
+    def geocodificar(self, query: str) -> Optional[Dict[str, Any]]:
+        """Retorna {lat, lon, precision} ou None se não encontrado."""
+        raise NotImplementedError
+
+
+class ProvedorNominatim(ProvedorGeocodificacao):
+    nome = "nominatim"
+
+    def __init__(self, user_agent: str = "rajai-geocode", timeout: int = 20, min_intervalo_s: float = 1.2):
+        if Nominatim is None:
+            raise RuntimeError("geopy não instalado; use RAJAI_GEOCODER=fixture ou instale geopy")
+        self.min_intervalo_s = min_intervalo_s
+        self._geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocodificar(self, query: str) -> Optional[Dict[str, Any]]:
+        try:
+            loc = self._geolocator.geocode(query, addressdetails=True)
+        except (GeocoderTimedOut, GeocoderUnavailable, GeocoderServiceError) as e:
+            raise ErroTemporario(str(e)) from e
+        if loc is None:
+            return None
+        return {
+            "lat": float(loc.latitude),
+            "lon": float(loc.longitude),
+            "precision": _inferir_precisao(getattr(loc, "raw", {}) or {}),
+        }
+
+
+class ProvedorFixture(ProvedorGeocodificacao):
+    """Responde a partir de um JSON {query: {lat, lon, precision}} local, sem rede nem limite de taxa."""
+
+    nome = "fixture"
+
+    def __init__(self, path: Path = FIXTURE_FILE):
+        self.respostas: Dict[str, Any] = {}
+        if path.exists():
+            with path.open(encoding="utf-8") as fp:
+                self.respostas = json.load(fp)
+
+    def geocodificar(self, query: str) -> Optional[Dict[str, Any]]:
+        hit = self.respostas.get(query)
+        if not hit or hit.get("lat") is None or hit.get("lon") is None:
+            return None
+        return {"lat": float(hit["lat"]), "lon": float(hit["lon"]), "precision": hit.get("precision", "unknown")}
+
+
+PROVEDORES = {
+    "nominatim": ProvedorNominatim,
+    "fixture": ProvedorFixture,
+}
+_PROVEDORES_ATIVOS: Dict[str, ProvedorGeocodificacao] = {}
+_PROVEDORES_LOCK = threading.Lock()
+
+
+def obter_provedor(nome: Optional[str] = None) -> ProvedorGeocodificacao:
+    nome = (nome or os.getenv("RAJAI_GEOCODER", "nominatim")).strip().lower()
+    if nome not in PROVEDORES:
+        raise ValueError(f"Provedor de geocodificação desconhecido: {nome}")
+    with _PROVEDORES_LOCK:
+        if nome not in _PROVEDORES_ATIVOS:
+            _PROVEDORES_ATIVOS[nome] = PROVEDORES[nome]()
+        return _PROVEDORES_ATIVOS[nome]
+
+
+def _inferir_precisao(raw: Dict[str, Any]) -> str:
+    addr = (raw or {}).get("address") or {}
+    if addr.get("house_number"):
+        return "exact"
+    if addr.get("road") or addr.get("pedestrian") or addr.get("footway"):
+        return "street"
+    if addr.get("suburb") or addr.get("neighbourhood"):
+        return "neighborhood"
+    return "unknown"
+
+
+# -----------------------------
+# Limite de taxa e cache compartilhados
+# -----------------------------
+@contextmanager
+def _trava_arquivo(path: Path) -> Iterator[None]:
+    """Trava exclusiva entre processos (e entre threads, que abrem o arquivo cada uma)."""
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+") as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+class LimitadorTaxa:
+    """
+    Garante um intervalo mínimo entre chamadas ao provedor, entre todas as
+    threads e todos os processos: o horário reservado para a última chamada
+    fica em `<diretorio>/<provedor>.taxa`, lido e escrito sob `flock`.
+    """
+
+    def __init__(self, diretorio: Path) -> None:
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+
+    def aguardar(self, provedor: ProvedorGeocodificacao) -> None:
+        if provedor.min_intervalo_s <= 0:
+            return
+        path = self.diretorio / f"{provedor.nome}.taxa"
+        with self._lock, _trava_arquivo(path):
+            try:
+                ultima = float(path.read_text().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                ultima = 0.0
+            agora = time.time()  # relógio de parede: comparável entre processos
+            espera = max(0.0, ultima + provedor.min_intervalo_s - agora)
+            path.write_text(repr(agora + espera))
+        if espera:
+            time.sleep(espera)
+
+
+class CacheGeocodificacao:
+    """Cache de consultas no mesmo formato do `geocode_cache.json` dos scripts."""
+
+    def __init__(self, path: Path, semente: Optional[Path] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._lock_arquivo = threading.Lock()
+        self._dados: Dict[str, Any] = {}
+        self._novos: Dict[str, Any] = {}  # consultas deste processo ainda não gravadas
+        origem = path if path.exists() else semente
+        if origem is not None and origem.exists():
+            try:
+                with origem.open(encoding="utf-8") as fp:
+                    self._dados = json.load(fp)
+            except Exception:
+                logger.exception("Cache de geocodificação ilegível em %s; iniciando vazio", origem)
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def obter(self, query: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hit = self._dados.get(query)
+        registrar_acesso_cache("geocode_cache", hit is not None)
+        return hit
+
+    def guardar(self, query: str, valor: Dict[str, Any]) -> None:
+        with self._lock:
+            self._dados[query] = valor
+            self._novos[query] = valor
+
+    def salvar(self) -> None:
+        """Grava as consultas novas sobre o arquivo atual, que outros processos também atualizam."""
+        with self._lock:
+            if not self._novos:
+                return
+            novos, self._novos = self._novos, {}
+        trava = self.path.with_suffix(self.path.suffix + ".lock")
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with self._lock_arquivo, _trava_arquivo(trava):
+            try:
+                with self.path.open(encoding="utf-8") as fp:
+                    snapshot = json.load(fp)
+            except FileNotFoundError:
+                with self._lock:
+                    snapshot = dict(self._dados)
+            except Exception:
+                logger.exception("Cache de geocodificação ilegível em %s; regravando", self.path)
+                with self._lock:
+                    snapshot = dict(self._dados)
+            snapshot.update(novos)
+            with tmp.open("w", encoding="utf-8") as fp:
+                json.dump(snapshot, fp, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        with self._lock:
+            # o que os outros processos gravaram passa a valer aqui também
+            self._dados = {**snapshot, **self._dados}
+
+
+LIMITADOR = LimitadorTaxa(JOBS_DIR)
+CACHE = CacheGeocodificacao(CACHE_FILE, semente=CACHE_SCRIPTS_FILE)
+registrar_tamanho_cache("geocode_cache", lambda: len(CACHE))
+
+
+# -----------------------------
+# Jobs
+# -----------------------------
+def montar_consultas(row: Dict[str, Any]) -> Tuple[str, str]:
+    """Mesmo critério do script: endereço completo e, como fallback, só o bairro."""
+    endereco = str(row.get("endereco", "") or "").strip()
+    bairro = str(row.get("bairro", "") or "").strip()
+    q1 = ", ".join([p for p in [endereco, bairro, DEFAULT_SUFFIX] if p])
+    q2 = ", ".join([p for p in [bairro, DEFAULT_SUFFIX] if p])
+    return q1, q2
+
+
+class JobGeocodificacao:
+    def __init__(self, job_id: str, linhas: List[Dict[str, Any]], provedor: str, nome_arquivo: str = ""):
+        self.id = job_id
+        self.linhas = linhas
+        self.provedor = provedor
+        self.nome_arquivo = nome_arquivo
+        self.resultados: List[Optional[Dict[str, Any]]] = [None] * len(linhas)
+        self.status = "pendente"
+        self.erro: Optional[str] = None
+        self.criado_em = time.time()
+        self.atualizado_em = self.criado_em
+        self.pid = os.getpid()  # processo que assumiu o job
+        self.cancelar = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def processadas(self) -> int:
+        return sum(1 for r in self.resultados if r is not None)
+
+    def progresso(self) -> Dict[str, Any]:
+        with self._lock:
+            feitos = [r for r in self.resultados if r is not None]
+        por_status: Dict[str, int] = {}
+        for r in feitos:
+            por_status[r["geocode_status"]] = por_status.get(r["geocode_status"], 0) + 1
+        total = len(self.linhas)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "erro": self.erro,
+            "provedor": self.provedor,
+            "arquivo": self.nome_arquivo,
+            "total_linhas": total,
+            "processadas": len(feitos),
+            "percentual": round(len(feitos) / total * 100, 2) if total else 100.0,
+            "por_status": por_status,
+            "criado_em": self.criado_em,
+            "atualizado_em": self.atualizado_em,
+        }
+
+    def registrar(self, idx: int, resultado: Dict[str, Any]) -> None:
+        with self._lock:
+            self.resultados[idx] = resultado
+            self.atualizado_em = time.time()
+
+    def para_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "erro": self.erro,
+                "provedor": self.provedor,
+                "arquivo": self.nome_arquivo,
+                "criado_em": self.criado_em,
+                "atualizado_em": self.atualizado_em,
+                "pid": self.pid,
+                "linhas": self.linhas,
+                "resultados": list(self.resultados),
+            }
+
+    @classmethod
+    def de_dict(cls, d: Dict[str, Any]) -> "JobGeocodificacao":
+        job = cls(d["id"], d["linhas"], d["provedor"], d.get("arquivo", ""))
+        job.resultados = d.get("resultados") or [None] * len(job.linhas)
+        job.status = d.get("status", "pendente")
+        job.erro = d.get("erro")
+        job.criado_em = d.get("criado_em", job.criado_em)
+        job.atualizado_em = d.get("atualizado_em", job.atualizado_em)
+        job.pid = d.get("pid", 0)
+        if job.status not in STATUS_FINAIS and not _processo_vivo(job.pid):
+            # o dono morreu sem se desligar direito: fica à espera de quem o retome
+            job.status = "interrompido"
+        return job
+
+    def salvar(self) -> None:
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        path = JOBS_DIR / f"{self.id}.json"
+        # nome temporário por thread: o worker do job e o DELETE podem salvar juntos
+        tmp = path.with_suffix(f".json.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as fp:
+            json.dump(self.para_dict(), fp, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+# jobs assumidos por este processo; os dos outros workers são lidos do disco
+JOBS: Dict[str, JobGeocodificacao] = {}
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_ENCERRANDO = threading.Event()
+
+
+def _pedido_cancelamento(job_id: str) -> Path:
+    """Marca deixada por outro worker para o processo dono do job cancelá-lo."""
+    return JOBS_DIR / f"{job_id}.cancelar"
+
+
+def _processo_vivo(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _ler_job(job_id: str) -> Optional[JobGeocodificacao]:
+    try:
+        with (JOBS_DIR / f"{job_id}.json").open("r", encoding="utf-8") as fp:
+            return JobGeocodificacao.de_dict(json.load(fp))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception("Job de geocodificação ilegível: %s", job_id)
+        return None
+
+
+def _carregar_job(job_id: str) -> Optional[JobGeocodificacao]:
+    return JOBS.get(job_id) or _ler_job(job_id)
+
+
+def _todos_jobs() -> List[JobGeocodificacao]:
+    ids = {p.stem for p in JOBS_DIR.glob("*.json")} if JOBS_DIR.is_dir() else set()
+    jobs = [job for job_id in ids | set(JOBS) if (job := _carregar_job(job_id)) is not None]
+    return sorted(jobs, key=lambda j: j.criado_em, reverse=True)
+
+
+def _cancelamento_pedido(job: JobGeocodificacao) -> bool:
+    return job.cancelar.is_set() or _pedido_cancelamento(job.id).exists()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="rajai-geocode")
+    return _EXECUTOR
+
+
+def _consultar(provedor: ProvedorGeocodificacao, query: str, max_retries: int = 5, base_wait: float = 2.0) -> Dict[str, Any]:
+    """Consulta com cache compartilhado, limite de taxa e backoff exponencial."""
+    hit = CACHE.obter(query)
+    if hit is not None:
+        return hit
+
+    resultado: Dict[str, Any] = {"lat": None, "lon": None, "status": "error", "precision": "unknown"}
+    for tentativa in range(max_retries + 1):
+        LIMITADOR.aguardar(provedor)
+        try:
+            loc = provedor.geocodificar(query)
+        except ErroTemporario:
+            if tentativa >= max_retries:
+                resultado["status"] = "timeout"
+                break
+            if _ENCERRANDO.wait(base_wait * (2 ** tentativa) + random.uniform(0, 1.0)):
+                raise _Encerrando()
+            continue
+        except Exception:
+            logger.exception("Falha no provedor %s para %r", provedor.nome, query)
+            break
+        if loc is None:
+            resultado["status"] = "not_found"
+        else:
+            resultado = {"lat": loc["lat"], "lon": loc["lon"], "status": "ok", "precision": loc.get("precision", "unknown")}
+        break
+
+    resultado["provider"] = provedor.nome
+    # timeouts não vão para o cache, para serem tentados de novo
+    if resultado["status"] in ("ok", "not_found"):
+        CACHE.guardar(query, resultado)
+    return resultado
+
+
+def _geocodificar_linha(provedor: ProvedorGeocodificacao, row: Dict[str, Any]) -> Dict[str, Any]:
+    q1, q2 = montar_consultas(row)
+    usado = q1
+    res = _consultar(provedor, q1) if q1 else {"status": "not_found"}
+    if res.get("status") != "ok" and q2 and q2 != q1:
+        res2 = _consultar(provedor, q2)
+        if res2.get("status") == "ok":
+            res, usado = res2, q2
+    return {
+        "lat": res.get("lat"),
+        "lon": res.get("lon"),
+        "geocode_status": res.get("status", "error"),
+        "geocode_precision": res.get("precision", "unknown"),
+        "geocode_provider": res.get("provider", provedor.nome),
+        "geocode_query": usado,
+    }
+
+
+def _executar_job(job: JobGeocodificacao) -> None:
+    try:
+        provedor = obter_provedor(job.provedor)
+    except Exception as e:
+        job.status, job.erro = "erro", str(e)
+        job.salvar()
+        return
+
+    if _ENCERRANDO.is_set():  # saiu da fila durante o desligamento: continua no disco para ser retomado
+        return
+    job.status = "executando"
+    desde_salvo = 0
+    try:
+        for idx, row in enumerate(job.linhas):
+            if _cancelamento_pedido(job):
+                job.status = "cancelado"
+                break
+            if _ENCERRANDO.is_set():
+                job.status = "interrompido"
+                break
+            if job.resultados[idx] is not None:  # retomada
+                continue
+            job.registrar(idx, _geocodificar_linha(provedor, row))
+            desde_salvo += 1
+            if desde_salvo >= SALVAR_A_CADA:
+                job.salvar()
+                CACHE.salvar()
+                desde_salvo = 0
+        else:
+            job.status = "concluido"
+    except _Encerrando:
+        job.status = "interrompido"
+    except Exception as e:
+        logger.exception("Job de geocodificação %s falhou", job.id)
+        job.status, job.erro = "erro", str(e)
+    finally:
+        job.atualizado_em = time.time()
+        job.salvar()
+        CACHE.salvar()
+        if job.status in STATUS_FINAIS:
+            _pedido_cancelamento(job.id).unlink(missing_ok=True)
+
+
+def submeter_job(linhas: List[Dict[str, Any]], provedor: str, nome_arquivo: str = "") -> JobGeocodificacao:
+    job = JobGeocodificacao(uuid.uuid4().hex[:12], linhas, provedor, nome_arquivo)
+    JOBS[job.id] = job
+    job.salvar()
+    _executor().submit(_executar_job, job)
+    return job
+
+
+def retomar_jobs() -> int:
+    """
+    Assume e reenfileira os jobs do disco que não terminaram e não têm dono:
+    interrompidos no desligamento ou cujo processo morreu. Roda em todos os
+    workers; a trava garante que cada job seja assumido por um só.
+    """
+    _ENCERRANDO.clear()
+    if not JOBS_DIR.exists():
+        return 0
+    retomados = 0
+    with _trava_arquivo(JOBS_DIR / "jobs.lock"):
+        for path in sorted(JOBS_DIR.glob("*.json")):
+            job = _ler_job(path.stem)
+            if job is None or job.status in STATUS_FINAIS or job.id in JOBS:
+                continue
+            if job.status != "interrompido" and job.pid != os.getpid():
+                continue  # dono vivo (outro worker já o assumiu)
+            job.status, job.pid = "pendente", os.getpid()
+            JOBS[job.id] = job
+            job.salvar()
+            _executor().submit(_executar_job, job)
+            retomados += 1
+    if retomados:
+        logger.info("Jobs de geocodificação retomados: %d", retomados)
+    return retomados
+
+
+def encerrar() -> None:
+    """
+    Desligamento: os jobs em execução param após a linha atual (e se salvam como
+    `interrompido`), os da fila não começam e o executor é desligado sem esperar.
+    Os da fila também são salvos como `interrompido`, para que outro worker ou a
+    próxima inicialização os assuma por `retomar_jobs`.
+    """
+    global _EXECUTOR
+    _ENCERRANDO.set()
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+    for job in list(JOBS.values()):
+        if job.status == "pendente":
+            job.status = "interrompido"
+            job.salvar()
+    CACHE.salvar()
+
+
+def _get_job(job_id: str) -> JobGeocodificacao:
+    job = _carregar_job(job_id) if re.fullmatch(r"[0-9a-f]{12}", job_id) else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de geocodificação não encontrado")
+    return job
+
+
+def _feature(row: Dict[str, Any], res: Dict[str, Any]) -> Dict[str, Any]:
+    props = {k: ("" if v is None else v) for k, v in row.items() if k not in ("lat", "lon")}
+    props.update({k: v for k, v in res.items() if k not in ("lat", "lon")})
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [res["lon"], res["lat"]]},
+        "properties": props,
+    }
+
+
+def _stream_geojson(job: JobGeocodificacao) -> Iterator[bytes]:
+    yield b'{"type":"FeatureCollection","features":['
+    primeiro = True
+    for row, res in zip(job.linhas, list(job.resultados)):
+        if not res or res.get("geocode_status") != "ok":
+            continue
+        chunk = json.dumps(_feature(row, res), ensure_ascii=False)
+        yield (chunk if primeiro else "," + chunk).encode("utf-8")
+        primeiro = False
+    yield b"]}"
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@geocode_router.post("/jobs", status_code=202)
+async def criar_job_geocodificacao(
+    request: Request,
+    provedor: Optional[str] = Query(default=None, description="nominatim | fixture (padrão: RAJAI_GEOCODER)"),
+    sep: str = Query(default=",", min_length=1, max_length=1, description="Separador do CSV"),
+    arquivo: str = Query(default="", description="Nome do arquivo de origem (informativo)"),
+):
+    """
+    Recebe o CSV no corpo da requisição (Content-Type: text/csv), com ao menos
+    a coluna `bairro` (e idealmente `endereco`), e enfileira a geocodificação.
+    """
+    corpo = await request.body()
+    if not corpo:
+        raise HTTPException(status_code=400, detail="Envie o CSV no corpo da requisição")
+    try:
+        texto = corpo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = corpo.decode("latin1")
+
+    reader = csv.DictReader(io.StringIO(texto), delimiter=sep)
+    colunas = [c.strip() for c in (reader.fieldnames or [])]
+    if "bairro" not in colunas and "endereco" not in colunas:
+        raise HTTPException(status_code=400, detail="CSV precisa ter a coluna 'bairro' ou 'endereco'")
+    linhas = [{(k or "").strip(): v for k, v in row.items()} for row in reader]
+    if not linhas:
+        raise HTTPException(status_code=400, detail="CSV sem linhas")
+
+    try:
+        nome_provedor = obter_provedor(provedor).nome
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = submeter_job(linhas, nome_provedor, arquivo)
+    return job.progresso()
+
+
+@geocode_router.get("/jobs")
+async def listar_jobs_geocodificacao():
+    return {"items": [job.progresso() for job in _todos_jobs()]}
+
+
+@geocode_router.get("/jobs/{job_id}")
+async def status_job_geocodificacao(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=0, description="0 = sem limite"),
+):
+    """Progresso e resultados parciais (linhas já processadas, na ordem do CSV)."""
+    job = _get_job(job_id)
+    feitos = [
+        {"linha": idx, **row, **res}
+        for idx, (row, res) in enumerate(zip(job.linhas, list(job.resultados)))
+        if res is not None
+    ]
+    pagina = feitos[offset:]
+    if limit:
+        pagina = pagina[:limit]
+    return {"meta": job.progresso(), "data": pagina}
+
+
+@geocode_router.get("/jobs/{job_id}/geojson")
+async def geojson_job_geocodificacao(job_id: str):
+    """GeoJSON (streaming) com os pontos geocodificados com sucesso até o momento."""
+    job = _get_job(job_id)
+    return StreamingResponse(_stream_geojson(job), media_type="application/geo+json")
+
+
+@geocode_router.delete("/jobs/{job_id}")
+async def cancelar_job_geocodificacao(job_id: str):
+    job = _get_job(job_id)
+    if job.status in STATUS_FINAIS:
+        return job.progresso()
+    if job.id not in JOBS:
+        # job de outro worker (ou sem dono): deixa o pedido para quem o executar
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        _pedido_cancelamento(job.id).touch()
+    job.cancelar.set()
+    if job.status != "executando":
+        job.status = "cancelado"
+        job.atualizado_em = time.time()
+        job.salvar()
+    return job.progresso()
@@ -0,0 +1,156 @@
+"""
+Geometria dos bairros (polígonos do limite de bairros do Rio).
+
+Carrega uma vez o GeoJSON dos limites (o mesmo `Limite_Bairro.geojson` usado
+pelo frontend, com o nome em `properties.NOME`) e guarda, por bairro
+normalizado, a geometria e o centróide de área. O arquivo é opcional: sem ele,
+os recursos que dependem de geometria ficam indisponíveis.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from endpoint import normalize_bairro
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+
+logger = logging.getLogger("rajai")
+
+BASE_DIR = Path(__file__).parent
+BAIRROS_GEOJSON_FILE = Path(os.getenv("RAJAI_BAIRROS_GEOJSON", BASE_DIR / "dados" / "bairros.geojson"))
+
+# bairro normalizado -> {"nome": str, "geometry": {...GeoJSON...}, "properties": {...}}
+BAIRROS_GEOMETRIA: Dict[str, Dict[str, Any]] = {}
+# bairro normalizado -> (lat, lon)
+BAIRROS_CENTROIDES: Dict[str, Tuple[float, float]] = {}
+
+_CAMPOS_NOME = ("NOME", "nome", "Nome", "BAIRRO", "bairro", "name")
+
+
+def _nome_feature(props: Dict[str, Any]) -> str:
+    for campo in _CAMPOS_NOME:
+        if props.get(campo):
+            return str(props[campo])
+    return ""
+
+
+def _poligonos(geometry: Dict[str, Any]) -> List[List[List[List[float]]]]:
+    """Normaliza Polygon/MultiPolygon para lista de polígonos (cada um = lista de anéis)."""
+    tipo = (geometry or {}).get("type")
+    coords = (geometry or {}).get("coordinates") or []
+    if tipo == "Polygon":
+        return [coords]
+    if tipo == "MultiPolygon":
+        return list(coords)
+    return []
+
+
+def _area_e_centroide_anel(anel: List[List[float]]) -> Tuple[float, float, float]:
+    """Área assinada (graus²) e centróide (x, y) de um anel pela fórmula do shoelace."""
+    a = cx = cy = 0.0
+    n = len(anel)
+    for i in range(n - 1 if n > 1 and anel[0] == anel[-1] else n):
+        x0, y0 = anel[i][0], anel[i][1]
+        x1, y1 = anel[(i + 1) % n][0], anel[(i + 1) % n][1]
+        cross = x0 * y1 - x1 * y0
+        a += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+    a *= 0.5
+    if a == 0:
+        xs = [p[0] for p in anel] or [0.0]
+        ys = [p[1] for p in anel] or [0.0]
+        return 0.0, sum(xs) / len(xs), sum(ys) / len(ys)
+    return a, cx / (6 * a), cy / (6 * a)
+
+
+def centroide(geometry: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """Centróide de área (lat, lon) de um Polygon/MultiPolygon, descontando os buracos."""
+    soma_a = soma_x = soma_y = 0.0
+    for poligono in _poligonos(geometry):
+        for i, anel in enumerate(poligono):
+            a, x, y = _area_e_centroide_anel(anel)
+            a = abs(a) if i == 0 else -abs(a)
+            soma_a += a
+            soma_x += a * x
+            soma_y += a * y
+    if soma_a == 0:
+        return None
+    return soma_y / soma_a, soma_x / soma_a
+
+
+def set_geometria_cache(geojson: Optional[Dict[str, Any]]) -> None:
+    BAIRROS_GEOMETRIA.clear()
+    BAIRROS_CENTROIDES.clear()
+    for feature in (geojson or {}).get("features", []):
+        props = feature.get("properties") or {}
+        nome = _nome_feature(props)
+        key = normalize_bairro(nome)
+        geometry = feature.get("geometry")
+        if not key or not geometry:
+            continue
+        BAIRROS_GEOMETRIA[key] = {"nome": nome, "geometry": geometry, "properties": props}
+        c = centroide(geometry)
+        if c is not None:
+            BAIRROS_CENTROIDES[key] = c
+
+
+def carregar_geometria(path: Path = BAIRROS_GEOJSON_FILE) -> int:
+    """Lê o GeoJSON dos bairros (se existir) e popula o cache. Retorna o número de bairros."""
+    if not path.exists():
+        logger.warning("GeoJSON de bairros não encontrado em %s; recursos de geometria desativados.", path)
+        set_geometria_cache(None)
+        return 0
+    with path.open(encoding="utf-8") as fp:
+        set_geometria_cache(json.load(fp))
+    logger.info("Geometria de bairros carregada: %d bairros", len(BAIRROS_GEOMETRIA))
+    return len(BAIRROS_GEOMETRIA)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    construtor.objeto("geometria", {"geometria": BAIRROS_GEOMETRIA, "centroides": BAIRROS_CENTROIDES})
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    dados = plano.objeto("geometria", {"geometria": {}, "centroides": {}})
+    BAIRROS_GEOMETRIA.clear()
+    BAIRROS_GEOMETRIA.update(dados["geometria"])
+    BAIRROS_CENTROIDES.clear()
+    BAIRROS_CENTROIDES.update(dados["centroides"])
+
+
+# -----------------------------
+# Simplificação
+# -----------------------------
+def _dist_ponto_segmento(p: List[float], a: List[float], b: List[float]) -> float:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return ((p[0] - a[0]) ** 2 + (p[1] - a[1]) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)))
+    px, py = a[0] + t * dx, a[1] + t * dy
+    return ((p[0] - px) ** 2 + (p[1] - py) ** 2) ** 0.5
+
+
+def douglas_peucker(linha: List[List[float]], tolerancia: float) -> List[List[float]]:
+    """Douglas-Peucker iterativo; mantém sempre o primeiro e o último ponto."""
+    n = len(linha)
+    if n <= 2 or tolerancia <= 0:
+        return list(linha)
+    manter = [False] * n
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        ini, fim = pilha.pop()
+        dmax, idx = 0.0, -1
+        for i in range(ini + 1, fim):
+            d = _dist_ponto_segmento(linha[i], linha[ini], linha[fim])
+            if d > dmax:
+                dmax, idx = d, i
+        if idx >= 0 and dmax > tolerancia:
+            manter[idx] = True
+            pilha.append((ini, idx))
+            pilha.append((idx, fim))
+    return [p for p, m in zip(linha, manter) if m]
@@ -0,0 +1,130 @@
+"""
+Intervalos de confiança e estabilidade de ranking das densidades (bootstrap).
+
+Bairros com pouca gente (ex.: Grumari, 184 pessoas) têm `densidade_*_10k`
+extremas e percentis que mudam com um único estabelecimento. Na carga, cada
+contagem por grupo é reamostrada (bootstrap paramétrico de Poisson, que é o
+modelo de uma contagem de estabelecimentos) em `REPLICAS` réplicas, todas de
+uma vez como arrays NumPy (réplica x item x grupo), e para cada réplica são
+recalculados densidades, razão e percentis exatamente como em
+`_calcular_totais`/`_aplicar_percentis`. Saem, por item e nível geográfico:
+
+- `intervalos[métrica] = [inferior, superior]` (nível `NIVEL_CONFIANCA`);
+- `estabilidade[percentil_*]`: fração das réplicas em que o item fica no
+  mesmo quintil do valor observado.
+
+As réplicas são geradas em blocos independentes (sementes derivadas de uma
+`SeedSequence`), o que limita a memória e permite repartir os blocos entre
+processos se o número de itens crescer.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from endpoint import GEO_LEVELS, METRICS_TO_RANK
+
+logger = logging.getLogger("rajai")
+
+REPLICAS = int(os.getenv("RAJAI_IC_REPLICAS", "2000"))
+NIVEL_CONFIANCA = float(os.getenv("RAJAI_IC_NIVEL", "0.95"))
+SEMENTE = int(os.getenv("RAJAI_IC_SEMENTE", "2022"))
+BLOCO_REPLICAS = 500
+CASAS = 2
+
+GRUPOS = (("in_natura", "In natura"), ("misto", "Misto"), ("ultraprocessado", "Ultraprocessado"))
+METRICAS_IC = [
+    "ratio_ultra_sobre_total",
+    *[f"densidade_{g}_10k" for g in ("total", "in_natura", "misto", "ultraprocessado")],
+    *[f"densidade_{g}_km2" for g in ("total", "in_natura", "misto", "ultraprocessado")],
+    *[alvo for _, alvo in METRICS_TO_RANK],
+]
+
+
+def _aplicar_percentis_replicas(metricas: Dict[str, np.ndarray]) -> None:
+    """
+    Percentis (0-100) de cada item em cada réplica, como `_aplicar_percentis`: a
+    mesma lista é reordenada (ordenação estável) métrica após métrica, então os
+    empates herdam a ordem da métrica anterior.
+    """
+    r, n = next(iter(metricas.values())).shape
+    ordem = np.broadcast_to(np.arange(n), (r, n))
+    for origem, alvo in METRICS_TO_RANK:
+        valores = np.take_along_axis(metricas[origem], ordem, axis=-1)
+        ordem = np.take_along_axis(ordem, np.argsort(valores, axis=-1, kind="stable"), axis=-1)
+        posicao = np.empty_like(ordem)
+        np.put_along_axis(posicao, ordem, np.broadcast_to(np.arange(n), (r, n)), axis=-1)
+        metricas[alvo] = np.round((posicao + 1) / n * 100, 2)
+
+
+def _metricas_replicas(contagens: np.ndarray, populacao: np.ndarray, area: np.ndarray) -> Dict[str, np.ndarray]:
+    """contagens: (R, n, 4) = in natura, misto, ultraprocessado, outros -> {métrica: (R, n)}."""
+    total = contagens.sum(axis=-1)
+    por_grupo = {"total": total, **{g: contagens[..., i] for i, (g, _) in enumerate(GRUPOS)}}
+    pop_inv = np.where(populacao > 0, 10000 / np.where(populacao > 0, populacao, 1), 0.0)
+    area_inv = np.where(area > 0, 1 / np.where(area > 0, area, 1), 0.0)
+    out: Dict[str, np.ndarray] = {
+        "ratio_ultra_sobre_total": np.where(total > 0, contagens[..., 2] / np.maximum(total, 1), 0.0)
+    }
+    for g, c in por_grupo.items():
+        out[f"densidade_{g}_10k"] = c * pop_inv
+        out[f"densidade_{g}_km2"] = c * area_inv
+    _aplicar_percentis_replicas(out)
+    return out
+
+
+def calcular_intervalos(
+    sumarios: Sequence[Dict[str, Any]],
+    replicas: int = REPLICAS,
+    nivel: float = NIVEL_CONFIANCA,
+    semente: int = SEMENTE,
+) -> List[Dict[str, Any]]:
+    """Para cada sumário (mesma ordem do nível), {"intervalos": {...}, "estabilidade": {...}}."""
+    n = len(sumarios)
+    if not n:
+        return []
+    obs = np.zeros((n, 4), dtype=np.float64)
+    for i, s in enumerate(sumarios):
+        t = s["totais"]
+        grupos = [t.get(f"total_{g}", 0) or 0 for g, _ in GRUPOS]
+        obs[i] = [*grupos, max((t.get("total") or 0) - sum(grupos), 0)]
+    populacao = np.asarray([float(s.get("populacao_2022") or 0) for s in sumarios])
+    area = np.asarray([float(s.get("area_km2") or 0) for s in sumarios])
+
+    blocos: Dict[str, List[np.ndarray]] = {m: [] for m in METRICAS_IC}
+    tamanhos = [min(BLOCO_REPLICAS, replicas - i) for i in range(0, replicas, BLOCO_REPLICAS)]
+    for tamanho, seq in zip(tamanhos, np.random.SeedSequence(semente).spawn(len(tamanhos))):
+        rng = np.random.default_rng(seq)
+        contagens = rng.poisson(obs, size=(tamanho, n, 4)).astype(np.float64)
+        for m, valores in _metricas_replicas(contagens, populacao, area).items():
+            blocos[m].append(valores)
+
+    alfa = (1 - nivel) / 2
+    resultado: List[Dict[str, Any]] = [{"intervalos": {}, "estabilidade": {}} for _ in range(n)]
+    for m, partes in blocos.items():
+        valores = np.concatenate(partes, axis=0)  # (R, n)
+        inferior, superior = np.quantile(valores, [alfa, 1 - alfa], axis=0)
+        for i in range(n):
+            resultado[i]["intervalos"][m] = [round(float(inferior[i]), CASAS + 2), round(float(superior[i]), CASAS + 2)]
+        if m.startswith("percentil_"):
+            observado = np.asarray([float(s["totais"].get(m) or 0) for s in sumarios])
+            quintil_obs = np.clip(np.ceil(observado / 20), 1, 5)
+            mesmo = (np.clip(np.ceil(valores / 20), 1, 5) == quintil_obs[None, :]).mean(axis=0)
+            for i in range(n):
+                resultado[i]["estabilidade"][m] = round(float(mesmo[i]), CASAS + 1)
+    return resultado
+
+
+def calcular_intervalos_geo(niveis: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None) -> int:
+    """Grava `intervalos`/`estabilidade` nos sumários de cada nível. Retorna o número de itens."""
+    total = 0
+    for nivel, sumarios in (niveis or GEO_LEVELS).items():
+        itens = list(sumarios.values())
+        for s, r in zip(itens, calcular_intervalos(itens)):
+            s.update(r)
+        total += len(itens)
+    logger.info("Intervalos de confiança (%d réplicas, %.0f%%): %d itens", REPLICAS, NIVEL_CONFIANCA * 100, total)
+    return total
@@ -0,0 +1,293 @@
+"""
+Índices espaciais para pontos (lat/lon).
+
+- `GradeEspacial`: grade uniforme com inserção/remoção incrementais. As
+  coordenadas são projetadas num plano equiretangular local (centrado na
+  latitude do Rio), em km, e distribuídas em células quadradas. Consultas por
+  raio e vizinho mais próximo só visitam as células que podem conter resposta.
+- `ArvoreR`: R-tree estática empacotada por STR, para camadas que só mudam
+  numa recarga completa (consultas por bbox e raio).
+
+A distância final é sempre haversine.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+RAIO_TERRA_KM = 6371.0
+LAT_REFERENCIA = -22.9  # Rio de Janeiro
+KM_POR_GRAU_LAT = 110.574
+KM_POR_GRAU_LON = 111.320 * math.cos(math.radians(LAT_REFERENCIA))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def projetar_km(lat: float, lon: float) -> Tuple[float, float]:
+    """Projeção equiretangular local (x, y) em km."""
+    return lon * KM_POR_GRAU_LON, lat * KM_POR_GRAU_LAT
+
+
+class GradeEspacial:
+    """
+    Grade de buckets {(cx, cy): [ids]} com inserção e remoção incrementais.
+
+    `celula_km` deve ficar na ordem do raio típico das consultas (ex.: 1 km para
+    contagens em 500 m/1 km/2 km).
+    """
+
+    def __init__(self, celula_km: float = 1.0):
+        self.celula_km = celula_km
+        self._celulas: Dict[Tuple[int, int], List[Any]] = {}
+        self._pontos: Dict[Any, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pontos)
+
+    def __contains__(self, pid: Any) -> bool:
+        return pid in self._pontos
+
+    def _celula(self, lat: float, lon: float) -> Tuple[int, int]:
+        x, y = projetar_km(lat, lon)
+        return int(math.floor(x / self.celula_km)), int(math.floor(y / self.celula_km))
+
+    def ids(self) -> List[Any]:
+        return list(self._pontos)
+
+    def coordenadas(self, pid: Any) -> Optional[Tuple[float, float]]:
+        return self._pontos.get(pid)
+
+    def inserir(self, pid: Any, lat: float, lon: float) -> None:
+        if pid in self._pontos:
+            self.remover(pid)
+        self._pontos[pid] = (lat, lon)
+        self._celulas.setdefault(self._celula(lat, lon), []).append(pid)
+
+    def inserir_muitos(self, pontos: Iterable[Tuple[Any, float, float]]) -> None:
+        for pid, lat, lon in pontos:
+            self.inserir(pid, lat, lon)
+
+    def remover(self, pid: Any) -> bool:
+        coords = self._pontos.pop(pid, None)
+        if coords is None:
+            return False
+        cel = self._celula(*coords)
+        bucket = self._celulas.get(cel, [])
+        try:
+            bucket.remove(pid)
+        except ValueError:
+            pass
+        if not bucket:
+            self._celulas.pop(cel, None)
+        return True
+
+    def no_raio(self, lat: float, lon: float, raio_km: float) -> List[Tuple[Any, float]]:
+        """Pontos a até `raio_km` (haversine), como (id, distância), ordenados pela distância."""
+        cx, cy = self._celula(lat, lon)
+        r = int(math.ceil(raio_km / self.celula_km))
+        encontrados = []
+        for dx in range(-r, r + 1):
+            for dy in range(-r, r + 1):
+                for pid in self._celulas.get((cx + dx, cy + dy), ()):
+                    plat, plon = self._pontos[pid]
+                    d = haversine_km(lat, lon, plat, plon)
+                    if d <= raio_km:
+                        encontrados.append((pid, d))
+        encontrados.sort(key=lambda t: t[1])
+        return encontrados
+
+    def mais_proximo(self, lat: float, lon: float, raio_max_km: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """Vizinho mais próximo por expansão de anéis de células."""
+        if not self._pontos:
+            return None
+        cx, cy = self._celula(lat, lon)
+        if self._celulas:
+            xs = [c[0] for c in self._celulas]
+            ys = [c[1] for c in self._celulas]
+            anel_max = max(abs(cx - min(xs)), abs(cx - max(xs)), abs(cy - min(ys)), abs(cy - max(ys)))
+        else:
+            anel_max = 0
+
+        melhor: Optional[Tuple[Any, float]] = None
+        anel = 0
+        while anel <= anel_max:
+            # qualquer ponto fora dos anéis já visitados está a pelo menos (anel-1)*celula
+            if melhor is not None and (anel - 1) * self.celula_km > melhor[1]:
+                break
+            if raio_max_km is not None and (anel - 1) * self.celula_km > raio_max_km:
+                break
+            for dx in range(-anel, anel + 1):
+                for dy in range(-anel, anel + 1):
+                    if max(abs(dx), abs(dy)) != anel:
+                        continue
+                    for pid in self._celulas.get((cx + dx, cy + dy), ()):
+                        plat, plon = self._pontos[pid]
+                        d = haversine_km(lat, lon, plat, plon)
+                        if melhor is None or d < melhor[1]:
+                            melhor = (pid, d)
+            anel += 1
+
+        if melhor is not None and raio_max_km is not None and melhor[1] > raio_max_km:
+            return None
+        return melhor
+
+    def na_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[Any]:
+        cx0, cy0 = self._celula(min_lat, min_lon)
+        cx1, cy1 = self._celula(max_lat, max_lon)
+        xs = range(min(cx0, cx1), max(cx0, cx1) + 1)
+        ys = range(min(cy0, cy1), max(cy0, cy1) + 1)
+        # bbox maior que a área ocupada: percorre só as células existentes
+        if len(xs) * len(ys) > len(self._celulas):
+            celulas = [c for c in self._celulas if c[0] in xs and c[1] in ys]
+        else:
+            celulas = [(cx, cy) for cx in xs for cy in ys]
+        out = []
+        for cel in celulas:
+            for pid in self._celulas.get(cel, ()):
+                lat, lon = self._pontos[pid]
+                if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
+                    out.append(pid)
+        return out
+
+
+# -----------------------------
+# R-tree (STR)
+# -----------------------------
+def _empacotar(entradas: List[List[Any]], capacidade: int) -> List[List[Any]]:
+    """
+    Um nível do Sort-Tile-Recursive: ordena por x, corta em fatias verticais,
+    ordena cada fatia por y e agrupa de `capacidade` em `capacidade`.
+    Cada entrada é [min_x, min_y, max_x, max_y, filho]; devolve os nós do nível acima.
+    """
+    n_nos = math.ceil(len(entradas) / capacidade)
+    n_fatias = math.ceil(math.sqrt(n_nos))
+    por_fatia = n_fatias * capacidade
+    entradas = sorted(entradas, key=lambda e: e[0] + e[2])
+    nos = []
+    for i in range(0, len(entradas), por_fatia):
+        fatia = sorted(entradas[i : i + por_fatia], key=lambda e: e[1] + e[3])
+        for j in range(0, len(fatia), capacidade):
+            grupo = fatia[j : j + capacidade]
+            nos.append(
+                [
+                    min(e[0] for e in grupo),
+                    min(e[1] for e in grupo),
+                    max(e[2] for e in grupo),
+                    max(e[3] for e in grupo),
+                    grupo,
+                ]
+            )
+    return nos
+
+
+class ArvoreR:
+    """
+    R-tree estática de pontos, montada de uma vez (bulk load STR).
+
+    Folhas guardam [lon, lat, lon, lat, id]; nós internos, [bbox..., filhos].
+    Não há inserção incremental: para mudar o conjunto, monta-se outra árvore.
+    """
+
+    def __init__(self, pontos: Iterable[Tuple[Any, float, float]], capacidade: int = 16):
+        folhas = [[lon, lat, lon, lat, pid] for pid, lat, lon in pontos]
+        self._n = len(folhas)
+        self._altura = 0
+        self._raiz: Optional[List[Any]] = None
+        nivel = folhas
+        # sempre ao menos um nível de nós acima das folhas
+        while nivel and (len(nivel) > 1 or self._altura == 0):
+            nivel = _empacotar(nivel, capacidade)
+            self._altura += 1
+        if nivel:
+            self._raiz = nivel[0]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _percorrer(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Iterable[List[Any]]:
+        if self._raiz is None:
+            return
+        pilha = [(self._raiz, self._altura)]
+        while pilha:
+            no, nivel = pilha.pop()
+            for e in no[4]:
+                if e[0] > max_lon or e[2] < min_lon or e[1] > max_lat or e[3] < min_lat:
+                    continue
+                if nivel == 1:
+                    yield e
+                else:
+                    pilha.append((e, nivel - 1))
+
+    def na_bbox(
+        self, min_lon: float, min_lat: float, max_lon: float, max_lat: float, limite: Optional[int] = None
+    ) -> List[Any]:
+        out = []
+        for e in self._percorrer(min_lon, min_lat, max_lon, max_lat):
+            out.append(e[4])
+            if limite is not None and len(out) >= limite:
+                break
+        return out
+
+    def no_raio(self, lat: float, lon: float, raio_km: float) -> List[Tuple[Any, float]]:
+        """Pontos a até `raio_km` (haversine), como (id, distância), ordenados pela distância."""
+        dlat = raio_km / KM_POR_GRAU_LAT
+        dlon = raio_km / (111.320 * max(math.cos(math.radians(lat)), 1e-6))
+        encontrados = []
+        for e in self._percorrer(lon - dlon, lat - dlat, lon + dlon, lat + dlat):
+            d = haversine_km(lat, lon, e[1], e[0])
+            if d <= raio_km:
+                encontrados.append((e[4], d))
+        encontrados.sort(key=lambda t: t[1])
+        return encontrados
+
+
+# -----------------------------
+# Geohash
+# -----------------------------
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precisao: int) -> str:
+    lat_int, lon_int = [-90.0, 90.0], [-180.0, 180.0]
+    out = []
+    bit = ch = 0
+    par = True  # bits pares = longitude
+    while len(out) < precisao:
+        intervalo, valor = (lon_int, lon) if par else (lat_int, lat)
+        meio = (intervalo[0] + intervalo[1]) / 2
+        if valor >= meio:
+            ch = (ch << 1) | 1
+            intervalo[0] = meio
+        else:
+            ch <<= 1
+            intervalo[1] = meio
+        par = not par
+        bit += 1
+        if bit == 5:
+            out.append(_BASE32[ch])
+            bit = ch = 0
+    return "".join(out)
+
+
+def geohash_bbox(gh: str) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) da célula."""
+    lat_int, lon_int = [-90.0, 90.0], [-180.0, 180.0]
+    par = True
+    for c in gh:
+        v = _BASE32.index(c)
+        for desloc in range(4, -1, -1):
+            intervalo = lon_int if par else lat_int
+            meio = (intervalo[0] + intervalo[1]) / 2
+            if (v >> desloc) & 1:
+                intervalo[0] = meio
+            else:
+                intervalo[1] = meio
+            par = not par
+    return lon_int[0], lat_int[0], lon_int[1], lat_int[1]
@@ -0,0 +1,25 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Compila o mesmo extrato OSM do build_pmtiles.sh na rede viária usada pela API
+# (hierarquias de contração para as matrizes de tempo/distância das rotas).
+# Requer: pip install osmium
+
+PBF_URL="https://download.geofabrik.de/south-america/brazil/rio-de-janeiro-latest.osm.pbf"
+PBF_FILE="data/rio-de-janeiro-latest.osm.pbf"
+OUT_FILE="../../dados/rede_viaria.npz"
+
+mkdir -p data
+
+echo "==> (1) Baixando OSM PBF do RJ (Geofabrik)"
+if [ ! -f "${PBF_FILE}" ]; then
+  curl -L "${PBF_URL}" -o "${PBF_FILE}"
+else
+  echo "   - Já existe: ${PBF_FILE}"
+fi
+
+echo "==> (2) Compilando a rede viária (município do Rio)"
+echo "   - Saída: ${OUT_FILE}"
+python ../../rede_viaria.py --pbf "${PBF_FILE}" --saida "${OUT_FILE}"
+
+echo "==> OK! Reinicie a API para carregar a rede (ou aponte RAJAI_REDE_VIARIA para o arquivo)."
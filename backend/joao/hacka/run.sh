@@ -3,12 +3,6 @@ set -euo pipefail
 
 PORT="${1:-8000}"
 
-CSV_FIXED="feiras_rio_geocoded_fixed.csv"
-CSV_GEO="feiras_rio_geocoded.csv"
-CSV_RAW="feiras_rio.csv"
-
-GEOJSON_OUT="map/feiras_rio.geojson"
-
 ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 cd "$ROOT"
 
@@ -23,22 +17,9 @@ source .venv/bin/activate
 pip -q install --upgrade pip >/dev/null
 pip -q install pandas geopy >/dev/null
 
-echo "==> (2) Gerando GeoJSON"
-if [ -f "$CSV_FIXED" ]; then
-  IN="$CSV_FIXED"
-elif [ -f "$CSV_GEO" ]; then
-  IN="$CSV_GEO"
-elif [ -f "$CSV_RAW" ]; then
-  echo "   - CSV cru encontrado. Geocodificando..."
-  python scripts/geocode_feiras.py --input "$CSV_RAW" --output "$CSV_GEO"
-  IN="$CSV_GEO"
-else
-  echo "ERRO: Nenhum CSV encontrado."
-  exit 1
-fi
-
-mkdir -p map
-python scripts/build_geojson.py --input "$IN" --output "$GEOJSON_OUT"
+echo "==> (2) Gerando GeoJSON (só as etapas desatualizadas)"
+# falha na atualização não impede subir o mapa com os GeoJSON que já existem
+python scripts/pipeline.py || echo "AVISO: pipeline com erro; servindo os GeoJSON atuais"
 
 URL="http://localhost:${PORT}"
 
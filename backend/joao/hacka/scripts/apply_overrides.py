@@ -20,24 +20,28 @@ def main():
     if "id" not in df.columns:
         raise SystemExit("CSV precisa ter coluna 'id'")
 
-    hits = 0
-    for fid, item in ov.items():
-        lat = item.get("lat")
-        lon = item.get("lon")
-        if lat is None or lon is None:
-            continue
-        mask = df["id"].astype(str) == str(fid)
-        if mask.any():
-            df.loc[mask, "lat"] = lat
-            df.loc[mask, "lon"] = lon
-            df.loc[mask, "geocode_status"] = "override"
-            df.loc[mask, "geocode_precision"] = "exact"
-            df.loc[mask, "geocode_provider"] = "manual_override"
-            df.loc[mask, "geocode_query"] = item.get("query", "")
-            hits += int(mask.sum())
+    # overrides viram uma tabela indexada por id (só os que têm lat/lon) e entram num único join
+    tabela = pd.DataFrame(
+        [
+            {"id": str(fid), "lat": item.get("lat"), "lon": item.get("lon"), "geocode_query": item.get("query", "")}
+            for fid, item in ov.items()
+        ],
+        columns=["id", "lat", "lon", "geocode_query"],
+    )
+    tabela = tabela.dropna(subset=["lat", "lon"]).drop_duplicates("id", keep="last").set_index("id")
+
+    ids = df["id"].astype(str)
+    mask = ids.isin(tabela.index)
+    if mask.any():
+        for col in ("lat", "lon", "geocode_query"):
+            df.loc[mask, col] = ids[mask].map(tabela[col])
+        df.loc[mask, "geocode_status"] = "override"
+        df.loc[mask, "geocode_precision"] = "exact"
+        df.loc[mask, "geocode_provider"] = "manual_override"
+    hits = int(mask.sum())
 
     df.to_csv(args.output, index=False)
     print(f"OK: {args.output} | overrides aplicados em {hits} linha(s)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
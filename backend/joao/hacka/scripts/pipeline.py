@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline incremental das camadas do mapa (feiras, hortas, cozinhas).
+
+Cada etapa declara entradas, saídas e o comando que as produz; o grafo sai do
+casamento saída -> entrada. Uma etapa só roda se o hash (sha256) do conteúdo das
+entradas, do próprio script e dos argumentos mudou desde a última execução, ou
+se alguma saída sumiu / foi alterada à mão. Sem estado salvo (clone novo), as
+saídas que já existem são adotadas pelo hash do conteúdo, sem rodar nada. As camadas são independentes e rodam
+em paralelo; as etapas de geocodificação dividem o limite do Nominatim e o
+`geocode_cache.json`, então rodam uma de cada vez.
+
+Uso (na pasta do projeto):
+    python scripts/pipeline.py                   # roda o que estiver desatualizado
+    python scripts/pipeline.py --dry-run         # só mostra o que rodaria
+    python scripts/pipeline.py feiras            # só as etapas da camada feiras
+    python scripts/pipeline.py --forcar feiras.geojson
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESTADO = ".pipeline_estado.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    inputs: List[str]
+    outputs: List[str]
+    cmd: List[str]
+    resource: Optional[str] = None  # etapas com o mesmo recurso não rodam ao mesmo tempo
+
+    @property
+    def script(self) -> str:
+        return self.cmd[0]
+
+    def deps(self) -> List[str]:
+        # o script também é entrada: mudar o código refaz a etapa
+        return [self.script, *self.inputs]
+
+
+def geocode(layer: str, raw: str, out: str) -> Stage:
+    return Stage(
+        f"{layer}.geocode", [raw], [out],
+        ["scripts/geocode_feiras.py", "--input", raw, "--output", out],
+        resource="nominatim",
+    )
+
+
+def geojson(layer: str, csv: str, out: str) -> Stage:
+    return Stage(f"{layer}.geojson", [csv], [out], ["scripts/build_geojson.py", "--input", csv, "--output", out])
+
+
+STAGES: List[Stage] = [
+    geocode("feiras", "feiras_rio.csv", "feiras_rio_geocoded.csv"),
+    Stage(
+        "feiras.overrides",
+        ["feiras_rio_geocoded.csv", "scripts/overrides.json"],
+        ["feiras_rio_geocoded_fixed.csv"],
+        [
+            "scripts/apply_overrides.py",
+            "--input", "feiras_rio_geocoded.csv",
+            "--output", "feiras_rio_geocoded_fixed.csv",
+            "--overrides", "scripts/overrides.json",
+        ],
+    ),
+    geojson("feiras", "feiras_rio_geocoded_fixed.csv", "map/feiras_rio.geojson"),
+    geocode("hortas", "hortas_cariocas_anexoA.csv", "hortas_cariocas_geocoded.csv"),
+    geojson("hortas", "hortas_cariocas_geocoded.csv", "map/hortas_urbanas_rio.geojson"),
+    geocode("cozinhas", "cozinhas_comunitarias_rio.csv", "cozinhas_comunitarias_rio_geocoded.csv"),
+    geojson("cozinhas", "cozinhas_comunitarias_rio_geocoded.csv", "map/cozinhas_comunitarias_rio.geojson"),
+]
+
+
+def file_hash(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def inputs_hash(stage: Stage) -> Optional[str]:
+    h = hashlib.sha256("\0".join(stage.cmd).encode("utf-8"))
+    for path in stage.deps():
+        fh = file_hash(path)
+        if fh is None:
+            return None
+        h.update(f"\0{path}\0{fh}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_state(path: str) -> Dict[str, Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_state(path: str, state: Dict[str, Dict]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def producers(stages: Sequence[Stage]) -> Dict[str, List[str]]:
+    """Etapa -> etapas das quais ela depende (quem produz alguma das suas entradas)."""
+    by_output: Dict[str, str] = {}
+    for s in stages:
+        for out in s.outputs:
+            if out in by_output:
+                raise SystemExit(f"ERRO: '{out}' é saída de '{by_output[out]}' e de '{s.name}'")
+            by_output[out] = s.name
+    return {s.name: sorted({by_output[i] for i in s.inputs if i in by_output}) for s in stages}
+
+
+def reason_to_run(stage: Stage, state: Dict[str, Dict], forced: bool) -> Optional[str]:
+    """None se a etapa está em dia; senão o motivo para rodar."""
+    if forced:
+        return "forçada"
+    h_in = inputs_hash(stage)
+    if h_in is None:
+        faltando = [p for p in stage.deps() if not os.path.exists(p)]
+        return f"entrada ausente: {', '.join(faltando)}"
+    anterior = state.get(stage.name)
+    if anterior is None:
+        if all(os.path.exists(o) for o in stage.outputs):
+            # primeira execução (clone novo) com as saídas versionadas: adota o conteúdo
+            # atual delas em vez de refazer (e geocodificar tudo de novo no Nominatim);
+            # daí em diante, mudar uma entrada ou uma saída refaz a etapa normalmente
+            state[stage.name] = {"inputs": h_in, "outputs": {o: file_hash(o) for o in stage.outputs}}
+            return None
+        return "sem histórico"
+    if anterior.get("inputs") != h_in:
+        return "entradas mudaram"
+    for out in stage.outputs:
+        if file_hash(out) != anterior.get("outputs", {}).get(out):
+            return f"saída ausente ou alterada: {out}"
+    return None
+
+
+def run_stage(stage: Stage, locks: Dict[str, threading.Lock]) -> subprocess.CompletedProcess:
+    for out in stage.outputs:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    cmd = [sys.executable, *stage.cmd]
+    if stage.resource:
+        with locks[stage.resource]:
+            return subprocess.run(cmd, capture_output=True, text=True)
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Pipeline incremental das camadas do mapa")
+    ap.add_argument("select", nargs="*", help="camadas ou etapas (ex.: feiras, hortas.geojson); padrão: todas")
+    ap.add_argument("--forcar", nargs="*", metavar="ETAPA", help="refaz as etapas dadas (ou todas, sem argumento)")
+    ap.add_argument("--dry-run", action="store_true", help="só mostra o que rodaria")
+    ap.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--state", default=ESTADO)
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+
+    def matches(s: Stage, names: Sequence[str]) -> bool:
+        return any(s.name == n or s.name.split(".")[0] == n for n in names)
+
+    stages = [s for s in STAGES if not args.select or matches(s, args.select)]
+    if not stages:
+        raise SystemExit(f"ERRO: nenhuma etapa para {args.select}; etapas: {', '.join(s.name for s in STAGES)}")
+    forced: Set[str] = set()
+    if args.forcar is not None:
+        forced = {s.name for s in stages if not args.forcar or matches(s, args.forcar)}
+
+    deps = producers(STAGES)
+    selected = {s.name for s in stages}
+    deps = {n: [d for d in deps[n] if d in selected] for n in selected}
+    state = load_state(args.state)
+    locks = {s.resource: threading.Lock() for s in stages if s.resource}
+
+    if args.dry_run:
+        refeitas: Set[str] = set()
+        for s in stages:  # STAGES já está em ordem topológica
+            motivo = reason_to_run(s, state, s.name in forced)
+            if motivo is None and any(d in refeitas for d in deps[s.name]):
+                motivo = "depende de etapa refeita"
+            if motivo:
+                refeitas.add(s.name)
+            print(f"{'RODA' if motivo else 'ok  '}  {s.name}" + (f"  ({motivo})" if motivo else ""))
+        return 0
+
+    t0 = time.time()
+    pending = {s.name: s for s in stages}
+    finished: Set[str] = set()
+    failed: Set[str] = set()
+    running: Dict[Future, Stage] = {}
+    started: Dict[str, float] = {}
+    n_run = n_skip = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                if any(d in failed for d in deps[name]):
+                    print(f"--  {name}: bloqueada (dependência falhou)")
+                    failed.add(name)
+                    del pending[name]
+                elif all(d in finished for d in deps[name]):
+                    s = pending.pop(name)
+                    motivo = reason_to_run(s, state, name in forced)
+                    if motivo is None:
+                        print(f"ok  {name}: em dia")
+                        finished.add(name)
+                        n_skip += 1
+                        continue
+                    print(f"==> {name}: {motivo}")
+                    started[name] = time.time()
+                    running[pool.submit(run_stage, s, locks)] = s
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s = running.pop(fut)
+                proc = fut.result()
+                dt = time.time() - started[s.name]
+                for linha in (proc.stdout + proc.stderr).splitlines():
+                    print(f"    [{s.name}] {linha}")
+                if proc.returncode != 0 or not all(os.path.exists(o) for o in s.outputs):
+                    print(f"ERRO {s.name}: código {proc.returncode} ({dt:.1f}s)")
+                    state.pop(s.name, None)
+                    failed.add(s.name)
+                else:
+                    print(f"ok  {s.name}: refeita em {dt:.1f}s")
+                    state[s.name] = {
+                        "inputs": inputs_hash(s),
+                        "outputs": {o: file_hash(o) for o in s.outputs},
+                    }
+                    finished.add(s.name)
+                    n_run += 1
+                save_state(args.state, state)
+
+    save_state(args.state, state)
+    print(f"Pipeline: {n_run} refeita(s), {n_skip} em dia, {len(failed)} com erro | {time.time() - t0:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
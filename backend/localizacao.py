@@ -0,0 +1,712 @@
+"""
+Localização de novas feiras/hortas (máxima cobertura e p-mediana).
+
+Dado um conjunto de locais candidatos e as fontes in natura já existentes
+(camadas de `joao/hacka`), escolhe `k` novos locais que mais reduzem a
+exposição a desertos alimentares:
+
+- `cobertura` (padrão): maximiza a população a até `raio_km` de alguma fonte
+  (só conta quem ainda não está coberto pelas fontes existentes);
+- `p_mediana`: minimiza a distância ponderada pela população até a fonte mais
+  próxima, truncada em `distancia_maxima_km` (quem está mais longe conta como
+  essa distância).
+
+Demanda: com os polígonos dos bairros, uma grade de células de `CELULA_KM`
+dentro de cada bairro, cada uma com a população do bairro dividida igualmente
+entre as suas células; sem polígonos, o centróide de cada bairro (o mesmo da
+acessibilidade). Candidatos: centróides dos bairros, uma grade com `passo_km`
+ou uma lista enviada no pedido.
+
+As distâncias candidato x demanda só são calculadas para os pares dentro do
+raio útil, com um índice em grade vetorizado (células do tamanho do raio,
+vizinhança 3x3), e ficam numa matriz esparsa (CSR). A escolha é gulosa
+preguiçosa (CELF): os ganhos só diminuem à medida que locais são escolhidos
+(as duas funções objetivo são submodulares), então só o topo da fila de
+prioridade é reavaliado a cada passo.
+
+A demanda só depende da carga (população, polígonos e centróides): é montada
+uma vez junto com a acessibilidade e, com dados compartilhados, vai para o
+segmento como arrays, então um pedido não refaz a grade.
+
+O cálculo roda como job no pool de processos (`execucao.py`), com progresso
+por etapa consultável em `GET /api/v1/geo/localizacao/jobs/{id}`. O estado de
+cada job fica em disco (`dados/localizacao_jobs`), então qualquer worker do
+uvicorn responde o progresso e o cancelamento, não só o que recebeu o pedido.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+
+from acessibilidade import MOTOR
+from distancias import haversine_vetorizado
+from endpoint import GEO_SUMMARY
+from execucao import POOL, informar_progresso
+from geometria import BAIRROS_CENTROIDES, BAIRROS_GEOMETRIA, _poligonos
+from indice_espacial import KM_POR_GRAU_LAT, KM_POR_GRAU_LON
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from metricas import registrar_tamanho_cache
+from pontos import pontos_in_natura
+
+logger = logging.getLogger("rajai")
+
+localizacao_router = APIRouter(prefix="/api/v1/geo/localizacao", tags=["geo"])
+
+BASE_DIR = Path(__file__).parent
+JOBS_DIR = Path(os.getenv("RAJAI_LOCALIZACAO_JOBS_DIR", BASE_DIR / "dados" / "localizacao_jobs"))
+CELULA_KM = float(os.getenv("RAJAI_LOCALIZACAO_CELULA_KM", "0.5"))
+MAX_CANDIDATOS = int(os.getenv("RAJAI_LOCALIZACAO_MAX_CANDIDATOS", "20000"))
+TEMPO_MAX_S = float(os.getenv("RAJAI_LOCALIZACAO_TEMPO_MAX_S", "120"))
+MAX_K = 100
+MAX_JOBS = 50  # jobs guardados em disco (os mais antigos já terminados saem primeiro)
+
+METODOS = ("cobertura", "p_mediana")
+CANDIDATOS = ("centroides", "grade", "lista")
+STATUS_FINAIS = {"concluido", "erro", "cancelado"}
+
+
+# -----------------------------
+# Índice em grade (vetorizado)
+# -----------------------------
+def pares_no_raio(
+    lat_o: np.ndarray, lon_o: np.ndarray, lat_d: np.ndarray, lon_d: np.ndarray, raio_km: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pares origem x destino a até `raio_km`, em CSR por origem: (indptr, destinos, distâncias).
+
+    Os destinos são agrupados em células de `raio_km` (projeção equiretangular
+    de `indice_espacial`); cada origem só visita as 9 células vizinhas da sua.
+    """
+    n_o = lat_o.size
+    if n_o == 0 or lat_d.size == 0:
+        return np.zeros(n_o + 1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    cx_d = np.floor(lon_d * KM_POR_GRAU_LON / raio_km).astype(np.int64)
+    cy_d = np.floor(lat_d * KM_POR_GRAU_LAT / raio_km).astype(np.int64)
+    cx_o = np.floor(lon_o * KM_POR_GRAU_LON / raio_km).astype(np.int64)
+    cy_o = np.floor(lat_o * KM_POR_GRAU_LAT / raio_km).astype(np.int64)
+    base_x = min(cx_d.min(), cx_o.min()) - 1
+    base_y = min(cy_d.min(), cy_o.min()) - 1
+    largura = max(cy_d.max(), cy_o.max()) - base_y + 2
+
+    chaves = (cx_d - base_x) * largura + (cy_d - base_y)
+    ordem = np.argsort(chaves, kind="stable")
+    chaves = chaves[ordem]
+
+    origens: List[np.ndarray] = []
+    destinos: List[np.ndarray] = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            alvo = (cx_o + dx - base_x) * largura + (cy_o + dy - base_y)
+            ini = np.searchsorted(chaves, alvo, side="left")
+            qtd = np.searchsorted(chaves, alvo, side="right") - ini
+            total = int(qtd.sum())
+            if not total:
+                continue
+            # posições ini[o] .. ini[o] + qtd[o] - 1 de cada origem, concatenadas
+            deslocamento = np.repeat(ini - (np.cumsum(qtd) - qtd), qtd)
+            origens.append(np.repeat(np.arange(n_o), qtd))
+            destinos.append(ordem[deslocamento + np.arange(total)])
+    if not origens:
+        return np.zeros(n_o + 1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    o = np.concatenate(origens)
+    d = np.concatenate(destinos)
+    dist = haversine_vetorizado(lat_o[o], lon_o[o], lat_d[d], lon_d[d])
+    dentro = dist <= raio_km
+    o, d, dist = o[dentro], d[dentro], dist[dentro]
+    por_origem = np.argsort(o, kind="stable")
+    indptr = np.zeros(n_o + 1, dtype=np.int64)
+    np.cumsum(np.bincount(o, minlength=n_o), out=indptr[1:])
+    return indptr, d[por_origem], dist[por_origem]
+
+
+def _mais_proxima(destinos: np.ndarray, dist: np.ndarray, n_destinos: int) -> np.ndarray:
+    """Distância de cada destino à origem mais próxima entre os pares (inf se nenhuma)."""
+    melhor = np.full(n_destinos, np.inf)
+    np.minimum.at(melhor, destinos, dist)
+    return melhor
+
+
+# -----------------------------
+# Solver (roda no pool de processos)
+# -----------------------------
+def resolver(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `dados`: demanda (lat, lon, peso), existentes (lat, lon), candidatos
+    (lat, lon), `k`, `metodo`, `raio_km` e `distancia_maxima_km`. Devolve os
+    índices escolhidos, na ordem, com o ganho marginal de cada um.
+    """
+    t0 = time.monotonic()
+    metodo = dados["metodo"]
+    raio = float(dados["raio_km"])
+    limite = raio if metodo == "cobertura" else float(dados["distancia_maxima_km"])
+    lat_d, lon_d, peso = (np.asarray(dados["demanda"][c], dtype=np.float64) for c in ("lat", "lon", "peso"))
+    lat_e, lon_e = (np.asarray(dados["existentes"][c], dtype=np.float64) for c in ("lat", "lon"))
+    lat_c, lon_c = (np.asarray(dados["candidatos"][c], dtype=np.float64) for c in ("lat", "lon"))
+    n_c, n_d = lat_c.size, lat_d.size
+
+    informar_progresso({"etapa": "distancias", "concluido": 0, "total": 1})
+    indptr, dest, dist = pares_no_raio(lat_c, lon_c, lat_d, lon_d, limite)
+    _, dest_e, dist_e = pares_no_raio(lat_e, lon_e, lat_d, lon_d, limite)
+    inicial = _mais_proxima(dest_e, dist_e, n_d)
+    origem_par = np.repeat(np.arange(n_c), np.diff(indptr))
+    informar_progresso({"etapa": "distancias", "concluido": 1, "total": 1, "pares": int(dest.size)})
+
+    if metodo == "cobertura":
+        coberto = inicial <= raio
+        ganhos = np.bincount(origem_par, weights=peso[dest] * ~coberto[dest], minlength=n_c)
+
+        def ganho(c: int) -> float:
+            a, b = indptr[c], indptr[c + 1]
+            return float((peso[dest[a:b]] * ~coberto[dest[a:b]]).sum())
+
+        def escolher(c: int) -> Tuple[np.ndarray, np.ndarray]:
+            alvo = dest[indptr[c] : indptr[c + 1]]
+            novos = alvo[~coberto[alvo]]
+            coberto[novos] = True
+            return novos, peso[novos]
+
+    else:
+        atual = np.minimum(inicial, limite)  # distância atual, truncada
+        ganhos = np.bincount(origem_par, weights=peso[dest] * np.maximum(atual[dest] - dist, 0), minlength=n_c)
+
+        def ganho(c: int) -> float:
+            a, b = indptr[c], indptr[c + 1]
+            return float((peso[dest[a:b]] * np.maximum(atual[dest[a:b]] - dist[a:b], 0)).sum())
+
+        def escolher(c: int) -> Tuple[np.ndarray, np.ndarray]:
+            a, b = indptr[c], indptr[c + 1]
+            alvo = dest[a:b]
+            reducao = np.maximum(atual[alvo] - dist[a:b], 0)
+            atual[alvo] -= reducao
+            return alvo, peso[alvo] * reducao
+
+    # guloso preguiçoso (CELF): (-ganho, candidato, passo em que o ganho foi calculado)
+    k = min(int(dados["k"]), n_c)
+    fila = [(-g, c, 0) for c, g in enumerate(ganhos.tolist()) if g > 0]
+    heapq.heapify(fila)
+    bairro = np.asarray(dados["demanda"]["bairro"], dtype=np.int64)
+    escolhidos: List[Dict[str, Any]] = []
+    avaliacoes = n_c
+    while fila and len(escolhidos) < k:
+        neg, c, passo = heapq.heappop(fila)
+        if passo != len(escolhidos):
+            g = ganho(c)
+            avaliacoes += 1
+            if g > 0:
+                heapq.heappush(fila, (-g, c, len(escolhidos)))
+            continue
+        alvo, valores = escolher(c)
+        por_bairro = np.bincount(bairro[alvo], weights=valores, minlength=int(bairro.max(initial=-1)) + 1)
+        maiores = [int(b) for b in np.argsort(-por_bairro, kind="stable")[:5] if por_bairro[b] > 0]
+        escolhidos.append({"candidato": c, "ganho": -neg, "por_bairro": [(b, float(por_bairro[b])) for b in maiores]})
+        informar_progresso({"etapa": "selecao", "concluido": len(escolhidos), "total": k})
+
+    # medidas antes/depois (cobertura no raio e distância média truncada)
+    depois = inicial.copy()
+    for e in escolhidos:
+        a, b = indptr[e["candidato"]], indptr[e["candidato"] + 1]
+        np.minimum.at(depois, dest[a:b], dist[a:b])
+    total = float(peso.sum()) or 1.0
+    return {
+        "escolhidos": escolhidos,
+        "avaliacoes": avaliacoes,
+        "pares": int(dest.size),
+        "demanda_total": float(peso.sum()),
+        "cobertura_antes": float(peso[inicial <= raio].sum()),
+        "cobertura_depois": float(peso[depois <= raio].sum()),
+        "dist_media_antes_km": float((peso * np.minimum(inicial, limite)).sum() / total),
+        "dist_media_depois_km": float((peso * np.minimum(depois, limite)).sum() / total),
+        "tempo_gasto_s": time.monotonic() - t0,
+    }
+
+
+# -----------------------------
+# Demanda e candidatos (API)
+# -----------------------------
+def _dentro(lat: np.ndarray, lon: np.ndarray, geometry: Dict[str, Any]) -> np.ndarray:
+    """Ponto-em-polígono vetorizado (regra par-ímpar sobre todos os anéis, o que já desconta buracos)."""
+    dentro = np.zeros(lat.size, dtype=bool)
+    for poligono in _poligonos(geometry):
+        for anel in poligono:
+            arr = np.asarray(anel, dtype=np.float64)
+            if arr.shape[0] < 3:
+                continue
+            x0, y0 = arr[:, 0], arr[:, 1]
+            x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+            cruza = (y0[None, :] > lat[:, None]) != (y1[None, :] > lat[:, None])
+            dy = np.where(y1 == y0, 1.0, y1 - y0)
+            x_corte = x0[None, :] + (lat[:, None] - y0[None, :]) * (x1 - x0)[None, :] / dy[None, :]
+            dentro ^= (cruza & (lon[:, None] < x_corte)).sum(axis=1) % 2 == 1
+    return dentro
+
+
+def _caixa(geometry: Dict[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    pontos = [p for poligono in _poligonos(geometry) for p in (poligono[0] if poligono else [])]
+    if not pontos:
+        return None
+    xs = [p[0] for p in pontos]
+    ys = [p[1] for p in pontos]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def montar_demanda(celula_km: float = CELULA_KM) -> Dict[str, Any]:
+    """
+    Pontos de demanda {lat, lon, peso, bairro (código)} e a lista de bairros.
+
+    Células de uma grade global (alinhada, para bairros vizinhos não repetirem
+    célula) dentro de cada polígono; bairros sem célula (ou sem polígono) entram
+    pelo centróide.
+    """
+    populacao = {b: float(s.get("populacao_2022") or 0) for b, s in GEO_SUMMARY.items()}
+    centroides = {b: MOTOR.bairros.coordenadas(b) for b in MOTOR.bairros.ids()}
+    bairros = sorted(b for b in set(centroides) | set(BAIRROS_GEOMETRIA) if populacao.get(b))
+    lat: List[float] = []
+    lon: List[float] = []
+    peso: List[float] = []
+    codigo: List[int] = []
+    usadas: set = set()
+    for i, b in enumerate(bairros):
+        geo = BAIRROS_GEOMETRIA.get(b)
+        caixa = _caixa(geo["geometry"]) if geo else None
+        pts_lat = pts_lon = np.zeros(0)
+        if caixa is not None:
+            x0, y0, x1, y1 = caixa
+            cx = np.arange(np.floor(x0 * KM_POR_GRAU_LON / celula_km), np.ceil(x1 * KM_POR_GRAU_LON / celula_km))
+            cy = np.arange(np.floor(y0 * KM_POR_GRAU_LAT / celula_km), np.ceil(y1 * KM_POR_GRAU_LAT / celula_km))
+            gx, gy = np.meshgrid(cx, cy)
+            gx, gy = gx.ravel(), gy.ravel()
+            pts_lon = (gx + 0.5) * celula_km / KM_POR_GRAU_LON
+            pts_lat = (gy + 0.5) * celula_km / KM_POR_GRAU_LAT
+            ok = _dentro(pts_lat, pts_lon, geo["geometry"])
+            chaves = [(int(x), int(y)) for x, y in zip(gx[ok], gy[ok])]
+            livres = np.asarray([c not in usadas for c in chaves], dtype=bool)
+            usadas.update(chaves)
+            pts_lat, pts_lon = pts_lat[ok][livres], pts_lon[ok][livres]
+        if not pts_lat.size:
+            c = BAIRROS_CENTROIDES.get(b) or centroides.get(b)
+            if c is None:
+                continue
+            pts_lat, pts_lon = np.asarray([c[0]]), np.asarray([c[1]])
+        lat.extend(pts_lat.tolist())
+        lon.extend(pts_lon.tolist())
+        peso.extend([populacao[b] / pts_lat.size] * pts_lat.size)
+        codigo.extend([i] * pts_lat.size)
+    return {
+        "lat": lat,
+        "lon": lon,
+        "peso": peso,
+        "bairro": codigo,
+        "bairros": bairros,
+        "origem": "grade" if BAIRROS_GEOMETRIA else "centroides",
+    }
+
+
+DEMANDA: Dict[str, Any] = {}
+registrar_tamanho_cache("localizacao.demanda", lambda: int(DEMANDA["peso"].size) if DEMANDA else 0)
+
+
+def montar_demanda_localizacao() -> int:
+    """Monta a demanda na carga (depois da acessibilidade). Retorna o número de pontos."""
+    demanda = montar_demanda()
+    DEMANDA.clear()
+    DEMANDA.update(
+        lat=np.asarray(demanda["lat"], dtype=np.float64),
+        lon=np.asarray(demanda["lon"], dtype=np.float64),
+        peso=np.asarray(demanda["peso"], dtype=np.float64),
+        bairro=np.asarray(demanda["bairro"], dtype=np.int64),
+        bairros=demanda["bairros"],
+        origem=demanda["origem"],
+    )
+    logger.info("Demanda da localização: %d pontos (%s)", DEMANDA["peso"].size, DEMANDA["origem"])
+    return int(DEMANDA["peso"].size)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if not DEMANDA:
+        return
+    for c in ("lat", "lon", "peso", "bairro"):
+        construtor.array(f"localizacao.demanda.{c}", DEMANDA[c])
+    construtor.objeto("localizacao.demanda", {"bairros": DEMANDA["bairros"], "origem": DEMANDA["origem"]})
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    DEMANDA.clear()
+    info = plano.objeto("localizacao.demanda")
+    if info is not None:
+        DEMANDA.update(info, **{c: plano.array(f"localizacao.demanda.{c}") for c in ("lat", "lon", "peso", "bairro")})
+
+
+def _candidatos_grade(demanda: Dict[str, Any], passo_km: float) -> List[Dict[str, Any]]:
+    """Centros de uma grade de `passo_km` sobre a área da demanda (só células perto de alguém)."""
+    lat_d, lon_d = np.asarray(demanda["lat"]), np.asarray(demanda["lon"])
+    if not lat_d.size:
+        return []
+    cx = np.arange(np.floor(lon_d.min() * KM_POR_GRAU_LON / passo_km), np.ceil(lon_d.max() * KM_POR_GRAU_LON / passo_km) + 1)
+    cy = np.arange(np.floor(lat_d.min() * KM_POR_GRAU_LAT / passo_km), np.ceil(lat_d.max() * KM_POR_GRAU_LAT / passo_km) + 1)
+    if cx.size * cy.size > 50 * MAX_CANDIDATOS:
+        raise HTTPException(status_code=400, detail="passo_km pequeno demais para a área da cidade")
+    gx, gy = np.meshgrid(cx, cy)
+    lon = (gx.ravel() + 0.5) * passo_km / KM_POR_GRAU_LON
+    lat = (gy.ravel() + 0.5) * passo_km / KM_POR_GRAU_LAT
+    indptr, _, _ = pares_no_raio(lat, lon, lat_d, lon_d, max(passo_km, CELULA_KM))
+    perto = np.flatnonzero(np.diff(indptr) > 0)
+    return [{"id": f"grade-{j}", "lat": float(lat[i]), "lon": float(lon[i])} for j, i in enumerate(perto)]
+
+
+def _candidatos_lista(locais: Any) -> List[Dict[str, Any]]:
+    if not isinstance(locais, list) or not locais:
+        raise HTTPException(status_code=400, detail="candidatos=lista exige 'locais': [{id, lat, lon}, ...]")
+    saida = []
+    for i, p in enumerate(locais):
+        try:
+            lat, lon = float(p["lat"]), float(p["lon"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Local {i} sem lat/lon numéricos")
+        saida.append({"id": str(p.get("id") or f"local-{i}"), "lat": lat, "lon": lon})
+    return saida
+
+
+def _numero(payload: Dict[str, Any], campo: str, padrao: float, minimo: float, maximo: float) -> float:
+    valor = payload.get(campo, padrao)
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{campo} deve ser numérico")
+    if not minimo <= valor <= maximo:
+        raise HTTPException(status_code=400, detail=f"{campo} deve estar entre {minimo:g} e {maximo:g}")
+    return valor
+
+
+# -----------------------------
+# Jobs
+# -----------------------------
+class JobLocalizacao:
+    def __init__(self, job_id: str, parametros: Dict[str, Any]):
+        self.id = job_id
+        self.parametros = parametros
+        self.status = "pendente"
+        self.erro: Optional[str] = None
+        self.etapa = "fila"
+        self.concluido = 0
+        self.total = 0
+        self.resultado: Optional[Dict[str, Any]] = None
+        self.criado_em = time.time()
+        self.atualizado_em = self.criado_em
+        self.pid = os.getpid()  # processo que executa o job
+        self.tarefa: Optional["asyncio.Task[None]"] = None
+        self._lock = threading.Lock()
+
+    def atualizar(self, aviso: Dict[str, Any]) -> None:
+        """Callback de progresso do pool (chamado fora do event loop)."""
+        if _pedido_cancelamento(self.id).exists():
+            self.cancelar()
+            return
+        with self._lock:
+            if self.status in STATUS_FINAIS:
+                return
+            self.status = "executando"
+            self.etapa = aviso["etapa"]
+            self.concluido = aviso["concluido"]
+            self.total = aviso["total"]
+            self.atualizado_em = time.time()
+        self.salvar()
+
+    def cancelar(self) -> None:
+        """Cancela a tarefa deste processo (de qualquer thread)."""
+        with self._lock:
+            if self.status in STATUS_FINAIS:
+                return
+            self.status = "cancelado"
+            self.atualizado_em = time.time()
+        if self.tarefa is not None:
+            self.tarefa.get_loop().call_soon_threadsafe(self.tarefa.cancel)
+        self.salvar()
+
+    def progresso(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.status == "concluido":
+                percentual = 100.0
+            elif self.etapa == "selecao" and self.total:
+                percentual = 10 + 90 * self.concluido / self.total
+            elif self.etapa == "distancias":
+                percentual = 10.0 * self.concluido
+            else:
+                percentual = 0.0
+            return {
+                "id": self.id,
+                "status": self.status,
+                "erro": self.erro,
+                "etapa": self.etapa,
+                "concluido": self.concluido,
+                "total": self.total,
+                "percentual": round(percentual, 2),
+                "parametros": self.parametros,
+                "criado_em": self.criado_em,
+                "atualizado_em": self.atualizado_em,
+            }
+
+    def para_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "parametros": self.parametros,
+                "status": self.status,
+                "erro": self.erro,
+                "etapa": self.etapa,
+                "concluido": self.concluido,
+                "total": self.total,
+                "resultado": self.resultado,
+                "criado_em": self.criado_em,
+                "atualizado_em": self.atualizado_em,
+                "pid": self.pid,
+            }
+
+    @classmethod
+    def de_dict(cls, d: Dict[str, Any]) -> "JobLocalizacao":
+        job = cls(d["id"], d["parametros"])
+        for campo in ("status", "erro", "etapa", "concluido", "total", "resultado", "criado_em", "atualizado_em", "pid"):
+            setattr(job, campo, d.get(campo, getattr(job, campo)))
+        if job.status not in STATUS_FINAIS and not _processo_vivo(job.pid):
+            job.status, job.erro = "erro", "O processo que executava o job foi encerrado"
+        return job
+
+    def salvar(self) -> None:
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        path = JOBS_DIR / f"{self.id}.json"
+        # nome temporário por thread: o callback de progresso e o fim do job podem salvar juntos
+        tmp = path.with_suffix(f".json.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as fp:
+            json.dump(self.para_dict(), fp, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+# jobs executados por este processo; os dos outros workers são lidos do disco
+JOBS: Dict[str, JobLocalizacao] = {}
+
+
+def _pedido_cancelamento(job_id: str) -> Path:
+    """Marca deixada por outro worker para o processo dono do job cancelá-lo."""
+    return JOBS_DIR / f"{job_id}.cancelar"
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _carregar_job(job_id: str) -> Optional[JobLocalizacao]:
+    local = JOBS.get(job_id)
+    if local is not None:
+        return local
+    try:
+        with (JOBS_DIR / f"{job_id}.json").open("r", encoding="utf-8") as fp:
+            return JobLocalizacao.de_dict(json.load(fp))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception("Job de localização ilegível: %s", job_id)
+        return None
+
+
+def _todos_jobs() -> List[JobLocalizacao]:
+    ids = {p.stem for p in JOBS_DIR.glob("*.json")} if JOBS_DIR.is_dir() else set()
+    jobs = [job for job_id in ids | set(JOBS) if (job := _carregar_job(job_id)) is not None]
+    return sorted(jobs, key=lambda j: j.criado_em, reverse=True)
+
+
+def _guardar_job(job: JobLocalizacao) -> None:
+    JOBS[job.id] = job
+    job.salvar()
+    jobs = _todos_jobs()
+    finais = sorted((j for j in jobs if j.status in STATUS_FINAIS), key=lambda j: j.criado_em)
+    for antigo in finais[: max(0, len(jobs) - MAX_JOBS)]:
+        JOBS.pop(antigo.id, None)
+        for path in (JOBS_DIR / f"{antigo.id}.json", _pedido_cancelamento(antigo.id)):
+            path.unlink(missing_ok=True)
+
+
+def _formatar(
+    res: Dict[str, Any], candidatos: Sequence[Dict[str, Any]], demanda: Dict[str, Any], meta: Dict[str, Any]
+) -> Dict[str, Any]:
+    total = res["demanda_total"] or 1.0
+    sites = []
+    acumulado = 0.0
+    for ordem, e in enumerate(res["escolhidos"], start=1):
+        c = candidatos[e["candidato"]]
+        acumulado += e["ganho"]
+        sites.append(
+            {
+                "ordem": ordem,
+                "id": c["id"],
+                "lat": c["lat"],
+                "lon": c["lon"],
+                "ganho": round(e["ganho"], 2),
+                "ganho_acumulado": round(acumulado, 2),
+                "bairros": [{"bairro": demanda["bairros"][b], "ganho": round(v, 2)} for b, v in e["por_bairro"]],
+            }
+        )
+    return {
+        "meta": {
+            **meta,
+            "pares": res["pares"],
+            "avaliacoes": res["avaliacoes"],
+            "tempo_gasto_s": round(res["tempo_gasto_s"], 3),
+        },
+        "resumo": {
+            "populacao": round(res["demanda_total"], 1),
+            "populacao_coberta_antes": round(res["cobertura_antes"], 1),
+            "populacao_coberta_depois": round(res["cobertura_depois"], 1),
+            "percentual_coberto_antes": round(res["cobertura_antes"] / total * 100, 2),
+            "percentual_coberto_depois": round(res["cobertura_depois"] / total * 100, 2),
+            "dist_media_antes_km": round(res["dist_media_antes_km"], 4),
+            "dist_media_depois_km": round(res["dist_media_depois_km"], 4),
+        },
+        "sites": sites,
+    }
+
+
+async def _executar_job(
+    job: JobLocalizacao, dados: Dict[str, Any], candidatos: List[Dict[str, Any]], demanda: Dict[str, Any], meta: Dict[str, Any]
+) -> None:
+    try:
+        res = await POOL.executar("localizacao", resolver, dados, timeout_s=TEMPO_MAX_S, progresso=job.atualizar)
+        if _pedido_cancelamento(job.id).exists():
+            raise asyncio.CancelledError
+        job.resultado = _formatar(res, candidatos, demanda, meta)
+        job.status = "concluido"
+    except asyncio.CancelledError:
+        job.status = "cancelado"
+    except HTTPException as e:
+        job.status, job.erro = "erro", str(e.detail)
+    except Exception as e:
+        logger.exception("Job de localização %s falhou", job.id)
+        job.status, job.erro = "erro", str(e)
+    finally:
+        job.atualizado_em = time.time()
+        job.salvar()
+
+
+def submeter_job(payload: Dict[str, Any]) -> JobLocalizacao:
+    metodo = str(payload.get("metodo") or "cobertura").lower()
+    if metodo not in METODOS:
+        raise HTTPException(status_code=400, detail=f"metodo deve ser um de: {', '.join(METODOS)}")
+    origem = str(payload.get("candidatos") or "grade").lower()
+    if origem not in CANDIDATOS:
+        raise HTTPException(status_code=400, detail=f"candidatos deve ser um de: {', '.join(CANDIDATOS)}")
+    k = int(_numero(payload, "k", 5, 1, MAX_K))
+    raio = _numero(payload, "raio_km", 1.0, 0.1, 10.0)
+    distancia_maxima = _numero(payload, "distancia_maxima_km", 5.0, raio, 30.0)
+    passo = _numero(payload, "passo_km", 0.5, 0.1, 10.0)
+    existentes = pontos_in_natura() if payload.get("considerar_existentes", True) else []
+
+    demanda = DEMANDA
+    if not demanda or not demanda["peso"].size:
+        raise HTTPException(status_code=404, detail="Sem bairros com população e localização para a demanda")
+    if origem == "centroides":
+        candidatos = [
+            {"id": b, "lat": c[0], "lon": c[1]} for b in MOTOR.bairros.ids() if (c := MOTOR.bairros.coordenadas(b))
+        ]
+    elif origem == "grade":
+        candidatos = _candidatos_grade(demanda, passo)
+    else:
+        candidatos = _candidatos_lista(payload.get("locais"))
+    if not candidatos:
+        raise HTTPException(status_code=400, detail="Nenhum local candidato")
+    if len(candidatos) > MAX_CANDIDATOS:
+        raise HTTPException(
+            status_code=400, detail=f"{len(candidatos)} candidatos (máximo {MAX_CANDIDATOS}); aumente passo_km"
+        )
+
+    parametros = {
+        "metodo": metodo,
+        "k": k,
+        "raio_km": raio,
+        "distancia_maxima_km": distancia_maxima if metodo == "p_mediana" else None,
+        "candidatos": origem,
+        "passo_km": passo if origem == "grade" else None,
+        "considerar_existentes": bool(payload.get("considerar_existentes", True)),
+    }
+    dados = {
+        "metodo": metodo,
+        "k": k,
+        "raio_km": raio,
+        "distancia_maxima_km": distancia_maxima,
+        "demanda": {c: demanda[c] for c in ("lat", "lon", "peso", "bairro")},
+        "existentes": {"lat": [p["lat"] for p in existentes], "lon": [p["lon"] for p in existentes]},
+        "candidatos": {"lat": [c["lat"] for c in candidatos], "lon": [c["lon"] for c in candidatos]},
+    }
+    meta = {
+        **parametros,
+        "n_candidatos": len(candidatos),
+        "n_demanda": int(demanda["peso"].size),
+        "origem_demanda": demanda["origem"],
+        "fontes_existentes": len(existentes),
+    }
+    job = JobLocalizacao(uuid.uuid4().hex[:12], parametros)
+    _guardar_job(job)
+    job.tarefa = asyncio.get_running_loop().create_task(_executar_job(job, dados, candidatos, demanda, meta))
+    return job
+
+
+def _get_job(job_id: str) -> JobLocalizacao:
+    job = _carregar_job(job_id) if re.fullmatch(r"[0-9a-f]{12}", job_id) else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de localização não encontrado")
+    return job
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@localizacao_router.post("/jobs", status_code=202)
+async def criar_job_localizacao(payload: Dict[str, Any]):
+    """
+    Enfileira a escolha de `k` novos locais. Corpo (todos opcionais):
+    `metodo` (cobertura | p_mediana), `k`, `raio_km`, `distancia_maxima_km`,
+    `candidatos` (grade | centroides | lista), `passo_km`, `locais` (para
+    lista) e `considerar_existentes`.
+    """
+    return submeter_job(payload).progresso()
+
+
+@localizacao_router.get("/jobs")
+async def listar_jobs_localizacao():
+    return {"items": [job.progresso() for job in _todos_jobs()]}
+
+
+@localizacao_router.get("/jobs/{job_id}")
+async def status_job_localizacao(job_id: str):
+    """Progresso e, quando concluído, os locais escolhidos em ordem com o ganho marginal de cada um."""
+    job = _get_job(job_id)
+    return {"meta": job.progresso(), "data": job.resultado}
+
+
+@localizacao_router.delete("/jobs/{job_id}")
+async def cancelar_job_localizacao(job_id: str):
+    job = _get_job(job_id)
+    if job.status in STATUS_FINAIS:
+        return job.progresso()
+    if job.id not in JOBS:
+        # job de outro worker: deixa o pedido para o processo dono e já registra o cancelamento
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        _pedido_cancelamento(job.id).touch()
+    job.cancelar()
+    return job.progresso()
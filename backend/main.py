@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import csv
+import logging
+import os
 import sys
+import time
 import unicodedata
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 import pandas as pd # Usaremos pandas para fazer o cálculo rápido em memória
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 
 BASE_DIR = Path(__file__).parent
@@ -24,14 +29,81 @@ from endpoint import (
   set_data_cache,
   set_geo_cache,
   DATASETS,
+  DATA_CACHE,
+  GEO_SUMMARY,
+  conteudo_compartilhado,
+  set_dados_compartilhados,
+  total_linhas_geo,
 )
+from acessibilidade import acessibilidade_router, calcular_acessibilidade
+from bootstrap import bootstrap_router, montar_bootstrap
+from colunar import FORMATO_QUERY, esquema_da_fonte, inferir_esquema, registrar_fonte, resposta_colunar, validar_formato
+from compressao import CompressaoMiddleware, resposta_estatica, serializar_estatico
+from topologia import montar_topologia, topologia_router
+from cubo import cubo_router, montar_cubo
+from autocorrelacao import autocorrelacao_router, montar_adjacencia, pre_calcular as pre_calcular_autocorrelacao
+from versoes import carregar_versoes, versoes_router
+from incerteza import calcular_intervalos_geo
+from localizacao import localizacao_router, montar_demanda_localizacao
+from cenarios import cenarios_router, montar_base_cenarios
+from geocodificacao import encerrar as encerrar_geocodificacao, geocode_router, retomar_jobs
+from distancias import montar_matriz_bairros
+from geometria import BAIRROS_CENTROIDES, carregar_geometria
+from piramide_pontos import montar_piramide, piramide_router
+from pontos import PONTOS, carregar_pontos, pontos_router
+from rede_viaria import carregar_rede
+import acessibilidade
+import autocorrelacao
+import bootstrap
+import cenarios
+import cubo
+import distancias
+import geometria
+import localizacao
+import piramide_pontos
+import pontos
+import rede_viaria
+import topologia
+import versoes
+from execucao import POOL
+from memoria_compartilhada import (
+  ATIVO as DADOS_COMPARTILHADOS,
+  INTERVALO_VERIFICACAO_S,
+  Construtor,
+  PlanoCompartilhado,
+  anexar,
+  geracao_atual,
+  impressao_digital,
+  publicar,
+  trava,
+)
+from serializacao import RespostaJSONRapida, normalizar_registros
+from metricas import (
+  PROFILER_HABILITADO,
+  MetricasMiddleware,
+  definir_linhas_dataset,
+  medir_fase,
+  metricas_router,
+  profiler_router,
+  registrar_erro_carga,
+  registrar_fase,
+  registrar_tamanho_cache,
+)
+
+logging.basicConfig(
+    level=os.getenv("RAJAI_LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("rajai")
 
 # --- Configuração de Caminhos ---
 DATA_FILE = BASE_DIR / "dados" / "dados.csv"
 CENSO_FILE = BASE_DIR / "dados" / "Censo_2022.csv"
 
-# Cache Global
+# Cache Global (com dados compartilhados, uma TabelaCompartilhada)
 DENSITY_CACHE: List[Dict[str, Any]] = []
+DENSITY_PAYLOAD: Dict[str, Any] = {}  # DENSITY_CACHE serializado + pré-comprimido
+registrar_fonte("densidade", lambda: DENSITY_CACHE)
 
 # --- Funções Auxiliares ---
 
@@ -48,31 +120,34 @@ def processar_densidade_em_memoria():
     calcula densidades e OS PERCENTIS para cada tipo.
     """
     if not DATA_FILE.exists() or not CENSO_FILE.exists():
-        print("⚠️ Arquivos dados.csv ou Censo_2022.csv não encontrados.")
+        logger.warning("Arquivos dados.csv ou Censo_2022.csv não encontrados.")
         return []
 
-    print("⚙️ Processando densidade, tipos e percentis em memória...")
+    logger.info("Processando densidade, tipos e percentis em memória...")
     
     try:
         # 1. Carrega CSVs
         # Dtype str para garantir que o CNAE não perca zeros ou formatação
-        df_dados = pd.read_csv(DATA_FILE, dtype={'classificacao_cnae': str})
-        df_censo = pd.read_csv(CENSO_FILE)
+        with medir_fase("densidade.csv_parse"):
+            df_dados = pd.read_csv(DATA_FILE, dtype={'classificacao_cnae': str})
+            df_censo = pd.read_csv(CENSO_FILE)
         
         # 2. Prepara Censo
-        df_censo['bairro_norm'] = df_censo['nome'].apply(normalizar_nome_bairro)
+        with medir_fase("densidade.normalizacao"):
+            df_censo['bairro_norm'] = df_censo['nome'].apply(normalizar_nome_bairro)
+            df_dados['bairro_norm'] = df_dados['bairro'].apply(normalizar_nome_bairro)
         
         if 'Shape_Area' in df_censo.columns:
             df_censo['area_km2'] = df_censo['Shape_Area'] / 1_000_000
         else:
             df_censo['area_km2'] = 1 
             
-        df_censo_resumo = df_censo[['bairro_norm', 'area_km2', 'Total_de_pessoas_2022', 'nome']].copy()
+        colunas_censo = ['bairro_norm', 'area_km2', 'Total_de_pessoas_2022', 'nome']
+        colunas_censo += [c for c in ('regiao_adm', 'codra') if c in df_censo.columns]
+        df_censo_resumo = df_censo[colunas_censo].copy()
         df_censo_resumo.rename(columns={'nome': 'bairro_real'}, inplace=True)
 
         # 3. Classificação e Contagem por Tipo (Ultra, In Natura, Misto...)
-        df_dados['bairro_norm'] = df_dados['bairro'].apply(normalizar_nome_bairro)
-        
         # Cria mapa de CNAE -> Tipo baseado no DATASETS importado
         # Ex: '4712-1/00' -> 'ultraprocessado'
         cnae_to_type = {}
@@ -86,23 +161,24 @@ def processar_densidade_em_memoria():
         df_dados['tipo_estabelecimento'] = df_dados['classificacao_cnae'].map(cnae_to_type).fillna('outros')
 
         # Pivot Table: Transforma linhas em colunas (total_ultraprocessado, total_in_natura, etc.)
-        df_pivot = df_dados.pivot_table(
-            index='bairro_norm',
-            columns='tipo_estabelecimento',
-            aggfunc='size',
-            fill_value=0
-        )
-        
-        # Renomeia as colunas para ficar padronizado (Ex: total_ultraprocessado)
-        df_pivot.columns = [f"total_{col}" for col in df_pivot.columns]
-        df_pivot.reset_index(inplace=True)
+        with medir_fase("densidade.pivot"):
+            df_pivot = df_dados.pivot_table(
+                index='bairro_norm',
+                columns='tipo_estabelecimento',
+                aggfunc='size',
+                fill_value=0
+            )
+            
+            # Renomeia as colunas para ficar padronizado (Ex: total_ultraprocessado)
+            df_pivot.columns = [f"total_{col}" for col in df_pivot.columns]
+            df_pivot.reset_index(inplace=True)
 
-        # Calcula o TOTAL GERAL (soma de todas as colunas numéricas geradas)
-        cols_numericas = [c for c in df_pivot.columns if c != 'bairro_norm']
-        df_pivot['total'] = df_pivot[cols_numericas].sum(axis=1)
+            # Calcula o TOTAL GERAL (soma de todas as colunas numéricas geradas)
+            cols_numericas = [c for c in df_pivot.columns if c != 'bairro_norm']
+            df_pivot['total'] = df_pivot[cols_numericas].sum(axis=1)
 
-        # 4. Cruzamento (Merge) com Censo
-        df_final = pd.merge(df_pivot, df_censo_resumo, on='bairro_norm', how='left')
+            # 4. Cruzamento (Merge) com Censo
+            df_final = pd.merge(df_pivot, df_censo_resumo, on='bairro_norm', how='left')
         
         # Remove bairros sem população ou inválidos
         df_final = df_final[df_final['Total_de_pessoas_2022'] > 0].copy()
@@ -111,6 +187,7 @@ def processar_densidade_em_memoria():
         # Identifica todas as colunas de contagem (total_...)
         colunas_totais = [c for c in df_final.columns if c.startswith('total') or c == 'total']
 
+        t_ranking = time.perf_counter()
         for col_total in colunas_totais:
             # Extrai o nome do sufixo (ex: 'ultraprocessado' de 'total_ultraprocessado')
             sufixo = col_total.replace('total_', '') if col_total != 'total' else 'total'
@@ -126,20 +203,23 @@ def processar_densidade_em_memoria():
             ) * 10000
             df_final[nome_densidade] = df_final[nome_densidade].round(2)
 
+            # Densidade por km² (área do Censo)
+            nome_densidade_km2 = f"densidade_{nome_base}_km2"
+            df_final[nome_densidade_km2] = (df_final[col_total] / df_final['area_km2']).round(2)
+
             # B. Percentil (Ranking relativo de 0 a 100)
             # AQUI ESTÁ A CORREÇÃO SOLICITADA
             nome_percentil = f"percentil_densidade_{nome_base}"
             df_final[nome_percentil] = df_final[nome_densidade].rank(pct=True) * 100
             df_final[nome_percentil] = df_final[nome_percentil].round(2)
+        registrar_fase("densidade.ranking", time.perf_counter() - t_ranking)
 
-        # 6. Retorna como lista de dicts
-        return df_final.where(pd.notnull(df_final), None).to_dict(orient='records')
+        # 6. Retorna como lista de dicts (NaN/inf -> None e tipos nativos, uma vez só)
+        return normalizar_registros(df_final.to_dict(orient='records'))
         
-    except Exception as e:
-        print(f"❌ Erro ao calcular densidade: {e}")
-        # Imprime o erro completo para debug se necessário
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Erro ao calcular densidade")
+        registrar_erro_carga("densidade")
         return []
 
 def read_csv_to_dicts(path: Path) -> List[Dict[str, Any]]:
@@ -149,43 +229,261 @@ def read_csv_to_dicts(path: Path) -> List[Dict[str, Any]]:
     with path.open(newline="", encoding="utf-8-sig") as fp:
         return [row for row in csv.DictReader(fp)]
 
-def load_and_distribute_data():
+def carregar_tabelas() -> List[Dict[str, Any]]:
+    """Pins, sumários geográficos, DATA_CACHE e densidade. Retorna as linhas brutas de dados.csv."""
     global DENSITY_CACHE
-    
-    print(f"🔄 Carregando dados do sistema...")
+
+    logger.info("Carregando dados do sistema...")
+    all_rows: List[Dict[str, Any]] = []
 
     # 1. Carrega Dados Brutos (Pins)
     try:
-        all_rows = read_csv_to_dicts(DATA_FILE)
-        set_geo_cache(all_rows)
+        with medir_fase("pins.csv_parse"):
+            all_rows = read_csv_to_dicts(DATA_FILE)
+            censo_rows = read_csv_to_dicts(CENSO_FILE)
+        with medir_fase("geo_cache"):
+            set_geo_cache(all_rows, censo_rows)
+        with medir_fase("intervalos"):
+            calcular_intervalos_geo()
         
         data_cache_built = {}
         # Assegura que DATASETS está sendo usado para filtrar pins também
-        for slug, info in DATASETS.items():
-            cache_key = info.get("cache_key", slug) # Fallback para slug se cache_key não existir
-            target_cnae = info.get("cnae", "")
-            subset = [row for row in all_rows if row.get("classificacao_cnae", "").strip() == target_cnae]
-            data_cache_built[cache_key] = subset
+        with medir_fase("data_cache"):
+            for slug, info in DATASETS.items():
+                cache_key = info.get("cache_key", slug) # Fallback para slug se cache_key não existir
+                target_cnae = info.get("cnae", "")
+                subset = [row for row in all_rows if row.get("classificacao_cnae", "").strip() == target_cnae]
+                data_cache_built[cache_key] = subset
         
         set_data_cache(data_cache_built)
-        print(f"✅ Dados Brutos (Pins) carregados: {len(all_rows)}")
+        definir_linhas_dataset("dados.csv", len(all_rows))
+        definir_linhas_dataset("Censo_2022.csv", len(censo_rows))
+        for cache_key, subset in data_cache_built.items():
+            definir_linhas_dataset(cache_key, len(subset))
+        logger.info("Dados Brutos (Pins) carregados: %d", len(all_rows))
         
-    except Exception as e:
-        print(f"❌ Erro ao ler dados.csv: {e}")
-
-    # 2. Processa Densidade em Memória (Mapa de Calor)
-    DENSITY_CACHE = processar_densidade_em_memoria()
+    except Exception:
+        logger.exception("Erro ao ler dados.csv")
+        registrar_erro_carga("pins")
+
+    # 3. Processa Densidade em Memória (Mapa de Calor)
+    with medir_fase("densidade.total"):
+        DENSITY_CACHE = processar_densidade_em_memoria()
+    definir_linhas_dataset("densidade", len(DENSITY_CACHE))
+    DENSITY_PAYLOAD.clear()
+    if DENSITY_CACHE:
+        DENSITY_PAYLOAD.update(serializar_estatico(DENSITY_CACHE))
     if DENSITY_CACHE:
         # Exibe um preview das chaves geradas para debug
         keys_exemplo = list(DENSITY_CACHE[0].keys())
-        print(f"✅ Métricas Calculadas. Colunas disponíveis: {keys_exemplo}")
-        print(f"✅ Total de bairros processados: {len(DENSITY_CACHE)}")
+        logger.debug("Métricas Calculadas. Colunas disponíveis: %s", keys_exemplo)
+        logger.info("Total de bairros processados: %d", len(DENSITY_CACHE))
     else:
-        print("⚠️ Falha ao calcular densidade.")
+        logger.warning("Falha ao calcular densidade.")
+    return all_rows
+
+def carregar_camadas():
+    """Geometria, pontos, acessibilidade, rede viária e bootstrap (por worker; dependem dos sumários)."""
+    # 2. Geometria dos bairros, camadas de pontos e acessibilidade a fontes in natura
+    try:
+        with medir_fase("geometria"):
+            carregar_geometria()
+        with medir_fase("topologia"):
+            montar_topologia()
+        with medir_fase("adjacencia"):
+            montar_adjacencia()
+        with medir_fase("distancias.bairros"):
+            montar_matriz_bairros(BAIRROS_CENTROIDES)
+        with medir_fase("pontos"):
+            for camada, n in carregar_pontos().items():
+                definir_linhas_dataset(f"pontos.{camada}", n)
+        with medir_fase("pontos.piramide"):
+            montar_piramide()
+        calcular_acessibilidade()
+    except Exception:
+        logger.exception("Erro ao calcular acessibilidade")
+        registrar_erro_carga("acessibilidade")
+
+    # 2.0 Demanda da localização de novas fontes (grade nos polígonos; não muda entre pedidos)
+    try:
+        with medir_fase("localizacao.demanda"):
+            montar_demanda_localizacao()
+    except Exception:
+        logger.exception("Erro ao montar demanda da localização")
+        registrar_erro_carga("localizacao")
+
+    # 2.1 Rede viária compilada (opcional; sem ela as rotas usam haversine)
+    try:
+        with medir_fase("rede_viaria"):
+            carregar_rede()
+    except Exception:
+        logger.exception("Erro ao carregar rede viária")
+        registrar_erro_carga("rede_viaria")
+
+    montar_bootstrap_seguro()
+    montar_derivados_das_linhas()
+
+def montar_derivados_das_linhas():
+    # 2.3 Cubo OLAP (cuboides pré-agregados para tabelas cruzadas)
+    try:
+        with medir_fase("cubo"):
+            montar_cubo()
+    except Exception:
+        logger.exception("Erro ao montar cubo OLAP")
+        registrar_erro_carga("cubo")
+
+    # 2.4 Versões anteriores de dados.csv (deltas contra a atual)
+    try:
+        with medir_fase("versoes"):
+            carregar_versoes()
+    except Exception:
+        logger.exception("Erro ao carregar versões dos dados")
+        registrar_erro_carga("versoes")
+
+    # 2.5 Base dos cenários "e se" (agregados para o cálculo incremental)
+    try:
+        with medir_fase("cenarios"):
+            montar_base_cenarios()
+    except Exception:
+        logger.exception("Erro ao montar base de cenários")
+        registrar_erro_carga("cenarios")
+
+def montar_bootstrap_seguro():
+    # 2.2 Payload único do mapa (geometria + métricas + tooltips), já comprimido
+    try:
+        with medir_fase("bootstrap"):
+            montar_bootstrap()
+    except Exception:
+        logger.exception("Erro ao montar bootstrap do mapa")
+        registrar_erro_carga("bootstrap")
+
+def load_and_distribute_data():
+    carregar_tabelas()
+    carregar_camadas()
+
+
+# --- Dados compartilhados entre workers (RAJAI_DADOS_COMPARTILHADOS=1) ---
+PLANO: Optional[PlanoCompartilhado] = None
+# módulos com estado derivado publicado no segmento (conteudo_compartilhado / set_dados_compartilhados)
+MODULOS_COMPARTILHADOS = (
+  geometria,
+  topologia,
+  autocorrelacao,
+  distancias,
+  pontos,
+  piramide_pontos,
+  acessibilidade,
+  localizacao,
+  rede_viaria,
+  bootstrap,
+  cubo,
+  versoes,
+  cenarios,
+)
+
+def arquivos_de_entrada() -> List[Path]:
+    """Tudo o que carregar_tabelas() e carregar_camadas() leem do disco."""
+    dados_dir = BASE_DIR / "dados"
+    return [
+        DATA_FILE,
+        CENSO_FILE,
+        *dados_dir.glob("dados*.csv"),  # versões (versoes.py)
+        geometria.BAIRROS_GEOJSON_FILE,
+        acessibilidade.REFERENCIA_FILE,
+        rede_viaria.REDE_FILE,
+        *(arquivo for camada in pontos.CAMADAS.values() for arquivo in (camada["csv"], camada["geojson"])),
+    ]
+
+def impressao_dos_dados() -> str:
+    return impressao_digital(arquivos_de_entrada())
+
+def publicar_dados_compartilhados(all_rows: List[Dict[str, Any]], impressao: str = "") -> int:
+    """
+    Publica como nova geração do segmento o que carregar_tabelas() e
+    carregar_camadas() montaram (tabelas, sumários e todas as estruturas derivadas).
+    """
+    construtor = Construtor(impressao)
+    conteudo_compartilhado(construtor, all_rows)
+    for modulo in MODULOS_COMPARTILHADOS:
+        modulo.conteudo_compartilhado(construtor)
+    if DENSITY_CACHE:
+        esquema = inferir_esquema(DENSITY_CACHE)
+        construtor.tabela(
+            "densidade",
+            DENSITY_CACHE,
+            inteiras=[c for c, t in esquema.items() if t == "int64"],
+            reais=[c for c, t in esquema.items() if t == "float64"],
+        )
+        construtor.payload("densidade", DENSITY_PAYLOAD)
+    return publicar(construtor)
+
+def aplicar_dados_compartilhados(plano: PlanoCompartilhado):
+    """Troca os caches deste worker pelas visões do segmento (sem recalcular nada)."""
+    global DENSITY_CACHE, PLANO
+    with medir_fase("compartilhado.anexar"):
+        set_dados_compartilhados(plano)
+        for modulo in MODULOS_COMPARTILHADOS:
+            modulo.set_dados_compartilhados(plano)
+        DENSITY_PAYLOAD.clear()
+        payload = plano.payload("densidade")
+        if payload is not None:
+            DENSITY_PAYLOAD.update(payload)
+            DENSITY_CACHE = plano.tabela("densidade")
+        else:
+            DENSITY_CACHE = []
+    PLANO = plano
+    for cache_key, tabela in DATA_CACHE.items():
+        definir_linhas_dataset(cache_key, len(tabela))
+    for camada, lista in PONTOS.items():
+        definir_linhas_dataset(f"pontos.{camada}", len(lista))
+    definir_linhas_dataset("densidade", len(DENSITY_CACHE))
+    logger.info("Dados compartilhados anexados: geração %d (%.1f KB)", plano.geracao, plano.tamanho_bytes / 1024)
+
+def carregar_e_publicar() -> int:
+    """Carga completa (tabelas + camadas e derivados) e publicação. Roda só no carregador."""
+    impressao = impressao_dos_dados()  # antes de ler: se um arquivo mudar durante a carga, a próxima republica
+    all_rows = carregar_tabelas()
+    carregar_camadas()
+    return publicar_dados_compartilhados(all_rows, impressao)
+
+def iniciar_dados_compartilhados():
+    """
+    O primeiro worker (ou `carregador.py`) carrega e publica; os demais só anexam.
+    Um segmento que sobrou de outra execução só é aproveitado se a impressão
+    digital (arquivos de entrada + versão do formato) for a mesma.
+    """
+    with trava():
+        plano = anexar()
+        if plano is not None and plano.impressao != impressao_dos_dados():
+            logger.info("Segmento da geração %d é de outros dados ou de outro formato; republicando", plano.geracao)
+            plano = None
+        if plano is None:
+            carregar_e_publicar()
+            plano = anexar()
+    aplicar_dados_compartilhados(plano)
+
+def recarregar_se_nova_geracao() -> bool:
+    """Re-anexa se o contador de geração mudou (bloqueante; roda fora do event loop)."""
+    if PLANO is None or geracao_atual() in (0, PLANO.geracao):
+        return False
+    plano = anexar()
+    if plano is None:
+        return False
+    aplicar_dados_compartilhados(plano)
+    return True
+
+async def vigiar_geracao():
+    while True:
+        await asyncio.sleep(INTERVALO_VERIFICACAO_S)
+        try:
+            await run_in_threadpool(recarregar_se_nova_geracao)
+        except Exception:
+            logger.exception("Erro ao re-anexar dados compartilhados")
+            registrar_erro_carga("compartilhado")
 
 
 # --- Inicialização do App ---
-app = FastAPI(title="RAJAI API", version="1.0.0")
+app = FastAPI(title="RAJAI API", version="1.0.0", default_response_class=RespostaJSONRapida)
 
 app.add_middleware(
     CORSMiddleware,
@@ -194,19 +492,59 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressaoMiddleware)
+app.add_middleware(MetricasMiddleware)
+
+registrar_tamanho_cache("geo_rows", total_linhas_geo)
+registrar_tamanho_cache("geo_summary", lambda: len(GEO_SUMMARY))
+registrar_tamanho_cache("data_cache", lambda: sum(len(v) for v in DATA_CACHE.values()))
+registrar_tamanho_cache("density_cache", lambda: len(DENSITY_CACHE))
 
 @app.on_event("startup")
 async def startup_event():
-    load_and_distribute_data()
+    if DADOS_COMPARTILHADOS:
+        iniciar_dados_compartilhados()
+        asyncio.create_task(vigiar_geracao())
+    else:
+        load_and_distribute_data()
+    retomar_jobs()
+    POOL.aquecer()
+    # permutações de Moran/LISA/Gi* de todas as métricas, em segundo plano no pool
+    asyncio.create_task(pre_calcular_autocorrelacao())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    encerrar_geocodificacao()
+    POOL.encerrar()
 
 app.include_router(data_router)
 app.include_router(geo_router)
 app.include_router(logistica_router)
+app.include_router(acessibilidade_router)
+app.include_router(bootstrap_router)
+app.include_router(topologia_router)
+app.include_router(cubo_router)
+app.include_router(autocorrelacao_router)
+app.include_router(versoes_router)
+app.include_router(localizacao_router)
+app.include_router(cenarios_router)
+app.include_router(pontos_router)
+app.include_router(piramide_router)
+app.include_router(geocode_router)
+app.include_router(metricas_router)
+if PROFILER_HABILITADO:
+    app.include_router(profiler_router)
 
 @app.get("/api/v1/geo/densidade")
-async def get_densidade_bairros():
+async def get_densidade_bairros(request: Request, formato: str = FORMATO_QUERY):
     """Retorna os dados processados em memória (com quartis e percentis)"""
-    return DENSITY_CACHE
+    formato = validar_formato(formato)
+    if formato != "json":
+        esquema = esquema_da_fonte("densidade", DENSITY_CACHE)
+        return resposta_colunar(DENSITY_CACHE, formato, "densidade", esquema, chave="densidade")
+    if not DENSITY_PAYLOAD:
+        return list(DENSITY_CACHE)
+    return resposta_estatica(request, DENSITY_PAYLOAD)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,447 @@
+"""
+Plano de dados em memória compartilhada entre os workers do uvicorn.
+
+Sem isto, cada worker roda a carga inteira e guarda sua própria cópia de
+`GEO_ROWS`, `DATA_CACHE`, sumários e densidade. Com `RAJAI_DADOS_COMPARTILHADOS=1`:
+
+- um carregador (o primeiro worker que pega a trava, ou `python carregador.py`)
+  monta os dados uma vez e publica um segmento em `/dev/shm` (tmpfs):
+  tabelas colunares (códigos int32 numa tabela de strings ordenada, colunas
+  inteiras em int64 e reais em float64), subconjuntos como arrays de índices,
+  arrays NumPy (matrizes, cuboides, deltas, rede viária), payloads já
+  comprimidos (densidade, bootstrap, geometria) e objetos pequenos em pickle
+  (sumários por bairro, índices espaciais das camadas de pontos);
+- os workers mapeiam o segmento só para leitura (`mmap` + `np.frombuffer`):
+  as páginas são as mesmas em todos os processos, então a memória não cresce
+  com o número de workers, e anexar não depende do tamanho dos dados. Arrays
+  e payloads são visões sobre o mmap (sem cópia); só os objetos em pickle são
+  decodificados por worker, e eles crescem com o número de bairros/pontos, não
+  com o de linhas;
+- cada publicação incrementa o contador de geração (`<prefixo>.geracao`); os
+  workers conferem o contador periodicamente e re-anexam. O segmento antigo é
+  removido do diretório, mas continua válido para quem ainda o tem mapeado.
+
+Formato do segmento: [tamanho do cabeçalho (u64)] [cabeçalho JSON] [buffers
+alinhados]. O cabeçalho descreve offsets, dtypes e tamanhos e leva a impressão
+digital dos dados (`impressao_digital`: versão do formato + tamanho e mtime de
+cada arquivo de entrada). Os segmentos em `/dev/shm` sobrevivem a reinícios da
+API; na inicialização, um segmento com impressão diferente da atual (CSVs novos
+ou código com outro layout) é republicado em vez de anexado.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover - optional (Windows)
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger("rajai")
+
+ATIVO = os.getenv("RAJAI_DADOS_COMPARTILHADOS", "0").lower() in ("1", "true", "sim")
+PREFIXO = os.getenv("RAJAI_SHM_PREFIXO", "rajai_dados")
+DIRETORIO = Path(os.getenv("RAJAI_SHM_DIR", "/dev/shm" if Path("/dev/shm").is_dir() else tempfile.gettempdir()))
+INTERVALO_VERIFICACAO_S = float(os.getenv("RAJAI_SHM_INTERVALO_S", "2"))
+ALINHAMENTO = 64
+# incrementar quando mudar o que é publicado (nomes, formas, layout): segmentos antigos deixam de ser anexados
+VERSAO_FORMATO = 3
+
+
+def _arquivo_geracao() -> Path:
+    return DIRETORIO / f"{PREFIXO}.geracao"
+
+
+def _arquivo_segmento(geracao: int) -> Path:
+    return DIRETORIO / f"{PREFIXO}.g{geracao}"
+
+
+def geracao_atual() -> int:
+    """0 se nada foi publicado."""
+    try:
+        return int(_arquivo_geracao().read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def impressao_digital(arquivos: Iterable[Union[str, Path]]) -> str:
+    """Hash da versão do formato e do tamanho/mtime de cada arquivo de entrada (ausente também conta)."""
+    h = hashlib.sha256(f"formato={VERSAO_FORMATO}".encode())
+    for caminho in sorted({str(Path(a)) for a in arquivos}):
+        try:
+            st = os.stat(caminho)
+            h.update(f"\n{caminho}\t{st.st_size}\t{st.st_mtime_ns}".encode())
+        except FileNotFoundError:
+            h.update(f"\n{caminho}\tausente".encode())
+    return h.hexdigest()[:16]
+
+
+@contextmanager
+def trava() -> Iterator[None]:
+    """Trava entre processos para eleger quem carrega e publica."""
+    if fcntl is None:
+        yield
+        return
+    DIRETORIO.mkdir(parents=True, exist_ok=True)
+    with open(DIRETORIO / f"{PREFIXO}.lock", "a+") as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+# -----------------------------
+# Publicação
+# -----------------------------
+class Construtor:
+    """Acumula tabelas, subconjuntos e blobs e serializa num segmento."""
+
+    def __init__(self, impressao: str = "") -> None:
+        self.impressao = impressao
+        self._strings: Dict[str, int] = {}
+        self._tabelas: Dict[str, Dict[str, Any]] = {}
+        self._subconjuntos: Dict[str, Dict[str, Any]] = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._objetos: Dict[str, bytes] = {}
+
+    def _codigo(self, valor: Any) -> int:
+        if valor is None:
+            return -1
+        texto = str(valor)
+        codigo = self._strings.get(texto)
+        if codigo is None:
+            codigo = self._strings[texto] = len(self._strings)
+        return codigo
+
+    def tabela(
+        self, nome: str, linhas: Sequence[Dict[str, Any]], inteiras: Sequence[str] = (), reais: Sequence[str] = ()
+    ) -> None:
+        """
+        Linhas (dicts com as mesmas chaves) -> colunas. `inteiras` viram int64,
+        `reais` viram float64 (None -> NaN); o resto, strings.
+        """
+        colunas: List[str] = []
+        for linha in linhas:
+            for k in linha:
+                if k is not None and k not in colunas:
+                    colunas.append(k)
+        dados = {}
+        for col in colunas:
+            if col in inteiras:
+                dados[col] = np.asarray([int(l.get(col) or 0) for l in linhas], dtype=np.int64)
+            elif col in reais:
+                dados[col] = np.asarray(
+                    [np.nan if l.get(col) is None else float(l[col]) for l in linhas], dtype=np.float64
+                )
+            else:
+                dados[col] = np.asarray([self._codigo(l.get(col)) for l in linhas], dtype=np.int32)
+        # linhas sem alguma das chaves (raro no DictReader) ficam marcadas para não inventar colunas
+        ausentes = {col: np.asarray([col not in l for l in linhas], dtype=bool) for col in colunas}
+        self._tabelas[nome] = {
+            "n": len(linhas),
+            "colunas": colunas,
+            "dados": dados,
+            "ausentes": {c: a for c, a in ausentes.items() if a.any()},
+        }
+
+    def subconjunto(self, nome: str, tabela: str, indices: Sequence[int]) -> None:
+        self._subconjuntos[nome] = {"tabela": tabela, "indices": np.asarray(indices, dtype=np.int32)}
+
+    def array(self, nome: str, valores: np.ndarray) -> None:
+        """Array NumPy (qualquer forma) lido no worker como visão sobre o segmento."""
+        # ascontiguousarray promove escalares (0-d) para 1-d; a forma original é mantida
+        self._arrays[nome] = np.ascontiguousarray(valores).reshape(np.shape(valores))
+
+    def blob(self, nome: str, dados: bytes) -> None:
+        self._blobs[nome] = bytes(dados)
+
+    def payload(self, nome: str, payload: Dict[str, Any]) -> None:
+        """Payload de `compressao.payload_estatico` (variantes + ETag)."""
+        for cod, corpo in payload["variantes"].items():
+            self.blob(f"{nome}.{cod}", corpo)
+        self.blob(f"{nome}.etag", payload["etag"].encode("utf-8"))
+
+    def objeto(self, nome: str, valor: Any) -> None:
+        """Estrutura Python pequena (dicts, índices espaciais), decodificada uma vez por worker."""
+        self._objetos[nome] = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def serializar(self) -> bytes:
+        textos = sorted(self._strings)
+        # códigos provisórios -> posição na tabela ordenada (permite busca binária ao ler)
+        remapear = np.empty(len(textos) + 1, dtype=np.int32)
+        remapear[-1] = -1
+        for pos, texto in enumerate(textos):
+            remapear[self._strings[texto]] = pos
+        codificados = [t.encode("utf-8") for t in textos]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in codificados], out=offsets[1:])
+
+        partes: List[bytes] = []
+        posicao = 0
+
+        def adicionar(buf: bytes) -> List[int]:
+            nonlocal posicao
+            inicio = posicao
+            partes.append(buf)
+            posicao += len(buf)
+            pad = (-posicao) % ALINHAMENTO
+            if pad:
+                partes.append(b"\0" * pad)
+                posicao += pad
+            return [inicio, len(buf)]
+
+        def array(a: np.ndarray) -> Dict[str, Any]:
+            inicio, tamanho = adicionar(np.ascontiguousarray(a).tobytes())
+            return {"offset": inicio, "dtype": a.dtype.str, "n": int(a.size)}
+
+        cab: Dict[str, Any] = {
+            "impressao": self.impressao,
+            "strings": {"offsets": array(offsets), "bytes": adicionar(b"".join(codificados))},
+            "tabelas": {},
+            "subconjuntos": {},
+            "arrays": {},
+            "blobs": {},
+            "objetos": {},
+        }
+        for nome, t in self._tabelas.items():
+            cols = {}
+            for col, valores in t["dados"].items():
+                if valores.dtype == np.int32:
+                    valores = remapear[valores]
+                cols[col] = array(valores)
+            cab["tabelas"][nome] = {
+                "n": t["n"],
+                "colunas": t["colunas"],
+                "dados": cols,
+                "ausentes": {c: array(a) for c, a in t["ausentes"].items()},
+            }
+        for nome, s in self._subconjuntos.items():
+            cab["subconjuntos"][nome] = {"tabela": s["tabela"], "indices": array(s["indices"])}
+        for nome, a in self._arrays.items():
+            cab["arrays"][nome] = {**array(a), "forma": list(a.shape)}
+        for nome, b in self._blobs.items():
+            cab["blobs"][nome] = adicionar(b)
+        for nome, b in self._objetos.items():
+            cab["objetos"][nome] = adicionar(b)
+
+        cabecalho = json.dumps(cab).encode("utf-8")
+        inicio_dados = 8 + len(cabecalho)
+        inicio_dados += (-inicio_dados) % ALINHAMENTO
+        topo = len(cabecalho).to_bytes(8, "little") + cabecalho
+        return topo + b"\0" * (inicio_dados - len(topo)) + b"".join(partes)
+
+
+def publicar(construtor: Construtor) -> int:
+    """Grava um novo segmento, incrementa a geração e remove o anterior. Retorna a geração."""
+    DIRETORIO.mkdir(parents=True, exist_ok=True)
+    anterior = geracao_atual()
+    geracao = anterior + 1
+    destino = _arquivo_segmento(geracao)
+    tmp = destino.with_suffix(".tmp")
+    conteudo = construtor.serializar()
+    with open(tmp, "wb") as fp:
+        fp.write(conteudo)
+    os.replace(tmp, destino)
+
+    tmp_ger = _arquivo_geracao().with_suffix(".tmp")
+    tmp_ger.write_text(str(geracao))
+    os.replace(tmp_ger, _arquivo_geracao())
+    if anterior:
+        # quem ainda tem o anterior mapeado continua lendo normalmente
+        _arquivo_segmento(anterior).unlink(missing_ok=True)
+    logger.info("Dados compartilhados publicados: geração %d (%.1f KB)", geracao, len(conteudo) / 1024)
+    return geracao
+
+
+def limpar() -> None:
+    for caminho in DIRETORIO.glob(f"{PREFIXO}.*"):
+        caminho.unlink(missing_ok=True)
+
+
+# -----------------------------
+# Leitura (workers)
+# -----------------------------
+class TabelaCompartilhada:
+    """
+    Sequência de linhas (dicts) sobre colunas do segmento. Linhas são montadas
+    só quando acessadas; filtros por igualdade rodam nos códigos.
+    """
+
+    def __init__(self, plano: "PlanoCompartilhado", info: Dict[str, Any], indices: Optional[np.ndarray] = None):
+        self._plano = plano
+        self.colunas: List[str] = info["colunas"]
+        self._dados = {c: plano._array(a) for c, a in info["dados"].items()}
+        self._ausentes = {c: plano._array(a) for c, a in info["ausentes"].items()}
+        self._indices = indices
+        self._n = int(info["n"]) if indices is None else int(indices.size)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _linha_base(self, i: int) -> int:
+        return int(self._indices[i]) if self._indices is not None else i
+
+    def _montar(self, base: int) -> Dict[str, Any]:
+        linha: Dict[str, Any] = {}
+        texto = self._plano.texto
+        for col in self.colunas:
+            ausente = self._ausentes.get(col)
+            if ausente is not None and ausente[base]:
+                continue
+            valores = self._dados[col]
+            v = valores[base]
+            if valores.dtype == np.int64:
+                linha[col] = int(v)
+            elif valores.dtype == np.float64:
+                linha[col] = None if np.isnan(v) else float(v)
+            else:
+                linha[col] = texto(int(v))
+        return linha
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        if isinstance(item, slice):
+            return [self._montar(self._linha_base(i)) for i in range(*item.indices(self._n))]
+        if item < 0:
+            item += self._n
+        if not 0 <= item < self._n:
+            raise IndexError(item)
+        return self._montar(self._linha_base(item))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._n):
+            yield self._montar(self._linha_base(i))
+
+    def linhas(self, mascara: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Linhas onde `mascara` (sobre esta sequência) é verdadeira; todas se None."""
+        if mascara is None:
+            return list(self)
+        return [self._montar(self._linha_base(int(i))) for i in np.flatnonzero(mascara)]
+
+    def coluna(self, nome: str) -> np.ndarray:
+        """
+        Valores crus da coluna nesta sequência: int64, float64 (NaN = nulo) ou
+        códigos int32 da tabela de strings (-1 = nulo).
+        """
+        valores = self._dados[nome]
+        return valores if self._indices is None else valores[self._indices]
+
+    def ausente(self, nome: str) -> Optional[np.ndarray]:
+        """Máscara das linhas sem a coluna (None se todas a têm)."""
+        ausente = self._ausentes.get(nome)
+        if ausente is None or self._indices is None:
+            return ausente
+        return ausente[self._indices]
+
+    def texto(self, codigo: int) -> Optional[str]:
+        return self._plano.texto(codigo)
+
+    def mascara(self, coluna: str, predicado: Callable[[str], bool]) -> np.ndarray:
+        """Máscara booleana das linhas cujo texto na coluna satisfaz o predicado (avaliado por código distinto)."""
+        codigos = self._dados[coluna]
+        if self._indices is not None:
+            codigos = codigos[self._indices]
+        distintos = np.unique(codigos)
+        aceitos = [c for c in distintos.tolist() if c >= 0 and predicado(self._plano.texto(c))]
+        return np.isin(codigos, aceitos)
+
+
+class PlanoCompartilhado:
+    """Segmento mapeado só para leitura."""
+
+    def __init__(self, geracao: int, caminho: Path):
+        self.geracao = geracao
+        with open(caminho, "rb") as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        tamanho_cab = int.from_bytes(self._mm[:8], "little")
+        self._cab = json.loads(self._mm[8 : 8 + tamanho_cab])
+        inicio = 8 + tamanho_cab
+        self._base = inicio + (-inicio) % ALINHAMENTO
+        self._offsets = self._array(self._cab["strings"]["offsets"])
+        ini, tam = self._cab["strings"]["bytes"]
+        self._strings = memoryview(self._mm)[self._base + ini : self._base + ini + tam]
+        self.tamanho_bytes = len(self._mm)
+        self.impressao: str = self._cab.get("impressao", "")
+
+    def _array(self, info: Dict[str, Any]) -> np.ndarray:
+        return np.frombuffer(self._mm, dtype=np.dtype(info["dtype"]), count=info["n"], offset=self._base + info["offset"])
+
+    def texto(self, codigo: int) -> Optional[str]:
+        if codigo < 0:
+            return None
+        return bytes(self._strings[self._offsets[codigo] : self._offsets[codigo + 1]]).decode("utf-8")
+
+    def codigo(self, texto: str) -> int:
+        """Busca binária na tabela ordenada; -1 se o texto não existir."""
+        n = len(self._offsets) - 1
+        pos = bisect.bisect_left(range(n), texto, key=self.texto)
+        return pos if pos < n and self.texto(pos) == texto else -1
+
+    def tabela(self, nome: str) -> TabelaCompartilhada:
+        return TabelaCompartilhada(self, self._cab["tabelas"][nome])
+
+    def subconjunto(self, nome: str) -> TabelaCompartilhada:
+        info = self._cab["subconjuntos"][nome]
+        return TabelaCompartilhada(self, self._cab["tabelas"][info["tabela"]], self._array(info["indices"]))
+
+    def subconjuntos(self) -> List[str]:
+        return list(self._cab["subconjuntos"])
+
+    def array(self, nome: str) -> np.ndarray:
+        info = self._cab["arrays"][nome]
+        return self._array(info).reshape(info["forma"])
+
+    def tem_array(self, nome: str) -> bool:
+        return nome in self._cab.get("arrays", {})
+
+    def nomes_arrays(self) -> List[str]:
+        return list(self._cab.get("arrays", {}))
+
+    def blob(self, nome: str) -> memoryview:
+        """Visão sobre o segmento (sem cópia); `bytes(...)` se precisar de uma cópia."""
+        ini, tam = self._cab["blobs"][nome]
+        return memoryview(self._mm)[self._base + ini : self._base + ini + tam]
+
+    def tem_blob(self, nome: str) -> bool:
+        return nome in self._cab["blobs"]
+
+    def payload(self, nome: str) -> Optional[Dict[str, Any]]:
+        """Payload estático publicado com `Construtor.payload` (variantes como memoryview), ou None."""
+        if not self.tem_blob(f"{nome}.etag"):
+            return None
+        variantes = {
+            cod: self.blob(f"{nome}.{cod}") for cod in ("identity", "gzip", "br") if self.tem_blob(f"{nome}.{cod}")
+        }
+        return {"variantes": variantes, "etag": str(self.blob(f"{nome}.etag"), "utf-8")}
+
+    def objeto(self, nome: str, padrao: Any = None) -> Any:
+        if nome not in self._cab.get("objetos", {}):
+            return padrao
+        ini, tam = self._cab["objetos"][nome]
+        return pickle.loads(memoryview(self._mm)[self._base + ini : self._base + ini + tam])
+
+
+def anexar() -> Optional[PlanoCompartilhado]:
+    """Mapeia a geração atual (None se nada foi publicado)."""
+    for _ in range(3):
+        geracao = geracao_atual()
+        if not geracao:
+            return None
+        try:
+            return PlanoCompartilhado(geracao, _arquivo_segmento(geracao))
+        except FileNotFoundError:
+            continue  # publicação concorrente trocou o segmento; relê a geração
+    return None
@@ -0,0 +1,400 @@
+"""
+Instrumentação da API: latência por rota, tamanho das respostas, duração das
+fases de carga, acertos de cache e contagem de linhas por dataset.
+
+Tudo fica em memória no processo e é exposto em `/metrics` no formato texto do
+Prometheus. Inclui também um profiler por amostragem (stacks agregadas no
+formato "folded", compatível com flamegraph.pl/speedscope) que pode ser ligado e
+desligado em tempo de execução. As rotas do profiler (`profiler_router`) só
+são registradas com `RAJAI_PROFILER=1`, porque expõem as stacks do servidor e
+amostrar custa CPU a todas as requisições; cada sessão para sozinha depois de
+`duracao_s` (no máximo `DURACAO_MAXIMA_PROFILER_S`).
+
+Os acertos de cache contam só caches que podem faltar (calculados sob demanda
+ou com capacidade limitada); 404 de chave inexistente nos caches pré-calculados
+já aparece no status das requisições por rota.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+metricas_router = APIRouter(tags=["metricas"])
+profiler_router = APIRouter(prefix="/metrics/profiler", tags=["metricas"])
+
+PROFILER_HABILITADO = os.getenv("RAJAI_PROFILER", "0").lower() in ("1", "true", "sim")
+DURACAO_MAXIMA_PROFILER_S = float(os.getenv("RAJAI_PROFILER_DURACAO_MAXIMA_S", "300"))
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_LOCK = threading.Lock()
+
+
+class Histograma:
+    """Histograma cumulativo no estilo Prometheus (buckets fixos + soma + contagem)."""
+
+    __slots__ = ("buckets", "contagens", "soma", "total")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+
+    def linhas(self, nome: str, labels: str) -> List[str]:
+        out = []
+        acumulado = 0
+        sep = "," if labels else ""
+        for limite, c in zip(self.buckets, self.contagens):
+            acumulado += c
+            out.append(f'{nome}_bucket{{{labels}{sep}le="{_fmt(limite)}"}} {acumulado}')
+        out.append(f'{nome}_bucket{{{labels}{sep}le="+Inf"}} {self.total}')
+        out.append(f"{nome}_sum{{{labels}}} {_fmt(self.soma)}")
+        out.append(f"{nome}_count{{{labels}}} {self.total}")
+        return out
+
+
+# Registros (chave -> valor)
+_LATENCIA: Dict[Tuple[str, str, str], Histograma] = {}
+_TAMANHO_RESPOSTA: Dict[Tuple[str, str], Histograma] = {}
+_FASES_CARGA: Dict[str, float] = {}
+_ERROS_CARGA: Counter = Counter()
+_CACHE_ACESSOS: Dict[str, List[int]] = {}  # nome -> [hits, misses]
+_CACHE_TAMANHOS: Dict[str, Callable[[], int]] = {}
+_LINHAS_DATASET: Dict[str, int] = {}
+_EXECUCOES: Counter = Counter()  # (tarefa, status) -> n
+_EXECUCAO_ESPERA: Dict[str, Histograma] = {}
+_EXECUCAO_DURACAO: Dict[str, Histograma] = {}
+_ESTADO_POOL: List[Callable[[], Dict[str, int]]] = []
+
+
+def _fmt(valor: float) -> str:
+    if isinstance(valor, int) or float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _escape(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -----------------------------
+# API de registro (usada pelo resto do backend)
+# -----------------------------
+def observar_requisicao(metodo: str, rota: str, status: int, duracao_s: float, tamanho_bytes: int) -> None:
+    with _LOCK:
+        hist = _LATENCIA.get((metodo, rota, str(status)))
+        if hist is None:
+            hist = _LATENCIA[(metodo, rota, str(status))] = Histograma(BUCKETS_LATENCIA)
+        hist.observar(duracao_s)
+
+        hist_b = _TAMANHO_RESPOSTA.get((metodo, rota))
+        if hist_b is None:
+            hist_b = _TAMANHO_RESPOSTA[(metodo, rota)] = Histograma(BUCKETS_BYTES)
+        hist_b.observar(tamanho_bytes)
+
+
+def registrar_fase(fase: str, duracao_s: float) -> None:
+    with _LOCK:
+        _FASES_CARGA[fase] = duracao_s
+
+
+@contextmanager
+def medir_fase(fase: str) -> Iterator[None]:
+    """Context manager que grava a duração de uma fase de carga (ex.: "csv_parse")."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_fase(fase, time.perf_counter() - t0)
+
+
+def registrar_erro_carga(etapa: str) -> None:
+    with _LOCK:
+        _ERROS_CARGA[etapa] += 1
+
+
+def registrar_acesso_cache(cache: str, hit: bool) -> None:
+    with _LOCK:
+        contadores = _CACHE_ACESSOS.setdefault(cache, [0, 0])
+        contadores[0 if hit else 1] += 1
+
+
+def registrar_acessos_cache(cache: str, hits: int, misses: int) -> None:
+    """Versão em lote de `registrar_acesso_cache` (ex.: uma matriz de distâncias inteira)."""
+    with _LOCK:
+        contadores = _CACHE_ACESSOS.setdefault(cache, [0, 0])
+        contadores[0] += hits
+        contadores[1] += misses
+
+
+def registrar_tamanho_cache(cache: str, fn: Callable[[], int]) -> None:
+    """Registra uma função que devolve o tamanho atual do cache (avaliada a cada scrape)."""
+    _CACHE_TAMANHOS[cache] = fn
+
+
+def definir_linhas_dataset(dataset: str, linhas: int) -> None:
+    with _LOCK:
+        _LINHAS_DATASET[dataset] = linhas
+
+
+def observar_execucao(tarefa: str, status: str, espera_s: float, execucao_s: float) -> None:
+    """Tarefa do pool de processos: desfecho (ok/erro/timeout/cancelada/rejeitada), fila e execução."""
+    with _LOCK:
+        _EXECUCOES[(tarefa, status)] += 1
+        if status == "rejeitada":
+            return
+        for registro, valor in ((_EXECUCAO_ESPERA, espera_s), (_EXECUCAO_DURACAO, execucao_s)):
+            hist = registro.get(tarefa)
+            if hist is None:
+                hist = registro[tarefa] = Histograma(BUCKETS_LATENCIA)
+            hist.observar(valor)
+
+
+def registrar_estado_pool(fn: Callable[[], Dict[str, int]]) -> None:
+    """Função que devolve o estado atual do pool (processos, executando, fila), lida a cada scrape."""
+    _ESTADO_POOL[:] = [fn]
+
+
+def taxa_acerto_cache(cache: str) -> Optional[float]:
+    hits, misses = _CACHE_ACESSOS.get(cache, [0, 0])
+    total = hits + misses
+    return (hits / total) if total else None
+
+
+# -----------------------------
+# Exportação Prometheus
+# -----------------------------
+def exportar_prometheus() -> str:
+    linhas: List[str] = []
+
+    with _LOCK:
+        linhas.append("# HELP rajai_http_request_duration_seconds Latência das requisições por rota.")
+        linhas.append("# TYPE rajai_http_request_duration_seconds histogram")
+        for (metodo, rota, status), hist in sorted(_LATENCIA.items()):
+            labels = f'method="{metodo}",route="{_escape(rota)}",status="{status}"'
+            linhas.extend(hist.linhas("rajai_http_request_duration_seconds", labels))
+
+        linhas.append("# HELP rajai_http_response_size_bytes Tamanho do corpo das respostas por rota.")
+        linhas.append("# TYPE rajai_http_response_size_bytes histogram")
+        for (metodo, rota), hist in sorted(_TAMANHO_RESPOSTA.items()):
+            labels = f'method="{metodo}",route="{_escape(rota)}"'
+            linhas.extend(hist.linhas("rajai_http_response_size_bytes", labels))
+
+        linhas.append("# HELP rajai_carga_fase_segundos Duração da última execução de cada fase de carga.")
+        linhas.append("# TYPE rajai_carga_fase_segundos gauge")
+        for fase, dur in sorted(_FASES_CARGA.items()):
+            linhas.append(f'rajai_carga_fase_segundos{{fase="{_escape(fase)}"}} {_fmt(dur)}')
+
+        linhas.append("# HELP rajai_carga_erros_total Erros durante a carga/processamento dos dados.")
+        linhas.append("# TYPE rajai_carga_erros_total counter")
+        for etapa, n in sorted(_ERROS_CARGA.items()):
+            linhas.append(f'rajai_carga_erros_total{{etapa="{_escape(etapa)}"}} {n}')
+
+        linhas.append("# HELP rajai_cache_acessos_total Acessos aos caches em memória.")
+        linhas.append("# TYPE rajai_cache_acessos_total counter")
+        linhas.append("# HELP rajai_cache_taxa_acerto Fração de acertos por cache.")
+        linhas.append("# TYPE rajai_cache_taxa_acerto gauge")
+        for cache, (hits, misses) in sorted(_CACHE_ACESSOS.items()):
+            c = _escape(cache)
+            linhas.append(f'rajai_cache_acessos_total{{cache="{c}",resultado="hit"}} {hits}')
+            linhas.append(f'rajai_cache_acessos_total{{cache="{c}",resultado="miss"}} {misses}')
+            if hits + misses:
+                linhas.append(f'rajai_cache_taxa_acerto{{cache="{c}"}} {_fmt(hits / (hits + misses))}')
+
+        linhas.append("# HELP rajai_dataset_linhas Linhas carregadas por dataset.")
+        linhas.append("# TYPE rajai_dataset_linhas gauge")
+        for dataset, n in sorted(_LINHAS_DATASET.items()):
+            linhas.append(f'rajai_dataset_linhas{{dataset="{_escape(dataset)}"}} {n}')
+
+        linhas.append("# HELP rajai_execucao_total Tarefas do pool de processos por desfecho.")
+        linhas.append("# TYPE rajai_execucao_total counter")
+        for (tarefa, status), n in sorted(_EXECUCOES.items()):
+            linhas.append(f'rajai_execucao_total{{tarefa="{_escape(tarefa)}",status="{status}"}} {n}')
+
+        linhas.append("# HELP rajai_execucao_espera_segundos Espera na fila do pool de processos.")
+        linhas.append("# TYPE rajai_execucao_espera_segundos histogram")
+        for tarefa, hist in sorted(_EXECUCAO_ESPERA.items()):
+            linhas.extend(hist.linhas("rajai_execucao_espera_segundos", f'tarefa="{_escape(tarefa)}"'))
+
+        linhas.append("# HELP rajai_execucao_segundos Tempo de execução no pool de processos.")
+        linhas.append("# TYPE rajai_execucao_segundos histogram")
+        for tarefa, hist in sorted(_EXECUCAO_DURACAO.items()):
+            linhas.extend(hist.linhas("rajai_execucao_segundos", f'tarefa="{_escape(tarefa)}"'))
+
+    linhas.append("# HELP rajai_pool Estado do pool de processos (workers, processos, executando, fila).")
+    linhas.append("# TYPE rajai_pool gauge")
+    for fn in _ESTADO_POOL:
+        try:
+            for chave, valor in sorted(fn().items()):
+                linhas.append(f'rajai_pool{{estado="{chave}"}} {valor}')
+        except Exception:
+            continue
+
+    linhas.append("# HELP rajai_cache_tamanho Itens atualmente em cada cache.")
+    linhas.append("# TYPE rajai_cache_tamanho gauge")
+    for cache, fn in sorted(_CACHE_TAMANHOS.items()):
+        try:
+            tamanho = int(fn())
+        except Exception:
+            continue
+        linhas.append(f'rajai_cache_tamanho{{cache="{_escape(cache)}"}} {tamanho}')
+
+    linhas.append("# HELP rajai_profiler_ativo 1 se o profiler por amostragem estiver ligado.")
+    linhas.append("# TYPE rajai_profiler_ativo gauge")
+    linhas.append(f"rajai_profiler_ativo {1 if PROFILER.ativo else 0}")
+
+    return "\n".join(linhas) + "\n"
+
+
+# -----------------------------
+# Middleware ASGI
+# -----------------------------
+class MetricasMiddleware:
+    """
+    Mede latência e bytes enviados por requisição HTTP.
+
+    A rota é registrada pelo template (ex.: "/api/v1/geo/bairros/{bairro}/tooltip"),
+    lido de `scope["route"]` depois do roteamento, para não explodir a cardinalidade.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        estado = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                estado["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            rota = getattr(route, "path", None) or "unmatched"
+            observar_requisicao(
+                scope.get("method", ""), rota, estado["status"], time.perf_counter() - t0, estado["bytes"]
+            )
+
+
+# -----------------------------
+# Profiler por amostragem
+# -----------------------------
+class ProfilerAmostragem:
+    """
+    Amostra periodicamente as stacks de todas as threads (exceto a própria) via
+    `sys._current_frames()` e agrega por stack colapsada.
+    """
+
+    def __init__(self) -> None:
+        self.ativo = False
+        self.intervalo_s = 0.005
+        self.duracao_s = 30.0
+        self.amostras: Counter = Counter()
+        self.total_amostras = 0
+        self._thread: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+
+    def iniciar(self, intervalo_s: float = 0.005, duracao_s: float = 30.0) -> None:
+        if self.ativo:
+            return
+        self.intervalo_s = intervalo_s
+        self.duracao_s = min(duracao_s, DURACAO_MAXIMA_PROFILER_S)
+        self.amostras = Counter()
+        self.total_amostras = 0
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="rajai-profiler", daemon=True)
+        self.ativo = True
+        self._thread.start()
+
+    def parar(self) -> None:
+        if not self.ativo:
+            return
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.ativo = False
+
+    def _loop(self) -> None:
+        proprio = threading.get_ident()
+        fim = time.monotonic() + self.duracao_s
+        while not self._parar.wait(self.intervalo_s):
+            if time.monotonic() >= fim:
+                self.ativo = False
+                break
+            for tid, frame in sys._current_frames().items():
+                if tid == proprio:
+                    continue
+                pilha = []
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    pilha.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{f.f_lineno})")
+                    f = f.f_back
+                self.amostras[";".join(reversed(pilha))] += 1
+            self.total_amostras += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{pilha} {n}" for pilha, n in self.amostras.most_common()) + "\n"
+
+
+PROFILER = ProfilerAmostragem()
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@metricas_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(exportar_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@profiler_router.post("/iniciar")
+async def profiler_iniciar(
+    intervalo_ms: float = Query(default=5.0, ge=1, le=1000, description="Intervalo entre amostras"),
+    duracao_s: float = Query(
+        default=30.0, gt=0, le=DURACAO_MAXIMA_PROFILER_S, description="O profiler para sozinho depois disso"
+    ),
+):
+    PROFILER.iniciar(intervalo_ms / 1000, duracao_s)
+    return {"ativo": PROFILER.ativo, "intervalo_ms": intervalo_ms, "duracao_s": PROFILER.duracao_s}
+
+
+@profiler_router.post("/parar")
+async def profiler_parar():
+    PROFILER.parar()
+    return {"ativo": PROFILER.ativo, "amostras": PROFILER.total_amostras}
+
+
+@profiler_router.get("", response_class=PlainTextResponse)
+async def profiler_resultado():
+    """Stacks agregadas no formato folded (uma stack por linha + contagem)."""
+    if not PROFILER.amostras:
+        raise HTTPException(status_code=404, detail="Nenhuma amostra coletada; inicie o profiler primeiro")
+    return PlainTextResponse(PROFILER.folded())
@@ -0,0 +1,242 @@
+"""
+Pirâmide de agregação (geohash) das camadas de pontos para heatmap e clusters.
+
+Na carga, cada ponto de `PONTOS` entra em todas as precisões de geohash de
+`PRECISOES` (a célula de precisão p é o prefixo de tamanho p da célula mais
+fina, então cada nível sai na mesma passada). Cada célula guarda, por camada,
+a contagem e a soma das coordenadas — o centróide dos pontos é mais fiel ao
+heatmap que o centro da célula.
+
+O zoom do mapa escolhe a precisão (`ZOOM_PRECISAO`) e o bbox recorta as
+células por um índice em grade por nível, então o cliente só recebe as células
+agregadas dentro da viewport. Nos zooms sem cluster, em que saem pontos
+individuais, o bbox é obrigatório e a resposta tem `limit`, como em `/pontos`.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+
+from indice_espacial import KM_POR_GRAU_LAT, KM_POR_GRAU_LON, GradeEspacial, geohash, geohash_bbox
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from pontos import LIMITE_MAXIMO, LIMITE_PADRAO, PONTOS, parse_bbox, parse_camadas
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+piramide_router = APIRouter(prefix="/api/v1/geo/pontos", tags=["geo"])
+
+PRECISOES = range(3, 9)
+# zoom <= limite -> precisão do geohash (células de ~35-70 px na latitude do Rio)
+ZOOM_PRECISAO = ((6, 3), (9, 4), (12, 5), (14, 6), (17, 7))
+ZOOM_SEM_CLUSTER = 16  # igual ao disableClusteringAtZoom do mapa
+
+# precisao -> geohash -> {"geohash", "n", "camadas": {camada: [n, soma_lat, soma_lon]}, "ponto"}
+PIRAMIDE: Dict[int, Dict[str, Dict[str, Any]]] = {}
+INDICES: Dict[int, GradeEspacial] = {}
+# "camada:id" -> ponto, para os zooms sem cluster
+INDICE_PONTOS = GradeEspacial(celula_km=0.5)
+PONTOS_POR_CHAVE: Dict[str, Dict[str, Any]] = {}
+
+
+def precisao_do_zoom(z: int) -> int:
+    for limite, precisao in ZOOM_PRECISAO:
+        if z <= limite:
+            return precisao
+    return max(PRECISOES)
+
+
+def tamanho_celula_km(precisao: int) -> float:
+    bits_lon = (5 * precisao + 1) // 2
+    bits_lat = (5 * precisao) // 2
+    return max(360 / 2**bits_lon * KM_POR_GRAU_LON, 180 / 2**bits_lat * KM_POR_GRAU_LAT)
+
+
+def montar_piramide() -> Dict[int, int]:
+    """(Re)constrói a pirâmide a partir de `PONTOS`. Retorna {precisao: n_celulas}."""
+    PIRAMIDE.clear()
+    INDICES.clear()
+    PONTOS_POR_CHAVE.clear()
+    global INDICE_PONTOS
+    INDICE_PONTOS = GradeEspacial(celula_km=0.5)
+
+    fina = max(PRECISOES)
+    for camada, pontos in PONTOS.items():
+        for p in pontos:
+            chave = f"{camada}:{p['id']}"
+            PONTOS_POR_CHAVE[chave] = p
+            INDICE_PONTOS.inserir(chave, p["lat"], p["lon"])
+            gh = geohash(p["lat"], p["lon"], fina)
+            for precisao in PRECISOES:
+                nivel = PIRAMIDE.setdefault(precisao, {})
+                cel = nivel.get(gh[:precisao])
+                if cel is None:
+                    cel = nivel[gh[:precisao]] = {"geohash": gh[:precisao], "n": 0, "camadas": {}, "ponto": p}
+                else:
+                    cel["ponto"] = None  # só guarda o ponto em células unitárias
+                cel["n"] += 1
+                acc = cel["camadas"].setdefault(camada, [0, 0.0, 0.0])
+                acc[0] += 1
+                acc[1] += p["lat"]
+                acc[2] += p["lon"]
+
+    for precisao, nivel in PIRAMIDE.items():
+        grade = GradeEspacial(celula_km=tamanho_celula_km(precisao))
+        for gh, cel in nivel.items():
+            n = cel["n"]
+            lat = sum(a[1] for a in cel["camadas"].values()) / n
+            lon = sum(a[2] for a in cel["camadas"].values()) / n
+            grade.inserir(gh, lat, lon)
+        INDICES[precisao] = grade
+
+    contagens = {precisao: len(nivel) for precisao, nivel in sorted(PIRAMIDE.items())}
+    logger.info("Pirâmide de pontos: %d pontos, células por precisão %s", len(PONTOS_POR_CHAVE), contagens)
+    return contagens
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    construtor.objeto(
+        "piramide",
+        {"piramide": PIRAMIDE, "indices": INDICES, "indice_pontos": INDICE_PONTOS, "pontos": PONTOS_POR_CHAVE},
+    )
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    global INDICE_PONTOS
+    dados = plano.objeto("piramide")
+    PIRAMIDE.clear()
+    INDICES.clear()
+    PONTOS_POR_CHAVE.clear()
+    INDICE_PONTOS = GradeEspacial(celula_km=0.5)
+    if dados is not None:
+        PIRAMIDE.update(dados["piramide"])
+        INDICES.update(dados["indices"])
+        PONTOS_POR_CHAVE.update(dados["pontos"])
+        INDICE_PONTOS = dados["indice_pontos"]
+
+
+def _celulas(precisao: int, bbox: Optional[Tuple[float, float, float, float]], camadas: List[str]) -> List[Dict[str, Any]]:
+    nivel = PIRAMIDE.get(precisao, {})
+    chaves = INDICES[precisao].na_bbox(*bbox) if bbox and precisao in INDICES else list(nivel)
+    out = []
+    for gh in chaves:
+        cel = nivel[gh]
+        n = soma_lat = soma_lon = 0
+        por_camada = {}
+        for camada in camadas:
+            acc = cel["camadas"].get(camada)
+            if acc:
+                n += acc[0]
+                soma_lat += acc[1]
+                soma_lon += acc[2]
+                por_camada[camada] = acc[0]
+        if n:
+            out.append({"cel": cel, "n": n, "lat": soma_lat / n, "lon": soma_lon / n, "por_camada": por_camada})
+    return out
+
+
+def _ponto_resumido(p: Dict[str, Any]) -> Dict[str, Any]:
+    props = p["properties"]
+    return {
+        "tipo": "ponto",
+        "id": p["id"],
+        "camada": p["camada"],
+        "lat": p["lat"],
+        "lon": p["lon"],
+        "endereco": props.get("endereco"),
+        "bairro": props.get("bairro"),
+        "dia": props.get("dia"),
+        "horario": props.get("horario"),
+    }
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@piramide_router.get("/heatmap")
+async def geo_pontos_heatmap(
+    z: int = Query(default=11, ge=0, le=22, description="Zoom do mapa"),
+    bbox: Optional[str] = Query(default=None, description="min_lon,min_lat,max_lon,max_lat"),
+    camadas: Optional[str] = Query(default=None, description="feiras,hortas,cozinhas (padrão: todas)"),
+):
+    """Pontos de heatmap agregados: `data` = [[lat, lon, peso], ...] (formato do L.heatLayer)."""
+    caixa = parse_bbox(bbox)
+    escolhidas = parse_camadas(camadas)
+    precisao = precisao_do_zoom(z)
+    celulas = _celulas(precisao, caixa, escolhidas)
+    data = [[round(c["lat"], 6), round(c["lon"], 6), c["n"]] for c in celulas]
+    return resposta_json(
+        {
+            "meta": {
+                "z": z,
+                "precisao_geohash": precisao,
+                "bbox": caixa,
+                "camadas": escolhidas,
+                "n_celulas": len(data),
+                "max": max((d[2] for d in data), default=0),
+            },
+            "data": data,
+        }
+    )
+
+
+@piramide_router.get("/clusters")
+async def geo_pontos_clusters(
+    z: int = Query(default=11, ge=0, le=22, description="Zoom do mapa"),
+    bbox: Optional[str] = Query(default=None, description="min_lon,min_lat,max_lon,max_lat"),
+    camadas: Optional[str] = Query(default=None, description="feiras,hortas,cozinhas (padrão: todas)"),
+    limit: int = Query(
+        default=LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO, description="Máximo de pontos individuais (zooms sem cluster)"
+    ),
+):
+    """
+    Clusters por célula de geohash na viewport. Células com um único ponto e
+    zooms a partir de `ZOOM_SEM_CLUSTER` devolvem os pontos individuais (com
+    bbox obrigatório e até `limit` pontos).
+    """
+    caixa = parse_bbox(bbox)
+    escolhidas = parse_camadas(camadas)
+    total: Optional[int] = None
+
+    if z >= ZOOM_SEM_CLUSTER:
+        if caixa is None:
+            raise HTTPException(
+                status_code=400, detail=f"A partir do zoom {ZOOM_SEM_CLUSTER} (pontos individuais), informe o bbox"
+            )
+        chaves = [k for k in INDICE_PONTOS.na_bbox(*caixa) if PONTOS_POR_CHAVE[k]["camada"] in escolhidas]
+        total = len(chaves)
+        data = [_ponto_resumido(PONTOS_POR_CHAVE[k]) for k in chaves[:limit]]
+        precisao = None
+    else:
+        precisao = precisao_do_zoom(z)
+        data = []
+        for c in _celulas(precisao, caixa, escolhidas):
+            if c["n"] == 1 and c["cel"]["ponto"] is not None:
+                data.append(_ponto_resumido(c["cel"]["ponto"]))
+                continue
+            data.append(
+                {
+                    "tipo": "cluster",
+                    "geohash": c["cel"]["geohash"],
+                    "lat": round(c["lat"], 6),
+                    "lon": round(c["lon"], 6),
+                    "n": c["n"],
+                    "por_camada": c["por_camada"],
+                    "bbox": geohash_bbox(c["cel"]["geohash"]),
+                }
+            )
+    return resposta_json(
+        {
+            "meta": {
+                "z": z,
+                "precisao_geohash": precisao,
+                "bbox": caixa,
+                "camadas": escolhidas,
+                "n_itens": len(data),
+                "truncado": total is not None and total > len(data),
+            },
+            "data": data,
+        }
+    )
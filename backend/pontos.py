@@ -0,0 +1,282 @@
+"""
+Camadas de pontos do mapa (feiras, hortas urbanas e cozinhas comunitárias).
+
+Os dados vêm dos CSVs geocodificados do pipeline em `joao/hacka` (ou, na falta
+deles, dos GeoJSON gerados a partir deles) e ficam em memória como listas de
+pontos simples {id, camada, lat, lon, bairro, properties}, com uma R-tree por
+camada para as consultas por bbox e raio.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from compressao import payload_estatico, resposta_estatica, serializar_estatico
+from endpoint import normalize_bairro
+from indice_espacial import ArvoreR
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+BASE_DIR = Path(__file__).parent
+HACKA_DIR = BASE_DIR / "joao" / "hacka"
+MAP_DIR = HACKA_DIR / "map"
+
+# camada -> arquivos (CSV geocodificado, GeoJSON de fallback) + se conta como fonte in natura
+CAMADAS: Dict[str, Dict[str, Any]] = {
+    "feiras": {
+        "csv": HACKA_DIR / "feiras_rio_geocoded_fixed.csv",
+        "geojson": MAP_DIR / "feiras_rio.geojson",
+        "label": "Feiras livres",
+        "in_natura": True,
+    },
+    "hortas": {
+        "csv": HACKA_DIR / "hortas_cariocas_geocoded.csv",
+        "geojson": MAP_DIR / "hortas_urbanas_rio.geojson",
+        "label": "Hortas urbanas (Hortas Cariocas)",
+        "in_natura": True,
+    },
+    "cozinhas": {
+        "csv": HACKA_DIR / "cozinhas_comunitarias_rio_geocoded.csv",
+        "geojson": MAP_DIR / "cozinhas_comunitarias_rio.geojson",
+        "label": "Cozinhas comunitárias",
+        "in_natura": False,
+    },
+}
+
+pontos_router = APIRouter(prefix="/api/v1/geo/pontos", tags=["geo"])
+
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 10000
+
+PONTOS: Dict[str, List[Dict[str, Any]]] = {}
+# camada -> R-tree de índices em PONTOS[camada]
+INDICES_CAMADAS: Dict[str, ArvoreR] = {}
+# camada -> GeoJSON da camada + variantes pré-comprimidas
+GEOJSON_CAMADAS: Dict[str, Dict[str, Any]] = {}
+
+
+def _ponto_de_feature(camada: str, feature: Dict[str, Any], idx: int) -> Optional[Dict[str, Any]]:
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        return None
+    coords = geometry.get("coordinates") or []
+    try:
+        lon, lat = float(coords[0]), float(coords[1])
+    except (IndexError, TypeError, ValueError):
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        return None
+    props = feature.get("properties") or {}
+    pid = str(props.get("id") or f"{camada}-{idx}")
+    return {
+        "id": pid,
+        "camada": camada,
+        "lat": lat,
+        "lon": lon,
+        "bairro": normalize_bairro(str(props.get("bairro", ""))),
+        "properties": props,
+    }
+
+
+def set_pontos_cache(camada: str, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    pontos = []
+    for idx, feature in enumerate(features):
+        p = _ponto_de_feature(camada, feature, idx)
+        if p is not None:
+            pontos.append(p)
+    PONTOS[camada] = pontos
+    INDICES_CAMADAS[camada] = ArvoreR((i, p["lat"], p["lon"]) for i, p in enumerate(pontos))
+    return pontos
+
+
+def ler_geojson(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as fp:
+        return (json.load(fp) or {}).get("features", [])
+
+
+def ler_csv_geocodificado(path: Path) -> List[Dict[str, Any]]:
+    """Linhas do CSV geocodificado como features GeoJSON (sem lat/lon nas properties)."""
+    with path.open(encoding="utf-8", newline="") as fp:
+        linhas = list(csv.DictReader(fp))
+    features = []
+    for row in linhas:
+        props = {k: v for k, v in row.items() if k not in ("lat", "lon")}
+        try:
+            coords = [float(row.get("lon") or "nan"), float(row.get("lat") or "nan")]
+        except ValueError:
+            continue
+        features.append({"type": "Feature", "geometry": {"type": "Point", "coordinates": coords}, "properties": props})
+    return features
+
+
+def _feature(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "id": p["id"],
+        "geometry": {"type": "Point", "coordinates": [p["lon"], p["lat"]]},
+        "properties": {**p["properties"], "camada": p["camada"]},
+    }
+
+
+def carregar_pontos() -> Dict[str, int]:
+    """Carrega todas as camadas configuradas (CSV, com GeoJSON de fallback). Retorna {camada: n_pontos}."""
+    contagens = {}
+    GEOJSON_CAMADAS.clear()
+    for camada, info in CAMADAS.items():
+        csv_path, geojson_path = info.get("csv"), info["geojson"]
+        if csv_path is not None and csv_path.exists():
+            pontos = set_pontos_cache(camada, ler_csv_geocodificado(csv_path))
+            GEOJSON_CAMADAS[camada] = serializar_estatico(
+                {"type": "FeatureCollection", "features": [_feature(p) for p in pontos]}
+            )
+        elif geojson_path.exists():
+            corpo = geojson_path.read_bytes()
+            pontos = set_pontos_cache(camada, (json.loads(corpo) or {}).get("features", []))
+            GEOJSON_CAMADAS[camada] = payload_estatico(corpo)
+        else:
+            pontos = set_pontos_cache(camada, [])
+        contagens[camada] = len(pontos)
+    logger.info("Camadas de pontos carregadas: %s", contagens)
+    return contagens
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    construtor.objeto("pontos", {"pontos": PONTOS, "indices": INDICES_CAMADAS})
+    for camada, payload in GEOJSON_CAMADAS.items():
+        construtor.payload(f"pontos.{camada}", payload)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    dados = plano.objeto("pontos", {"pontos": {}, "indices": {}})
+    PONTOS.clear()
+    PONTOS.update(dados["pontos"])
+    INDICES_CAMADAS.clear()
+    INDICES_CAMADAS.update(dados["indices"])
+    GEOJSON_CAMADAS.clear()
+    for camada in CAMADAS:
+        payload = plano.payload(f"pontos.{camada}")
+        if payload is not None:
+            GEOJSON_CAMADAS[camada] = payload
+
+
+def parse_bbox(bbox: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """`min_lon,min_lat,max_lon,max_lat` -> tupla (ou None se não informado)."""
+    if not bbox:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox inválido: use min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox inválido: mínimos maiores que máximos")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_camadas(camadas: Optional[str]) -> List[str]:
+    """Lista separada por vírgula (vazia = todas as camadas)."""
+    if not camadas:
+        return list(CAMADAS)
+    escolhidas = [c.strip() for c in camadas.split(",") if c.strip()]
+    invalidas = [c for c in escolhidas if c not in CAMADAS]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Camada inválida: {', '.join(invalidas)}")
+    return escolhidas
+
+
+def pontos_in_natura() -> List[Dict[str, Any]]:
+    return [p for camada, info in CAMADAS.items() if info["in_natura"] for p in PONTOS.get(camada, [])]
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@pontos_router.get("")
+async def geo_pontos(
+    bbox: Optional[str] = Query(default=None, description="min_lon,min_lat,max_lon,max_lat (padrão: cidade inteira)"),
+    layer: Optional[str] = Query(default=None, description="feiras,hortas,cozinhas (padrão: todas)"),
+    limit: int = Query(default=LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+):
+    """Features das camadas dentro do bbox (GeoJSON), consultadas na R-tree de cada camada."""
+    caixa = parse_bbox(bbox)
+    camadas = parse_camadas(layer)
+    features: List[Dict[str, Any]] = []
+    total = 0
+    for camada in camadas:
+        pontos = PONTOS.get(camada, [])
+        idxs = INDICES_CAMADAS[camada].na_bbox(*caixa) if caixa and camada in INDICES_CAMADAS else range(len(pontos))
+        total += len(idxs)
+        for i in idxs:
+            if len(features) >= limit:
+                break
+            features.append(_feature(pontos[i]))
+    return resposta_json(
+        {
+            "type": "FeatureCollection",
+            "meta": {
+                "bbox": caixa,
+                "layers": camadas,
+                "total": total,
+                "returned": len(features),
+                "limit": limit,
+                "truncado": total > len(features),
+            },
+            "features": features,
+        }
+    )
+
+
+@pontos_router.get("/near")
+async def geo_pontos_proximos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(default=1.0, gt=0, le=50, description="Raio em km"),
+    layer: Optional[str] = Query(default=None, description="feiras,hortas,cozinhas (padrão: todas)"),
+    limit: int = Query(default=100, ge=1, le=LIMITE_MAXIMO),
+):
+    """Features a até `radius` km do ponto, ordenadas pela distância (`properties.distancia_km`)."""
+    camadas = parse_camadas(layer)
+    encontrados = []
+    for camada in camadas:
+        arvore = INDICES_CAMADAS.get(camada)
+        if arvore is None:
+            continue
+        for i, d in arvore.no_raio(lat, lon, radius):
+            encontrados.append((d, camada, i))
+    encontrados.sort(key=lambda t: t[0])
+    features = []
+    for d, camada, i in encontrados[:limit]:
+        f = _feature(PONTOS[camada][i])
+        f["properties"]["distancia_km"] = round(d, 4)
+        features.append(f)
+    return resposta_json(
+        {
+            "type": "FeatureCollection",
+            "meta": {
+                "centro": {"lat": lat, "lon": lon},
+                "radius_km": radius,
+                "layers": camadas,
+                "total": len(encontrados),
+                "returned": len(features),
+            },
+            "features": features,
+        }
+    )
+
+
+@pontos_router.get("/{camada}/geojson")
+async def geo_pontos_geojson(camada: str, request: Request):
+    """GeoJSON completo da camada, servido a partir das variantes pré-comprimidas."""
+    payload = GEOJSON_CAMADAS.get(camada)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Camada não encontrada")
+    return resposta_estatica(request, payload, media_type="application/geo+json", cache_control="public, max-age=3600")
@@ -0,0 +1,502 @@
+"""
+Rede viária (OSM) com hierarquias de contração para matrizes de tempo/distância.
+
+Duas partes:
+
+- compilação offline (`python rede_viaria.py --pbf ...`): lê o extrato
+  Geofabrik do RJ (o mesmo `.osm.pbf` do `build_pmtiles.sh`) com `pyosmium`,
+  monta o grafo dirigido das vias com tempo de viagem por tipo de via
+  (`VELOCIDADES_KMH`), fica com a maior componente conexa, contrai os nós
+  (ordem por diferença de arestas, com buscas de testemunha limitadas) e grava
+  os grafos "para cima" em CSR num `.npz`;
+- consulta em processo (`RedeViaria`): cada ponto é ancorado no nó mais
+  próximo e a matriz origens x destinos sai do algoritmo de buckets para CH
+  (uma busca para trás por destino, uma para frente por origem), sem Dijkstra
+  no grafo inteiro.
+
+Sem o arquivo compilado (ou para pares fora da rede), `matriz_viagem` cai para
+haversine com velocidade média `VELOCIDADE_FALLBACK_KMH`.
+
+Com dados compartilhados, o carregador lê o `.npz` uma vez e publica os arrays
+no segmento; workers da API e do pool montam a `RedeViaria` sobre eles, sem
+cópia. A R-tree de ancoragem só é montada no primeiro uso (os workers da API
+mandam as rotas para o pool e nunca ancoram).
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from distancias import matriz_distancias
+from indice_espacial import ArvoreR, haversine_km
+from memoria_compartilhada import ATIVO as DADOS_COMPARTILHADOS, Construtor, PlanoCompartilhado, anexar
+
+try:
+    import osmium
+except Exception:  # pragma: no cover - optional
+    osmium = None  # type: ignore
+
+logger = logging.getLogger("rajai")
+
+BASE_DIR = Path(__file__).parent
+REDE_FILE = Path(os.getenv("RAJAI_REDE_VIARIA", str(BASE_DIR / "dados" / "rede_viaria.npz")))
+
+# Município do Rio (min_lon, min_lat, max_lon, max_lat), com folga
+BBOX_RIO = (-43.80, -23.09, -43.09, -22.74)
+
+VELOCIDADES_KMH = {
+    "motorway": 80,
+    "motorway_link": 50,
+    "trunk": 60,
+    "trunk_link": 40,
+    "primary": 45,
+    "primary_link": 35,
+    "secondary": 35,
+    "secondary_link": 30,
+    "tertiary": 30,
+    "tertiary_link": 25,
+    "unclassified": 25,
+    "residential": 20,
+    "living_street": 10,
+    "service": 15,
+}
+VELOCIDADE_ACESSO_KMH = 15.0  # do ponto até o nó da rede em que foi ancorado
+VELOCIDADE_FALLBACK_KMH = 25.0
+RAIOS_ANCORAGEM_KM = (0.2, 0.5, 1.0, 2.0)  # acima disso o ponto fica fora da rede
+LIMITE_TESTEMUNHA = 500  # nós assentados por busca de testemunha na contração
+
+Aresta = Tuple[int, int, float, float]  # (origem, destino, tempo_s, km)
+
+
+# -----------------------------
+# Leitura do PBF
+# -----------------------------
+def _mao_unica(tags: Any, highway: str) -> int:
+    """1 = só no sentido da via, -1 = só no sentido contrário, 0 = mão dupla."""
+    valor = (tags.get("oneway") or "").lower()
+    if valor in ("yes", "1", "true"):
+        return 1
+    if valor == "-1":
+        return -1
+    if valor == "no":
+        return 0
+    if highway in ("motorway", "motorway_link") or tags.get("junction") in ("roundabout", "circular"):
+        return 1
+    return 0
+
+
+def ler_pbf(caminho: Path, bbox: Optional[Tuple[float, float, float, float]] = BBOX_RIO) -> Tuple[List[float], List[float], List[Aresta]]:
+    """Lê as vias carroçáveis do PBF. Retorna (lat, lon, arestas) com nós reindexados de 0."""
+    if osmium is None:
+        raise RuntimeError("pyosmium não instalado (pip install osmium)")
+
+    lat: List[float] = []
+    lon: List[float] = []
+    indice: Dict[int, int] = {}
+    arestas: List[Aresta] = []
+
+    def no(ref: Any) -> Optional[int]:
+        loc = ref.location
+        if not loc.valid():
+            return None
+        if bbox and not (bbox[0] <= loc.lon <= bbox[2] and bbox[1] <= loc.lat <= bbox[3]):
+            return None
+        i = indice.get(ref.ref)
+        if i is None:
+            i = indice[ref.ref] = len(lat)
+            lat.append(loc.lat)
+            lon.append(loc.lon)
+        return i
+
+    class Vias(osmium.SimpleHandler):  # type: ignore[misc]
+        def way(self, w: Any) -> None:
+            highway = w.tags.get("highway")
+            if highway not in VELOCIDADES_KMH or w.tags.get("access") in ("no", "private"):
+                return
+            sentido = _mao_unica(w.tags, highway)
+            velocidade = VELOCIDADES_KMH[highway]
+            anterior = None
+            for ref in w.nodes:
+                atual = no(ref)
+                if atual is not None and anterior is not None:
+                    km = haversine_km(lat[anterior], lon[anterior], lat[atual], lon[atual])
+                    tempo = km / velocidade * 3600
+                    if sentido >= 0:
+                        arestas.append((anterior, atual, tempo, km))
+                    if sentido <= 0:
+                        arestas.append((atual, anterior, tempo, km))
+                anterior = atual
+
+    Vias().apply_file(str(caminho), locations=True)
+    return lat, lon, arestas
+
+
+def _maior_componente(n: int, arestas: Sequence[Aresta]) -> List[int]:
+    """Nós da maior componente (fracamente) conexa, para não ancorar pontos em ilhas."""
+    pai = list(range(n))
+
+    def raiz(i: int) -> int:
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]
+            i = pai[i]
+        return i
+
+    for u, v, _, _ in arestas:
+        ru, rv = raiz(u), raiz(v)
+        if ru != rv:
+            pai[ru] = rv
+    tamanhos: Dict[int, int] = {}
+    for i in range(n):
+        r = raiz(i)
+        tamanhos[r] = tamanhos.get(r, 0) + 1
+    if not tamanhos:
+        return []
+    maior = max(tamanhos, key=tamanhos.get)
+    return [i for i in range(n) if raiz(i) == maior]
+
+
+# -----------------------------
+# Contração
+# -----------------------------
+class _Contrator:
+    def __init__(self, n: int, arestas: Sequence[Aresta], limite_testemunha: int = LIMITE_TESTEMUNHA):
+        self.n = n
+        self.limite = limite_testemunha
+        # adjacências com (tempo, km); arestas paralelas ficam com a mais rápida
+        self.saida: List[Dict[int, Tuple[float, float]]] = [{} for _ in range(n)]
+        self.entrada: List[Dict[int, Tuple[float, float]]] = [{} for _ in range(n)]
+        for u, v, t, km in arestas:
+            if u != v:
+                self._adicionar(u, v, t, km)
+        self.contraido = [False] * n
+        self.vizinhos_contraidos = [0] * n
+        self.rank = [0] * n
+
+    def _adicionar(self, u: int, v: int, t: float, km: float) -> None:
+        atual = self.saida[u].get(v)
+        if atual is None or t < atual[0]:
+            self.saida[u][v] = (t, km)
+            self.entrada[v][u] = (t, km)
+
+    def _testemunha(self, origem: int, ignorar: int, alvos: Dict[int, float], custo_max: float) -> Dict[int, float]:
+        """Dijkstra limitado a partir de `origem`, sem passar por `ignorar` nem por nós contraídos."""
+        dist = {origem: 0.0}
+        heap = [(0.0, origem)]
+        faltam = set(alvos)
+        assentados = 0
+        while heap and faltam and assentados < self.limite:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > custo_max:
+                break
+            faltam.discard(u)
+            assentados += 1
+            for x, (t, _) in self.saida[u].items():
+                if x == ignorar or self.contraido[x]:
+                    continue
+                nd = d + t
+                if nd < dist.get(x, float("inf")):
+                    dist[x] = nd
+                    heapq.heappush(heap, (nd, x))
+        return dist
+
+    def _atalhos(self, v: int) -> List[Aresta]:
+        entradas = [(u, w) for u, w in self.entrada[v].items() if not self.contraido[u]]
+        saidas = [(x, w) for x, w in self.saida[v].items() if not self.contraido[x]]
+        atalhos = []
+        for u, (t_uv, km_uv) in entradas:
+            alvos = {x: t_uv + t_vx for x, (t_vx, _) in saidas if x != u}
+            if not alvos:
+                continue
+            dist = self._testemunha(u, v, alvos, max(alvos.values()))
+            for x, (t_vx, km_vx) in saidas:
+                if x == u:
+                    continue
+                via_v = t_uv + t_vx
+                if dist.get(x, float("inf")) > via_v + 1e-9:
+                    atalhos.append((u, x, via_v, km_uv + km_vx))
+        return atalhos
+
+    def _prioridade(self, v: int) -> int:
+        grau = sum(1 for u in self.entrada[v] if not self.contraido[u]) + sum(
+            1 for x in self.saida[v] if not self.contraido[x]
+        )
+        return len(self._atalhos(v)) - grau + self.vizinhos_contraidos[v]
+
+    def contrair(self, progresso: int = 0) -> List[int]:
+        heap = [(self._prioridade(v), v) for v in range(self.n)]
+        heapq.heapify(heap)
+        proximo_rank = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if self.contraido[v]:
+                continue
+            # atualização preguiçosa: se a prioridade piorou, volta para a fila
+            p = self._prioridade(v)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+            for u, x, t, km in self._atalhos(v):
+                self._adicionar(u, x, t, km)
+            self.contraido[v] = True
+            self.rank[v] = proximo_rank
+            proximo_rank += 1
+            for w in list(self.entrada[v]) + list(self.saida[v]):
+                self.vizinhos_contraidos[w] += 1
+            if progresso and proximo_rank % progresso == 0:
+                logger.info("Contração: %d/%d nós", proximo_rank, self.n)
+        return self.rank
+
+
+def _csr(n: int, arestas: List[Tuple[int, int, float, float]]) -> Tuple[np.ndarray, ...]:
+    arestas.sort(key=lambda a: a[0])
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    for a in arestas:
+        indptr[a[0] + 1] += 1
+    np.cumsum(indptr, out=indptr)
+    destino = np.asarray([a[1] for a in arestas], dtype=np.int32)
+    tempo = np.asarray([a[2] for a in arestas], dtype=np.float32)
+    km = np.asarray([a[3] for a in arestas], dtype=np.float32)
+    return indptr, destino, tempo, km
+
+
+def compilar(lat: Sequence[float], lon: Sequence[float], arestas: Sequence[Aresta], progresso: int = 0) -> Dict[str, np.ndarray]:
+    """Grafo dirigido -> arrays da hierarquia (grafos para cima, para frente e para trás)."""
+    manter = _maior_componente(len(lat), arestas)
+    novo = {old: i for i, old in enumerate(manter)}
+    arestas = [(novo[u], novo[v], t, km) for u, v, t, km in arestas if u in novo and v in novo]
+    n = len(manter)
+
+    contrator = _Contrator(n, arestas)
+    rank = contrator.contrair(progresso)
+
+    para_frente: List[Tuple[int, int, float, float]] = []
+    para_tras: List[Tuple[int, int, float, float]] = []
+    for u in range(n):
+        for x, (t, km) in contrator.saida[u].items():
+            if rank[x] > rank[u]:
+                para_frente.append((u, x, t, km))
+            else:
+                para_tras.append((x, u, t, km))  # busca reversa: de x sobe para u
+
+    f_ptr, f_dst, f_t, f_km = _csr(n, para_frente)
+    b_ptr, b_dst, b_t, b_km = _csr(n, para_tras)
+    return {
+        "lat": np.asarray([lat[i] for i in manter], dtype=np.float64),
+        "lon": np.asarray([lon[i] for i in manter], dtype=np.float64),
+        "frente_indptr": f_ptr,
+        "frente_destino": f_dst,
+        "frente_tempo": f_t,
+        "frente_km": f_km,
+        "tras_indptr": b_ptr,
+        "tras_destino": b_dst,
+        "tras_tempo": b_t,
+        "tras_km": b_km,
+    }
+
+
+# -----------------------------
+# Consulta
+# -----------------------------
+class RedeViaria:
+    """Hierarquia compilada em memória + ancoragem de pontos nos nós."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+        # arrays CSR compactos (int32/float32); as buscas convertem só as arestas de cada nó assentado
+        self._frente = tuple(arrays[f"frente_{k}"] for k in ("indptr", "destino", "tempo", "km"))
+        self._tras = tuple(arrays[f"tras_{k}"] for k in ("indptr", "destino", "tempo", "km"))
+        self._arvore: Optional[ArvoreR] = None
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> "RedeViaria":
+        with np.load(caminho) as dados:
+            return cls({k: dados[k] for k in dados.files})
+
+    def ancorar(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """Nó mais próximo e a distância até ele (km), ou None se longe da rede."""
+        if self._arvore is None:
+            self._arvore = ArvoreR((i, la, lo) for i, (la, lo) in enumerate(zip(self.lat.tolist(), self.lon.tolist())))
+        for raio in RAIOS_ANCORAGEM_KM:
+            achados = self._arvore.no_raio(lat, lon, raio)
+            if achados:
+                return achados[0]
+        return None
+
+    @staticmethod
+    def _subir(origem: int, grafo: Tuple[np.ndarray, ...]) -> Dict[int, Tuple[float, float]]:
+        """Dijkstra só por arestas para nós de rank maior: {nó: (tempo_s, km)}."""
+        indptr, destino, tempo, km = grafo
+        dist: Dict[int, Tuple[float, float]] = {origem: (0.0, 0.0)}
+        heap = [(0.0, origem)]
+        assentados: Dict[int, Tuple[float, float]] = {}
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in assentados:
+                continue
+            assentados[u] = dist[u]
+            d_km = dist[u][1]
+            ini, fim = indptr[u], indptr[u + 1]
+            if ini == fim:
+                continue
+            for x, t, k in zip(destino[ini:fim].tolist(), tempo[ini:fim].tolist(), km[ini:fim].tolist()):
+                nd = d + t
+                atual = dist.get(x)
+                if atual is None or nd < atual[0]:
+                    dist[x] = (nd, d_km + k)
+                    heapq.heappush(heap, (nd, x))
+        return assentados
+
+    def matriz_nos(self, origens: Sequence[int], destinos: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Many-to-many por buckets: (tempo_s, km); inf onde não há caminho."""
+        tempo = np.full((len(origens), len(destinos)), np.inf)
+        km = np.full((len(origens), len(destinos)), np.inf)
+        buckets: Dict[int, List[Tuple[int, float, float]]] = {}
+        for j, no in enumerate(destinos):
+            for v, (t, k) in self._subir(no, self._tras).items():
+                buckets.setdefault(v, []).append((j, t, k))
+        for i, no in enumerate(origens):
+            linha_t = tempo[i]
+            linha_km = km[i]
+            for v, (t, k) in self._subir(no, self._frente).items():
+                for j, tb, kb in buckets.get(v, ()):
+                    if t + tb < linha_t[j]:
+                        linha_t[j] = t + tb
+                        linha_km[j] = k + kb
+        return tempo, km
+
+    def matriz(
+        self, origens: Sequence[Tuple[float, float]], destinos: Sequence[Tuple[float, float]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(km, minutos) entre coordenadas, com o trecho de acesso até a rede; NaN fora da rede."""
+        km = np.full((len(origens), len(destinos)), np.nan)
+        minutos = np.full((len(origens), len(destinos)), np.nan)
+        ancoras_o = [self.ancorar(la, lo) for la, lo in origens]
+        ancoras_d = [self.ancorar(la, lo) for la, lo in destinos]
+        io = [i for i, a in enumerate(ancoras_o) if a is not None]
+        jd = [j for j, a in enumerate(ancoras_d) if a is not None]
+        if not io or not jd:
+            return km, minutos
+
+        tempo_s, dist_km = self.matriz_nos([ancoras_o[i][0] for i in io], [ancoras_d[j][0] for j in jd])
+        acesso_o = np.asarray([ancoras_o[i][1] for i in io])[:, None]
+        acesso_d = np.asarray([ancoras_d[j][1] for j in jd])[None, :]
+        acesso = acesso_o + acesso_d
+        sub_km = dist_km + acesso
+        sub_min = tempo_s / 60 + acesso / VELOCIDADE_ACESSO_KMH * 60
+        alcancavel = np.isfinite(tempo_s)
+        km[np.ix_(io, jd)] = np.where(alcancavel, sub_km, np.nan)
+        minutos[np.ix_(io, jd)] = np.where(alcancavel, sub_min, np.nan)
+        return km, minutos
+
+
+REDE: Optional[RedeViaria] = None
+_CARGA_TENTADA = False  # por processo (os workers do pool carregam sob demanda)
+
+
+def rede_carregada() -> bool:
+    return REDE is not None
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    if REDE is not None:
+        for nome, valores in REDE.arrays.items():
+            construtor.array(f"rede.{nome}", valores)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    global REDE, _CARGA_TENTADA
+    _CARGA_TENTADA = True
+    nomes = [n for n in plano.nomes_arrays() if n.startswith("rede.")]
+    REDE = RedeViaria({n[len("rede."):]: plano.array(n) for n in nomes}) if nomes else None
+
+
+def carregar_rede(caminho: Optional[Path] = None) -> int:
+    """Carrega o `.npz` compilado, se existir. Retorna o número de nós (0 sem rede)."""
+    global REDE, _CARGA_TENTADA
+    _CARGA_TENTADA = True
+    caminho = Path(caminho or REDE_FILE)
+    if not caminho.exists():
+        REDE = None
+        logger.info("Rede viária não encontrada em %s; distâncias por haversine", caminho)
+        return 0
+    REDE = RedeViaria.carregar(caminho)
+    logger.info("Rede viária carregada: %d nós", len(REDE))
+    return len(REDE)
+
+
+def matriz_viagem(
+    origens: Sequence[Tuple[float, float]], destinos: Sequence[Tuple[float, float]]
+) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    (km, minutos, metodo) origens x destinos. `metodo` é "rede_viaria",
+    "haversine" ou "misto" (pares fora da rede caem para haversine).
+    """
+    if REDE is None and not _CARGA_TENTADA:
+        # workers do pool carregam sob demanda: do segmento compartilhado, se houver
+        plano = anexar() if DADOS_COMPARTILHADOS else None
+        if plano is not None:
+            set_dados_compartilhados(plano)
+        else:
+            carregar_rede()
+    linha_reta = matriz_distancias(origens, destinos)
+    estimado = linha_reta / VELOCIDADE_FALLBACK_KMH * 60
+    if REDE is None or not len(origens) or not len(destinos):
+        return linha_reta, estimado, "haversine"
+    km, minutos = REDE.matriz(origens, destinos)
+    fora = np.isnan(km)
+    if fora.all():
+        return linha_reta, estimado, "haversine"
+    if fora.any():
+        return np.where(fora, linha_reta, km), np.where(fora, estimado, minutos), "misto"
+    return km, minutos, "rede_viaria"
+
+
+# -----------------------------
+# CLI de compilação
+# -----------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Compila o extrato OSM (.osm.pbf) na rede viária com hierarquias de contração")
+    ap.add_argument("--pbf", required=True, help="Ex.: joao/hacka/data/rio-de-janeiro-latest.osm.pbf")
+    ap.add_argument("--saida", default=str(REDE_FILE))
+    ap.add_argument(
+        "--bbox",
+        default=",".join(str(v) for v in BBOX_RIO),
+        help="min_lon,min_lat,max_lon,max_lat (vazio = extrato inteiro)",
+    )
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    bbox = tuple(float(v) for v in args.bbox.split(",")) if args.bbox else None
+
+    t0 = time.perf_counter()
+    lat, lon, arestas = ler_pbf(Path(args.pbf), bbox)  # type: ignore[arg-type]
+    logger.info("PBF lido: %d nós, %d arestas (%.1fs)", len(lat), len(arestas), time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    rede = compilar(lat, lon, arestas, progresso=50_000)
+    n_atalhos = len(rede["frente_destino"]) + len(rede["tras_destino"])
+    logger.info("Hierarquia: %d nós, %d arestas (%.1fs)", len(rede["lat"]), n_atalhos, time.perf_counter() - t0)
+
+    saida = Path(args.saida)
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(saida, **rede)
+    print(f"OK: {saida} ({saida.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
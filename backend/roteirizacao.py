@@ -0,0 +1,620 @@
+"""
+Roteirização com vários veículos (VRP) para as entregas dos produtores.
+
+Cada produtor é um depósito com `veiculos` veículos de `capacidade` unidades;
+cada destino tem `demand` e, opcionalmente, janela de horário — explícita
+(`janela: ["07:00", "13:00"]`) ou lida do campo `horario` das feiras
+(`"07:00 H ÀS 13:00 H"`). Destinos com `feira_id` puxam coordenadas, `dia` e
+`horario` da camada de feiras.
+
+O solver (matriz de tempos incluída) roda no pool de processos de
+`execucao.py`, fora do event loop, e respeita o orçamento de tempo do pedido:
+
+1. construção por inserção mais barata (destinos com janela mais apertada
+   primeiro); se o prazo acabar no meio, os destinos restantes vão para o fim
+   da rota mais próxima que os comporte;
+2. busca local (realocação, troca entre rotas, 2-opt) até não melhorar;
+3. enquanto sobrar tempo, destrói e reconstrói parte da solução (ruin &
+   recreate) e aceita só o que melhorar, parando após `SEM_MELHORA_MAX`
+   tentativas seguidas sem melhora.
+
+Todas as fases checam o prazo, então o worker devolve em até ~`tempo_limite_s`
+mesmo com `MAX_DESTINOS` destinos. Com poucos destinos (até
+`EXATO_MAX_DESTINOS`) o problema é resolvido exatamente, por programação
+dinâmica, e a resposta sai sem gastar o orçamento.
+
+O custo é o tempo total das rotas (saída do depósito até a volta), com
+penalidade alta por destino não atendido. Os tempos vêm de
+`rede_viaria.matriz_viagem` (rede viária ou haversine).
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+
+from execucao import POOL
+from rede_viaria import matriz_viagem
+
+TEMPO_LIMITE_PADRAO_S = float(os.getenv("RAJAI_VRP_TEMPO_PADRAO_S", "2"))
+TEMPO_LIMITE_MAX_S = float(os.getenv("RAJAI_VRP_TEMPO_MAX_S", "10"))
+FOLGA_S = 5.0  # margem para a matriz de tempos e a ida/volta ao worker
+MAX_DESTINOS = 500
+SERVICO_PADRAO_MIN = 10.0
+INICIO_PADRAO = "06:00"
+PENALIDADE_NAO_ATENDIDO = 1e6
+FRACAO_DESTRUICAO = 0.2
+SEM_MELHORA_MAX = int(os.getenv("RAJAI_VRP_SEM_MELHORA", "200"))
+EXATO_MAX_DESTINOS = int(os.getenv("RAJAI_VRP_EXATO_MAX", "8"))
+EXATO_MAX_OPERACOES = 500_000
+
+Rota = List[Any]  # [deposito, [clientes]]
+
+# -----------------------------
+# Horários
+# -----------------------------
+_HORA = re.compile(r"(\d{1,2})\s*(?::|h)\s*(\d{2})?", re.IGNORECASE)
+
+
+def hora_para_min(valor: Any) -> float:
+    """"07:00", "7h30" ou minutos (número) -> minutos desde 00:00."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    m = _HORA.search(str(valor))
+    if not m:
+        raise ValueError(f"Horário inválido: {valor}")
+    return int(m.group(1)) * 60 + int(m.group(2) or 0)
+
+
+def min_para_hora(minutos: float) -> str:
+    minutos = int(round(minutos))
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def janela_do_horario(horario: str) -> Optional[Tuple[float, float]]:
+    """"07:00 H ÀS 13:00 H" -> (420, 780)."""
+    horas = _HORA.findall(horario or "")
+    if len(horas) < 2:
+        return None
+    (h1, m1), (h2, m2) = horas[0], horas[1]
+    return int(h1) * 60 + int(m1 or 0), int(h2) * 60 + int(m2 or 0)
+
+
+def _sem_acento(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+
+def _mesmo_dia(a: str, b: str) -> bool:
+    """"Sábado" == "sabado" == "Sábado-feira"; compara pelo primeiro termo."""
+    return _sem_acento(a).split("-")[0] == _sem_acento(b).split("-")[0]
+
+
+# -----------------------------
+# Solver (roda no worker)
+# -----------------------------
+class _Problema:
+    def __init__(self, dados: Dict[str, Any]):
+        self.tempo: List[List[float]] = dados["tempo"]
+        self.m: int = len(dados["capacidades"])
+        self.capacidades: List[float] = dados["capacidades"]
+        self.veiculos: List[int] = dados["veiculos"]
+        self.demandas: List[float] = dados["demandas"]
+        self.janelas: List[Optional[Tuple[float, float]]] = dados["janelas"]
+        self.servico: float = dados["servico_min"]
+        self.inicio: float = dados["inicio_min"]
+        self._custos: Dict[Tuple[int, Tuple[int, ...]], Optional[float]] = {}
+
+    def custo(self, dep: int, clientes: Sequence[int]) -> Optional[float]:
+        """Duração da rota (min) ou None se estoura capacidade/janela."""
+        chave = (dep, tuple(clientes))
+        if chave in self._custos:
+            return self._custos[chave]
+        valor: Optional[float] = None
+        if sum(self.demandas[c] for c in clientes) <= self.capacidades[dep]:
+            t = self.inicio
+            anterior = dep
+            viavel = True
+            for c in clientes:
+                no = self.m + c
+                t += self.tempo[anterior][no]
+                janela = self.janelas[c]
+                if janela is not None:
+                    if t > janela[1]:
+                        viavel = False
+                        break
+                    t = max(t, janela[0])
+                t += self.servico
+                anterior = no
+            if viavel:
+                valor = t + self.tempo[anterior][dep] - self.inicio
+        if len(self._custos) > 200_000:
+            self._custos.clear()
+        self._custos[chave] = valor
+        return valor
+
+    def chegadas(self, dep: int, clientes: Sequence[int]) -> List[float]:
+        t = self.inicio
+        anterior = dep
+        out = []
+        for c in clientes:
+            t += self.tempo[anterior][self.m + c]
+            janela = self.janelas[c]
+            if janela is not None:
+                t = max(t, janela[0])
+            out.append(t)
+            t += self.servico
+            anterior = self.m + c
+        return out
+
+
+def _custo_rotas(P: _Problema, rotas: List[Rota]) -> float:
+    return sum(P.custo(d, cl) or 0.0 for d, cl in rotas)
+
+
+def _custo_total(P: _Problema, rotas: List[Rota], nao_atendidos: Sequence[int]) -> float:
+    return _custo_rotas(P, rotas) + PENALIDADE_NAO_ATENDIDO * len(nao_atendidos)
+
+
+def _veiculos_livres(P: _Problema, rotas: List[Rota]) -> List[int]:
+    usados = [0] * P.m
+    for d, _ in rotas:
+        usados[d] += 1
+    return [d for d in range(P.m) if usados[d] < P.veiculos[d]]
+
+
+def _melhor_insercao(
+    P: _Problema, c: int, rotas: List[Rota], prazo: float
+) -> Optional[Tuple[float, int, int, int]]:
+    """(delta, índice da rota ou -1 para rota nova, depósito, posição). Passado o prazo, para de varrer as rotas."""
+    melhor = None
+    for r, (d, cl) in enumerate(rotas):
+        if time.perf_counter() >= prazo:
+            break
+        base = P.custo(d, cl)
+        if base is None:
+            continue
+        for pos in range(len(cl) + 1):
+            novo = P.custo(d, cl[:pos] + [c] + cl[pos:])
+            if novo is not None and (melhor is None or novo - base < melhor[0]):
+                melhor = (novo - base, r, d, pos)
+    for d in _veiculos_livres(P, rotas):
+        novo = P.custo(d, [c])
+        if novo is not None and (melhor is None or novo < melhor[0]):
+            melhor = (novo, -1, d, 0)
+    return melhor
+
+
+def _anexar(P: _Problema, c: int, rotas: List[Rota]) -> bool:
+    """Complemento barato (prazo esgotado): põe o destino no fim da rota viável cujo último ponto é mais próximo."""
+    no = P.m + c
+
+    def ultimo(r: int) -> int:
+        d, cl = rotas[r]
+        return P.m + cl[-1] if cl else d
+
+    for r in sorted(range(len(rotas)), key=lambda r: P.tempo[ultimo(r)][no]):
+        d, cl = rotas[r]
+        if P.custo(d, cl + [c]) is not None:
+            cl.append(c)
+            return True
+    for d in sorted(_veiculos_livres(P, rotas), key=lambda d: P.tempo[d][no]):
+        if P.custo(d, [c]) is not None:
+            rotas.append([d, [c]])
+            return True
+    return False
+
+
+def _inserir(P: _Problema, clientes: Sequence[int], rotas: List[Rota], prazo: float) -> List[int]:
+    """Inserção mais barata, janelas mais apertadas primeiro. Devolve os que não couberam."""
+    ordem = sorted(
+        clientes,
+        key=lambda c: (P.janelas[c][1] if P.janelas[c] else float("inf"), -P.demandas[c]),
+    )
+    sobra = []
+    for c in ordem:
+        ins = _melhor_insercao(P, c, rotas, prazo) if time.perf_counter() < prazo else None
+        if ins is None:
+            if time.perf_counter() < prazo or not _anexar(P, c, rotas):
+                sobra.append(c)
+            continue
+        _, r, d, pos = ins
+        if r < 0:
+            rotas.append([d, [c]])
+        else:
+            rotas[r][1].insert(pos, c)
+    return sobra
+
+
+def _busca_local(P: _Problema, rotas: List[Rota], nao_atendidos: List[int], prazo: float, rng: random.Random) -> int:
+    """Primeira melhora entre realocação, troca e 2-opt. Devolve o número de movimentos aplicados."""
+    movimentos = 0
+    melhorou = True
+    while melhorou and time.perf_counter() < prazo:
+        melhorou = False
+
+        # destinos ainda de fora
+        for c in list(nao_atendidos):
+            if time.perf_counter() >= prazo:
+                return movimentos
+            ins = _melhor_insercao(P, c, rotas, prazo)
+            if ins is not None:
+                _, r, d, pos = ins
+                if r < 0:
+                    rotas.append([d, [c]])
+                else:
+                    rotas[r][1].insert(pos, c)
+                nao_atendidos.remove(c)
+                movimentos += 1
+                melhorou = True
+
+        # realocação: tira um destino e põe na melhor posição de qualquer rota
+        ordem = [(r, i) for r, (_, cl) in enumerate(rotas) for i in range(len(cl))]
+        rng.shuffle(ordem)
+        for r, i in ordem:
+            if time.perf_counter() >= prazo:
+                return movimentos
+            if r >= len(rotas) or i >= len(rotas[r][1]):
+                continue
+            d, cl = rotas[r]
+            c = cl[i]
+            sem = cl[:i] + cl[i + 1 :]
+            ganho_remocao = (P.custo(d, cl) or 0.0) - (P.custo(d, sem) or 0.0) if sem else (P.custo(d, cl) or 0.0)
+            candidatas = [list(x) for x in rotas]
+            candidatas[r] = [d, sem]
+            if not sem:
+                candidatas.pop(r)
+            ins = _melhor_insercao(P, c, candidatas, prazo)
+            if ins is not None and ins[0] < ganho_remocao - 1e-9:
+                _, r2, d2, pos = ins
+                if r2 < 0:
+                    candidatas.append([d2, [c]])
+                else:
+                    candidatas[r2] = [candidatas[r2][0], candidatas[r2][1][:pos] + [c] + candidatas[r2][1][pos:]]
+                rotas[:] = candidatas
+                movimentos += 1
+                melhorou = True
+
+        # troca de destinos entre duas rotas
+        for r1 in range(len(rotas)):
+            for r2 in range(r1 + 1, len(rotas)):
+                if time.perf_counter() >= prazo:
+                    return movimentos
+                d1, cl1 = rotas[r1]
+                d2, cl2 = rotas[r2]
+                base = (P.custo(d1, cl1) or 0.0) + (P.custo(d2, cl2) or 0.0)
+                trocou = False
+                for i in range(len(cl1)):
+                    if time.perf_counter() >= prazo:
+                        return movimentos
+                    for j in range(len(cl2)):
+                        n1 = cl1[:i] + [cl2[j]] + cl1[i + 1 :]
+                        n2 = cl2[:j] + [cl1[i]] + cl2[j + 1 :]
+                        c1, c2 = P.custo(d1, n1), P.custo(d2, n2)
+                        if c1 is not None and c2 is not None and c1 + c2 < base - 1e-9:
+                            rotas[r1] = [d1, n1]
+                            rotas[r2] = [d2, n2]
+                            movimentos += 1
+                            melhorou = trocou = True
+                            break
+                    if trocou:
+                        break
+
+        # 2-opt dentro de cada rota
+        for r, (d, cl) in enumerate(rotas):
+            base = P.custo(d, cl)
+            for i in range(len(cl) - 1):
+                if time.perf_counter() >= prazo:
+                    return movimentos
+                for j in range(i + 1, len(cl)):
+                    novo = cl[:i] + cl[i : j + 1][::-1] + cl[j + 1 :]
+                    custo = P.custo(d, novo)
+                    if custo is not None and base is not None and custo < base - 1e-9:
+                        rotas[r] = [d, novo]
+                        cl, base = novo, custo
+                        movimentos += 1
+                        melhorou = True
+    return movimentos
+
+
+def _saida(P: _Problema, t: float, de: int, c: int) -> Optional[float]:
+    """Hora de saída do destino `c` chegando de `de` (nó) com relógio `t`; None se perde a janela."""
+    t += P.tempo[de][P.m + c]
+    janela = P.janelas[c]
+    if janela is not None:
+        if t > janela[1]:
+            return None
+        t = max(t, janela[0])
+    return t + P.servico
+
+
+def _operacoes_exato(P: _Problema) -> int:
+    n = len(P.demandas)
+    veiculos = sum(min(v, n) for v in P.veiculos)
+    return veiculos * 3**n + P.m * 2**n * n * n
+
+
+def _rotas_otimas(P: _Problema, dep: int) -> List[Optional[Tuple[float, List[int]]]]:
+    """
+    Melhor rota a partir de `dep` para cada subconjunto de destinos (bitmask), por
+    Held-Karp: em (subconjunto, último destino) basta guardar a saída mais cedo,
+    já que chegar antes nunca piora (dá para esperar a janela).
+    """
+    n = len(P.demandas)
+    demanda = [0.0] * (1 << n)
+    for mask in range(1, 1 << n):
+        baixo = (mask & -mask).bit_length() - 1
+        demanda[mask] = demanda[mask & (mask - 1)] + P.demandas[baixo]
+    estados: Dict[Tuple[int, int], Tuple[float, List[int]]] = {}
+    for c in range(n):
+        t = _saida(P, P.inicio, dep, c)
+        if t is not None and P.demandas[c] <= P.capacidades[dep]:
+            estados[(1 << c, c)] = (t, [c])
+    melhores: List[Optional[Tuple[float, List[int]]]] = [None] * (1 << n)
+    for mask in range(1, 1 << n):  # ordem crescente: todo subconjunto vem antes dos que o contêm
+        for c in range(n):
+            estado = estados.get((mask, c))
+            if estado is None:
+                continue
+            t, seq = estado
+            custo = t + P.tempo[P.m + c][dep] - P.inicio
+            if melhores[mask] is None or custo < melhores[mask][0]:
+                melhores[mask] = (custo, seq)
+            for c2 in range(n):
+                novo = mask | (1 << c2)
+                if novo == mask or demanda[novo] > P.capacidades[dep]:
+                    continue
+                t2 = _saida(P, t, P.m + c, c2)
+                if t2 is not None and ((novo, c2) not in estados or t2 < estados[(novo, c2)][0]):
+                    estados[(novo, c2)] = (t2, seq + [c2])
+    return melhores
+
+
+def _exato(P: _Problema) -> Tuple[List[Rota], List[int]]:
+    """Solução ótima para poucos destinos: melhores rotas por depósito, depois partição entre os veículos."""
+    n = len(P.demandas)
+    total = 1 << n
+    custo: List[float] = [float("inf")] * total
+    custo[0] = 0.0
+    solucao: List[List[Rota]] = [[] for _ in range(total)]
+    for dep in range(P.m):
+        rotas = _rotas_otimas(P, dep)
+        for _ in range(min(P.veiculos[dep], n)):
+            novo_custo = list(custo)
+            nova_solucao = list(solucao)
+            for mask in range(1, total):
+                sub = mask
+                while sub:
+                    rota = rotas[sub]
+                    resto = mask ^ sub
+                    if rota is not None and custo[resto] + rota[0] < novo_custo[mask]:
+                        novo_custo[mask] = custo[resto] + rota[0]
+                        nova_solucao[mask] = solucao[resto] + [[dep, list(rota[1])]]
+                    sub = (sub - 1) & mask
+            custo, solucao = novo_custo, nova_solucao
+    melhor = min(
+        (m for m in range(total) if custo[m] < float("inf")),
+        key=lambda m: custo[m] + PENALIDADE_NAO_ATENDIDO * (n - bin(m).count("1")),
+    )
+    return solucao[melhor], [c for c in range(n) if not melhor >> c & 1]
+
+
+def _km_rota(km: Any, m: int, dep: int, clientes: Sequence[int]) -> float:
+    nos = [dep] + [m + c for c in clientes] + [dep]
+    return float(sum(km[a, b] for a, b in zip(nos, nos[1:])))
+
+
+def resolver(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """Ponto de entrada do worker: devolve rotas (índices), não atendidos e estatísticas."""
+    t0 = time.perf_counter()
+    prazo = t0 + dados["tempo_limite_s"]
+    rng = random.Random(dados.get("semente", 0))
+    km, minutos, metodo = matriz_viagem(dados["coords"], dados["coords"])
+    P = _Problema({**dados, "tempo": minutos.tolist()})
+    n = len(P.demandas)
+
+    rotas: List[Rota] = []
+    iteracoes = movimentos = 0
+    if n <= EXATO_MAX_DESTINOS and _operacoes_exato(P) <= EXATO_MAX_OPERACOES:
+        rotas, nao_atendidos = _exato(P)
+        custo_inicial = _custo_rotas(P, rotas)
+        algoritmo = "vrp_exato"
+    else:
+        nao_atendidos = _inserir(P, range(n), rotas, prazo)
+        custo_inicial = _custo_rotas(P, rotas)
+        algoritmo = "vrp_insercao_busca_local"
+        movimentos = _busca_local(P, rotas, nao_atendidos, prazo, rng)
+    melhor_custo = _custo_total(P, rotas, nao_atendidos)
+
+    sem_melhora = 0
+    while algoritmo != "vrp_exato" and time.perf_counter() < prazo and sem_melhora < SEM_MELHORA_MAX:
+        iteracoes += 1
+        sem_melhora += 1
+        tentativa = [[d, list(cl)] for d, cl in rotas]
+        fora = list(nao_atendidos)
+        servidos = [c for _, cl in tentativa for c in cl]
+        k = max(1, int(len(servidos) * FRACAO_DESTRUICAO))
+        removidos = set(rng.sample(servidos, min(k, len(servidos))))
+        tentativa = [[d, [c for c in cl if c not in removidos]] for d, cl in tentativa]
+        tentativa = [r for r in tentativa if r[1]]
+        fora = _inserir(P, list(removidos) + fora, tentativa, prazo)
+        movimentos += _busca_local(P, tentativa, fora, prazo, rng)
+        custo = _custo_total(P, tentativa, fora)
+        if custo < melhor_custo - 1e-9:
+            rotas, nao_atendidos, melhor_custo = tentativa, fora, custo
+            sem_melhora = 0
+
+    return {
+        "rotas": [[d, cl, P.custo(d, cl), P.chegadas(d, cl), _km_rota(km, P.m, d, cl)] for d, cl in rotas],
+        "algoritmo": algoritmo,
+        "distancia": metodo,
+        "nao_atendidos": nao_atendidos,
+        "custo_inicial_min": custo_inicial,
+        "custo_min": _custo_rotas(P, rotas),
+        "movimentos": movimentos,
+        "iteracoes": iteracoes,
+        "tempo_gasto_s": time.perf_counter() - t0,
+    }
+
+
+# -----------------------------
+# Montagem do problema e da resposta (processo da API)
+# -----------------------------
+def _feira(feira_id: Any) -> Optional[Dict[str, Any]]:
+    from pontos import PONTOS  # import tardio: pontos importa endpoint, que importa este módulo
+
+    for p in PONTOS.get("feiras", []):
+        if str(p["id"]) == str(feira_id):
+            return p
+    return None
+
+
+def _preparar_destino(destino: Dict[str, Any]) -> Dict[str, Any]:
+    """Completa coordenadas/dia/horário a partir da feira, se vier `feira_id`."""
+    if destino.get("feira_id") is None:
+        return destino
+    feira = _feira(destino["feira_id"])
+    if feira is None:
+        raise HTTPException(status_code=404, detail=f"Feira não encontrada: {destino['feira_id']}")
+    props = feira["properties"]
+    return {
+        "lat": feira["lat"],
+        "lon": feira["lon"],
+        "bairro": props.get("bairro"),
+        "endereco": props.get("endereco"),
+        "dia": props.get("dia"),
+        "horario": props.get("horario"),
+        **destino,
+    }
+
+
+def _janela(destino: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    try:
+        if destino.get("janela"):
+            inicio, fim = destino["janela"]
+            return hora_para_min(inicio), hora_para_min(fim)
+        if destino.get("horario"):
+            return janela_do_horario(str(destino["horario"]))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Janela de horário inválida no destino {destino.get('id')}")
+    return None
+
+
+def _numero(valor: Any, padrao: Optional[float], campo: str) -> Optional[float]:
+    if valor is None:
+        return padrao
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{campo} deve ser numérico")
+
+
+async def roteirizar(payload: Dict[str, Any], request: Optional[Request] = None) -> Dict[str, Any]:
+    """Modo `vrp` de `/rotas-candidatas`."""
+    producers = payload.get("producers") or []
+    destinos = [_preparar_destino(d) for d in payload.get("destinos") or []]
+    if not producers or not destinos:
+        raise HTTPException(status_code=400, detail="producers e destinos não podem ser vazios no modo vrp")
+    if len(destinos) > MAX_DESTINOS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_DESTINOS} destinos no modo vrp")
+
+    capacidade_padrao = _numero(payload.get("capacidade"), None, "capacidade")
+    veiculos_padrao = int(_numero(payload.get("veiculos_por_produtor"), 1, "veiculos_por_produtor") or 1)
+    tempo_limite = _numero(payload.get("tempo_limite_s"), TEMPO_LIMITE_PADRAO_S, "tempo_limite_s") or TEMPO_LIMITE_PADRAO_S
+    tempo_limite = min(max(tempo_limite, 0.1), TEMPO_LIMITE_MAX_S)
+    try:
+        inicio = hora_para_min(payload.get("inicio") or INICIO_PADRAO)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="inicio deve ser um horário (HH:MM)")
+    dia = payload.get("dia")
+
+    # destinos de feira em outro dia não entram no problema
+    nao_atendidos = []
+    ativos = []
+    for d in destinos:
+        if dia and d.get("dia") and not _mesmo_dia(str(d["dia"]), str(dia)):
+            nao_atendidos.append({"destino": d, "motivo": f"não funciona em {dia}"})
+        else:
+            ativos.append(d)
+
+    capacidades = []
+    veiculos = []
+    for p in producers:
+        cap = _numero(p.get("capacidade"), capacidade_padrao, "capacidade")
+        capacidades.append(float("inf") if cap is None else cap)
+        veiculos.append(int(_numero(p.get("veiculos"), veiculos_padrao, "veiculos") or 0))
+
+    coords = [(float(p.get("lat", 0)), float(p.get("lon", 0))) for p in producers] + [
+        (float(d.get("lat", 0)), float(d.get("lon", 0))) for d in ativos
+    ]
+    dados = {
+        "coords": coords,
+        "capacidades": capacidades,
+        "veiculos": veiculos,
+        "demandas": [_numero(d.get("demand"), 0.0, "demand") for d in ativos],
+        "janelas": [_janela(d) for d in ativos],
+        "servico_min": _numero(payload.get("servico_min"), SERVICO_PADRAO_MIN, "servico_min"),
+        "inicio_min": inicio,
+        "tempo_limite_s": tempo_limite,
+        "semente": int(payload.get("semente") or 0),
+    }
+
+    res = await POOL.executar("vrp", resolver, dados, timeout_s=tempo_limite + FOLGA_S, request=request)
+
+    m = len(producers)
+    tours = []
+    usados: Dict[int, int] = {}
+    for dep, clientes, duracao, chegadas, dist in res["rotas"]:
+        usados[dep] = usados.get(dep, 0) + 1
+        carga = 0.0
+        paradas = []
+        for ordem, (c, chegada) in enumerate(zip(clientes, chegadas), start=1):
+            carga += dados["demandas"][c]
+            janela = dados["janelas"][c]
+            paradas.append(
+                {
+                    "ordem": ordem,
+                    "destino": ativos[c],
+                    "chegada": min_para_hora(chegada),
+                    "janela": [min_para_hora(janela[0]), min_para_hora(janela[1])] if janela else None,
+                    "carga_acumulada": round(carga, 3),
+                }
+            )
+        cap = capacidades[dep]
+        tours.append(
+            {
+                "produtor": producers[dep],
+                "veiculo": usados[dep],
+                "paradas": paradas,
+                "distance_km": round(dist, 3),
+                "duration_min": round(duracao, 1),
+                "saida": min_para_hora(inicio),
+                "retorno": min_para_hora(inicio + duracao),
+                "carga": round(carga, 3),
+                "capacidade": None if cap == float("inf") else cap,
+            }
+        )
+    for c in res["nao_atendidos"]:
+        nao_atendidos.append({"destino": ativos[c], "motivo": "sem veículo com capacidade/janela viável"})
+
+    return {
+        "meta": {
+            "algorithm": res["algoritmo"],
+            "distancia": res["distancia"],
+            "tempo_limite_s": tempo_limite,
+            "tempo_gasto_s": round(res["tempo_gasto_s"], 3),
+            "iteracoes": res["iteracoes"],
+            "movimentos": res["movimentos"],
+            "custo_inicial_min": round(res["custo_inicial_min"], 1),
+        },
+        "total_distance_km": round(sum(t["distance_km"] for t in tours), 3),
+        "total_duration_min": round(res["custo_min"], 1),
+        "veiculos_usados": len(tours),
+        "tours": tours,
+        "nao_atendidos": nao_atendidos,
+    }
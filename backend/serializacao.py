@@ -0,0 +1,86 @@
+"""
+Serialização JSON rápida para as respostas da API.
+
+`RespostaJSONRapida` é a classe de resposta padrão do app: usa `orjson` quando
+instalado (NaN/inf viram `null`, tipos NumPy são aceitos) e cai para o
+`json` da stdlib com o mesmo contrato.
+
+Rotas que devolvem estruturas pré-calculadas e confiáveis (só tipos JSON
+nativos) usam `resposta_json(...)`, que devolve a `Response` pronta e pula o
+`jsonable_encoder` do FastAPI.
+"""
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, List
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional
+    orjson = None  # type: ignore
+
+_ORJSON_OPCOES = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def _padrao(obj: Any) -> Any:
+    """Fallback da stdlib para escalares/arrays NumPy."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+def _sem_nan(obj: Any) -> Any:
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _sem_nan(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sem_nan(v) for v in obj]
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON compacto em UTF-8; NaN/inf são serializados como `null`."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPCOES)
+    try:
+        texto = json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_padrao)
+    except ValueError:  # NaN/inf: limpa e tenta de novo (caminho raro)
+        texto = json.dumps(_sem_nan(obj), ensure_ascii=False, separators=(",", ":"), default=_padrao)
+    return texto.encode("utf-8")
+
+
+class RespostaJSONRapida(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def resposta_json(conteudo: Any, status_code: int = 200) -> RespostaJSONRapida:
+    """Resposta direta para estruturas pré-calculadas (sem `jsonable_encoder`)."""
+    return RespostaJSONRapida(conteudo, status_code=status_code)
+
+
+def normalizar_registros(registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Normaliza, uma vez na carga, registros vindos do pandas: NaN/inf -> None e
+    escalares NumPy -> tipos nativos. Depois disso os registros podem ser
+    servidos direto por `resposta_json`.
+    """
+    out = []
+    for reg in registros:
+        limpo = {}
+        for k, v in reg.items():
+            if hasattr(v, "item") and not isinstance(v, (str, bytes)):
+                v = v.item()
+            if isinstance(v, float) and not math.isfinite(v):
+                v = None
+            limpo[k] = v
+        out.append(limpo)
+    return out
@@ -0,0 +1,7 @@
+"""Os módulos do backend são importados pelo nome (`import roteirizacao`), como em main.py."""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
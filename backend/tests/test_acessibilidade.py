@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from acessibilidade import METRICAS_ACESSIBILIDADE, MotorAcessibilidade
+
+
+def _cenario(semente=0, n_bairros=40, n_fontes=60):
+    rng = random.Random(semente)
+    ponto = lambda: (-22.95 + rng.uniform(-0.06, 0.06), -43.25 + rng.uniform(-0.08, 0.08))
+    centroides = {f"B{i:02d}": ponto() for i in range(n_bairros)}
+    populacao = {b: float(rng.randint(0, 80_000)) for b in centroides}
+    fontes = [{"id": f"f{i}", "lat": lat, "lon": lon} for i, (lat, lon) in (( i, ponto()) for i in range(n_fontes))]
+    return centroides, populacao, fontes
+
+
+def _completo(centroides, populacao, fontes):
+    motor = MotorAcessibilidade()
+    motor.calcular(centroides, populacao, fontes)
+    return motor
+
+
+def _iguais(motor, referencia):
+    assert motor.resultado == referencia.resultado
+    assert motor._mais_proxima == referencia._mais_proxima
+    for b, acc in referencia._acessibilidade.items():
+        assert motor._acessibilidade[b] == pytest.approx(acc, rel=1e-9, abs=1e-15)
+
+
+def test_adicionar_igual_ao_calculo_completo():
+    centroides, populacao, fontes = _cenario()
+    motor = _completo(centroides, populacao, fontes[:30])
+    afetados = motor.adicionar_fontes(fontes[30:])
+    referencia = _completo(centroides, populacao, fontes)
+    _iguais(motor, referencia)
+    mudaram = {b for b in centroides if _completo(centroides, populacao, fontes[:30]).resultado[b] != referencia.resultado[b]}
+    assert mudaram <= set(afetados)
+
+
+def test_adicionar_e_remover_volta_ao_calculo_completo():
+    centroides, populacao, fontes = _cenario(1)
+    base = fontes[:40]
+    motor = _completo(centroides, populacao, base)
+    rng = random.Random(2)
+    # muitas idas e voltas: sem arredondamento intermediário nem clamp, nada deriva
+    for _ in range(50):
+        lote = rng.sample(fontes[40:], 5)
+        motor.adicionar_fontes(lote)
+        motor.remover_fontes([f["id"] for f in lote])
+    _iguais(motor, _completo(centroides, populacao, base))
+
+
+def test_remover_todas_as_fontes():
+    centroides, populacao, fontes = _cenario(3, n_fontes=10)
+    motor = _completo(centroides, populacao, fontes)
+    motor.remover_fontes([f["id"] for f in fontes])
+    for res in motor.resultado.values():
+        assert res["dist_in_natura_km"] is None
+        assert res["acessibilidade_in_natura"] == 0.0 and str(res["acessibilidade_in_natura"]) == "0.0"
+        assert all(res[m] == 0 for m in METRICAS_ACESSIBILIDADE[1:4])
+    _iguais(motor, _completo(centroides, populacao, []))
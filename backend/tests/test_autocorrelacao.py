@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from autocorrelacao import calcular_estatisticas, contiguidade_queen
+from topologia import construir_topologia
+
+LADO = 6
+
+
+def _quadrado(i, j):
+    # cantos calculados do mesmo jeito nos quadrados vizinhos (vértices idênticos, como num GeoJSON real)
+    x0, x1 = -43.5 + j / 100, -43.5 + (j + 1) / 100
+    y0, y1 = -23.0 + i / 100, -23.0 + (i + 1) / 100
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def _nome(i, j):
+    return f"C{i}{j}"
+
+
+def _reticulado(lado=LADO):
+    """Reticulado lado x lado de quadrados; CSR queen derivado da topologia."""
+    geometrias = {_nome(i, j): {"nome": _nome(i, j), "geometry": _quadrado(i, j)} for i in range(lado) for j in range(lado)}
+    return contiguidade_queen(construir_topologia(geometrias))
+
+
+def _densa(bairros, indptr, indices):
+    n = len(bairros)
+    w = np.zeros((n, n))
+    for i in range(n):
+        w[i, indices[indptr[i] : indptr[i + 1]]] = 1
+    return w
+
+
+def _valores(bairros, f):
+    return np.asarray([f(int(b[1]), int(b[2])) for b in bairros], dtype=np.float64)
+
+
+@pytest.mark.parametrize("lado", [LADO, 8])
+def test_contiguidade_queen_do_reticulado(lado):
+    bairros, indptr, indices = _reticulado(lado)
+    for pos, b in enumerate(bairros):
+        i, j = int(b[1]), int(b[2])
+        esperado = {
+            _nome(i + di, j + dj)
+            for di in (-1, 0, 1)
+            for dj in (-1, 0, 1)
+            if (di or dj) and 0 <= i + di < lado and 0 <= j + dj < lado
+        }
+        assert {bairros[v] for v in indices[indptr[pos] : indptr[pos + 1]]} == esperado
+    graus = np.diff(indptr)
+    assert sorted(set(graus.tolist())) == [3, 5, 8]  # canto, borda, interior
+
+
+@pytest.mark.parametrize(
+    "padrao",
+    [
+        lambda i, j: float(j),  # gradiente
+        lambda i, j: float((i + j) % 2),  # xadrez
+        lambda i, j: float(i < LADO // 2) * 10 + (i * 7 + j * 3) % 5,  # dois blocos com ruído
+    ],
+)
+def test_moran_lisa_e_gi_iguais_as_formulas_densas(padrao):
+    bairros, indptr, indices = _reticulado()
+    x = _valores(bairros, padrao)
+    res = calcular_estatisticas(x, indptr, indices, permutacoes=99)
+
+    w = _densa(bairros, indptr, indices)
+    n = x.size
+    z = x - x.mean()
+    ws = w / w.sum(axis=1, keepdims=True)
+    assert res["moran"]["I"] == pytest.approx(z @ ws @ z / (z @ z))
+    np.testing.assert_allclose(res["lisa"], z / (z @ z / n) * (ws @ z))
+
+    wg = w + np.eye(n)  # Gi*: inclui o próprio bairro
+    wi = wg.sum(axis=1)
+    s = np.sqrt((x**2).mean() - x.mean() ** 2)
+    gi = (wg @ x - x.mean() * wi) / (s * np.sqrt((n * (wg**2).sum(axis=1) - wi**2) / (n - 1)))
+    np.testing.assert_allclose(res["gi_z"], gi)
+
+
+def test_gradiente_e_agrupado_e_significativo():
+    bairros, indptr, indices = _reticulado()
+    res = calcular_estatisticas(_valores(bairros, lambda i, j: float(j)), indptr, indices, permutacoes=199)
+    assert res["moran"]["I"] > 0.5
+    assert res["moran"]["p_sim"] == pytest.approx(1 / 200)
+    assert res["moran"]["z_sim"] > 4
+    # extremos do gradiente: alto-alto à direita, baixo-baixo à esquerda
+    quad = dict(zip(bairros, res["quadrante"].tolist()))
+    assert quad[_nome(2, LADO - 1)] == 1 and quad[_nome(2, 0)] == 3
+
+
+def test_sem_estrutura_espacial_nao_rejeita():
+    bairros, indptr, indices = _reticulado(10)
+    rejeicoes = 0
+    for semente in range(20):
+        x = np.random.default_rng(semente).normal(size=len(bairros))
+        res = calcular_estatisticas(x, indptr, indices, permutacoes=199, semente=semente)
+        rejeicoes += res["moran"]["p_sim"] < 0.05
+        assert res["moran"]["esperado"] == pytest.approx(-1 / 99)
+    assert rejeicoes <= 4  # ~5% esperado sob a hipótese nula
+
+
+def test_lisa_condicional_aponta_o_hotspot():
+    bairros, indptr, indices = _reticulado(8)
+    centro = {(3, 3), (3, 4), (4, 3), (4, 4)}
+    x = _valores(bairros, lambda i, j: 100.0 if (i, j) in centro else float((i * 5 + j * 3) % 4))
+    res = calcular_estatisticas(x, indptr, indices, permutacoes=499)
+    pos = {b: k for k, b in enumerate(bairros)}
+    for i, j in centro:
+        k = pos[_nome(i, j)]
+        assert res["quadrante"][k] == 1
+        assert res["lisa_p"][k] < 0.05 and res["gi_p"][k] < 0.05
+    canto = pos[_nome(0, 0)]
+    assert res["lisa_p"][canto] > 0.05
+    assert np.all((res["lisa_p"] >= 1 / 500) & (res["lisa_p"] <= 0.5 + 1 / 500))
+
+
+def test_ilhas_e_valores_constantes():
+    bairros, indptr, indices = _reticulado(3)
+    assert calcular_estatisticas(np.ones(len(bairros)), indptr, indices)["moran"] is None
+    # sem vizinhos: tudo NaN
+    vazio = calcular_estatisticas(np.arange(4.0), np.zeros(5, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    assert vazio["moran"] is None and np.isnan(vazio["lisa"]).all()
@@ -0,0 +1,145 @@
+import random
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import cenarios
+from cenarios import (
+    METRICAS_CENARIO,
+    BaseCenarios,
+    calcular_cenario,
+    cnae_casa,
+    id_cenario,
+    normalizar_deltas,
+    termos_cnae,
+)
+from endpoint import GEO_CATALOG, GEO_JOIN_KEYS, montar_geo
+
+GRUPOS = ["In natura", "Misto", "Ultraprocessado"]
+CNAES = ["Feira livre", "Hortifruti", "Padaria", "Restaurante", "Lanchonete", "Supermercado"]
+
+
+def _dados(semente=0):
+    rng = random.Random(semente)
+    ras = {f"B{i:02d}": ["CENTRO", "TIJUCA", "BANGU"][i % 3] for i in range(12)}
+    censo = [
+        {"nome": b, "regiao_adm": ra, "codra": str(i), "Shape_Area": rng.uniform(1e6, 9e6),
+         "Total_de_pessoas_2022": rng.randint(5_000, 90_000)}
+        for i, (b, ra) in enumerate(ras.items())
+    ]
+    rows = [
+        {"bairro": b, "classificacao_grupo": g, "classificacao_cnae": c, "quantidade": rng.randint(2, 30)}
+        for b in ras
+        for g in GRUPOS
+        for c in rng.sample(CNAES, 3)
+    ]
+    return rows, censo
+
+
+def _base(rows, censo, monkeypatch):
+    geo = montar_geo(rows, censo)
+    monkeypatch.setitem(GEO_CATALOG, "groups", geo["catalogo"]["groups"])
+    return BaseCenarios(geo["rows"], {n: geo[n] for n in ("bairro", "ra", "cidade")})
+
+
+def _aplicar_nas_linhas(rows, censo, deltas):
+    """Os mesmos deltas aplicados nas linhas e no Censo, para recalcular tudo do zero."""
+    rows = [dict(r) for r in rows]
+    censo = [dict(c) for c in censo]
+    for d in deltas:
+        if d["op"] == "adicionar":
+            rows.append({"bairro": d["bairro"], "classificacao_grupo": d["grupo"],
+                         "classificacao_cnae": d["cnae"], "quantidade": d["quantidade"]})
+        elif d["op"] == "remover":
+            rows.append({"bairro": d["bairro"], "classificacao_grupo": d["grupo"],
+                         "classificacao_cnae": d["cnae"], "quantidade": -d["quantidade"]})
+        elif d["op"] == "reclassificar":
+            for r in rows:
+                if (cnae_casa(r["classificacao_cnae"], termos_cnae(d["cnae"])) and r["classificacao_grupo"] != d["para"]
+                        and (d["bairro"] is None or r["bairro"] == d["bairro"])):
+                    r["classificacao_grupo"] = d["para"]
+        elif d["op"] == "populacao":
+            for c in censo:
+                if c["nome"] == d["bairro"]:
+                    c["Total_de_pessoas_2022"] = d["valor"] if d["valor"] is not None else c["Total_de_pessoas_2022"] + d["variacao"]
+    return montar_geo(rows, censo)
+
+
+def test_cenario_incremental_igual_ao_recalculo_completo(monkeypatch):
+    rows, censo = _dados()
+    base = _base(rows, censo, monkeypatch)
+    existente = next(r for r in rows if r["bairro"] == "B04" and r["classificacao_grupo"] == "Misto")
+    deltas = normalizar_deltas(base, [
+        {"op": "adicionar", "bairro": "B01", "grupo": "In natura", "cnae": "Feira livre", "quantidade": 12},
+        {"op": "adicionar", "bairro": "B07", "grupo": "in natura", "cnae": "Sacolão", "quantidade": 5},
+        {"op": "remover", "bairro": "B04", "grupo": "Misto", "cnae": existente["classificacao_cnae"], "quantidade": 1},
+        {"op": "reclassificar", "cnae": "restaurante|lanchonete", "para": "Misto", "bairro": "B02"},
+        {"op": "populacao", "bairro": "B05", "variacao": 40_000},
+        {"op": "populacao", "bairro": "B10", "valor": 1_000},
+    ])
+    res = calcular_cenario(base, deltas)
+    completo = _aplicar_nas_linhas(rows, censo, deltas)
+
+    for nivel in ("bairro", "ra", "cidade"):
+        alterados = {i[GEO_JOIN_KEYS[nivel]]: i["depois"] for i in res["niveis"][nivel]}
+        for item, sumario in completo[nivel].items():
+            esperado = {m: sumario["totais"].get(m) for m in METRICAS_CENARIO}
+            obtido = alterados.get(item) or {m: base.totais[nivel][item].get(m) for m in METRICAS_CENARIO}
+            assert obtido == pytest.approx(esperado), (nivel, item)
+    assert res["meta"]["bairros_afetados"] == 6
+    assert not res["avisos"]
+
+
+def test_id_nao_depende_da_grafia(monkeypatch):
+    base = _base(*_dados(), monkeypatch)
+    a = normalizar_deltas(base, [{"op": "adicionar", "bairro": "b01", "grupo": "IN NATURA", "cnae": " Feira livre "}])
+    b = normalizar_deltas(base, [{"op": "adicionar", "bairro": "B01", "grupo": "In natura", "cnae": "Feira livre", "quantidade": 1}])
+    assert id_cenario(a) == id_cenario(b)
+
+
+def test_definicao_criada_num_worker_e_lida_em_outro(monkeypatch, tmp_path):
+    monkeypatch.setattr(cenarios, "DEFINICOES_DIR", tmp_path)
+    monkeypatch.setattr(cenarios, "BASE", _base(*_dados(), monkeypatch))
+    monkeypatch.setattr(cenarios, "_CACHE", cenarios.OrderedDict())
+    monkeypatch.setattr(cenarios, "_DEFINICOES", {})
+    deltas = normalizar_deltas(cenarios.BASE, [{"op": "populacao", "bairro": "B03", "variacao": 500}])
+    cid = id_cenario(deltas)
+    cenarios.salvar_definicao(cid, {"nome": "teste", "deltas": deltas})
+
+    # outro worker: LRU e definições lidas vazias, só o disco em comum
+    cenarios._CACHE.clear()
+    cenarios._DEFINICOES.clear()
+    res = cenarios.obter_cenario(cid)
+    assert res["nome"] == "teste" and res["niveis"]["bairro"][0]["bairro"] == "B03"
+    assert [c for c, _ in cenarios.listar_definicoes()] == [cid]
+    with pytest.raises(HTTPException) as erro:
+        cenarios.obter_cenario("../../etc/passwd")
+    assert erro.value.status_code == 404
+
+
+def test_poda_das_definicoes(monkeypatch, tmp_path):
+    monkeypatch.setattr(cenarios, "DEFINICOES_DIR", tmp_path)
+    monkeypatch.setattr(cenarios, "MAX_DEFINICOES", 2)
+    for i in range(4):
+        cenarios.salvar_definicao(f"{i:016x}", {"nome": str(i), "deltas": []})
+    assert sorted(c for c, _ in cenarios.listar_definicoes()) == [f"{i:016x}" for i in (2, 3)]
+
+
+def test_reclassificar_usa_termos_literais(monkeypatch):
+    base = _base(*_dados(), monkeypatch)
+    # padrão de backtracking catastrófico para `re`: aqui é só texto, e responde na hora
+    deltas = normalizar_deltas(base, [{"op": "reclassificar", "cnae": "(a+)+$|" + "a" * 40, "para": "Misto"}])
+    inicio = time.perf_counter()
+    res = calcular_cenario(base, deltas)
+    assert time.perf_counter() - inicio < 1
+    assert res["meta"]["bairros_afetados"] == 0 and res["avisos"]
+
+    assert termos_cnae(" Restaurante | LANCHONETE ||") == ["restaurante", "lanchonete"]
+    assert cnae_casa("Lanchonete e similares", termos_cnae("restaurante|lanchonete"))
+    assert not cnae_casa("Padaria", termos_cnae("pada.ia"))
+
+    for cnae in ("|", "x" * 201, "|".join("abcdefghijklmnopqrstu")):
+        with pytest.raises(HTTPException) as erro:
+            normalizar_deltas(base, [{"op": "reclassificar", "cnae": cnae, "para": "Misto"}])
+        assert erro.value.status_code == 400
@@ -0,0 +1,105 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import colunar
+import endpoint
+from colunar import inferir_esquema, resposta_colunar
+from endpoint import data_router
+
+pa = pytest.importorskip("pyarrow")
+pd = pytest.importorskip("pandas")
+
+LINHAS = [
+    {"bairro": "TIJUCA", "quantidade": "3", "area": "1.5", "codigo": "01", "ativo": True, "obs": ""},
+    {"bairro": "GRAJAU", "quantidade": "7", "area": "2", "codigo": "02", "ativo": False, "obs": "x"},
+    {"bairro": "TIJUCA", "quantidade": "", "area": "0.25", "codigo": "10", "ativo": True, "obs": ""},
+    {"bairro": "MEIER", "quantidade": "12", "area": "3e1", "codigo": "03", "ativo": None, "obs": "y"},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(endpoint.DATA_CACHE, "tabela_1", [dict(l) for l in LINHAS])
+    app = FastAPI()
+    app.include_router(data_router)
+    return TestClient(app)
+
+
+def test_esquema_inferido():
+    assert colunar.classificar(["1.5", "01.5"]) == "string"
+    assert colunar.classificar(["0", "0.5", "-.5", "1e3"]) == "float64"
+    assert inferir_esquema(LINHAS) == {
+        "bairro": "string",
+        "quantidade": "int64",
+        "area": "float64",
+        "codigo": "string",  # zero à esquerda continua texto (nem int, nem float)
+        "ativo": "bool",
+        "obs": "string",
+    }
+
+
+def test_arrow_com_tipos(client):
+    r = client.get("/api/v1/dados/hipermercados", params={"format": "arrow"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert r.headers["x-total-rows"] == "4"
+    assert 'filename="hipermercados.arrows"' in r.headers["content-disposition"]
+
+    tabela = pa.ipc.open_stream(r.content).read_all()
+    assert tabela.schema.field("quantidade").type == pa.int64()
+    assert tabela.schema.field("area").type == pa.float64()
+    assert tabela.schema.field("ativo").type == pa.bool_()
+    assert tabela.schema.field("bairro").type == pa.dictionary(pa.int32(), pa.string())
+    assert tabela.column("quantidade").to_pylist() == [3, 7, None, 12]
+    assert tabela.column("obs").to_pylist() == ["", "x", "", "y"]
+
+    df = pa.ipc.open_stream(r.content).read_pandas()
+    assert str(df["area"].dtype) == "float64" and df["area"].tolist() == [1.5, 2.0, 0.25, 30.0]
+    assert isinstance(df["bairro"].dtype, pd.CategoricalDtype)
+    assert df["codigo"].astype(str).tolist() == ["01", "02", "10", "03"]
+
+
+def test_parquet_ida_e_volta(client):
+    r = client.get("/api/v1/dados/hipermercados", params={"format": "parquet"})
+    assert r.headers["content-type"] == "application/vnd.apache.parquet"
+    df = pd.read_parquet(io.BytesIO(r.content))
+    assert df["quantidade"].isna().tolist() == [False, False, True, False]
+    assert df["quantidade"].dropna().astype("int64").tolist() == [3, 7, 12]
+    assert df["bairro"].astype(str).tolist() == ["TIJUCA", "GRAJAU", "TIJUCA", "MEIER"]
+    assert str(df["area"].dtype) == "float64"
+
+
+def test_recorte_usa_o_esquema_da_fonte(client):
+    # a página só tem "2" em area, mas a fonte inteira é float64
+    r = client.get("/api/v1/dados/hipermercados", params={"format": "arrow", "offset": 1, "limit": 1})
+    tabela = pa.ipc.open_stream(r.content).read_all()
+    assert tabela.num_rows == 1 and tabela.schema.field("area").type == pa.float64()
+    assert tabela.column("area").to_pylist() == [2.0]
+
+    catalogo = client.get("/api/v1/dados/catalogo").json()
+    (hiper,) = [i for i in catalogo["items"] if i["slug"] == "hipermercados"]
+    assert {c["nome"]: c["tipo"] for c in hiper["schema"]}["area"] == "float64"
+    assert "arrow" in catalogo["exportacao"]["formatos"]
+
+    assert client.get("/api/v1/dados/hipermercados", params={"format": "xml"}).status_code == 400
+
+
+def test_sem_pyarrow_responde_501(client, monkeypatch):
+    monkeypatch.setattr(colunar, "pa", None)
+    assert client.get("/api/v1/dados/hipermercados", params={"format": "arrow"}).status_code == 501
+    assert client.get("/api/v1/dados/hipermercados").json()["meta"]["total_rows"] == 4
+
+
+def test_lotes_do_stream():
+    async def coletar(resposta):
+        return [parte async for parte in resposta.body_iterator]
+
+    partes = asyncio.run(coletar(resposta_colunar(LINHAS, "arrow", "teste", lote=1)))
+    leitor = pa.ipc.open_stream(b"".join(partes))
+    lotes = list(leitor)
+    assert [b.num_rows for b in lotes] == [1, 1, 1, 1]
+    assert pa.Table.from_batches(lotes).column("quantidade").to_pylist() == [3, 7, None, 12]
@@ -0,0 +1,120 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compressao
+from compressao import CompressaoMiddleware, negociar, resposta_estatica, serializar_estatico
+
+LIMIAR = 1024
+GRANDE = {"data": [{"bairro": "TIJUCA", "quantidade": i} for i in range(200)]}
+ESTATICO = serializar_estatico(GRANDE)
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/grande")
+    async def grande():
+        return JSONResponse(GRANDE)
+
+    @app.get("/pequeno")
+    async def pequeno():
+        return JSONResponse({"ok": True})
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse((json.dumps(d) + "\n" for d in GRANDE["data"]), media_type="application/x-ndjson")
+
+    @app.get("/binario")
+    async def binario():
+        return StreamingResponse(iter([b"\x00" * 4096]), media_type="application/octet-stream")
+
+    @app.get("/estatico")
+    async def estatico(request: Request):
+        return resposta_estatica(request, ESTATICO, cache_control="public, max-age=60")
+
+    app.add_middleware(CompressaoMiddleware, limiar_bytes=LIMIAR)
+    return TestClient(app)
+
+
+def _bruto(client, rota, **headers):
+    """Status, cabeçalhos e corpo como vieram do servidor (sem a descompressão do httpx)."""
+    with client.stream("GET", rota, headers=headers) as r:
+        return r.status_code, r.headers, b"".join(r.iter_raw())
+
+
+@pytest.fixture
+def client():
+    return _app()
+
+
+def test_negociacao_respeita_q(monkeypatch):
+    assert negociar("gzip, deflate") == "gzip"
+    assert negociar("GZIP;q=0.5, identity") == "gzip"
+    assert negociar("gzip;q=0") is None
+    assert negociar("identity") is None
+    assert negociar("") is None
+    assert negociar("*;q=0.3") == "gzip"
+    assert negociar("*, gzip;q=0") is None
+    assert negociar("gzip;q=abc") is None
+    # preferência entre as duas quando brotli está instalado
+    monkeypatch.setattr(compressao, "codificacoes_suportadas", lambda: ["br", "gzip"])
+    assert negociar("gzip, br") == "br"
+    assert negociar("br;q=0.4, gzip;q=0.8") == "gzip"
+    assert negociar("br;q=0.8, gzip;q=0.8") == "br"  # empate: ordem de preferência do servidor
+    assert negociar("br;q=0, *") == "gzip"
+
+
+def test_limiar_da_compressao_dinamica(client):
+    status, headers, corpo = _bruto(client, "/grande", **{"Accept-Encoding": "gzip"})
+    assert status == 200 and headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in headers["vary"]
+    assert int(headers["content-length"]) == len(corpo)
+    assert json.loads(gzip.decompress(corpo)) == GRANDE
+
+    # abaixo do limiar, sem Accept-Encoding, ou com q=0: sai sem compressão
+    status, headers, corpo = _bruto(client, "/pequeno", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in headers and json.loads(corpo) == {"ok": True}
+    for aceita in ("identity", "gzip;q=0"):
+        status, headers, corpo = _bruto(client, "/grande", **{"Accept-Encoding": aceita})
+        assert "content-encoding" not in headers and json.loads(corpo) == GRANDE
+    # tipo não comprimível
+    _, headers, corpo = _bruto(client, "/binario", **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in headers and len(corpo) == 4096
+
+
+def test_stream_comprimido_em_pedacos(client):
+    _, headers, corpo = _bruto(client, "/stream", **{"Accept-Encoding": "gzip"})
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    linhas = gzip.decompress(corpo).decode().splitlines()
+    assert [json.loads(l) for l in linhas] == GRANDE["data"]
+
+
+def test_estatico_serve_a_variante_pronta_e_304(client):
+    _, headers, corpo = _bruto(client, "/estatico", **{"Accept-Encoding": "gzip"})
+    # a variante pré-comprimida passa pelo middleware sem ser comprimida de novo
+    assert headers["content-encoding"] == "gzip" and corpo == ESTATICO["variantes"]["gzip"]
+    assert headers["etag"] == ESTATICO["etag"] and headers["cache-control"] == "public, max-age=60"
+
+    _, headers, corpo = _bruto(client, "/estatico", **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in headers and corpo == ESTATICO["variantes"]["identity"]
+
+    status, headers, corpo = _bruto(
+        client, "/estatico", **{"Accept-Encoding": "gzip", "If-None-Match": f'W/"x", {ESTATICO["etag"]}'}
+    )
+    assert status == 304 and corpo == b"" and headers["etag"] == ESTATICO["etag"]
+    assert "content-encoding" not in headers
+    status, _, _ = _bruto(client, "/estatico", **{"If-None-Match": '"outro"'})
+    assert status == 200
+
+
+def test_brotli_quando_instalado(client):
+    brotli = pytest.importorskip("brotli")
+    _, headers, corpo = _bruto(client, "/grande", **{"Accept-Encoding": "gzip;q=0.5, br"})
+    assert headers["content-encoding"] == "br" and json.loads(brotli.decompress(corpo)) == GRANDE
+    _, headers, corpo = _bruto(client, "/estatico", **{"Accept-Encoding": "br"})
+    assert headers["content-encoding"] == "br" and corpo == ESTATICO["variantes"]["br"]
@@ -0,0 +1,98 @@
+import itertools
+import random
+from collections import defaultdict
+
+import pytest
+
+import memoria_compartilhada
+from cubo import DIMENSOES, Cubo
+from memoria_compartilhada import Construtor, anexar, publicar
+
+RAS = ["CENTRO", "TIJUCA", "BANGU"]
+
+
+def _dados(semente=0):
+    rng = random.Random(semente)
+    bairros = [f"B{i:02d}" for i in range(10)]
+    ra_de = {b: rng.choice(RAS) for b in bairros}
+    populacao = {b: rng.choice([0, 1000, 5000]) for b in bairros}
+    rows = [
+        {
+            "bairro": rng.choice(bairros),
+            "classificacao_grupo": rng.choice("GH"),
+            "classificacao_cnae": rng.choice(["c1", "c2", "c3"]),
+            "quantidade": rng.randint(1, 9),
+        }
+        for _ in range(200)
+    ]
+    return rows, ra_de, populacao
+
+
+def _forca_bruta(rows, ra_de, populacao, linhas, colunas, filtros):
+    """Soma linha a linha: {(rótulo da linha, rótulo da coluna): (quantidade, população)}."""
+    registros = [dict(r, regiao_adm=ra_de[r["bairro"]]) for r in rows]
+    qtd = defaultdict(int)
+    for r in registros:
+        if all(r[d] in v for d, v in filtros.items()):
+            qtd[(tuple(r[d] for d in linhas), tuple(r[d] for d in colunas))] += r["quantidade"]
+    geo = [d for d in linhas + colunas if d in ("regiao_adm", "bairro")]
+    pop = defaultdict(int)
+    for b, p in populacao.items():
+        r = {"bairro": b, "regiao_adm": ra_de[b]}
+        if all(r[d] in v for d, v in filtros.items() if d in r):
+            pop[tuple(r[d] for d in geo)] += p
+    saida = {}
+    for (l, c), q in qtd.items():
+        valores = dict(zip(linhas + colunas, l + c))
+        saida[(l, c)] = (q, pop[tuple(valores[d] for d in geo)])
+    return saida
+
+
+@pytest.mark.parametrize(
+    "linhas,colunas,filtros",
+    [
+        (["regiao_adm"], ["classificacao_grupo"], {}),
+        (["regiao_adm", "bairro"], ["classificacao_cnae"], {}),
+        (["regiao_adm"], ["bairro"], {"classificacao_grupo": ["G"]}),
+        (["bairro", "classificacao_grupo", "regiao_adm"], [], {"regiao_adm": ["CENTRO", "BANGU"]}),
+        (["regiao_adm"], [], {"bairro": ["B01", "B02", "B03"]}),
+        ([], ["classificacao_cnae"], {"regiao_adm": ["TIJUCA"]}),
+    ],
+)
+def test_consulta_igual_a_soma_das_linhas(linhas, colunas, filtros):
+    rows, ra_de, populacao = _dados()
+    res = Cubo(rows, ra_de, populacao).consultar(linhas, colunas, filtros)
+    esperado = _forca_bruta(rows, ra_de, populacao, linhas, colunas, filtros)
+    obtido = {}
+    for i, l in enumerate(res["linhas"]):
+        for j, c in enumerate(res["colunas"]):
+            if res["valores"]["quantidade"][i][j]:
+                obtido[(tuple(l), tuple(c))] = (res["valores"]["quantidade"][i][j], res["valores"]["populacao"][i][j])
+    assert obtido == esperado
+    assert res["totais"]["geral"] == sum(q for q, _ in esperado.values())
+
+
+def test_drill_down_agrupa_bairros_pela_ra():
+    rows, ra_de, populacao = _dados()
+    res = Cubo(rows, ra_de, populacao).consultar(["regiao_adm", "bairro"], [], {})
+    assert res["linhas"] == sorted(res["linhas"])
+    assert all(ra_de[b] == ra for ra, b in res["linhas"])
+
+
+def test_eixo_geografico_nao_cruza_ra_com_bairro():
+    rows, ra_de, populacao = _dados()
+    cubo = Cubo(rows, ra_de, populacao)
+    assert all(not {"regiao_adm", "bairro"} <= dims for dims in cubo.cuboides)
+    assert len(cubo.cuboides) == 12
+
+
+def test_cubo_compartilhado_responde_igual(tmp_path, monkeypatch):
+    monkeypatch.setattr(memoria_compartilhada, "DIRETORIO", tmp_path)
+    monkeypatch.setattr(memoria_compartilhada, "PREFIXO", "teste")
+    cubo = Cubo(*_dados())
+    construtor = Construtor()
+    cubo.conteudo_compartilhado(construtor)
+    publicar(construtor)
+    anexado = Cubo.de_plano(anexar())
+    for linhas, colunas in itertools.permutations(DIMENSOES, 2):
+        assert anexado.consultar([linhas], [colunas], {}) == cubo.consultar([linhas], [colunas], {})
@@ -0,0 +1,126 @@
+import itertools
+import random
+
+from deduplicacao import LIMIAR, IndiceEntidades, registro, registros_tabela, similaridade
+
+
+def _feira(fonte, id, endereco, lat=None, lon=None, dia="", bairro="Tijuca", nome=""):
+    return registro(fonte, id, bairro, "Feira", "In natura", nome=nome, endereco=endereco,
+                    lat=lat, lon=lon, precisao="exact" if lat is not None else "", discriminante=dia)
+
+
+def _particao(indice):
+    grupos = {}
+    for i in range(len(indice.registros)):
+        grupos.setdefault(indice._raiz(i), set()).add(i)
+    return sorted(map(sorted, grupos.values()))
+
+
+def test_mesma_feira_em_duas_fontes_vira_uma_entidade():
+    indice = IndiceEntidades()
+    a = indice.adicionar(_feira("feiras", 1, "Rua Conde de Bonfim, 120", -22.9245, -43.2330, dia="Quarta"))
+    b = indice.adicionar(_feira("dados", 7, "CONDE DE BONFIM 120", -22.9247, -43.2331, dia="quarta", bairro="TIJUCA"))
+    assert a == b == 0
+    (entidade,) = indice.entidades()
+    assert entidade["n_registros"] == 2
+    assert entidade["fontes"] == "feiras:1|dados:7"
+    assert entidade["endereco"] == "Rua Conde de Bonfim, 120"
+
+
+def test_ordem_dos_tokens_e_erro_de_digitacao():
+    a = _feira("a", 1, "LIVRAMENTO DO, RUA")
+    assert similaridade(a, _feira("b", 1, "Rua do Livramento")) == 1.0
+    # erro de digitação: sozinho fica abaixo do limiar, com coordenadas próximas casa
+    b = _feira("a", 2, "Rua Barão de Mesquita, 500", -22.9245, -43.2330)
+    assert similaridade(b, _feira("b", 2, "R. Barao de Mesqiuta 500")) == 0.6 < LIMIAR
+    assert similaridade(b, _feira("b", 3, "R. Barao de Mesqiuta 500", -22.9250, -43.2332)) >= LIMIAR
+    # geocodificação só no nível do bairro: a proximidade não conta
+    no_bairro = registro("b", 4, "Tijuca", "Feira", endereco="R. Barao de Mesqiuta 500",
+                         lat=-22.9250, lon=-43.2332, precisao="bairro")
+    assert similaridade(b, no_bairro) == 0.6
+
+
+def test_nao_funde_estabelecimentos_distintos():
+    indice = IndiceEntidades()
+    indice.adicionar(_feira("feiras", 1, "Rua Conde de Bonfim, 120", -22.9245, -43.2330, dia="Quarta"))
+    # mesmo endereço, outro dia: outra sessão
+    indice.adicionar(_feira("feiras", 2, "Rua Conde de Bonfim, 120", -22.9245, -43.2330, dia="Sábado"))
+    # mesma rua, outro número
+    indice.adicionar(_feira("dados", 3, "Rua Conde de Bonfim, 900"))
+    # mesmo endereço escrito igual, mas geocodificado a vários km
+    indice.adicionar(_feira("dados", 4, "Rua Conde de Bonfim, 120", -22.9700, -43.1850))
+    # mesmo endereço em outro bairro: outro bloco, nem chega a comparar
+    indice.adicionar(_feira("dados", 5, "Rua Conde de Bonfim, 120", bairro="Maracanã"))
+    assert len(indice.entidades()) == 5
+    # nomes diferentes na mesma rua e número (duas hortas) também não
+    h1 = registro("hortas", 1, "Tijuca", "Horta", nome="Horta da Escola", endereco="Rua Uruguai 10")
+    h2 = registro("hortas", 2, "Tijuca", "Horta", nome="Horta Comunitária Salgueiro", endereco="Rua Uruguai 10")
+    assert similaridade(h1, h2) < LIMIAR
+
+
+def test_registro_ponte_funde_entidades_existentes():
+    indice = IndiceEntidades(limiar=0.6)
+    regs = [
+        _feira("a", 1, "Rua Uruguai 300", -22.9300, -43.2400),
+        _feira("b", 2, "Praça Saens Peña", -22.9295, -43.2395),  # perto, mas endereço sem nada em comum
+        # perto e com o endereço de cada um: casa com as duas entidades, que viram uma só
+        _feira("c", 3, "Rua Uruguai 300 Praça Saens Peña", -22.9302, -43.2401),
+    ]
+    ids = indice.adicionar_varios(regs)
+    assert ids[:2] == [0, 1] and ids[2] == 0  # a entidade mais antiga dá o id
+    assert _particao(indice) == [[0, 1, 2]]
+    assert indice.resumo()["entidades"] == 1
+
+
+def test_informais_ocupam_uma_entidade_por_fonte():
+    indice = IndiceEntidades()
+    indice.adicionar(_feira("feiras", 1, "Rua Conde de Bonfim, 120", -22.9245, -43.2330))
+    indice.adicionar(_feira("feiras", 2, "Rua Uruguai 300", -22.9300, -43.2400))
+    linhas = [{"bairro": "TIJUCA", "classificacao_grupo": "In natura", "classificacao_cnae": "feira"}] * 3
+    ids = indice.adicionar_varios(registros_tabela("informais", linhas))
+    # os dois primeiros preenchem as feiras já conhecidas; o terceiro é uma feira a mais
+    assert ids == [0, 1, 4]
+    assert [e["n_registros"] for e in indice.entidades()] == [2, 2, 1]
+
+    # ao contrário: o registro com endereço descreve a entidade que só tinha informais
+    indice = IndiceEntidades()
+    indice.adicionar_varios(registros_tabela("informais", linhas[:1]))
+    assert indice.adicionar(_feira("feiras", 1, "Rua Conde de Bonfim, 120", -22.9245, -43.2330)) == 0
+    (entidade,) = indice.entidades()
+    assert entidade["endereco"] == "Rua Conde de Bonfim, 120" and entidade["classificacao_grupo"] == "In natura"
+
+
+def test_incremental_igual_aos_componentes_conexos_por_bloco():
+    """Sem registros vazios, as entidades são as componentes conexas do grafo similaridade >= limiar."""
+    rng = random.Random(3)
+    ruas = ["Rua Uruguai", "Rua Conde de Bonfim", "Av. Maracanã", "Rua Barão de Mesquita", "Rua Haddock Lobo"]
+    regs = []
+    for n in range(120):
+        rua = rng.choice(ruas)
+        if rng.random() < 0.3:  # erro de digitação
+            k = rng.randrange(4, len(rua) - 1)
+            rua = rua[:k] + rua[k + 1] + rua[k] + rua[k + 2 :]
+        lat = -22.92 + rng.choice([0, 0.0005, 0.02]) if rng.random() < 0.5 else None
+        regs.append(_feira(rng.choice("abc"), n, f"{rua} {rng.choice([10, 120, 300])}",
+                           lat, -43.23 if lat is not None else None, bairro=rng.choice(["Tijuca", "Grajaú"])))
+    indice = IndiceEntidades()
+    indice.adicionar_varios(regs)
+
+    pai = list(range(len(regs)))
+
+    def raiz(i):
+        while pai[i] != i:
+            i = pai[i]
+        return i
+
+    for i, j in itertools.combinations(range(len(regs)), 2):
+        if regs[i]["_bloco"] == regs[j]["_bloco"] and similaridade(regs[i], regs[j]) >= LIMIAR:
+            pai[raiz(j)] = raiz(i)
+    esperado = {}
+    for i in range(len(regs)):
+        esperado.setdefault(raiz(i), []).append(i)
+    assert _particao(indice) == sorted(esperado.values())
+
+    resumo = indice.resumo()
+    assert resumo["blocos"] == 2
+    assert resumo["comparacoes"] < resumo["pares_sem_blocagem"] * 0.6
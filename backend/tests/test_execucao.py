@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import metricas
+from execucao import RETRY_AFTER_S, PoolProcessos, informar_progresso
+
+
+# funções de módulo: vão por pickle para os processos do pool
+def _pid():
+    return os.getpid()
+
+
+def _dormir(segundos):
+    time.sleep(segundos)
+    return os.getpid()
+
+
+def _morrer():
+    os._exit(3)
+
+
+def _falhar():
+    raise ValueError("entrada inválida")
+
+
+def _contar(n):
+    for i in range(n):
+        informar_progresso(i)
+    return n
+
+
+class RequisicaoFalsa:
+    """Só o que o pool usa da `Request`: desconecta depois de `apos_s` segundos."""
+
+    def __init__(self, apos_s):
+        self.desconecta_em = time.monotonic() + apos_s
+
+    async def is_disconnected(self):
+        return time.monotonic() > self.desconecta_em
+
+
+@pytest.fixture
+def pool():
+    p = PoolProcessos(workers=1, fila_maxima=1, metodo_inicio="spawn")
+    yield p
+    p.encerrar()
+
+
+def _contagem(tarefa, status):
+    return metricas._EXECUCOES[(tarefa, status)]
+
+
+def _morto(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+def test_fila_cheia_responde_429_com_retry_after(pool):
+    async def cenario():
+        tarefas = [asyncio.create_task(pool.executar("t-fila", _dormir, 0.5)) for _ in range(2)]
+        await asyncio.sleep(0)  # as duas reservam: uma executa, outra fica na fila
+        estado = pool.estado()
+        assert estado["executando"] + estado["fila"] == 2
+        with pytest.raises(HTTPException) as exc:
+            await pool.executar("t-fila", _pid)
+        return exc.value, await asyncio.gather(*tarefas)
+
+    antes = {s: _contagem("t-fila", s) for s in ("ok", "rejeitada")}
+    erro, pids = asyncio.run(cenario())
+    assert erro.status_code == 429 and erro.headers["Retry-After"] == str(RETRY_AFTER_S)
+    assert pids[0] == pids[1]  # a segunda esperou o mesmo (e único) processo
+    assert _contagem("t-fila", "rejeitada") - antes["rejeitada"] == 1
+    assert _contagem("t-fila", "ok") - antes["ok"] == 2
+    assert pool.estado() == {"workers": 1, "processos": 1, "executando": 0, "fila": 0, "fila_maxima": 1}
+
+
+def test_timeout_responde_504_e_substitui_o_processo(pool):
+    async def cenario():
+        primeiro = await pool.executar("t-prazo", _pid)
+        with pytest.raises(HTTPException) as exc:
+            await pool.executar("t-prazo", _dormir, 30, timeout_s=0.5)
+        return primeiro, exc.value, await pool.executar("t-prazo", _pid)
+
+    antes = _contagem("t-prazo", "timeout")
+    inicio = time.monotonic()
+    primeiro, erro, depois = asyncio.run(cenario())
+    assert erro.status_code == 504
+    assert time.monotonic() - inicio < 15
+    assert primeiro != depois and _morto(primeiro)
+    assert _contagem("t-prazo", "timeout") - antes == 1
+    assert pool.estado()["processos"] == 1
+
+
+def test_prazo_conta_a_espera_na_fila(pool):
+    async def cenario():
+        longa = asyncio.create_task(pool.executar("t-espera", _dormir, 1.0))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await pool.executar("t-espera", _pid, timeout_s=0.3)
+        return exc.value, await longa
+
+    erro, _ = asyncio.run(cenario())
+    assert erro.status_code == 504
+    assert metricas._EXECUCAO_ESPERA["t-espera"].total >= 1
+
+
+def test_desconexao_do_cliente_cancela_a_tarefa(pool):
+    async def cenario():
+        primeiro = await pool.executar("t-cancela", _pid)
+        with pytest.raises(HTTPException) as exc:
+            await pool.executar("t-cancela", _dormir, 30, request=RequisicaoFalsa(apos_s=0.3))
+        # cancelamento da própria corrotina (ex.: shutdown): também encerra o processo
+        tarefa = asyncio.create_task(pool.executar("t-cancela", _dormir, 30))
+        await asyncio.sleep(0.5)
+        tarefa.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarefa
+        return primeiro, exc.value, await pool.executar("t-cancela", _pid)
+
+    antes = _contagem("t-cancela", "cancelada")
+    primeiro, erro, depois = asyncio.run(cenario())
+    assert erro.status_code == 499
+    assert primeiro != depois and _morto(primeiro)
+    assert _contagem("t-cancela", "cancelada") - antes == 2
+
+
+def test_processo_que_morre_e_substituido(pool):
+    async def cenario():
+        primeiro = await pool.executar("t-queda", _pid)
+        with pytest.raises(RuntimeError, match="terminou inesperadamente"):
+            await pool.executar("t-queda", _morrer)
+        return primeiro, await pool.executar("t-queda", _pid)
+
+    antes = _contagem("t-queda", "erro")
+    primeiro, depois = asyncio.run(cenario())
+    assert primeiro != depois
+    assert _contagem("t-queda", "erro") - antes == 1
+    assert pool.estado()["processos"] == 1
+
+
+def test_excecao_da_tarefa_chega_intacta_e_o_processo_continua(pool):
+    async def cenario():
+        primeiro = await pool.executar("t-excecao", _pid)
+        with pytest.raises(ValueError, match="entrada inválida"):
+            await pool.executar("t-excecao", _falhar)
+        avisos = []
+        n = await pool.executar("t-excecao", _contar, 3, progresso=avisos.append)
+        return primeiro, avisos, n, await pool.executar("t-excecao", _pid)
+
+    primeiro, avisos, n, depois = asyncio.run(cenario())
+    assert primeiro == depois
+    assert avisos == [0, 1, 2] and n == 3
+
+
+def test_contadores_no_prometheus(pool):
+    asyncio.run(pool.executar("t-metricas", _pid))
+    texto = metricas.exportar_prometheus()
+    assert 'rajai_execucao_total{tarefa="t-metricas",status="ok"}' in texto
+    assert 'rajai_execucao_espera_segundos_count{tarefa="t-metricas"}' in texto
+    assert 'rajai_execucao_segundos_count{tarefa="t-metricas"}' in texto
@@ -0,0 +1,228 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import geocodificacao
+from geocodificacao import DEFAULT_SUFFIX, CacheGeocodificacao, LimitadorTaxa, ProvedorFixture, geocode_router
+
+CSV = (
+    "nome,endereco,bairro\n"
+    "Feira A,Rua Conde de Bonfim 120,Tijuca\n"
+    "Feira B,Rua Uruguai 300,Tijuca\n"
+    "Feira C,Rua Inexistente 1,Grajaú\n"  # não acha o endereço: cai no bairro
+    "Feira D,Rua Perdida 9,Lugar Nenhum\n"  # não acha nada
+    "Feira E,Av. Maracanã 900,Maracanã\n"
+)
+RESPOSTAS = {
+    f"Rua Conde de Bonfim 120, Tijuca, {DEFAULT_SUFFIX}": {"lat": -22.9245, "lon": -43.2330, "precision": "exact"},
+    f"Rua Uruguai 300, Tijuca, {DEFAULT_SUFFIX}": {"lat": -22.9300, "lon": -43.2400, "precision": "exact"},
+    f"Grajaú, {DEFAULT_SUFFIX}": {"lat": -22.9220, "lon": -43.2630, "precision": "neighborhood"},
+    f"Av. Maracanã 900, Maracanã, {DEFAULT_SUFFIX}": {"lat": -22.9180, "lon": -43.2300, "precision": "street"},
+}
+
+
+class ProvedorComPorteira(ProvedorFixture):
+    """Fixture que conta as consultas e, com a porteira fechada, segura a consulta de `parar_em`."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.consultas = []
+        self.porteira = threading.Event()
+        self.porteira.set()
+        self.parar_em = None
+        self.parado = threading.Event()
+
+    def geocodificar(self, query):
+        if self.parar_em and query.startswith(self.parar_em) and not self.porteira.is_set():
+            self.parado.set()
+            self.porteira.wait(10)
+        self.consultas.append(query)
+        return super().geocodificar(query)
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    fixture = tmp_path / "fixture.json"
+    fixture.write_text(json.dumps(RESPOSTAS), encoding="utf-8")
+    provedor = ProvedorComPorteira(fixture)
+    monkeypatch.setattr(geocodificacao, "JOBS_DIR", tmp_path / "jobs")
+    monkeypatch.setattr(geocodificacao, "JOBS", {})
+    monkeypatch.setattr(geocodificacao, "CACHE", CacheGeocodificacao(tmp_path / "cache.json"))
+    monkeypatch.setattr(geocodificacao, "LIMITADOR", LimitadorTaxa(tmp_path / "jobs"))
+    monkeypatch.setattr(geocodificacao, "_PROVEDORES_ATIVOS", {"fixture": provedor})
+    monkeypatch.setattr(geocodificacao, "_EXECUTOR", None)
+    monkeypatch.setattr(geocodificacao, "SALVAR_A_CADA", 1)
+    geocodificacao._ENCERRANDO.clear()
+    app = FastAPI()
+    app.include_router(geocode_router)
+    with TestClient(app) as client:
+        yield client, provedor
+    provedor.porteira.set()
+    executor = geocodificacao._EXECUTOR
+    geocodificacao.encerrar()
+    if executor is not None:  # nenhuma thread de job pode sobreviver aos monkeypatches
+        executor.shutdown(wait=True)
+    geocodificacao._ENCERRANDO.clear()
+
+
+def _enviar(client, corpo=CSV, **params):
+    return client.post("/api/v1/geo/geocode/jobs", params={"provedor": "fixture", **params},
+                       content=corpo.encode("utf-8"), headers={"Content-Type": "text/csv"})
+
+
+def _esperar(client, job_id, condicao, timeout=10.0):
+    fim = time.monotonic() + timeout
+    while time.monotonic() < fim:
+        corpo = client.get(f"/api/v1/geo/geocode/jobs/{job_id}", params={"limit": 0}).json()
+        if condicao(corpo["meta"]):
+            return corpo
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} não chegou ao estado esperado: {corpo['meta']}")
+
+
+def _pid_morto():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_ciclo_completo_com_geojson(api):
+    client, _ = api
+    r = _enviar(client, arquivo="feiras.csv")
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+    corpo = _esperar(client, job_id, lambda m: m["status"] == "concluido")
+
+    assert corpo["meta"]["processadas"] == 5 and corpo["meta"]["percentual"] == 100.0
+    assert corpo["meta"]["por_status"] == {"ok": 4, "not_found": 1}
+    por_nome = {d["nome"]: d for d in corpo["data"]}
+    assert por_nome["Feira A"]["lat"] == -22.9245 and por_nome["Feira A"]["geocode_precision"] == "exact"
+    assert por_nome["Feira C"]["geocode_query"] == f"Grajaú, {DEFAULT_SUFFIX}"
+    assert por_nome["Feira D"]["geocode_status"] == "not_found" and por_nome["Feira D"]["lat"] is None
+    assert [d["linha"] for d in corpo["data"]] == [0, 1, 2, 3, 4]
+
+    pagina = client.get(f"/api/v1/geo/geocode/jobs/{job_id}", params={"offset": 1, "limit": 2}).json()
+    assert [d["nome"] for d in pagina["data"]] == ["Feira B", "Feira C"]
+
+    geo = client.get(f"/api/v1/geo/geocode/jobs/{job_id}/geojson")
+    assert geo.headers["content-type"].startswith("application/geo+json")
+    features = geo.json()["features"]
+    assert [f["properties"]["nome"] for f in features] == ["Feira A", "Feira B", "Feira C", "Feira E"]
+    assert features[0]["geometry"] == {"type": "Point", "coordinates": [-43.2330, -22.9245]}
+    assert "lat" not in features[0]["properties"]
+
+    # as consultas ficaram no cache: um segundo job não chama o provedor
+    _, provedor = api
+    antes = len(provedor.consultas)
+    _esperar(client, _enviar(client).json()["id"], lambda m: m["status"] == "concluido")
+    assert len(provedor.consultas) == antes
+    assert client.get("/api/v1/geo/geocode/jobs").json()["items"][0]["status"] == "concluido"
+
+
+def test_resultados_parciais_e_retomada_apos_reinicio(api):
+    client, provedor = api
+    provedor.porteira.clear()
+    provedor.parar_em = "Rua Inexistente"
+    job_id = _enviar(client).json()["id"]
+    assert provedor.parado.wait(10)
+
+    parcial = _esperar(client, job_id, lambda m: m["processadas"] == 2)
+    assert parcial["meta"]["status"] == "executando" and parcial["meta"]["percentual"] == 40.0
+    assert [d["nome"] for d in parcial["data"]] == ["Feira A", "Feira B"]
+    assert len(client.get(f"/api/v1/geo/geocode/jobs/{job_id}/geojson").json()["features"]) == 2
+
+    # desligamento: a linha em andamento termina e o job para como `interrompido`
+    geocodificacao.encerrar()
+    provedor.porteira.set()
+    _esperar(client, job_id, lambda m: m["status"] == "interrompido")
+    salvo = json.loads((geocodificacao.JOBS_DIR / f"{job_id}.json").read_text(encoding="utf-8"))
+    assert salvo["status"] == "interrompido" and sum(r is not None for r in salvo["resultados"]) == 3
+
+    # reinício: processo novo, nada em memória; o job é retomado de onde parou
+    geocodificacao.JOBS.clear()
+    feitas = len(provedor.consultas)
+    assert geocodificacao.retomar_jobs() == 1
+    corpo = _esperar(client, job_id, lambda m: m["status"] == "concluido")
+    assert corpo["meta"]["por_status"] == {"ok": 4, "not_found": 1}
+    assert len(provedor.consultas) - feitas == 3  # só Feira D (endereço e bairro) e Feira E
+    assert geocodificacao.retomar_jobs() == 0
+
+
+def test_job_de_outro_worker_e_assumido_uma_vez(api, monkeypatch):
+    client, provedor = api
+    provedor.porteira.clear()
+    provedor.parar_em = "Rua Uruguai"
+    job_id = _enviar(client).json()["id"]
+    assert provedor.parado.wait(10)
+
+    # outro worker: não tem o job em memória, mas lê o status do disco
+    outro = dict(geocodificacao.JOBS)
+    geocodificacao.JOBS.clear()
+    meta = client.get(f"/api/v1/geo/geocode/jobs/{job_id}").json()["meta"]
+    assert meta["status"] == "executando" and meta["processadas"] == 1
+    assert [j["id"] for j in client.get("/api/v1/geo/geocode/jobs").json()["items"]] == [job_id]
+    # o dono (este pid, visto de outro pid) está vivo: o job não é assumido de novo
+    with monkeypatch.context() as m:
+        m.setattr(geocodificacao.os, "getpid", lambda: 1)
+        assert geocodificacao.retomar_jobs() == 0
+
+    # cancelamento pedido pelo outro worker chega ao dono pelo arquivo-marca
+    assert client.delete(f"/api/v1/geo/geocode/jobs/{job_id}").json()["status"] == "executando"
+    geocodificacao.JOBS.update(outro)
+    provedor.porteira.set()
+    _esperar(client, job_id, lambda m: m["status"] == "cancelado")
+    assert not (geocodificacao.JOBS_DIR / f"{job_id}.cancelar").exists()
+
+
+def test_job_de_processo_morto_fica_interrompido_e_e_retomado(api):
+    client, _ = api
+    job = geocodificacao.JobGeocodificacao("0123456789ab", [{"endereco": "Rua Uruguai 300", "bairro": "Tijuca"}], "fixture")
+    job.status, job.pid = "executando", _pid_morto()
+    job.salvar()
+
+    assert client.get("/api/v1/geo/geocode/jobs/0123456789ab").json()["meta"]["status"] == "interrompido"
+    assert geocodificacao.retomar_jobs() == 1
+    corpo = _esperar(client, job.id, lambda m: m["status"] == "concluido")
+    assert corpo["data"][0]["lat"] == -22.9300
+    assert client.get("/api/v1/geo/geocode/jobs/..%2F..%2Fetc").status_code == 404
+    assert client.get("/api/v1/geo/geocode/jobs/ffffffffffff").status_code == 404
+
+
+def test_validacao_do_csv(api):
+    client, _ = api
+    assert _enviar(client, sep="").status_code == 422
+    assert _enviar(client, sep=";;").status_code == 422
+    assert _enviar(client, corpo="").status_code == 400
+    assert _enviar(client, corpo="nome,cidade\nA,Rio\n").status_code == 400
+    r = _enviar(client, corpo=CSV.replace(",", ";"), sep=";")
+    assert r.status_code == 202 and r.json()["total_linhas"] == 5
+
+
+def test_limite_de_taxa_vale_entre_processos(tmp_path):
+    provedor = ProvedorFixture(tmp_path / "nada.json")
+    provedor.min_intervalo_s = 0.05
+    # dois limitadores sobre o mesmo diretório, como em dois workers
+    a, b = LimitadorTaxa(tmp_path), LimitadorTaxa(tmp_path)
+    inicio = time.monotonic()
+    for limitador in (a, b, a, b, a, b):
+        limitador.aguardar(provedor)
+    assert time.monotonic() - inicio >= 5 * 0.05 - 0.005
+
+
+def test_cache_de_dois_processos_nao_se_sobrescreve(tmp_path):
+    path = tmp_path / "cache.json"
+    a, b = CacheGeocodificacao(path), CacheGeocodificacao(path)
+    a.guardar("q1", {"lat": 1.0, "lon": 2.0, "status": "ok"})
+    b.guardar("q2", {"lat": 3.0, "lon": 4.0, "status": "ok"})
+    a.salvar()
+    b.salvar()
+    assert set(json.loads(path.read_text(encoding="utf-8"))) == {"q1", "q2"}
+    assert b.obter("q1") is not None
+    assert os.path.exists(path) and not path.with_suffix(".json.tmp").exists()
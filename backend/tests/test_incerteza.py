@@ -0,0 +1,85 @@
+import numpy as np
+
+from endpoint import _aplicar_percentis, _calcular_totais
+from incerteza import METRICAS_IC, _metricas_replicas, calcular_intervalos
+
+NOMES = ("In natura", "Misto", "Ultraprocessado", "Outros")
+
+
+def _sumarios(contagens, populacao, area):
+    sumarios = []
+    for c, p, a in zip(contagens, populacao, area):
+        grupos = {g: int(n) for g, n in zip(NOMES, c) if n}
+        sumarios.append({"populacao_2022": p, "area_km2": a, "totais": _calcular_totais(grupos, p, a)})
+    _aplicar_percentis(sumarios)
+    return sumarios
+
+
+def test_replica_igual_ao_calculo_da_carga():
+    rng = np.random.default_rng(0)
+    n = 40
+    contagens = rng.integers(0, 6, size=(n, 4))  # contagens pequenas: muitos empates no ranking
+    populacao = rng.integers(0, 50_000, size=n).astype(float)
+    populacao[:3] = 0
+    area = rng.uniform(0.5, 20, size=n)
+    sumarios = _sumarios(contagens, populacao, area)
+
+    replica = _metricas_replicas(contagens[None].astype(float), populacao, area)
+    for m in METRICAS_IC:
+        np.testing.assert_allclose(replica[m][0], [s["totais"][m] for s in sumarios], err_msg=m)
+
+
+def test_cobertura_dos_intervalos_de_95():
+    """Com as contagens sorteadas de taxas conhecidas, ~95% dos intervalos contêm o valor verdadeiro."""
+    rng = np.random.default_rng(1)
+    n = 150
+    taxas = rng.uniform(20, 150, size=(n, 4))
+    populacao = rng.uniform(5_000, 200_000, size=n)
+    area = rng.uniform(1, 30, size=n)
+    verdade = {
+        "densidade_total_10k": taxas.sum(axis=1) * 10000 / populacao,
+        "densidade_in_natura_10k": taxas[:, 0] * 10000 / populacao,
+        "densidade_ultraprocessado_km2": taxas[:, 2] / area,
+        "ratio_ultra_sobre_total": taxas[:, 2] / taxas.sum(axis=1),
+    }
+    dentro = {m: [] for m in verdade}
+    for semente in range(4):
+        sumarios = _sumarios(rng.poisson(taxas), populacao, area)
+        for i, r in enumerate(calcular_intervalos(sumarios, replicas=1000, semente=semente)):
+            for m, v in verdade.items():
+                inferior, superior = r["intervalos"][m]
+                dentro[m].append(inferior <= round(v[i], 4) <= superior)
+    for m, acertos in dentro.items():
+        assert 0.92 <= np.mean(acertos) <= 0.98, (m, np.mean(acertos))
+
+
+def test_intervalos_largos_onde_ha_pouca_gente():
+    populacao = np.asarray([184.0, 150_000.0])
+    sumarios = _sumarios(np.asarray([[2, 1, 3, 0], [800, 400, 1200, 0]]), populacao, np.asarray([5.0, 5.0]))
+    pequeno, grande = calcular_intervalos(sumarios, replicas=500)
+    largura = [r["intervalos"]["densidade_total_10k"] for r in (pequeno, grande)]
+    relativa = [(s - i) / sm["totais"]["densidade_total_10k"] for (i, s), sm in zip(largura, sumarios)]
+    assert relativa[0] > 5 * relativa[1]
+    for r, sm in zip((pequeno, grande), sumarios):
+        i, s = r["intervalos"]["densidade_total_10k"]
+        assert i <= sm["totais"]["densidade_total_10k"] <= s
+
+
+def test_estabilidade_do_quintil():
+    rng = np.random.default_rng(2)
+    n = 50
+    # metade com contagens enormes (ranking estável), metade quase empatada em contagens minúsculas
+    contagens = np.vstack([rng.integers(1000, 5000, size=(25, 4)), rng.integers(0, 3, size=(25, 4))])
+    populacao = np.full(n, 100_000.0)
+    sumarios = _sumarios(contagens, populacao, np.ones(n))
+    res = calcular_intervalos(sumarios, replicas=400)
+    estabilidade = np.asarray([r["estabilidade"]["percentil_densidade_total"] for r in res])
+    assert np.all((0 <= estabilidade) & (estabilidade <= 1))
+    assert estabilidade[:25].mean() > estabilidade[25:].mean()
+    assert calcular_intervalos([], replicas=10) == []
+
+
+def test_deterministico_pela_semente():
+    sumarios = _sumarios(np.asarray([[5, 2, 7, 1], [9, 0, 3, 2], [1, 1, 1, 1]]), np.full(3, 1e4), np.ones(3))
+    assert calcular_intervalos(sumarios, replicas=300, semente=7) == calcular_intervalos(sumarios, replicas=300, semente=7)
+    assert calcular_intervalos(sumarios, replicas=300, semente=7) != calcular_intervalos(sumarios, replicas=300, semente=8)
@@ -0,0 +1,133 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import localizacao
+from distancias import haversine_vetorizado
+from localizacao import JobLocalizacao, pares_no_raio, resolver
+
+
+def _instancia(semente=0, n_d=300, n_c=12, n_e=3):
+    rng = np.random.default_rng(semente)
+
+    def pontos(n):
+        return {"lat": (-22.95 + rng.random(n) * 0.05).tolist(), "lon": (-43.25 + rng.random(n) * 0.05).tolist()}
+
+    demanda = {**pontos(n_d), "peso": rng.uniform(1, 100, n_d).tolist(), "bairro": rng.integers(0, 5, n_d).tolist()}
+    return demanda, pontos(n_e), pontos(n_c)
+
+
+def _distancias(origens, demanda):
+    lat_o, lon_o = np.asarray(origens["lat"]), np.asarray(origens["lon"])
+    lat_d, lon_d = np.asarray(demanda["lat"]), np.asarray(demanda["lon"])
+    if not lat_o.size:
+        return np.full((0, lat_d.size), np.inf)
+    return haversine_vetorizado(
+        np.repeat(lat_o, lat_d.size), np.repeat(lon_o, lat_d.size), np.tile(lat_d, lat_o.size), np.tile(lon_d, lat_o.size)
+    ).reshape(lat_o.size, lat_d.size)
+
+
+def _objetivo(metodo, escolha, d_cand, d_exist, peso, raio, limite):
+    """Valor a maximizar: população coberta ou redução da distância truncada (p-mediana)."""
+    perto = np.min(np.vstack([d_exist, d_cand[list(escolha)], np.full((1, peso.size), np.inf)]), axis=0)
+    if metodo == "cobertura":
+        return float(peso[perto <= raio].sum())
+    return -float((peso * np.minimum(perto, limite)).sum())
+
+
+@pytest.mark.parametrize("metodo", ["cobertura", "p_mediana"])
+@pytest.mark.parametrize("semente", [0, 1, 2])
+def test_celf_escolhe_o_mesmo_que_o_guloso_simples(metodo, semente):
+    demanda, existentes, candidatos = _instancia(semente)
+    raio, limite, k = 0.8, 2.5, 4
+    dados = {"metodo": metodo, "k": k, "raio_km": raio, "distancia_maxima_km": limite,
+             "demanda": demanda, "existentes": existentes, "candidatos": candidatos}
+    res = resolver(dados)
+
+    peso = np.asarray(demanda["peso"])
+    d_cand, d_exist = _distancias(candidatos, demanda), _distancias(existentes, demanda)
+    escolha: list = []
+    for _ in range(k):
+        atual = _objetivo(metodo, escolha, d_cand, d_exist, peso, raio, limite)
+        ganhos = {c: _objetivo(metodo, escolha + [c], d_cand, d_exist, peso, raio, limite) - atual
+                  for c in range(len(candidatos["lat"])) if c not in escolha}
+        melhor = max(ganhos, key=ganhos.get)
+        if ganhos[melhor] <= 1e-9:
+            break
+        escolha.append(melhor)
+        assert res["escolhidos"][len(escolha) - 1]["ganho"] == pytest.approx(ganhos[melhor], rel=1e-9, abs=1e-6)
+    assert [e["candidato"] for e in res["escolhidos"]] == escolha
+    # CELF reavalia menos que o guloso simples (todos os candidatos a cada passo)
+    assert res["avaliacoes"] < len(candidatos["lat"]) * max(1, len(escolha))
+
+
+@pytest.mark.parametrize("metodo", ["cobertura", "p_mediana"])
+def test_guloso_dentro_da_garantia_contra_forca_bruta(metodo):
+    demanda, existentes, candidatos = _instancia(5, n_c=10)
+    raio, limite, k = 0.8, 2.5, 3
+    res = resolver({"metodo": metodo, "k": k, "raio_km": raio, "distancia_maxima_km": limite,
+                    "demanda": demanda, "existentes": existentes, "candidatos": candidatos})
+    peso = np.asarray(demanda["peso"])
+    d_cand, d_exist = _distancias(candidatos, demanda), _distancias(existentes, demanda)
+    base = _objetivo(metodo, [], d_cand, d_exist, peso, raio, limite)
+    otimo = max(
+        _objetivo(metodo, list(c), d_cand, d_exist, peso, raio, limite) - base
+        for c in itertools.combinations(range(len(candidatos["lat"])), k)
+    )
+    guloso = sum(e["ganho"] for e in res["escolhidos"])
+    assert guloso <= otimo + 1e-6
+    assert guloso >= (1 - 1 / math.e) * otimo - 1e-6
+
+
+def test_pares_no_raio_igual_a_matriz_completa():
+    demanda, _, candidatos = _instancia(3, n_c=40)
+    d = _distancias(candidatos, demanda)
+    indptr, dest, dist = pares_no_raio(*(np.asarray(x[c]) for x in (candidatos, demanda) for c in ("lat", "lon")), 0.7)
+    for c in range(d.shape[0]):
+        a, b = indptr[c], indptr[c + 1]
+        assert sorted(dest[a:b].tolist()) == np.flatnonzero(d[c] <= 0.7).tolist()
+        np.testing.assert_allclose(np.sort(dist[a:b]), np.sort(d[c][d[c] <= 0.7]))
+
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(localizacao, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(localizacao, "JOBS", {})
+    return tmp_path
+
+
+def test_job_visivel_e_cancelavel_por_outro_worker(jobs_dir):
+    job = JobLocalizacao("0123456789ab", {"metodo": "cobertura", "k": 2})
+    localizacao._guardar_job(job)
+    job.atualizar({"etapa": "selecao", "concluido": 1, "total": 2})
+
+    # outro worker: não tem o job em memória, lê do disco
+    localizacao.JOBS.clear()
+    lido = localizacao._get_job(job.id)
+    assert lido.progresso()["status"] == "executando"
+    assert lido.progresso()["percentual"] == 55.0
+
+    localizacao.JOBS_DIR.joinpath(f"{job.id}.cancelar").touch()
+    job.atualizar({"etapa": "selecao", "concluido": 2, "total": 2})  # o dono vê o pedido
+    assert job.status == "cancelado"
+    assert localizacao._get_job(job.id).status == "cancelado"
+
+
+def test_job_de_processo_encerrado_vira_erro(jobs_dir, monkeypatch):
+    job = JobLocalizacao("ba9876543210", {})
+    job.status = "executando"
+    job.salvar()
+    monkeypatch.setattr(localizacao, "_processo_vivo", lambda pid: False)
+    lido = localizacao._get_job(job.id)
+    assert lido.status == "erro" and "encerrado" in lido.erro
+
+
+def test_poda_mantem_os_mais_recentes(jobs_dir, monkeypatch):
+    monkeypatch.setattr(localizacao, "MAX_JOBS", 3)
+    for i in range(5):
+        job = JobLocalizacao(f"{i:012x}", {})
+        job.status, job.criado_em = "concluido", 1000.0 + i
+        localizacao._guardar_job(job)
+    assert sorted(j.id for j in localizacao._todos_jobs()) == [f"{i:012x}" for i in (2, 3, 4)]
@@ -0,0 +1,117 @@
+import math
+
+import numpy as np
+import pytest
+
+import memoria_compartilhada
+from compressao import serializar_estatico
+from memoria_compartilhada import Construtor, anexar, publicar
+
+
+@pytest.fixture
+def segmento(tmp_path, monkeypatch):
+    monkeypatch.setattr(memoria_compartilhada, "DIRETORIO", tmp_path)
+    monkeypatch.setattr(memoria_compartilhada, "PREFIXO", "teste")
+    return tmp_path
+
+
+def test_tabela_com_colunas_inteiras_reais_e_texto(segmento):
+    linhas = [
+        {"bairro": "CENTRO", "total": 3, "densidade": 1.5},
+        {"bairro": "TIJUCA", "total": 0, "densidade": None},
+        {"bairro": None, "total": 7, "densidade": 2.25},
+    ]
+    c = Construtor()
+    c.tabela("t", linhas, inteiras=("total",), reais=("densidade",))
+    publicar(c)
+    tabela = anexar().tabela("t")
+    assert list(tabela) == linhas
+    assert tabela.coluna("densidade").dtype == np.float64
+    assert math.isnan(tabela.coluna("densidade")[1])
+
+
+def test_arrays_payloads_e_objetos_sem_copia(segmento):
+    matriz = np.arange(12, dtype=np.float32).reshape(3, 4)
+    payload = serializar_estatico({"a": [1, 2, 3]})
+    c = Construtor()
+    c.array("m", matriz)
+    c.payload("p", payload)
+    c.objeto("o", {"x": (1.0, 2.0)})
+    publicar(c)
+    plano = anexar()
+
+    lida = plano.array("m")
+    assert lida.shape == (3, 4) and lida.dtype == np.float32
+    np.testing.assert_array_equal(lida, matriz)
+    assert not lida.flags.writeable  # visão só leitura sobre o mmap
+
+    servido = plano.payload("p")
+    assert servido["etag"] == payload["etag"]
+    assert isinstance(servido["variantes"]["identity"], memoryview)
+    assert {k: bytes(v) for k, v in servido["variantes"].items()} == payload["variantes"]
+
+    assert plano.objeto("o") == {"x": (1.0, 2.0)}
+    assert plano.objeto("ausente") is None
+    assert plano.payload("ausente") is None
+
+
+def test_nova_geracao_nao_invalida_a_anterior(segmento):
+    c = Construtor()
+    c.array("v", np.array([1, 2, 3]))
+    publicar(c)
+    antigo = anexar()
+    c = Construtor()
+    c.array("v", np.array([4, 5]))
+    publicar(c)
+    novo = anexar()
+    assert novo.geracao == antigo.geracao + 1
+    assert antigo.array("v").tolist() == [1, 2, 3]
+    assert novo.array("v").tolist() == [4, 5]
+
+
+def test_impressao_digital_muda_com_arquivos_e_formato(tmp_path, monkeypatch):
+    dados = tmp_path / "dados.csv"
+    dados.write_text("a,b\n1,2\n")
+    ausente = tmp_path / "rede.npz"
+    base = memoria_compartilhada.impressao_digital([dados, ausente])
+    assert memoria_compartilhada.impressao_digital([ausente, dados, dados]) == base  # ordem e repetição não contam
+
+    dados.write_text("a,b\n1,2\n3,4\n")
+    mudou_csv = memoria_compartilhada.impressao_digital([dados, ausente])
+    ausente.write_bytes(b"x")
+    apareceu = memoria_compartilhada.impressao_digital([dados, ausente])
+    monkeypatch.setattr(memoria_compartilhada, "VERSAO_FORMATO", memoria_compartilhada.VERSAO_FORMATO + 1)
+    outro_formato = memoria_compartilhada.impressao_digital([dados, ausente])
+    assert len({base, mudou_csv, apareceu, outro_formato}) == 4
+
+
+def test_segmento_de_outros_dados_e_republicado(segmento, tmp_path, monkeypatch):
+    import main
+
+    entrada = tmp_path / "dados.csv"
+    entrada.write_text("v\n1\n")
+    publicados, anexados = [], []
+
+    def carregar_e_publicar():
+        c = Construtor(main.impressao_dos_dados())
+        c.array("v", np.array([len(entrada.read_text())]))
+        publicados.append(publicar(c))
+        return publicados[-1]
+
+    monkeypatch.setattr(main, "arquivos_de_entrada", lambda: [entrada])
+    monkeypatch.setattr(main, "carregar_e_publicar", carregar_e_publicar)
+    monkeypatch.setattr(main, "aplicar_dados_compartilhados", lambda plano: anexados.append(plano))
+
+    main.iniciar_dados_compartilhados()  # nada publicado: carrega
+    main.iniciar_dados_compartilhados()  # outro worker (ou reinício) com os mesmos dados: só anexa
+    assert publicados == [1] and [p.geracao for p in anexados] == [1, 1]
+
+    entrada.write_text("v\n1\n2\n")  # deploy com CSV novo: o segmento que sobrou em /dev/shm não serve
+    main.iniciar_dados_compartilhados()
+    assert publicados == [1, 2] and anexados[-1].geracao == 2
+    assert anexados[-1].array("v").tolist() == [len("v\n1\n2\n")]
+
+    # segmento de uma versão do código com outro layout, mesmos arquivos
+    monkeypatch.setattr(memoria_compartilhada, "VERSAO_FORMATO", memoria_compartilhada.VERSAO_FORMATO + 1)
+    main.iniciar_dados_compartilhados()
+    assert publicados == [1, 2, 3] and anexados[-1].impressao == main.impressao_dos_dados()
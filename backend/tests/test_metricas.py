@@ -0,0 +1,48 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metricas
+from metricas import ProfilerAmostragem, metricas_router, profiler_router
+
+
+def _app(com_profiler):
+    app = FastAPI()
+    app.include_router(metricas_router)
+    if com_profiler:
+        app.include_router(profiler_router)
+    return TestClient(app)
+
+
+def test_profiler_so_existe_com_a_flag(monkeypatch):
+    monkeypatch.setattr(metricas, "PROFILER", ProfilerAmostragem())
+    cliente = _app(com_profiler=False)
+    assert cliente.post("/metrics/profiler/iniciar").status_code == 404
+    assert cliente.get("/metrics/profiler").status_code == 404
+    assert not metricas.PROFILER.ativo
+    assert "rajai_profiler_ativo 0" in cliente.get("/metrics").text
+
+
+def test_profiler_para_sozinho(monkeypatch):
+    monkeypatch.setattr(metricas, "PROFILER", ProfilerAmostragem())
+    cliente = _app(com_profiler=True)
+    assert cliente.post("/metrics/profiler/iniciar", params={"duracao_s": 10_000}).status_code == 422
+    assert cliente.post("/metrics/profiler/iniciar", params={"intervalo_ms": 0.01}).status_code == 422
+    r = cliente.post("/metrics/profiler/iniciar", params={"intervalo_ms": 1, "duracao_s": 0.2}).json()
+    assert r["ativo"] and r["duracao_s"] == 0.2
+    fim = time.monotonic() + 5
+    while metricas.PROFILER.ativo and time.monotonic() < fim:
+        time.sleep(0.02)
+    assert not metricas.PROFILER.ativo
+    assert metricas.PROFILER.total_amostras > 0
+    assert cliente.get("/metrics/profiler").status_code == 200
+
+
+def test_duracao_limitada_pelo_maximo(monkeypatch):
+    monkeypatch.setattr(metricas, "DURACAO_MAXIMA_PROFILER_S", 0.1)
+    profiler = ProfilerAmostragem()
+    profiler.iniciar(0.001, duracao_s=60)
+    assert profiler.duracao_s == 0.1
+    profiler._thread.join(timeout=5)
+    assert not profiler.ativo
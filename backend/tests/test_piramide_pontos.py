@@ -0,0 +1,47 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import piramide_pontos
+import pontos
+from piramide_pontos import ZOOM_SEM_CLUSTER, montar_piramide, piramide_router
+
+BBOX = "-43.30,-22.95,-43.20,-22.90"
+
+
+def _ponto(camada, i, lat, lon):
+    return {"id": i, "camada": camada, "lat": lat, "lon": lon, "properties": {"bairro": "Tijuca"}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    feiras = [_ponto("feiras", i, -22.92 + i * 1e-4, -43.23) for i in range(30)]
+    hortas = [_ponto("hortas", 0, -22.93, -43.24), _ponto("hortas", 1, -22.80, -43.10)]  # a segunda fora do bbox
+    monkeypatch.setattr(piramide_pontos, "PONTOS", {"feiras": feiras, "hortas": hortas})
+    montar_piramide()
+    app = FastAPI()
+    app.include_router(piramide_router)
+    yield TestClient(app)
+    monkeypatch.undo()
+    montar_piramide()
+
+
+def test_zoom_sem_cluster_exige_bbox_e_respeita_limit(client):
+    r = client.get("/api/v1/geo/pontos/clusters", params={"z": ZOOM_SEM_CLUSTER})
+    assert r.status_code == 400
+
+    corpo = client.get("/api/v1/geo/pontos/clusters", params={"z": ZOOM_SEM_CLUSTER, "bbox": BBOX}).json()
+    assert corpo["meta"]["n_itens"] == 31 and not corpo["meta"]["truncado"]
+    assert all(d["tipo"] == "ponto" for d in corpo["data"])
+
+    params = {"z": ZOOM_SEM_CLUSTER, "bbox": BBOX, "limit": 5, "camadas": "feiras"}
+    corpo = client.get("/api/v1/geo/pontos/clusters", params=params).json()
+    assert corpo["meta"]["n_itens"] == 5 and corpo["meta"]["truncado"]
+    assert {d["camada"] for d in corpo["data"]} == {"feiras"}
+    assert client.get("/api/v1/geo/pontos/clusters", params={**params, "limit": pontos.LIMITE_MAXIMO + 1}).status_code == 422
+
+
+def test_zoom_agregado_continua_sem_bbox(client):
+    corpo = client.get("/api/v1/geo/pontos/clusters", params={"z": 6}).json()
+    assert sum(d.get("n", 1) for d in corpo["data"]) == 32
+    assert not corpo["meta"]["truncado"]
@@ -0,0 +1,67 @@
+import heapq
+import random
+
+import numpy as np
+import pytest
+
+from rede_viaria import RedeViaria, compilar
+
+
+def _grade(lado, semente=0):
+    """Grade com vias de mão dupla e algumas de mão única, pesos aleatórios (sem empates)."""
+    rng = random.Random(semente)
+    lat = [-22.9 + (i // lado) * 0.001 for i in range(lado * lado)]
+    lon = [-43.2 + (i % lado) * 0.001 for i in range(lado * lado)]
+    arestas = []
+    for i in range(lado * lado):
+        r, c = divmod(i, lado)
+        for j in ([i + 1] if c + 1 < lado else []) + ([i + lado] if r + 1 < lado else []):
+            km = rng.uniform(0.05, 0.2)
+            tempo = km / rng.choice([20, 30, 45]) * 3600 * rng.uniform(0.9, 1.1)
+            sentido = rng.random()
+            if sentido > 0.1:
+                arestas.append((i, j, tempo, km))
+            if sentido < 0.9:
+                arestas.append((j, i, tempo, km))
+    return lat, lon, arestas
+
+
+def _dijkstra(n, arestas, origem):
+    adj = [[] for _ in range(n)]
+    for u, v, t, km in arestas:
+        adj[u].append((v, t, km))
+    dist = {origem: (0.0, 0.0)}
+    heap = [(0.0, origem)]
+    feitos = set()
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in feitos:
+            continue
+        feitos.add(u)
+        for v, t, km in adj[u]:
+            if v not in dist or d + t < dist[v][0]:
+                dist[v] = (d + t, dist[u][1] + km)
+                heapq.heappush(heap, (d + t, v))
+    return dist
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_ch_igual_a_dijkstra(semente):
+    lat, lon, arestas = _grade(12, semente)
+    n = len(lat)
+    arrays = compilar(lat, lon, arestas)
+    assert len(arrays["lat"]) == n  # grade conexa: a maior componente é o grafo inteiro, na mesma ordem
+    rede = RedeViaria(arrays)
+
+    rng = random.Random(semente)
+    origens = rng.sample(range(n), 15)
+    destinos = rng.sample(range(n), 15)
+    tempo, km = rede.matriz_nos(origens, destinos)
+    for i, o in enumerate(origens):
+        dist = _dijkstra(n, arestas, o)
+        for j, d in enumerate(destinos):
+            if d not in dist:
+                assert np.isinf(tempo[i, j])
+                continue
+            assert tempo[i, j] == pytest.approx(dist[d][0], rel=1e-4, abs=1e-3)
+            assert km[i, j] == pytest.approx(dist[d][1], rel=1e-4, abs=1e-4)
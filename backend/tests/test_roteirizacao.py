@@ -0,0 +1,77 @@
+import itertools
+import random
+import time
+
+import pytest
+
+import roteirizacao
+from roteirizacao import MAX_DESTINOS, PENALIDADE_NAO_ATENDIDO, _Problema, resolver
+
+
+def _dados(n, produtores=3, veiculos=3, capacidade=None, tempo_limite_s=1.0, semente=1):
+    rng = random.Random(semente)
+    coords = [(-22.9 + rng.uniform(-0.1, 0.1), -43.3 + rng.uniform(-0.15, 0.15)) for _ in range(produtores + n)]
+    janelas = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            inicio = rng.choice([420, 480, 540])
+            janelas.append((inicio, inicio + rng.choice([120, 300])))
+        else:
+            janelas.append(None)
+    return {
+        "coords": coords,
+        "capacidades": [capacidade or float("inf")] * produtores,
+        "veiculos": [veiculos] * produtores,
+        "demandas": [rng.randint(1, 5) for _ in range(n)],
+        "janelas": janelas,
+        "servico_min": 10.0,
+        "inicio_min": 360.0,
+        "tempo_limite_s": tempo_limite_s,
+        "semente": 0,
+    }
+
+
+@pytest.mark.parametrize("produtores,veiculos,capacidade", [(1, 1, None), (3, 3, None), (5, 10, 60)])
+def test_respeita_orcamento_com_maximo_de_destinos(produtores, veiculos, capacidade):
+    dados = _dados(MAX_DESTINOS, produtores, veiculos, capacidade, tempo_limite_s=1.0)
+    t0 = time.perf_counter()
+    res = resolver(dados)
+    gasto = time.perf_counter() - t0
+    assert gasto <= dados["tempo_limite_s"] + 0.5
+    atendidos = sorted(c for _, cl, *_ in res["rotas"] for c in cl)
+    assert sorted(atendidos + res["nao_atendidos"]) == list(range(MAX_DESTINOS))
+
+
+def _forca_bruta(P):
+    """Menor custo total (com penalidade) testando toda atribuição destino -> veículo e toda ordem."""
+    n = len(P.demandas)
+    veiculos = [d for d in range(P.m) for _ in range(P.veiculos[d])]
+    melhor = float("inf")
+    for atribuicao in itertools.product(range(len(veiculos) + 1), repeat=n):
+        total = PENALIDADE_NAO_ATENDIDO * atribuicao.count(len(veiculos))
+        for v, dep in enumerate(veiculos):
+            clientes = [c for c in range(n) if atribuicao[c] == v]
+            if not clientes:
+                continue
+            custos = [P.custo(dep, list(p)) for p in itertools.permutations(clientes)]
+            custos = [c for c in custos if c is not None]
+            if not custos:
+                total = float("inf")
+                break
+            total += min(custos)
+        melhor = min(melhor, total)
+    return melhor
+
+
+@pytest.mark.parametrize("semente", range(4))
+def test_exato_igual_a_forca_bruta(semente):
+    dados = _dados(5, produtores=2, veiculos=2, capacidade=8, semente=semente)
+    t0 = time.perf_counter()
+    res = resolver(dados)
+    assert res["algoritmo"] == "vrp_exato"
+    assert time.perf_counter() - t0 < dados["tempo_limite_s"] / 2  # não gasta o orçamento
+
+    km, minutos, _ = roteirizacao.matriz_viagem(dados["coords"], dados["coords"])
+    P = _Problema({**dados, "tempo": minutos.tolist()})
+    custo = res["custo_min"] + PENALIDADE_NAO_ATENDIDO * len(res["nao_atendidos"])
+    assert custo == pytest.approx(_forca_bruta(P))
@@ -0,0 +1,93 @@
+import itertools
+
+from topologia import construir_topologia, topojson, topojson_para_geojson
+
+X0, Y0, LADO = -43.30, -22.95, 0.01
+N = 3
+# 300 quanta em 0,03 grau: vértices e pontos médios caem exatamente na grade
+QUANTIZACAO = 301
+
+
+def _quadrado(i, j, perturbar=False):
+    """Anel anti-horário do quadrado (i, j), com o ponto médio de cada lado."""
+    x, y, h = X0 + i * LADO, Y0 + j * LADO, LADO / 2
+    anel = [
+        (x, y), (x + h, y), (x + LADO, y), (x + LADO, y + h),
+        (x + LADO, y + LADO), (x + h, y + LADO), (x, y + LADO), (x, y + h), (x, y),
+    ]
+    if perturbar:  # vizinho com o ponto médio da divisa deslocado bem abaixo do quantum
+        anel[3] = (anel[3][0] + 1e-7, anel[3][1] - 1e-7)
+    return [list(p) for p in anel]
+
+
+def _grade():
+    return {
+        f"Q{i}{j}": {"nome": f"Quadrado {i}{j}", "geometry": {"type": "Polygon", "coordinates": [_quadrado(i, j, (i, j) == (0, 0))]}}
+        for i, j in itertools.product(range(N), repeat=2)
+    }
+
+
+def _ciclo(anel, casas=9):
+    """Anel fechado -> sequência a partir do menor ponto (a topologia pode começar o anel em outra junção)."""
+    pts = [(round(x, casas), round(y, casas)) for x, y in anel[:-1]]
+    k = pts.index(min(pts))
+    return pts[k:] + pts[:k]
+
+
+def _desfazer_delta(arco):
+    x = y = 0
+    out = []
+    for dx, dy in arco:
+        x, y = x + dx, y + dy
+        out.append((x, y))
+    return out
+
+
+def test_divisas_viram_um_arco_so():
+    topo = construir_topologia(_grade(), quantizacao=QUANTIZACAO)
+    # 12 divisas internas + 8 trechos da borda (os cantos externos não são junções)
+    assert len(topo["arcs"]) == 20
+    usos = {}
+    for g in topo["geometries"]:
+        for i in g["arcs"][0]:
+            usos.setdefault(i if i >= 0 else ~i, []).append(i >= 0)
+    assert sorted(map(sorted, usos.values())).count([False, True]) == 12  # o vizinho usa o arco invertido
+    assert sum(len(u) == 1 for u in usos.values()) == 8
+    # junção, ponto médio, junção; os 4 arcos que dobram um canto externo juntam dois lados
+    assert sorted(len(a) for a in topo["arcs"]) == [3] * 16 + [5] * 4
+
+
+def test_ida_e_volta_pelo_topojson():
+    grade = _grade()
+    topo = construir_topologia(grade, quantizacao=QUANTIZACAO)
+    saida = topojson(topo, 0.0)
+
+    # arcos delta-codificados: primeiro ponto absoluto, depois diferenças
+    for delta, absoluto in zip(saida["arcs"], topo["arcs"]):
+        assert _desfazer_delta(delta) == [tuple(p) for p in absoluto]
+        assert all(isinstance(v, int) for p in delta for v in p)
+    assert saida["transform"]["translate"] == [X0, Y0]
+
+    features = {f["id"]: f for f in topojson_para_geojson(saida)["features"]}
+    assert set(features) == set(grade)
+    for k, entrada in grade.items():
+        (anel_saida,) = features[k]["geometry"]["coordinates"]
+        (anel_entrada,) = entrada["geometry"]["coordinates"]
+        assert anel_saida[0] == anel_saida[-1]
+        # a perturbação abaixo do quantum some na ida e volta
+        assert _ciclo(anel_saida) == _ciclo(_quadrado(*map(int, k[1:])))
+        assert max(abs(a - b) for p, q in zip(_ciclo(anel_saida, 12), _ciclo(anel_entrada, 12)) for a, b in zip(p, q)) < 1e-6
+        assert features[k]["properties"] == {"bairro": k, "NOME": entrada["nome"]}
+
+
+def test_simplificacao_mantem_vizinhos_encaixados():
+    topo = construir_topologia(_grade(), quantizacao=QUANTIZACAO)
+    saida = topojson(topo, 0.001)  # bem acima do desvio dos pontos médios (colineares)
+    assert sum(len(a) for a in saida["arcs"]) < sum(len(a) for a in topo["arcs"])
+    features = topojson_para_geojson(saida)["features"]
+    for f in features:
+        (anel,) = f["geometry"]["coordinates"]
+        i, j = int(f["id"][1]), int(f["id"][2])
+        cantos = {(round(x, 9), round(y, 9)) for x, y in _quadrado(i, j)[::2]}
+        # só os cantos sobram; os pontos médios saem
+        assert {(round(x, 9), round(y, 9)) for x, y in anel} == cantos
@@ -0,0 +1,113 @@
+import csv
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import versoes
+from endpoint import limpar_linha_geo
+from versoes import ArmazemVersoes, carregar_versoes, versoes_router
+
+DADOS = Path(versoes.__file__).parent / "dados"
+CABECALHO = "bairro,classificacao_grupo,classificacao_cnae,quantidade\n"
+CENSO = [
+    {"nome": n, "Total_de_pessoas_2022": "10000", "Shape_Area": "2000000", "regiao_adm": "NORTE", "codra": "8"}
+    for n in ("Tijuca", "Grajaú", "Méier", "Andaraí")
+]
+# Grajaú sai, Andaraí entra, a Tijuca muda e o Méier fica igual
+V1 = (
+    "Tijuca,In natura,Feiras,3\n"
+    "Tijuca,Ultraprocessado,Lanchonetes,2\n"
+    "Grajaú,In natura,Feiras,1\n"
+    "Méier,Ultraprocessado,Lanchonetes,4\n"
+)
+V2 = (
+    "Tijuca,In natura,Feiras,5\n"
+    "Tijuca,Ultraprocessado,Lanchonetes,2\n"
+    "Méier,Ultraprocessado,Lanchonetes,4\n"
+    "Andaraí,Misto,Mercados,2\n"
+)
+
+
+def _contagem(linhas):
+    total = Counter()
+    for r in linhas:
+        total[(r["bairro"].strip(), r["classificacao_grupo"].strip(), r["classificacao_cnae"].strip())] += int(
+            r["quantidade"]
+        )
+    return +total  # sem as chaves zeradas
+
+
+def _ler(path):
+    with path.open(newline="", encoding="utf-8-sig") as fp:
+        return list(csv.DictReader(fp))
+
+
+def test_cada_versao_e_reconstruida_dos_deltas():
+    arquivos = sorted(DADOS.glob("dados*.csv"), key=lambda p: (p.stem == "dados", p.stem))
+    armazem = ArmazemVersoes()
+    originais = {}
+    for path in arquivos:
+        versao = path.stem.removeprefix("dados") or "atual"
+        originais[versao] = _ler(path)
+        armazem.adicionar(versao, [limpar_linha_geo(r) for r in originais[versao]], path.name)
+
+    assert armazem.versoes == ["1", "2", "3", "4", "atual"]
+    for versao, linhas in originais.items():
+        assert _contagem(armazem.linhas(versao)) == _contagem(linhas), versao
+    # só o que muda entre versões é guardado
+    assert armazem.elementos < sum(len(v) for v in originais.values())
+    assert [d["version"] for d in armazem.descrever()] == armazem.versoes
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    (tmp_path / "dados1.csv").write_text(CABECALHO + V1, encoding="utf-8")
+    (tmp_path / "dados2.csv").write_text(CABECALHO + V2, encoding="utf-8")
+    monkeypatch.setattr(versoes, "CENSO_FILE", tmp_path / "sem_censo.csv")
+    atual = [limpar_linha_geo(r) for r in csv.DictReader((CABECALHO + V2).splitlines())]
+    monkeypatch.setattr(versoes, "_filter_geo_rows", lambda: atual)
+    monkeypatch.setattr(versoes, "VERSOES", versoes.VERSOES)  # restaura o armazém carregado
+    assert carregar_versoes(tmp_path) == 3
+    versoes.VERSOES.censo_rows = CENSO
+    app = FastAPI()
+    app.include_router(versoes_router)
+    return TestClient(app)
+
+
+def test_diff_entre_versoes(client):
+    r = client.get("/api/v1/geo/bairros/diff", params={"from": "1", "to": "2", "metric": "total,total_in_natura"})
+    assert r.status_code == 200
+    por_bairro = {d["bairro"]: d for d in r.json()["data"]}
+    assert {b: d["status"] for b, d in por_bairro.items()} == {
+        "ANDARAI": "novo",
+        "GRAJAU": "removido",
+        "TIJUCA": "alterado",
+    }
+    assert por_bairro["TIJUCA"]["from"] == {"total": 5, "total_in_natura": 3}
+    assert por_bairro["TIJUCA"]["delta"] == {"total": 2, "total_in_natura": 2}
+    assert por_bairro["ANDARAI"]["from"] == {"total": None, "total_in_natura": None}
+    assert por_bairro["ANDARAI"]["delta"] == {"total": 2, "total_in_natura": 0}
+    assert por_bairro["GRAJAU"]["delta"] == {"total": -1, "total_in_natura": -1}
+
+    todos = client.get("/api/v1/geo/bairros/diff", params={"from": "1", "to": "2", "apenas_alterados": False}).json()
+    meier = next(d for d in todos["data"] if d["bairro"] == "MEIER")
+    # contagens iguais; só o percentil muda, porque os vizinhos mudaram
+    assert meier["status"] == "alterado" and meier["delta"]["total"] == 0
+    assert any(v for m, v in meier["delta"].items() if m.startswith("percentil"))
+    assert todos["meta"]["itens"] == 4
+
+    ra = client.get("/api/v1/geo/bairros/diff", params={"from": "1", "to": "2", "geo_level": "ra", "metric": "total"})
+    assert ra.json()["data"] == [
+        {"regiao_adm": "NORTE", "status": "alterado", "from": {"total": 10}, "to": {"total": 13}, "delta": {"total": 3}}
+    ]
+
+
+def test_diff_com_versao_desconhecida(client):
+    r = client.get("/api/v1/geo/bairros/diff", params={"from": "9", "to": "2"})
+    assert r.status_code == 404
+    versoes_disponiveis = client.get("/api/v1/geo/bairros/versoes").json()["data"]
+    assert [v["version"] for v in versoes_disponiveis] == ["1", "2", "atual"]
+    assert versoes_disponiveis[2]["chaves_alteradas"] == 0
@@ -0,0 +1,363 @@
+"""
+Topologia dos polígonos de bairros e geometria em TopoJSON quantizado.
+
+Pipeline (roda uma vez, após `carregar_geometria`):
+
+1. quantiza as coordenadas numa grade inteira (`transform` do TopoJSON), o que
+   também faz vértices quase coincidentes de bairros vizinhos virarem o mesmo;
+2. corta os anéis nas junções e deduplica os arcos: cada divisa entre dois
+   bairros é guardada uma vez só (o vizinho referencia o arco invertido, `~i`);
+3. simplifica cada arco (Douglas-Peucker ou Visvalingam) em várias
+   tolerâncias — como as pontas dos arcos são fixas, vizinhos continuam
+   encaixados sem buracos nem sobreposições;
+4. serializa cada nível como TopoJSON com arcos delta-codificados (e como
+   GeoJSON, para `formato=geojson`) e guarda o JSON e as variantes comprimidas
+   prontos para servir.
+
+Com dados compartilhados, só o carregador monta a topologia; os workers servem
+os payloads direto do segmento.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from compressao import resposta_estatica, serializar_estatico
+from geometria import BAIRROS_GEOMETRIA, _poligonos, douglas_peucker
+from memoria_compartilhada import Construtor, PlanoCompartilhado
+
+logger = logging.getLogger("rajai")
+
+topologia_router = APIRouter(prefix="/api/v1/geo/bairros", tags=["geo"])
+
+QUANTIZACAO = 100_000  # células por eixo na bbox da cidade (~0,5 m no Rio)
+# tolerâncias pré-calculadas, em graus (~0, 5 m, 10 m, 50 m, 100 m)
+TOLERANCIAS = (0.0, 0.00005, 0.0001, 0.0005, 0.001)
+TOLERANCIA_PADRAO = 0.0001
+ALGORITMOS = ("dp", "visvalingam")
+
+Ponto = Tuple[int, int]
+
+# (algoritmo, tolerancia) -> payload_estatico(...)
+GEOMETRIA_TOPOJSON: Dict[Tuple[str, float], Dict[str, Any]] = {}
+# o mesmo nível convertido para GeoJSON
+GEOMETRIA_GEOJSON: Dict[Tuple[str, float], Dict[str, Any]] = {}
+# estrutura base (arcos completos, quantizados) para re-simplificar sob demanda
+TOPOLOGIA: Dict[str, Any] = {}
+
+
+# -----------------------------
+# Quantização e topologia
+# -----------------------------
+def _bbox(aneis: Sequence[Sequence[Sequence[float]]]) -> Tuple[float, float, float, float]:
+    xs = [p[0] for anel in aneis for p in anel]
+    ys = [p[1] for anel in aneis for p in anel]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _quantizar_anel(anel: Sequence[Sequence[float]], x0: float, y0: float, kx: float, ky: float) -> List[Ponto]:
+    out: List[Ponto] = []
+    for p in anel:
+        q = (int(round((p[0] - x0) * kx)), int(round((p[1] - y0) * ky)))
+        if not out or out[-1] != q:
+            out.append(q)
+    if out and out[0] != out[-1]:
+        out.append(out[0])
+    return out
+
+
+def _juncoes(aneis: List[List[Ponto]]) -> set:
+    """
+    Um ponto é junção quando aparece em mais de um anel com vizinhos diferentes
+    (onde uma divisa começa ou termina), ou quando se repete no mesmo anel.
+    """
+    vizinhos: Dict[Ponto, set] = {}
+    juncoes = set()
+    for anel in aneis:
+        n = len(anel) - 1  # último == primeiro
+        vistos = set()
+        for i in range(n):
+            p = anel[i]
+            if p in vistos:
+                juncoes.add(p)
+            vistos.add(p)
+            # anel[-1] é a cópia de fechamento (== anel[0]); o antecessor de i=0 é anel[n - 1]
+            par = frozenset((anel[(i - 1) % n], anel[i + 1]))
+            vizinhos.setdefault(p, set()).add(par)
+    for p, pares in vizinhos.items():
+        if len(pares) > 1:
+            juncoes.add(p)
+    return juncoes
+
+
+def _cortar_anel(anel: List[Ponto], juncoes: set) -> List[List[Ponto]]:
+    n = len(anel) - 1
+    cortes = [i for i in range(n) if anel[i] in juncoes]
+    if not cortes:
+        # anel isolado: começa no menor ponto para que o mesmo anel gere o mesmo arco
+        inicio = min(range(n), key=lambda i: anel[i])
+        girado = anel[inicio:n] + anel[:inicio]
+        return [girado + [girado[0]]]
+    girado = anel[cortes[0]:n] + anel[: cortes[0]] + [anel[cortes[0]]]
+    arcos = []
+    atual = [girado[0]]
+    for p in girado[1:]:
+        atual.append(p)
+        if p in juncoes:
+            arcos.append(atual)
+            atual = [p]
+    return arcos
+
+
+def construir_topologia(geometrias: Dict[str, Dict[str, Any]], quantizacao: int = QUANTIZACAO) -> Dict[str, Any]:
+    """
+    Recebe {bairro: {"nome", "geometry"}} e devolve a topologia quantizada:
+    {"transform", "arcs" (listas de pontos inteiros, absolutos), "geometries"}.
+    """
+    chaves = sorted(geometrias)
+    todos_aneis = [anel for k in chaves for pol in _poligonos(geometrias[k]["geometry"]) for anel in pol]
+    if not todos_aneis:
+        return {}
+    x0, y0, x1, y1 = _bbox(todos_aneis)
+    kx = (quantizacao - 1) / (x1 - x0) if x1 > x0 else 1.0
+    ky = (quantizacao - 1) / (y1 - y0) if y1 > y0 else 1.0
+
+    # bairro -> polígonos -> anéis quantizados
+    quantizados: Dict[str, List[List[List[Ponto]]]] = {}
+    for k in chaves:
+        poligonos = []
+        for pol in _poligonos(geometrias[k]["geometry"]):
+            aneis = [_quantizar_anel(anel, x0, y0, kx, ky) for anel in pol]
+            aneis = [a for a in aneis if len(a) >= 4]
+            if aneis:
+                poligonos.append(aneis)
+        quantizados[k] = poligonos
+
+    juncoes = _juncoes([anel for pols in quantizados.values() for pol in pols for anel in pol])
+
+    arcos: List[List[Ponto]] = []
+    indice: Dict[Tuple[Ponto, ...], int] = {}
+
+    def _arco_id(arco: List[Ponto]) -> int:
+        chave = tuple(arco)
+        if chave in indice:
+            return indice[chave]
+        inverso = tuple(reversed(arco))
+        if inverso in indice:
+            return ~indice[inverso]
+        indice[chave] = len(arcos)
+        arcos.append(arco)
+        return indice[chave]
+
+    geometries = []
+    for k in chaves:
+        poligonos = [[[_arco_id(a) for a in _cortar_anel(anel, juncoes)] for anel in pol] for pol in quantizados[k]]
+        if not poligonos:
+            continue
+        geom: Dict[str, Any] = {"id": k, "properties": {"bairro": k, "NOME": geometrias[k]["nome"]}}
+        if len(poligonos) == 1:
+            geom.update({"type": "Polygon", "arcs": poligonos[0]})
+        else:
+            geom.update({"type": "MultiPolygon", "arcs": poligonos})
+        geometries.append(geom)
+
+    return {
+        "transform": {"scale": [1 / kx, 1 / ky], "translate": [x0, y0]},
+        "arcs": arcos,
+        "geometries": geometries,
+    }
+
+
+# -----------------------------
+# Simplificação por arco
+# -----------------------------
+def _area_triangulo(a: Ponto, b: Ponto, c: Ponto) -> float:
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+
+def visvalingam(linha: List[Ponto], area_minima: float) -> List[Ponto]:
+    """Visvalingam-Whyatt com heap: remove vértices de menor área efetiva até `area_minima`."""
+    n = len(linha)
+    if n <= 2 or area_minima <= 0:
+        return list(linha)
+    anterior = list(range(-1, n - 1))
+    proximo = list(range(1, n + 1))
+    removido = [False] * n
+    area = [float("inf")] * n
+    heap = []
+    for i in range(1, n - 1):
+        area[i] = _area_triangulo(linha[i - 1], linha[i], linha[i + 1])
+        heap.append((area[i], i))
+    heapq.heapify(heap)
+    maior = 0.0  # garante áreas efetivas monotônicas
+    while heap:
+        a, i = heapq.heappop(heap)
+        if removido[i] or a != area[i]:
+            continue
+        maior = max(maior, a)
+        if maior >= area_minima:
+            break
+        removido[i] = True
+        ant, prox = anterior[i], proximo[i]
+        proximo[ant], anterior[prox] = prox, ant
+        for j in (ant, prox):
+            if 0 < j < n - 1:
+                area[j] = max(_area_triangulo(linha[anterior[j]], linha[j], linha[proximo[j]]), maior)
+                heapq.heappush(heap, (area[j], j))
+    return [p for p, r in zip(linha, removido) if not r]
+
+
+def simplificar_arco(arco: List[Ponto], tolerancia_q: float, algoritmo: str) -> List[Ponto]:
+    """Simplifica um arco com tolerância em unidades quantizadas; arcos fechados mantêm 4 pontos."""
+    if tolerancia_q <= 0 or len(arco) <= 2:
+        return arco
+    if algoritmo == "visvalingam":
+        simples = visvalingam(arco, tolerancia_q * tolerancia_q)
+    else:
+        simples = douglas_peucker(arco, tolerancia_q)
+    if arco[0] == arco[-1] and len(simples) < 4:
+        return arco
+    return simples
+
+
+# -----------------------------
+# Serialização
+# -----------------------------
+def _delta(arco: List[Ponto]) -> List[List[int]]:
+    out = [[arco[0][0], arco[0][1]]]
+    for (xa, ya), (xb, yb) in zip(arco, arco[1:]):
+        out.append([xb - xa, yb - ya])
+    return out
+
+
+def topojson(topologia: Dict[str, Any], tolerancia: float, algoritmo: str = "dp") -> Dict[str, Any]:
+    """TopoJSON quantizado e delta-codificado na tolerância (em graus) pedida."""
+    sx, sy = topologia["transform"]["scale"]
+    tolerancia_q = tolerancia / min(sx, sy) if tolerancia > 0 else 0.0
+    arcos = [_delta(simplificar_arco(a, tolerancia_q, algoritmo)) for a in topologia["arcs"]]
+    return {
+        "type": "Topology",
+        "transform": topologia["transform"],
+        "objects": {"bairros": {"type": "GeometryCollection", "geometries": topologia["geometries"]}},
+        "arcs": arcos,
+    }
+
+
+def topojson_para_geojson(topo: Dict[str, Any], objeto: str = "bairros") -> Dict[str, Any]:
+    """Decodifica o TopoJSON (delta + quantização) de volta para GeoJSON."""
+    sx, sy = topo["transform"]["scale"]
+    tx, ty = topo["transform"]["translate"]
+    arcos = []
+    for arco in topo["arcs"]:
+        x = y = 0
+        pts = []
+        for dx, dy in arco:
+            x += dx
+            y += dy
+            pts.append([x * sx + tx, y * sy + ty])
+        arcos.append(pts)
+
+    def _anel(ids: List[int]) -> List[List[float]]:
+        coords: List[List[float]] = []
+        for i in ids:
+            pts = arcos[i] if i >= 0 else list(reversed(arcos[~i]))
+            coords.extend(pts if not coords else pts[1:])
+        return coords
+
+    features = []
+    for g in topo["objects"][objeto]["geometries"]:
+        if g["type"] == "Polygon":
+            geometry = {"type": "Polygon", "coordinates": [_anel(a) for a in g["arcs"]]}
+        else:
+            geometry = {"type": "MultiPolygon", "coordinates": [[_anel(a) for a in pol] for pol in g["arcs"]]}
+        features.append({"type": "Feature", "id": g.get("id"), "properties": g.get("properties", {}), "geometry": geometry})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def montar_topologia() -> int:
+    """(Re)constrói a topologia e pré-serializa todos os níveis. Retorna o número de arcos."""
+    TOPOLOGIA.clear()
+    GEOMETRIA_TOPOJSON.clear()
+    GEOMETRIA_GEOJSON.clear()
+    if not BAIRROS_GEOMETRIA:
+        return 0
+    TOPOLOGIA.update(construir_topologia(BAIRROS_GEOMETRIA))
+    if not TOPOLOGIA:
+        return 0
+    for algoritmo in ALGORITMOS:
+        for tol in TOLERANCIAS:
+            topo = topojson(TOPOLOGIA, tol, algoritmo)
+            GEOMETRIA_TOPOJSON[(algoritmo, tol)] = serializar_estatico(topo)
+            GEOMETRIA_GEOJSON[(algoritmo, tol)] = serializar_estatico(topojson_para_geojson(topo))
+    padrao = GEOMETRIA_TOPOJSON[("dp", TOLERANCIA_PADRAO)]
+    completo = GEOMETRIA_TOPOJSON[("dp", 0.0)]
+    logger.info(
+        "Topologia dos bairros: %d arcos; TopoJSON %d bytes completo, %d bytes (%d gzip) em tol=%s",
+        len(TOPOLOGIA["arcs"]),
+        len(completo["variantes"]["identity"]),
+        len(padrao["variantes"]["identity"]),
+        len(padrao["variantes"]["gzip"]),
+        TOLERANCIA_PADRAO,
+    )
+    return len(TOPOLOGIA["arcs"])
+
+
+def topojson_padrao() -> Optional[Dict[str, Any]]:
+    """TopoJSON na tolerância padrão (usado pelo bootstrap do mapa)."""
+    if not TOPOLOGIA:
+        return None
+    return topojson(TOPOLOGIA, TOLERANCIA_PADRAO)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    for (algoritmo, tol), payload in GEOMETRIA_TOPOJSON.items():
+        construtor.payload(f"topojson.{algoritmo}.{tol}", payload)
+        construtor.payload(f"geojson.{algoritmo}.{tol}", GEOMETRIA_GEOJSON[(algoritmo, tol)])
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    """Só os payloads: a topologia em si (arcos) fica no carregador."""
+    TOPOLOGIA.clear()
+    GEOMETRIA_TOPOJSON.clear()
+    GEOMETRIA_GEOJSON.clear()
+    for algoritmo in ALGORITMOS:
+        for tol in TOLERANCIAS:
+            topo = plano.payload(f"topojson.{algoritmo}.{tol}")
+            if topo is not None:
+                GEOMETRIA_TOPOJSON[(algoritmo, tol)] = topo
+                GEOMETRIA_GEOJSON[(algoritmo, tol)] = plano.payload(f"geojson.{algoritmo}.{tol}")
+
+
+def _nivel_mais_proximo(tolerancia: float) -> float:
+    """Maior tolerância pré-calculada que não passa da pedida."""
+    return max(t for t in TOLERANCIAS if t <= tolerancia) if tolerancia >= 0 else 0.0
+
+
+# -----------------------------
+# Endpoints
+# -----------------------------
+@topologia_router.get("/geometria")
+async def geo_geometria(
+    request: Request,
+    tolerance: float = Query(default=TOLERANCIA_PADRAO, ge=0, description="Tolerância de simplificação em graus"),
+    algoritmo: str = Query(default="dp", description="dp (Douglas-Peucker) ou visvalingam"),
+    formato: str = Query(default="topojson", description="topojson ou geojson"),
+):
+    if not GEOMETRIA_TOPOJSON:
+        raise HTTPException(status_code=404, detail="Geometria de bairros não carregada")
+    if algoritmo not in ALGORITMOS:
+        raise HTTPException(status_code=400, detail="Algoritmo de simplificação inválido")
+    if formato not in ("topojson", "geojson"):
+        raise HTTPException(status_code=400, detail="Formato inválido")
+
+    nivel = _nivel_mais_proximo(tolerance)
+    payloads = GEOMETRIA_GEOJSON if formato == "geojson" else GEOMETRIA_TOPOJSON
+    return resposta_estatica(
+        request,
+        payloads[(algoritmo, nivel)],
+        cache_control="public, max-age=86400",
+        headers={"X-Tolerancia": str(nivel)},
+    )
@@ -2,11 +2,14 @@ import pandas as pd
 import unicodedata
 from pathlib import Path
 
+from deduplicacao import IndiceEntidades, registros_camadas, registros_tabela
+
 # --- Configuração dos Arquivos ---
 BASE_DIR = Path.cwd()
 ARQUIVO_PRINCIPAL = BASE_DIR / "dados" / "dados.csv"
 ARQUIVO_INFORMAIS = BASE_DIR / "dados" / "csv_informais.csv"
 ARQUIVO_SAIDA = BASE_DIR / "dados" / "dados_consolidado.csv"
+ARQUIVO_CANONICOS = BASE_DIR / "dados" / "estabelecimentos_canonicos.csv"
 
 def normalizar_texto(texto):
     """Converte para MAIÚSCULA e remove acentos (Ex: 'São Cristóvão' -> 'SAO CRISTOVAO')"""
@@ -30,13 +33,27 @@ def unificar_bases():
 
     print(f"✅ Informais carregados: {len(df_informais)} registros.")
 
+    # 2. Deduplicar: informais + listas geocodificadas (feiras, hortas, cozinhas) viram
+    # estabelecimentos canônicos, para a mesma feira não ser contada uma vez por fonte
+    indice = IndiceEntidades()
+    indice.adicionar_varios(registros_camadas())
+    indice.adicionar_varios(registros_tabela("informais", df_informais.to_dict(orient="records")))
+    df_canonicos = pd.DataFrame(indice.entidades())
+    df_canonicos.to_csv(ARQUIVO_CANONICOS, index=False, encoding='utf-8')
+    resumo = indice.resumo()
+    print(
+        f"✅ Deduplicação: {resumo['registros']} registros -> {resumo['entidades']} estabelecimentos "
+        f"({resumo['comparacoes']} comparações em {resumo['blocos']} blocos, "
+        f"contra {resumo['pares_sem_blocagem']} pares sem blocagem)."
+    )
+
     # --- CORREÇÃO SOLICITADA: CAPS LOCK + NORMALIZAÇÃO ---
     # Aplica a função em todos os bairros antes de agrupar
-    df_informais['bairro'] = df_informais['bairro'].apply(normalizar_texto)
+    df_canonicos['bairro'] = df_canonicos['bairro'].apply(normalizar_texto)
     print("✅ Nomes de bairros convertidos para MAIÚSCULAS.")
 
-    # 2. Agrupar e Contar (Transforma lista de endereços em contagem)
-    df_informais_agrupado = df_informais.groupby(
+    # 3. Agrupar e Contar (Transforma lista de estabelecimentos em contagem)
+    df_informais_agrupado = df_canonicos.groupby(
         ['bairro', 'classificacao_grupo', 'classificacao_cnae']
     ).size().reset_index(name='quantidade')
 
@@ -44,7 +61,7 @@ def unificar_bases():
     for col in ['Total_de_pessoas_2022', 'densidade_por_10k', 'percentil_densidade', 'label_densidade']:
         df_informais_agrupado[col] = 0 
 
-    # 3. Carregar Principal e Unificar
+    # 4. Carregar Principal e Unificar
     if ARQUIVO_PRINCIPAL.exists():
         df_principal = pd.read_csv(ARQUIVO_PRINCIPAL, sep=',')
     else:
@@ -53,7 +70,7 @@ def unificar_bases():
     # Concatenar
     df_final = pd.concat([df_principal, df_informais_agrupado], ignore_index=True)
 
-    # 4. (Opcional) Agrupar novamente caso haja repetição de Bairro+Tipo nos dois arquivos
+    # 5. (Opcional) Agrupar novamente caso haja repetição de Bairro+Tipo nos dois arquivos
     # Isso garante que se já tinha "Tijuca - Feira" no principal, soma com o novo.
     cols_agrupamento = ['bairro', 'classificacao_grupo', 'classificacao_cnae']
     # Mantemos as outras colunas pegando o valor máximo (para preservar dados do censo se existirem) ou recriando
@@ -65,9 +82,10 @@ def unificar_bases():
         'label_densidade': 'first'
     })
 
-    # 5. Salvar
+    # 6. Salvar
     df_final.to_csv(ARQUIVO_SAIDA, index=False, encoding='utf-8')
     print(f"\n🚀 Sucesso! Arquivo gerado: {ARQUIVO_SAIDA}")
+    print(f"🧾 Estabelecimentos canônicos (com fontes): {ARQUIVO_CANONICOS}")
     print(f"📊 Total de linhas consolidadas: {len(df_final)}")
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+"""
+Versões (snapshots) de dados.csv e diff entre elas.
+
+`backend/dados` guarda versões sucessivas da mesma contagem de
+estabelecimentos: `dados1.csv` ... `dadosN.csv` (mais antigas, em ordem
+numérica) e `dados.csv` (a atual, servida por padrão). Cada versão é guardada
+como delta colunar contra a anterior:
+
+- uma tabela única de chaves (bairro, grupo, CNAE), compartilhada por todas as
+  versões;
+- por versão, só os ids das chaves cuja quantidade mudou (int32) e a variação
+  (int64). A primeira versão é o delta contra o vazio.
+
+A quantidade de uma versão é a soma cumulativa dos deltas até ela; sumários
+(bairro/RA/cidade) são montados sob demanda com `montar_geo` e ficam num LRU
+pequeno, então a memória cresce com o que muda entre versões, não com o
+número de versões. A versão atual usa os caches já carregados.
+
+Com dados compartilhados, as versões são lidas só no carregador: a tabela de
+chaves vira uma tabela colunar do segmento e os deltas, arrays mapeados.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+
+from endpoint import GEO_LEVELS, GEO_JOIN_KEYS, _filter_geo_rows, _validate_geo_level, limpar_linha_geo, montar_geo
+from memoria_compartilhada import Construtor, PlanoCompartilhado, TabelaCompartilhada
+from metricas import registrar_acesso_cache, registrar_tamanho_cache
+from serializacao import resposta_json
+
+logger = logging.getLogger("rajai")
+
+versoes_router = APIRouter(prefix="/api/v1/geo/bairros", tags=["geo"])
+
+DADOS_DIR = Path(__file__).parent / "dados"
+CENSO_FILE = DADOS_DIR / "Censo_2022.csv"
+VERSAO_ATUAL = "atual"
+CAPACIDADE_CACHE = int(os.getenv("RAJAI_VERSOES_CACHE", "4"))
+
+_VERSAO_RE = re.compile(r"^dados(\d+)\.csv$")
+Chave = Tuple[str, str, str]  # (bairro_raw, grupo, cnae)
+
+
+def _ler_csv(path: Path) -> List[Dict[str, Any]]:
+    with path.open(newline="", encoding="utf-8-sig") as fp:
+        return list(csv.DictReader(fp))
+
+
+class ArmazemVersoes:
+    def __init__(self, censo_rows: Optional[List[Dict[str, Any]]] = None, capacidade_cache: int = CAPACIDADE_CACHE):
+        self.censo_rows = censo_rows or []
+        self.capacidade_cache = capacidade_cache
+        self.chaves: List[Chave] = []
+        self._ids: Dict[Chave, int] = {}
+        self.versoes: List[str] = []
+        self.arquivos: Dict[str, str] = {}
+        self._deltas: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._ultima = np.zeros(0, dtype=np.int64)  # quantidades da última versão adicionada
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, versao: str) -> bool:
+        return versao in self.versoes
+
+    def adicionar(self, versao: str, rows: List[Dict[str, Any]], arquivo: str = "") -> None:
+        """Acrescenta uma versão (linhas já limpas por `limpar_linha_geo`) como delta da anterior."""
+        ids: List[int] = []
+        for r in rows:
+            chave = (r["bairro_raw"], r["classificacao_grupo"], r["classificacao_cnae"])
+            i = self._ids.get(chave)
+            if i is None:
+                i = self._ids[chave] = len(self.chaves)
+                self.chaves.append(chave)
+            ids.append(i)
+        atual = np.bincount(
+            np.asarray(ids, dtype=np.int64),
+            weights=np.asarray([r["quantidade"] for r in rows], dtype=np.float64),
+            minlength=len(self.chaves),
+        ).astype(np.int64)
+        anterior = np.zeros(len(self.chaves), dtype=np.int64)
+        anterior[: self._ultima.size] = self._ultima
+        mudou = np.flatnonzero(atual != anterior)
+        self._deltas.append((mudou.astype(np.int32), (atual - anterior)[mudou]))
+        self._ultima = atual
+        self.versoes.append(versao)
+        self.arquivos[versao] = arquivo
+
+    def quantidades(self, versao: str) -> np.ndarray:
+        """Quantidade por chave na versão (soma cumulativa dos deltas)."""
+        q = np.zeros(len(self.chaves), dtype=np.int64)
+        for ids, delta in self._deltas[: self.versoes.index(versao) + 1]:
+            q[ids] += delta
+        return q
+
+    def linhas(self, versao: str) -> List[Dict[str, Any]]:
+        q = self.quantidades(versao)
+        if isinstance(self.chaves, TabelaCompartilhada):
+            return [{**self.chaves[i], "quantidade": int(q[i])} for i in np.flatnonzero(q).tolist()]
+        return [
+            {"bairro": b, "classificacao_grupo": g, "classificacao_cnae": c, "quantidade": int(q[i])}
+            for i, (b, g, c) in enumerate(self.chaves)
+            if q[i]
+        ]
+
+    def geo(self, versao: str) -> Dict[str, Any]:
+        """Linhas e sumários da versão (mesmo formato de `montar_geo`), com LRU."""
+        with self._lock:
+            pronto = self._cache.get(versao)
+            if pronto is not None:
+                self._cache.move_to_end(versao)
+        registrar_acesso_cache("versoes", pronto is not None)
+        if pronto is not None:
+            return pronto
+        pronto = montar_geo(self.linhas(versao), self.censo_rows)
+        with self._lock:
+            self._cache[versao] = pronto
+            while len(self._cache) > self.capacidade_cache:
+                self._cache.popitem(last=False)
+        return pronto
+
+    def descrever(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "version": v,
+                "arquivo": self.arquivos[v],
+                "chaves_alteradas": int(ids.size),
+                "delta_quantidade": int(delta.sum()),
+            }
+            for v, (ids, delta) in zip(self.versoes, self._deltas)
+        ]
+
+    @property
+    def elementos(self) -> int:
+        return int(sum(ids.size for ids, _ in self._deltas))
+
+    def conteudo_compartilhado(self, construtor: Construtor) -> None:
+        construtor.tabela(
+            "versoes.chaves",
+            [{"bairro": b, "classificacao_grupo": g, "classificacao_cnae": c} for b, g, c in self.chaves],
+        )
+        construtor.objeto(
+            "versoes", {"versoes": self.versoes, "arquivos": self.arquivos, "censo": self.censo_rows}
+        )
+        for i, (ids, delta) in enumerate(self._deltas):
+            construtor.array(f"versoes.{i}.ids", ids)
+            construtor.array(f"versoes.{i}.delta", delta)
+
+    @classmethod
+    def de_plano(cls, plano: PlanoCompartilhado) -> "ArmazemVersoes":
+        info = plano.objeto("versoes")
+        if info is None:
+            return cls()
+        armazem = cls(info["censo"])
+        armazem.chaves = plano.tabela("versoes.chaves")  # type: ignore[assignment]
+        armazem.versoes = info["versoes"]
+        armazem.arquivos = info["arquivos"]
+        armazem._deltas = [
+            (plano.array(f"versoes.{i}.ids"), plano.array(f"versoes.{i}.delta")) for i in range(len(armazem.versoes))
+        ]
+        return armazem
+
+
+VERSOES = ArmazemVersoes()
+registrar_tamanho_cache("versoes", lambda: VERSOES.elementos)
+
+
+def carregar_versoes(diretorio: Path = DADOS_DIR) -> int:
+    """Lê dados1.csv ... dadosN.csv e acrescenta a versão atual (linhas já carregadas). Retorna o nº de versões."""
+    global VERSOES
+    censo = _ler_csv(CENSO_FILE) if CENSO_FILE.exists() else []
+    armazem = ArmazemVersoes(censo)
+    arquivos = sorted(
+        (int(m.group(1)), p) for p in diretorio.glob("dados*.csv") if (m := _VERSAO_RE.match(p.name))
+    )
+    for numero, caminho in arquivos:
+        armazem.adicionar(str(numero), [limpar_linha_geo(r) for r in _ler_csv(caminho)], caminho.name)
+    armazem.adicionar(VERSAO_ATUAL, _filter_geo_rows(), "dados.csv")
+    VERSOES = armazem
+    logger.info(
+        "Versões de dados: %s (%d chaves, %d deltas guardados)",
+        ", ".join(armazem.versoes), len(armazem.chaves), armazem.elementos,
+    )
+    return len(armazem.versoes)
+
+
+def conteudo_compartilhado(construtor: Construtor) -> None:
+    VERSOES.conteudo_compartilhado(construtor)
+
+
+def set_dados_compartilhados(plano: PlanoCompartilhado) -> None:
+    global VERSOES
+    VERSOES = ArmazemVersoes.de_plano(plano)
+
+
+def geo_da_versao(versao: Optional[str]) -> Optional[Dict[str, Any]]:
+    """None para a versão atual (caches globais); senão, linhas e sumários da versão pedida."""
+    if not versao or versao == VERSAO_ATUAL:
+        return None
+    if versao not in VERSOES:
+        raise HTTPException(
+            status_code=404, detail=f"Versão não encontrada: {versao} (disponíveis: {', '.join(VERSOES.versoes)})"
+        )
+    return VERSOES.geo(versao)
+
+
+def _niveis(versao: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    geo = geo_da_versao(versao)
+    return GEO_LEVELS if geo is None else {nivel: geo[nivel] for nivel in GEO_LEVELS}
+
+
+@versoes_router.get("/versoes")
+async def geo_versoes():
+    """Versões disponíveis (da mais antiga à atual) e o tamanho do delta de cada uma."""
+    return resposta_json({"meta": {"atual": VERSAO_ATUAL}, "data": VERSOES.descrever()})
+
+
+@versoes_router.get("/diff")
+async def geo_diff(
+    de: str = Query(alias="from", description="Versão de origem (ex.: 1)"),
+    para: str = Query(default=VERSAO_ATUAL, alias="to", description="Versão de destino (padrão: atual)"),
+    geo_level: str = Query(default="bairro", description="Nível geográfico: bairro, ra ou cidade"),
+    metric: Optional[str] = Query(default=None, description="Métricas separadas por vírgula (padrão: todas)"),
+    apenas_alterados: bool = Query(default=True, description="Omite itens sem nenhuma variação"),
+):
+    """Variação das métricas de cada bairro/RA entre duas versões (`to - from`)."""
+    level = _validate_geo_level(geo_level)
+    origem = _niveis(de)[level]
+    destino = _niveis(para)[level]
+    pedidas = [m.strip() for m in metric.split(",") if m.strip()] if metric else None
+
+    data = []
+    for chave in sorted(set(origem) | set(destino)):
+        t0 = origem.get(chave, {}).get("totais", {})
+        t1 = destino.get(chave, {}).get("totais", {})
+        metricas = pedidas or [m for m in t1 if m in t0] or list(t0 or t1)
+        delta = {m: round((t1.get(m) or 0) - (t0.get(m) or 0), 4) for m in metricas}
+        if apenas_alterados and chave in origem and chave in destino and not any(delta.values()):
+            continue
+        status = "novo" if chave not in origem else "removido" if chave not in destino else "alterado"
+        data.append(
+            {
+                GEO_JOIN_KEYS[level]: chave,
+                "status": status,
+                "from": {m: t0.get(m) for m in metricas},
+                "to": {m: t1.get(m) for m in metricas},
+                "delta": delta,
+            }
+        )
+    return resposta_json(
+        {
+            "meta": {"from": de, "to": para, "geo_level": level, "itens": len(data)},
+            "data": data,
+        }
+    )
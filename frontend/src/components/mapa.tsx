@@ -5,6 +5,7 @@ import type { Feature, FeatureCollection, Geometry } from 'geojson'
 import type { GeoJSONOptions, Layer, LeafletMouseEvent, Path, PathOptions } from 'leaflet'
 
 import { normalizeBairro } from '@/utils/normalizeBairro'
+import { topojsonToGeoJson, type Topology } from '@/utils/topojson'
 
 type BairroProperties = {
   NOME?: string
@@ -28,6 +29,17 @@ type TooltipResponse = {
   breakdown: Record<string, { classificacao_cnae: string; quantidade: number }[]>
 }
 
+// Payload único de /bootstrap: métricas e tooltips alinhados a `bairros`;
+// `geometria` é null quando o backend não tem o GeoJSON dos bairros
+type BootstrapResponse = {
+  versao: string
+  catalogo: { metrics?: string[] }
+  bairros: string[]
+  metricas: Record<string, (number | null)[]>
+  tooltips: ({ breakdown: TooltipResponse['breakdown'] } | null)[]
+  geometria: Topology | null
+}
+
 const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 const GEOJSON_LOCAL = '/geo/bairros.geojson'
 const GEOJSON_REMOTE =
@@ -45,6 +57,32 @@ const choroplethColors = [
 
 const tooltipCache = new Map<string, TooltipResponse>()
 
+function valoresDaColuna(bootstrap: BootstrapResponse, metric: string) {
+  const map = new Map<string, number>()
+  const coluna = bootstrap.metricas[metric] ?? []
+  bootstrap.bairros.forEach((bairro, i) => map.set(normalizeBairro(bairro), Number(coluna[i] ?? 0)))
+  return map
+}
+
+function preencherTooltips(bootstrap: BootstrapResponse) {
+  const col = (m: string, i: number) => Number(bootstrap.metricas[m]?.[i] ?? 0)
+  bootstrap.bairros.forEach((bairro, i) => {
+    const tip = bootstrap.tooltips[i]
+    if (!tip) return
+    tooltipCache.set(normalizeBairro(bairro), {
+      meta: { bairro },
+      totais: {
+        total: col('total', i),
+        total_in_natura: col('total_in_natura', i),
+        total_misto: col('total_misto', i),
+        total_ultraprocessado: col('total_ultraprocessado', i),
+        ratio_ultra_sobre_total: col('ratio_ultra_sobre_total', i),
+      },
+      breakdown: tip.breakdown,
+    })
+  })
+}
+
 function minMaxFromMap(map: Map<string, number>) {
   const values = Array.from(map.values()).filter((v) => Number.isFinite(v))
   if (!values.length) return { min: 0, max: 0 }
@@ -80,6 +118,8 @@ function formatTooltipHtml(displayName: string, tip: TooltipResponse) {
 
 export function Mapa() {
   const [geoJsonData, setGeoJsonData] = useState<FeatureCollection | null>(null)
+  // undefined = carregando; null = indisponível (usa os endpoints separados)
+  const [bootstrap, setBootstrap] = useState<BootstrapResponse | null | undefined>(undefined)
   const [metricsAvailable, setMetricsAvailable] = useState<string[]>([DEFAULT_METRIC])
   const [metric, setMetric] = useState<string>(DEFAULT_METRIC)
   const [valueMap, setValueMap] = useState<Map<string, number>>(new Map())
@@ -97,7 +137,7 @@ export function Mapa() {
   }, [])
 
   useEffect(() => {
-    // GeoJSON de bairros (tenta local primeiro, depois remoto)
+    // GeoJSON de bairros (tenta local primeiro, depois remoto), quando o bootstrap não traz a geometria
     const loadGeo = async () => {
       const tryFetch = async (url: string) => {
         const res = await fetch(url)
@@ -116,27 +156,58 @@ export function Mapa() {
         }
       }
     }
-    void loadGeo()
-  }, [])
 
-  useEffect(() => {
-    // Catálogo de métricas/grupos
-    fetch(`${API_BASE}/api/v1/geo/bairros/catalogo`)
-      .then((res) => res.json())
+    const aplicarCatalogo = (metrics: unknown) => {
+      if (!Array.isArray(metrics)) return
+      setMetricsAvailable(metrics)
+      setMetric((atual) => (metrics.includes(atual) ? atual : (metrics[0] ?? DEFAULT_METRIC)))
+    }
+
+    const loadCatalogo = () =>
+      fetch(`${API_BASE}/api/v1/geo/bairros/catalogo`)
+        .then((res) => res.json())
+        .then((json) => {
+          if (isMounted.current) aplicarCatalogo(json?.metrics)
+        })
+        .catch((err) => setError(`Falha ao carregar catálogo: ${String(err)}`))
+
+    // Uma requisição só: geometria, catálogo, todas as métricas e tooltips. A URL leva a
+    // versão (hash dos dados), então a resposta é imutável e o navegador a reaproveita
+    // do cache sem revalidar; a consulta da versão em si é pequena.
+    const loadBootstrap = async () => {
+      const versao = await fetch(`${API_BASE}/api/v1/geo/bairros/bootstrap/versao`)
+      if (!versao.ok) throw new Error(versao.statusText)
+      const { url } = (await versao.json()) as { versao: string; url: string }
+      const res = await fetch(`${API_BASE}${url}`)
+      if (!res.ok) throw new Error(res.statusText)
+      return (await res.json()) as BootstrapResponse
+    }
+
+    loadBootstrap()
       .then((json) => {
         if (!isMounted.current) return
-        if (Array.isArray(json?.metrics)) {
-          setMetricsAvailable(json.metrics)
-          if (!json.metrics.includes(metric)) {
-            setMetric(json.metrics[0] ?? DEFAULT_METRIC)
-          }
-        }
+        preencherTooltips(json)
+        aplicarCatalogo(json.catalogo?.metrics)
+        setBootstrap(json)
+        if (json.geometria) setGeoJsonData(topojsonToGeoJson(json.geometria))
+        else void loadGeo()
+      })
+      .catch(() => {
+        if (!isMounted.current) return
+        setBootstrap(null)
+        void loadGeo()
+        void loadCatalogo()
       })
-      .catch((err) => setError(`Falha ao carregar catálogo: ${String(err)}`))
-    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
 
   useEffect(() => {
+    if (bootstrap === undefined) return
+    if (bootstrap && bootstrap.metricas[metric]) {
+      const map = valoresDaColuna(bootstrap, metric)
+      setValueMap(map)
+      setMinMax(minMaxFromMap(map))
+      return
+    }
     setLoading(true)
     setError(null)
     fetch(`${API_BASE}/api/v1/geo/bairros/choropleth?metric=${metric}`)
@@ -155,7 +226,7 @@ export function Mapa() {
       .finally(() => {
         if (isMounted.current) setLoading(false)
       })
-  }, [metric])
+  }, [metric, bootstrap])
 
   const onEachFeature = useCallback<NonNullable<GeoJSONOptions['onEachFeature']>>(
     (feature: Feature<Geometry, BairroProperties>, layer: Layer) => {
@@ -0,0 +1,49 @@
+import type { Feature, FeatureCollection, MultiPolygon, Polygon, Position } from 'geojson'
+
+// TopoJSON no formato gerado por backend/topologia.py: arcos delta-codificados e quantizados
+type TopoGeometry = {
+  type: 'Polygon' | 'MultiPolygon'
+  id?: string
+  properties?: Record<string, unknown>
+  arcs: number[][] | number[][][]
+}
+
+export type Topology = {
+  type: 'Topology'
+  transform: { scale: [number, number]; translate: [number, number] }
+  objects: Record<string, { type: 'GeometryCollection'; geometries: TopoGeometry[] }>
+  arcs: [number, number][][]
+}
+
+export function topojsonToGeoJson(topo: Topology, objeto = 'bairros'): FeatureCollection {
+  const [sx, sy] = topo.transform.scale
+  const [tx, ty] = topo.transform.translate
+  const arcos: Position[][] = topo.arcs.map((arco) => {
+    let x = 0
+    let y = 0
+    return arco.map(([dx, dy]) => {
+      x += dx
+      y += dy
+      return [x * sx + tx, y * sy + ty]
+    })
+  })
+
+  // arco negativo (~i) é o arco i percorrido ao contrário
+  const anel = (ids: number[]): Position[] => {
+    const coords: Position[] = []
+    ids.forEach((i) => {
+      const pts = i >= 0 ? arcos[i] : arcos[~i].slice().reverse()
+      coords.push(...(coords.length ? pts.slice(1) : pts))
+    })
+    return coords
+  }
+
+  const features: Feature[] = (topo.objects[objeto]?.geometries ?? []).map((g) => {
+    const geometry: Polygon | MultiPolygon =
+      g.type === 'Polygon'
+        ? { type: 'Polygon', coordinates: (g.arcs as number[][]).map(anel) }
+        : { type: 'MultiPolygon', coordinates: (g.arcs as number[][][]).map((pol) => pol.map(anel)) }
+    return { type: 'Feature', id: g.id, properties: g.properties ?? {}, geometry }
+  })
+  return { type: 'FeatureCollection', features }
+}